@@ -29,7 +29,9 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=qt_plugins,
-    datas=[('images', 'images'), ('fonts', 'fonts'), ('estilos.css', '.')],
+    # demucs_server.py también como dato: lo ejecuta el Python de Demucs
+    datas=[('images', 'images'), ('fonts', 'fonts'), ('estilos.css', '.'),
+           ('demucs_server.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
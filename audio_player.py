@@ -15,7 +15,6 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import threading
-import queue
 import logging
 import random
 import re
@@ -33,9 +32,6 @@ from PyQt6.QtWidgets import (
     QFrame, QListWidgetItem, QWidget, QFileDialog,
     QAbstractItemView, QCheckBox, QMenu, QDialog,
 )
-import requests
-from urllib.parse import quote
-import unicodedata
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
@@ -43,8 +39,16 @@ from platform_utils import (
     IS_WINDOWS, IS_MAC,
     run_silent, check_command_exists, get_python_cmd, get_data_dir,
     detect_nvidia_gpu, check_visual_cpp, check_pytorch_cuda,
+    get_total_ram_gb, get_gpu_memory_gb,
+)
+from demucs_worker import (
+    LIVE_DIR, DemucsBatchWorker, DemucsWorker, _sanitize_path_component,
+)
+import demucs_server
+from demucs_scheduler import (
+    BATCH_SIZE, MAX_JOBS, DemucsScheduler, JobJournal, suggest_concurrency,
+    threads_per_job,
 )
-from demucs_worker import DemucsWorker, _sanitize_path_component
 import shutil
 from python_worker import PythonInstallWorker
 from visualc_worker import VisualCWorker
@@ -65,37 +69,55 @@ from lazy_resources import (LazyAudioManager, LazyImageManager, LazyLyricsManage
                             LazyPlaylistLoader, get_song_duration,
                             read_song_metadata)
 from audio_visualizer import (AudioAnalyzer, CircularVisualizerWidget,
-                              VisualizerWidget)
-from lyrics_sync_editor import AUTO_UNMUTE_COLOR, LYRIC_COLORS, LyricsSyncDialog
+                              StemLevelMeter, VisualizerWidget)
+from song_analysis import (analysis_path, compute_song_analysis,
+                           load_song_analysis, save_song_analysis, stems_mtime)
+from lrc_parser import ParsedLyrics, load_lrc, set_lrc_offset
+from lyrics_fetcher import (
+    LYRICS_NOT_FOUND_TEXT, LookupFailed, LyricsFetcher, lyrics_status, normalize_text,
+    read_lyrics_status, write_lyrics_status,
+)
+from lyrics_sync_editor import LyricsSyncDialog
+from live_stems import LiveStems
+from separation_index import SeparationIndex
+from separation_profiles import (
+    ALL_STEMS, DEFAULT_STEMS, STEM_FORMATS, ProfileStore, read_separation_info,
+    song_stem_format, stem_paths,
+)
 
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # ── Constantes ────────────────────────────────────────────────────────────────
 # ──────────────────────────────────────────────────────────────────────────────
-TRACK_NAMES = ("drums", "vocals", "bass", "other")
+# Todos los stems posibles, en el orden de los controles; cada canción usa
+# los que anota su data.json (song_stems): 4, 6 o voz + instrumental
+TRACK_NAMES = ALL_STEMS
+# Stems sin icono propio: usan el de "otros" con su nombre debajo
+_STEM_ICONS = {"guitar": "other", "piano": "other", "no_vocals": "other"}
 DEFAULT_LIBRARY = get_data_dir() / "music_library"
 DEFAULT_VOLUME = 25
 LYRICS_FONT_MIN = 20
 LYRICS_FONT_MAX = 100
 LYRICS_FONT_DEFAULT = 62
 LYRICS_NEXT_MIN_HEIGHT = 60
+# Espera tras el último "Mostrar antes/después" para guardar el [offset:]
+LYRICS_OFFSET_SAVE_MS = 1500
 STATUS_CACHE_TTL = 5.0
 VERIFICATION_MAX_ATTEMPTS = 60
 VERIFICATION_INTERVAL_MS = 30_000
-# Texto que se escribe en lyrics.lrc cuando la API no encontró letras; si el
-# archivo lo contiene, se reintenta la búsqueda en la próxima carga
-LYRICS_NOT_FOUND_TEXT = "Letras no encontradas"
+LIVE_REFRESH_MS = 250       # lectura de lo nuevo en la separación progresiva
 
 
 class AudioPlayer(QMainWindow):
     # QImage (no QPixmap): la portada se carga en hilos secundarios y Qt solo
     # permite crear QPixmap en el hilo de la GUI
     cover_loaded = pyqtSignal(QImage)
-    lyrics_loaded = pyqtSignal(list)
+    lyrics_loaded = pyqtSignal(object)  # ParsedLyrics (o lista vacía)
     lyrics_error = pyqtSignal(str)
     lyrics_not_found = pyqtSignal()
     lyrics_refetched = pyqtSignal(str, bool)  # ruta de la canción, encontradas
+    song_analysis_ready = pyqtSignal(str, object)  # ruta, SongAnalysis
     dependencies_checked = pyqtSignal()
 
     # ──────────────────────────────────────────────────────────────────────
@@ -157,20 +179,31 @@ class AudioPlayer(QMainWindow):
         self._search_matches: list[int] = []
         self._search_pos = -1
 
-        # Cola de letras: un solo worker en segundo plano para no saturar
-        # red/CPU al cargar playlists grandes
-        self._lyrics_queue: queue.Queue = queue.Queue()
-        self._lyrics_worker_thread = None
+        # Cola de letras: pocos workers con sesión HTTP compartida, límite
+        # de ritmo por proveedor y backoff persistente de las no encontradas
+        self.lyrics_fetcher = LyricsFetcher(
+            self._fetch_lyrics_from_api,
+            failures_path=get_data_dir() / "lyrics_failures.json",
+        )
 
-        # Cola Demucs
-        self.demucs_queue: list[dict] = []
-        self.demucs_active = False
-        self.demucs_progress = 0
+        # Cola Demucs: varios trabajos a la vez según hardware (o lo que
+        # elija el usuario en el menú); cada trabajo en curso guarda su
+        # worker, hilo y progreso en su dict (ver _start_demucs_job). La
+        # cola queda en disco: lo pendiente se reanuda en el próximo arranque
+        self.demucs_scheduler = DemucsScheduler(
+            self._start_demucs_job,
+            journal=JobJournal(get_data_dir() / "demucs_queue.json"),
+        )
+        self._demucs_resumed = False
+        self._demucs_jobs_override: int | None = None   # None = automático
+        self._demucs_auto_jobs: int | None = None
+        # Perfil predeterminado y RTF medido por dispositivo y perfil
+        self.separation_profiles = ProfileStore(get_data_dir() / "separation_profiles.json")
+        # (hash del audio de origen, perfil) → canción ya separada
+        self.separation_index = SeparationIndex(
+            get_data_dir() / "separation_index.json", library=DEFAULT_LIBRARY)
         self.processing_multiple = False
-        self.demucs_thread = None
-        self.demucs_worker = None
         self.last_in_queue = {"artist": "", "song": ""}
-        self._current_demucs_job: dict | None = None
         self._verification_attempts = 0
 
         # Dependencias — marcamos vc_available=True fuera de Windows (no se necesita)
@@ -191,9 +224,20 @@ class AudioPlayer(QMainWindow):
         # Auto-unmute de voz en líneas en blanco de las letras (con fundido)
         self.auto_unmute_enabled = False
         self._auto_unmute_gain = 0.0  # ganancia actual de la voz (0..1)
+        # Análisis offline por canción para el visualizador (song_analysis)
+        self.song_analysis_enabled = True
         self._seeking = False
         self._sd_streams: list = []
         self._track_data: list = []
+        self._track_names: list[str] = []     # stem de cada entrada de _track_data
+        # Separación progresiva: frames ya separados de _track_data (None =
+        # la canción entera); el mezclador no pasa de ahí
+        self._track_frontier: int | None = None
+        self._live: LiveStems | None = None
+        self._live_job: dict | None = None
+        self._live_timer = QTimer(self)
+        self._live_timer.setInterval(LIVE_REFRESH_MS)
+        self._live_timer.timeout.connect(self._refresh_live)
         self._seek_position = 0
         self._stream_lock = threading.Lock()
         self._stream_cancel_flags: list = []
@@ -202,9 +246,17 @@ class AudioPlayer(QMainWindow):
         self._stream_pause_flag.set()
 
         # Letras
-        self.lyrics: list = []
+        self.lyrics = []
         self.lyrics_font_size = LYRICS_FONT_DEFAULT
-        self._last_current_html = None
+        # Ajuste de timing sin guardar (s, + = mostrar después) sobre la letra
+        # de `_lyrics_nudge_path`: se aplica al consultar la línea vigente y
+        # se guarda como [offset:] tras LYRICS_OFFSET_SAVE_MS sin pulsaciones.
+        self._lyrics_nudge = 0.0
+        self._lyrics_nudge_path: Path | None = None
+        self._lyrics_offset_timer = QTimer(self)
+        self._lyrics_offset_timer.setSingleShot(True)
+        self._lyrics_offset_timer.setInterval(LYRICS_OFFSET_SAVE_MS)
+        self._lyrics_offset_timer.timeout.connect(self._save_lyrics_offset)
         self._last_progress_seconds = -1
 
         # Diálogos
@@ -230,6 +282,7 @@ class AudioPlayer(QMainWindow):
         # Cada chequeo lanza un subproceso (1-2s en total, hasta 15s si demucs
         # tarda); en segundo plano para no retrasar la aparición de la ventana
         self.dependencies_checked.connect(self._update_dependency_menus)
+        self.dependencies_checked.connect(self._resume_demucs_queue)
         threading.Thread(
             target=self._check_dependencies_worker, daemon=True
         ).start()
@@ -277,6 +330,10 @@ class AudioPlayer(QMainWindow):
         self.analyzer = AudioAnalyzer(parent=self)
         self.visualizer = VisualizerWidget(self.main_frame)
         self.analyzer.bars_ready.connect(self.visualizer.set_bars)
+        # Barras por stem para los medidores bajo los sliders (un solo rfft
+        # sobre todos los stems; ver AudioAnalyzer.process_stems)
+        self.analyzer.per_stem = True
+        self.analyzer.stem_bars_ready.connect(self._set_stem_levels)
         self.visualizer.lower()
         # El frame central se redimensiona al mostrar/ocultar el dock de la
         # playlist sin disparar el resizeEvent de la ventana; el filtro reubica
@@ -307,9 +364,37 @@ class AudioPlayer(QMainWindow):
         if hasattr(self, 'visualizer'):
             self.visualizer.clear()
             self.visualizer.setVisible(enabled)
+        self._clear_stem_levels()
+        for meter in self._track_meters.values():
+            meter.setVisible(enabled)
         if self._fs_visualizer is not None:
             self._fs_visualizer.clear()
             self._fs_visualizer.setVisible(enabled)
+        self._update_visualizer_pacing()
+
+    def _update_visualizer_pacing(self):
+        """Ajusta el ritmo del analizador a lo que realmente se ve.
+
+        Sin ningún visualizador visible (ventana minimizada y sin fullscreen,
+        o estilo "none") no se calcula nada; el fullscreen sigue el refresco
+        de su pantalla (tope 60 fps) y la ventana principal se queda en 30.
+        """
+        analyzer = getattr(self, 'analyzer', None)
+        if analyzer is None:
+            return
+        main_visible = (hasattr(self, 'visualizer')
+                        and self.visualizer.isVisible()
+                        and not self.isMinimized())
+        fs = self._fs_visualizer
+        fs_visible = (fs is not None and fs.isVisible()
+                      and self._fs_viz_style != "none")
+        analyzer.set_visible(main_visible or fs_visible)
+        if fs_visible:
+            screen = self.lyrics_container.screen()
+            rate = screen.refreshRate() if screen is not None else 60.0
+            analyzer.set_framerate(min(60.0, rate or 60.0))
+        else:
+            analyzer.set_framerate(30)
 
     def _position_visualizer(self):
         # Ocupa desde el borde superior de la barra de progreso hasta el fondo del
@@ -751,10 +836,12 @@ class AudioPlayer(QMainWindow):
         def worker():
             found = False
             try:
-                self._fetch_lyrics_from_api(artist, song, path)
-                found = LYRICS_NOT_FOUND_TEXT not in (
-                    path / "lyrics.lrc"
-                ).read_text(encoding="utf-8")
+                # Búsqueda manual: ignora el backoff pero lo actualiza
+                found = self._fetch_lyrics_from_api(artist, song, path)
+                self.lyrics_fetcher.failures.record(artist, song, found)
+            except LookupFailed as e:
+                # Sin respuesta del proveedor: no cuenta para el backoff
+                logger.warning("No se pudo buscar letras de %s - %s: %s", artist, song, e)
             except Exception as e:
                 logger.error("Error buscando letras de %s - %s: %s", artist, song, e)
             self.lyrics_refetched.emit(str(path), found)
@@ -820,6 +907,12 @@ class AudioPlayer(QMainWindow):
         Devuelve el bloque de la canción ya escrito.
         """
         entry = {"path": str(path), "metadata": read_song_metadata(path)}
+        status = read_lyrics_status(path)
+        if status is not None:
+            entry["lyrics"] = status
+        separation = read_separation_info(path)
+        if separation is not None:
+            entry["separation"] = separation
         (path / "data.json").write_text(
             json.dumps({artist: {song: entry}}, indent=4), encoding='utf-8'
         )
@@ -836,6 +929,7 @@ class AudioPlayer(QMainWindow):
         self.lyrics_error.connect(self._handle_lyrics_error)
         self.lyrics_not_found.connect(self._handle_lyrics_not_found)
         self.lyrics_refetched.connect(self._handle_lyrics_refetched)
+        self.song_analysis_ready.connect(self._handle_song_analysis_ready)
 
     # ──────────────────────────────────────────────────────────────────────
     # ── Timers ───────────────────────────────────────────────────────────
@@ -858,6 +952,12 @@ class AudioPlayer(QMainWindow):
             self._apply_background_pixmap()
         self._position_visualizer()
 
+    def changeEvent(self, event):
+        # Minimizada no se ve el visualizador: el analizador deja de calcular.
+        if event.type() == QEvent.Type.WindowStateChange:
+            self._update_visualizer_pacing()
+        super().changeEvent(event)
+
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -884,8 +984,11 @@ class AudioPlayer(QMainWindow):
         # Detener streams de audio y carga en curso antes del teardown:
         # streams vivos de PortAudio durante el cierre causan segfault
         self._control_channels('stop')
+        self._save_lyrics_offset()
         self.lazy_playlist.stop_loading()
-        self._cleanup_demucs_job()
+        self.lyrics_fetcher.close()
+        self._cleanup_demucs_jobs()
+        demucs_server.shutdown_server()
         if self.playlist_dock.isVisible():
             self.playlist_dock.close()
         super().closeEvent(event)
@@ -921,8 +1024,12 @@ class AudioPlayer(QMainWindow):
                 self.playlist.append(song_data)
                 self.playlist_widget.addItem(self._create_playlist_item(song_data))
 
+                # El estado de letras viene en el data.json ya leído: las
+                # canciones con letras no generan ninguna lectura del .lrc
+                json_data = song_data.get('json_data')
                 self._check_and_fetch_lyrics_async(
-                    song_data['path'], song_data['artist'], song_data['song']
+                    song_data['path'], song_data['artist'], song_data['song'],
+                    json_data.get('lyrics') if isinstance(json_data, dict) else None,
                 )
         finally:
             self.playlist_widget.setUpdatesEnabled(True)
@@ -933,7 +1040,7 @@ class AudioPlayer(QMainWindow):
     def _refresh_song_duration(self, key: tuple[str, str], song_data: dict):
         """Completa la duración de una canción que entró a la playlist sin ella.
 
-        DemucsWorker escribe data.json al inicio del proceso, mucho antes de
+        DemucsWorker escribía data.json al inicio del proceso, mucho antes de
         los stems: un escaneo que caiga en esa ventana agrega la canción con
         duración vacía (get_song_duration lee separated/other.mp3, que aún no
         existe). El re-escaneo posterior sí trae la duración real, pero el
@@ -962,7 +1069,20 @@ class AudioPlayer(QMainWindow):
     def _handle_cover_loaded(self, image: QImage):
         self.cover_label.setPixmap(QPixmap.fromImage(image))
 
-    def _handle_lyrics_loaded(self, lyrics_data: list):
+    @property
+    def lyrics(self) -> ParsedLyrics:
+        return self._lyrics
+
+    @lyrics.setter
+    def lyrics(self, value):
+        # Acepta también [(inicio, texto), ...]: siempre queda parseada, con
+        # el HTML y las marcas de auto-unmute ya calculados.
+        self._lyrics = (value if isinstance(value, ParsedLyrics)
+                        else ParsedLyrics.from_pairs(value or []))
+        # (línea, ancho, fuente) de lo último pintado; None fuerza repintar
+        self._lyrics_shown = None
+
+    def _handle_lyrics_loaded(self, lyrics_data):
         self.lyrics = lyrics_data or []
         self.update_lyrics_menu_state()
 
@@ -981,9 +1101,11 @@ class AudioPlayer(QMainWindow):
         self.lyrics_timer.start(100)
 
     def _handle_lyrics_error(self, error_msg: str):
+        self._lyrics_shown = None
         self.lyrics_current.setHtml(f'<center>Error: {error_msg}</center>')
 
     def _handle_lyrics_not_found(self):
+        self._lyrics_shown = None
         self.lyrics_current.setHtml('<center>No hay letras disponibles</center>')
 
     # ──────────────────────────────────────────────────────────────────────
@@ -1054,6 +1176,7 @@ class AudioPlayer(QMainWindow):
         self._fs_viz_style = style
         if self._fs_visualizer is not None:
             self._fs_visualizer.set_style(style)
+            self._update_visualizer_pacing()
         # Sincronizar el check del menú (también cuando se cicla con V).
         for act in getattr(self, '_fs_viz_style_actions', []):
             act.setChecked(act.data() == style)
@@ -1147,6 +1270,7 @@ class AudioPlayer(QMainWindow):
         self._fs_shortcuts.append(sc)
         self.lyrics_container.showFullScreen()
         self.lyrics_container.setFocus()
+        self._update_visualizer_pacing()
 
     def _exit_lyrics_fullscreen(self):
         if not self._lyrics_fullscreen:
@@ -1171,9 +1295,12 @@ class AudioPlayer(QMainWindow):
         self.tabs.insertTab(
             self._lyrics_tab_index, self.lyrics_container, "Letras")
         self.tabs.setCurrentWidget(self.lyrics_container)
+        self._update_visualizer_pacing()
 
     def stop_playback(self):
         self._control_channels('stop')
+        self._end_live()
+        self._save_lyrics_offset()
         self._update_playback_ui('Detenido')
         self.cover_label.setPixmap(QPixmap(resource_path('images/main_window/none.png')))
         self.progress_song.setValue(0)
@@ -1250,14 +1377,29 @@ class AudioPlayer(QMainWindow):
         chunk_size = 1024
         pos = start_frame
 
-        while pos < len(self._track_data[0][0]):
+        # Con una separación en curso, llegar al final tampoco termina la
+        # canción: espera a que el trabajo acabe (_listen_finished)
+        while pos < len(self._track_data[0][0]) or self._track_frontier is not None:
             if cancel_flag.is_set():
                 break
             self._stream_pause_flag.wait()
             if cancel_flag.is_set():
                 break
 
+            frontier = self._track_frontier
+            if frontier is not None and pos >= frontier:
+                # La reproducción alcanzó a la separación: silencio (la
+                # escritura marca el ritmo) hasta que llegue el siguiente tramo
+                try:
+                    stream.write(np.zeros((chunk_size, self._track_data[0][0].shape[1]),
+                                          dtype='float32'))
+                except Exception:
+                    break
+                continue
+
             end = min(pos + chunk_size, len(self._track_data[0][0]))
+            if frontier is not None:
+                end = min(end, frontier)
             chunk = np.zeros(
                 (end - pos, self._track_data[0][0].shape[1]),
                 dtype='float32',
@@ -1265,25 +1407,37 @@ class AudioPlayer(QMainWindow):
 
             sr = self._track_data[0][1]
             vocal_ramp = self._auto_unmute_ramp(pos, end - pos, sr)
+            # Ganancia con la que entra cada stem (para el análisis por stem)
+            gains = np.zeros(len(self._track_data), dtype=np.float32)
 
             for i, (track_data, _) in enumerate(self._track_data):
-                track = TRACK_NAMES[i]
+                track = self._track_names[i]
                 if self.mute_states[track]:
                     # Voz muteada: el auto-unmute puede reintroducirla con un
                     # fundido durante las líneas en blanco de la letra.
                     if track == "vocals" and vocal_ramp is not None:
                         base = self.individual_volumes[track] * (self.volume / 100.0)
                         chunk += track_data[pos:end] * base * vocal_ramp[:, None]
+                        gains[i] = base * float(vocal_ramp.mean())
                     continue
                 vol = self.individual_volumes[track] * (self.volume / 100.0)
                 chunk += track_data[pos:end] * vol
+                gains[i] = vol
 
             peak = np.max(np.abs(chunk))
             if peak > 1.0:
                 chunk /= peak
+                gains /= peak
 
             if hasattr(self, 'analyzer'):
-                self.analyzer.process(chunk)
+                if self.analyzer.offline is not None:
+                    self.analyzer.process_offline(
+                        pos / sr, gains, peak=min(peak, 1.0))
+                elif self.analyzer.per_stem:
+                    blocks = np.stack([td[pos:end] for td, _ in self._track_data])
+                    self.analyzer.process_stems(blocks, gains, peak=min(peak, 1.0))
+                else:
+                    self.analyzer.process(chunk, peak=min(peak, 1.0))
 
             try:
                 stream.write(chunk)
@@ -1307,6 +1461,10 @@ class AudioPlayer(QMainWindow):
         try:
             max_ms = self.progress_song.maximum()
             target_ms = max(0, min(target_ms, max_ms - 1000))
+            if self._track_frontier is not None:
+                # No se puede ir más allá de lo ya separado
+                sr = self._track_data[0][1]
+                target_ms = min(target_ms, int(self._track_frontier / sr * 1000))
 
             if target_ms >= max_ms - 1000:
                 self._seeking = False
@@ -1351,20 +1509,21 @@ class AudioPlayer(QMainWindow):
                 )
                 return False
 
-            self._track_data = []
+            track_data = []
             for track_path in track_paths:
                 data, sr = sf.read(str(track_path), dtype='float32', always_2d=True)
-                self._track_data.append((data, sr))
+                track_data.append((data, sr))
+            self._track_names = [Path(p).stem for p in track_paths]
+            self._track_data = track_data
+            self._apply_stem_controls(self._track_names)
 
             self._seek_position = 0
             self._stop_streams()
+            if hasattr(self, 'analyzer'):
+                self.analyzer.set_offline(None)
+                self._start_song_analysis(path, track_paths, self._track_data)
 
-            length_s = len(self._track_data[0][0]) / self._track_data[0][1]
-            length_ms = int(length_s * 1000)
-            total_m, total_s = divmod(int(length_s), 60)
-            self.progress_song.setRange(0, length_ms)
-            self.progress_song.setValue(0)
-            self.progress_label.setText(f"00:00 / {total_m:02d}:{total_s:02d}")
+            self._set_song_length(len(self._track_data[0][0]) / self._track_data[0][1])
             return True
 
         except Exception as e:
@@ -1374,6 +1533,95 @@ class AudioPlayer(QMainWindow):
             )
             return False
 
+    def _set_song_length(self, length_s: float):
+        total_m, total_s = divmod(int(length_s), 60)
+        self.progress_song.setRange(0, int(length_s * 1000))
+        self.progress_song.setValue(0)
+        self.progress_label.setText(f"00:00 / {total_m:02d}:{total_s:02d}")
+
+    # ──────────────────────────────────────────────────────────────────────
+    # ── Escuchar mientras se separa ──────────────────────────────────────
+    # ──────────────────────────────────────────────────────────────────────
+    def _play_live(self, slot: int, live_dir: str):
+        """Primer tramo separado de un trabajo con "escuchar mientras se
+        separa": suena con lo que hay; _refresh_live adelanta la frontera y
+        la canción entra a la playlist al terminar (_listen_finished)."""
+        job = self.demucs_scheduler.running.get(slot)
+        if job is None or not job.get('listen'):
+            return
+        try:
+            live = LiveStems(live_dir)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("No se pudo abrir la separación en curso %s: %s", live_dir, e)
+            return
+        self.stop_playback()
+        job['live_started'] = True
+        self.current_index = -1
+        self._live, self._live_job = live, job
+        self._track_names = list(live.stems)
+        self._track_data = live.track_data
+        self._track_frontier = live.frontier
+        self._apply_stem_controls(self._track_names)
+        self._seek_position = 0
+        if hasattr(self, 'analyzer'):
+            self.analyzer.set_offline(None)
+        self._set_song_length(live.frames / live.samplerate)
+        self._restore_mute_states()
+        self.title_bar.title.setText(f"{job['artist']} - {job['song']}")
+        self.lyrics_header.setHtml(
+            f'<H1 style="color: #3AABEF;"><center>{job["artist"]}</center></H1>'
+            f'<H2 style="color: #7E54AF;"><center>{job["song"]}</center></H2>'
+        )
+        self.lyrics_current.setHtml('<center>Separando...</center>')
+        self._update_playback_ui('Activa')
+        self.set_volume(self.volume)
+        self._control_channels('play')
+        self.tabs.setCurrentWidget(self.lyrics_container)
+        self._live_timer.start()
+
+    def _refresh_live(self):
+        live = self._live
+        if live is None:
+            self._live_timer.stop()
+            return
+        if live.refresh():
+            self._track_frontier = live.frontier
+
+    def _end_live(self):
+        """Deja de seguir la separación en curso (la carpeta .live se borra
+        al terminar el trabajo)."""
+        self._live_timer.stop()
+        self._live = self._live_job = None
+        self._track_frontier = None
+
+    def _listen_finished(self, job: dict, worker):
+        """Terminó un trabajo con "escuchar mientras se separa". Si estaba
+        sonando, sigue sin cortes y pasa a ser la canción de la playlist;
+        si nunca empezó (sin servidor, o stems reutilizados) suena ahora."""
+        base_path = worker.base_path
+        row = next((i for i, song in enumerate(self.playlist)
+                    if Path(song['path']) == base_path), -1)
+        live = self._live if self._live_job is job else None
+        if live is None:
+            shutil.rmtree(base_path / LIVE_DIR, ignore_errors=True)
+            if not job.get('live_started') and row >= 0:
+                self.current_index = row
+                self.play_current()
+            return
+        complete = live.finish()
+        self._end_live()
+        self.current_index = row
+        if row < 0:
+            return
+        if complete:
+            self.highlight_current_song()
+            self._update_metadata()
+            return
+        # El servidor cayó a mitad y terminó la CLI: los stems finales
+        position_ms = self.progress_song.value()
+        self.play_current()
+        self.seek_to(position_ms)
+
     # ──────────────────────────────────────────────────────────────────────
     # ── UI de reproducción ───────────────────────────────────────────────
     # ──────────────────────────────────────────────────────────────────────
@@ -1381,20 +1629,38 @@ class AudioPlayer(QMainWindow):
         self.playback_state = state
         if state != "Activa" and hasattr(self, 'visualizer'):
             self.visualizer.clear()
+            self._clear_stem_levels()
         stopped = state == "Detenido"
         self.stop_btn.setEnabled(not stopped)
         self.progress_song.setEnabled(not stopped)
-        for btn in (self.drums_btn, self.vocals_btn, self.bass_btn, self.other_btn):
+        for btn in self._track_buttons.values():
             btn.setEnabled(True)
         self.update_status()
 
+    def _apply_stem_controls(self, stems):
+        """Muestra solo los controles de los stems que tiene la canción."""
+        for track, column in self._track_columns.items():
+            column.setVisible(track in stems)
+
+    def _set_stem_levels(self, bars):
+        """Nivel de cada stem (filas de ``stem_bars_ready``, en el orden de
+        _track_data) en su medidor: la barra más alta de la fila."""
+        names = self._track_names
+        if len(bars) != len(names):
+            return      # bloque de la canción anterior
+        for track, level in zip(names, bars.max(axis=1).tolist()):
+            meter = self._track_meters.get(track)
+            if meter is not None:
+                meter.set_level(level)
+
+    def _clear_stem_levels(self):
+        for meter in self._track_meters.values():
+            meter.clear()
+
     def _restore_mute_states(self):
-        btns = {
-            "drums": self.drums_btn, "vocals": self.vocals_btn,
-            "bass": self.bass_btn, "other": self.other_btn,
-        }
-        for track, btn in btns.items():
-            icon_name = f"no_{track}" if self.mute_states[track] else track
+        for track, btn in self._track_buttons.items():
+            icon = _STEM_ICONS.get(track, track)
+            icon_name = f"no_{icon}" if self.mute_states[track] else icon
             btn.setIcon(QIcon(resource_path(f'images/main_window/icons01/{icon_name}.png')))
             btn.setChecked(self.mute_states[track])
 
@@ -1437,21 +1703,20 @@ class AudioPlayer(QMainWindow):
         sender = self.sender()
         if not isinstance(sender, QPushButton):
             return
-        btn_to_track = {
-            self.drums_btn: "drums", self.vocals_btn: "vocals",
-            self.bass_btn: "bass", self.other_btn: "other",
-        }
+        btn_to_track = {btn: track for track, btn in self._track_buttons.items()}
         track_name = btn_to_track.get(sender)
         if not track_name:
             return
         self.mute_states[track_name] = not self.mute_states[track_name]
         muted = self.mute_states[track_name]
-        icon_name = f"no_{track_name}" if muted else track_name
+        icon = _STEM_ICONS.get(track_name, track_name)
+        icon_name = f"no_{icon}" if muted else icon
         sender.setIcon(QIcon(resource_path(f'images/main_window/icons01/{icon_name}.png')))
         if self._lyrics_fullscreen:
             self._show_fs_track_toast(track_name, muted)
 
-    _TRACK_LABELS = {"drums": "Batería", "vocals": "Vocal", "bass": "Bajo", "other": "Otros"}
+    _TRACK_LABELS = {"drums": "Batería", "vocals": "Vocal", "bass": "Bajo", "other": "Otros",
+                     "guitar": "Guitarra", "piano": "Piano", "no_vocals": "Instrumental"}
 
     def _show_fs_track_toast(self, track_name: str, muted: bool):
         """Mensaje momentáneo (esquina superior derecha) al togglear una pista
@@ -1483,6 +1748,7 @@ class AudioPlayer(QMainWindow):
     # ──────────────────────────────────────────────────────────────────────
     AUTO_UNMUTE_FADE_S = 0.5  # duración del fundido (segundos)
     _AUTO_UNMUTE_ROW_H = 24  # alto reservado para la fila del checkbox (px)
+    _STEM_METER_H = 4        # alto del medidor de nivel bajo cada slider (px)
 
     def _on_auto_unmute_toggled(self, checked: bool):
         self.auto_unmute_enabled = checked
@@ -1496,21 +1762,12 @@ class AudioPlayer(QMainWindow):
         Antes de la primera línea se considera que NO dispara (la voz sigue
         muteada en la intro).
         """
-        if not self.lyrics:
-            return False
-        html = None
-        for t, h in self.lyrics:
-            if current_time >= t:
-                html = h
-            else:
-                break
-        if html is None:
-            return False
-        red_hex = LYRIC_COLORS[AUTO_UNMUTE_COLOR].lower()
-        if f'color="{red_hex}"' in html.lower():
-            return True
-        text = re.sub(r'<[^>]*>', '', html).replace('&nbsp;', '').strip()
-        return text == ''
+        i = self._lyrics_index(current_time)
+        return bool(i >= 0 and self.lyrics.blank[i])
+
+    def _lyrics_index(self, current_time: float) -> int:
+        """Línea vigente con el ajuste de timing pendiente aplicado."""
+        return self.lyrics.index_at(current_time - self._lyrics_nudge)
 
     def _auto_unmute_ramp(self, pos: int, n: int, sr: int):
         """Devuelve una rampa de ganancia (n,) para la voz, o None.
@@ -1598,10 +1855,21 @@ class AudioPlayer(QMainWindow):
             )
 
     def _format_demucs_progress(self) -> str:
-        if self.demucs_active:
-            filled = int(self.demucs_progress / 100 * 10)
+        running = list(self.demucs_scheduler.running.values())
+        if running:
+            # Con varios trabajos, la barra muestra el promedio
+            progress = sum(j.get('progress', 0) for j in running) // len(running)
+            filled = int(progress / 100 * 10)
             bar = '■' * filled + '▢' * (10 - filled)
-            return f"Separando: {bar} {self.demucs_progress}%"
+            # Las canciones, no los slots: un lote cuenta todas las suyas
+            songs = sum(len(j.get('batch') or [j]) for j in running)
+            label = "Separando" if songs == 1 else f"Separando {songs}"
+            text = f"{label}: {bar} {progress}%"
+            etas = [j['eta'] for j in running if j.get('eta') is not None]
+            if etas:
+                mins, secs = divmod(max(etas), 60)
+                text += f" (quedan {mins}:{secs:02d})"
+            return text
         if self.demucs_queue:
             return f"En cola: {len(self.demucs_queue)} trabajos"
         return ""
@@ -1643,11 +1911,14 @@ class AudioPlayer(QMainWindow):
     def track_buttons(self) -> QHBoxLayout:
         self._track_buttons: dict[str, QPushButton] = {}
         self._track_sliders: dict[str, QSlider] = {}
+        # Una columna por stem posible; se ocultan las que la canción no tiene
+        self._track_columns: dict[str, QWidget] = {}
+        self._track_meters: dict[str, StemLevelMeter] = {}
 
         outer = QHBoxLayout()
         for track in TRACK_NAMES:
             btn = QPushButton()
-            self.setup_button(btn, f'{track}_btn', track)
+            self.setup_button(btn, f'{track}_btn', _STEM_ICONS.get(track, track))
             setattr(self, f'{track}_btn', btn)
             self._track_buttons[track] = btn
 
@@ -1656,9 +1927,16 @@ class AudioPlayer(QMainWindow):
             setattr(self, f'{track}_slider', slider)
             self._track_sliders[track] = slider
 
-            col = QVBoxLayout()
+            meter = StemLevelMeter()
+            meter.setFixedHeight(self._STEM_METER_H)
+            self._track_meters[track] = meter
+
+            column = QWidget()
+            col = QVBoxLayout(column)
+            col.setContentsMargins(0, 0, 0, 0)
             col.addWidget(btn)
             col.addWidget(slider)
+            col.addWidget(meter)
 
             if track == "vocals":
                 self.auto_unmute_check = QCheckBox("Auto-unmute")
@@ -1683,15 +1961,24 @@ class AudioPlayer(QMainWindow):
                 self.auto_unmute_check.toggled.connect(self._on_auto_unmute_toggled)
                 self.auto_unmute_check.setChecked(True)
                 col.addWidget(self.auto_unmute_check)
+            elif track in _STEM_ICONS:
+                # Icono prestado: el nombre del stem en la fila del checkbox
+                name = QLabel(self._TRACK_LABELS[track])
+                name.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                name.setStyleSheet("color: #cfcfe0;")
+                name.setFixedHeight(self._AUTO_UNMUTE_ROW_H)
+                col.addWidget(name)
             else:
                 # Mismo alto reservado que el checkbox de la voz para que los
                 # iconos/sliders de todas las columnas queden alineados.
                 col.addSpacing(self._AUTO_UNMUTE_ROW_H)
 
-            outer.addLayout(col)
+            self._track_columns[track] = column
+            outer.addWidget(column)
 
         self.mute_buttons = list(self._track_buttons.values())
         self.enable_disable_buttons(False)
+        self._apply_stem_controls(DEFAULT_STEMS)
         return outer
 
 
@@ -1719,12 +2006,11 @@ class AudioPlayer(QMainWindow):
         btn.setIcon(icon)
 
     def enable_disable_buttons(self, state: bool):
-        for track in TRACK_NAMES:
-            btn = self._track_buttons[track]
+        for track, btn in self._track_buttons.items():
             btn.setEnabled(state)
             if state and not self.mute_states[track]:
                 btn.setIcon(QIcon(resource_path(
-                    f'images/main_window/icons01/{track}.png'
+                    f'images/main_window/icons01/{_STEM_ICONS.get(track, track)}.png'
                 )))
                 btn.setChecked(False)
 
@@ -1992,25 +2278,24 @@ class AudioPlayer(QMainWindow):
             current_time = self._seek_position / sr
         else:
             current_time = self.progress_song.value() / 1000.0
-        current_html = next_html = ""
-        for i, (t, html) in enumerate(self.lyrics):
-            if current_time >= t:
-                current_html = html
-                next_html = self.lyrics[i + 1][1] if i + 1 < len(self.lyrics) else ""
-            else:
-                break
-        # Los bloques multilínea del .lrc (líneas de continuación) llegan con
-        # '\n', que setHtml colapsa en un espacio: convertir a <br> al
-        # renderizar para que el salto de línea sí se muestre.
-        current_html = current_html.replace('\n', '<br>')
-        next_html = next_html.replace('\n', '<br>')
+        # Búsqueda binaria sobre los inicios; el HTML ya viene con los saltos
+        # de línea de los bloques multilínea convertidos a <br>.
+        i = self._lyrics_index(current_time)
+        viewport = self.lyrics_next.viewport()
+        key = (i, viewport.width() if viewport is not None else 0,
+               self.lyrics_font_size)
+        if key == self._lyrics_shown:
+            return  # misma línea: setHtml y el relayout sobran
+        self._lyrics_shown = key
+        html = self.lyrics.html
+        current_html = html[i] if i >= 0 else ""
+        next_html = html[i + 1] if 0 <= i < len(html) - 1 else ""
         self.lyrics_current.setHtml(current_html)
         self.lyrics_next.setHtml(f'<center>{next_html}</center>')
         # Altura según contenido: con la altura fija mínima, una línea de dos
         # renglones (<br>) dejaba el segundo cortado. Sin textWidth el
         # documento no calcula layout y size() devuelve 0.
         doc = self.lyrics_next.document()
-        viewport = self.lyrics_next.viewport()
         if viewport is not None:
             doc.setTextWidth(viewport.width())
         doc_h = int(doc.size().height())
@@ -2030,24 +2315,28 @@ class AudioPlayer(QMainWindow):
             self.sync_editor_action.setEnabled(self._has_sync_assets())
 
     def _lyrics_has_error(self) -> bool:
-        if not self.lyrics or not isinstance(self.lyrics, list):
+        if not self.lyrics:
             return True
         error_keywords = ("no se encontraron", "letras no encontradas")
         return any(
             any(kw in html.lower() for kw in error_keywords)
-            for _, html in self.lyrics
+            for html in self.lyrics.texts
         )
 
     def _has_sync_assets(self) -> bool:
-        """True si la canción actual tiene vocals.mp3 + lyrics.lrc.
+        """True si la canción actual tiene el stem de voz + lyrics.lrc.
 
         Los stems viven en <path>/separated/; el .lrc en la raíz <path>.
         """
         if not (0 <= self.current_index < len(self.playlist)):
             return False
         path = Path(self.playlist[self.current_index]["path"])
-        vocals = path / "separated" / "vocals.mp3"
-        return vocals.exists() and (path / "lyrics.lrc").exists()
+        return self._vocals_path(path).exists() and (path / "lyrics.lrc").exists()
+
+    @staticmethod
+    def _vocals_path(path: Path) -> Path:
+        """Stem de voz de la canción, en el formato en que se guardó."""
+        return path / "separated" / f"vocals.{song_stem_format(path)}"
 
     def open_lyrics_sync_editor(self):
         """Abre el editor de sincronización por onda (ventana aparte).
@@ -2058,6 +2347,9 @@ class AudioPlayer(QMainWindow):
         if not self._has_sync_assets():
             return
         path = Path(self.playlist[self.current_index]["path"])
+        # El editor lee el .lrc: guardar antes el ajuste pendiente para que
+        # vea los tiempos efectivos.
+        self._save_lyrics_offset()
 
         # Pausar reproducción principal para no solapar audio.
         if self.playback_state == "Activa":
@@ -2065,7 +2357,7 @@ class AudioPlayer(QMainWindow):
             self._update_playback_ui('Pausada')
 
         dialog = LyricsSyncDialog(
-            self, path / "separated" / "vocals.mp3", path / "lyrics.lrc",
+            self, self._vocals_path(path), path / "lyrics.lrc",
         )
         # El editor usa Ctrl+F (enfocar su buscador), Ctrl+D (separar línea) y
         # Ctrl+Shift+←/→ (extender selección de registros): deshabilitar las
@@ -2090,55 +2382,58 @@ class AudioPlayer(QMainWindow):
         if dialog.saved:
             # Invalidar cache y recargar letras editadas.
             self.lazy_lyrics.cache.remove(f"lyrics_{path}")
-            self._handle_lyrics_loaded(self.lazy_lyrics.load_lyrics_lazy(path))
+            lyrics = self.lazy_lyrics.load_lyrics_lazy(path)
+            song = self.playlist[self.current_index]
+            found = bool(lyrics) and all(
+                LYRICS_NOT_FOUND_TEXT not in text for _, text in lyrics)
+            write_lyrics_status(path, song["artist"], song["song"],
+                                lyrics_status(found, "editor", len(lyrics)))
+            self._handle_lyrics_loaded(lyrics)
         self.update_lyrics_menu_state()
 
     def adjust_lyrics_timing(self, offset: float):
+        """Muestra la letra `offset` segundos después (o antes si es < 0).
+
+        No reescribe el .lrc en cada pulsación: acumula el ajuste, que se
+        aplica al buscar la línea vigente, y lo guarda como cabecera
+        [offset:] cuando el usuario deja de pulsar (ver _save_lyrics_offset).
+        """
+        if not (0 <= self.current_index < len(self.playlist)):
+            return
+        path = Path(self.playlist[self.current_index]["path"])
+        if self._lyrics_nudge_path not in (None, path):
+            self._save_lyrics_offset()
+        self._lyrics_nudge_path = path
+        self._lyrics_nudge += offset
+        self._lyrics_shown = None
+        self.update_lyrics_display()
+        self._lyrics_offset_timer.start()
+
+    def _save_lyrics_offset(self):
+        """Escribe el ajuste pendiente en el [offset:] del .lrc y recarga la
+        letra ya con él aplicado (los timestamps no se tocan)."""
+        self._lyrics_offset_timer.stop()
+        path, nudge = self._lyrics_nudge_path, self._lyrics_nudge
+        if path is None:
+            return
+        self._lyrics_nudge_path = None
         try:
-            path = Path(self.playlist[self.current_index]["path"])
-            lrc_path = path / "lyrics.lrc"
-            with open(lrc_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            modified = self._process_lines(lines, offset)
-            with open(lrc_path, "w", encoding="utf-8") as f:
-                f.writelines(modified)
-            # Invalidar el parse cacheado: sin esto, al volver a la canción
-            # se mostraría la versión vieja de las letras
-            self.lazy_lyrics.cache.remove(f"lyrics_{path}")
-            self._handle_lyrics_loaded(self.lazy_lyrics.load_lyrics_lazy(path))
+            if nudge:
+                lrc_path = path / "lyrics.lrc"
+                # [offset:] positivo adelanta la letra: el signo se invierte
+                set_lrc_offset(lrc_path, load_lrc(lrc_path).offset - nudge)
+                self.lazy_lyrics.cache.remove(f"lyrics_{path}")
+                if (0 <= self.current_index < len(self.playlist) and Path(
+                        self.playlist[self.current_index]["path"]) == path):
+                    self.lyrics = self.lazy_lyrics.load_lyrics_lazy(path)
         except Exception as e:
             styled_message_box(
                 self, "Error", f"No se pudo ajustar: {str(e)}",
                 QMessageBox.Icon.Warning,
             )
-
-    def _process_lines(self, lines: list, offset: float) -> list:
-        result = []
-        for line in lines:
-            if not line.strip().startswith("["):
-                result.append(line)
-                continue
-            try:
-                time_str = line[1:line.index("]")]
-                new_time = self._adjust_time(time_str, offset)
-                result.append(f"[{new_time}]{line.split(']', 1)[1]}")
-            except Exception:
-                result.append(line)
-        return result
-
-    def _adjust_time(self, time_str: str, offset: float) -> str:
-        # Aritmética entera en centisegundos: evita errores de redondeo
-        # de float (p.ej. 01:59.80 + 0.5 daba 02:00.29)
-        mins, rest = time_str.split(':', 1)
-        secs, centis = rest.split('.', 1)
-        total_cs = max(
-            0,
-            int(mins) * 6000 + int(secs) * 100 + int(centis)
-            + round(offset * 100),
-        )
-        m, rem = divmod(total_cs, 6000)
-        s, c = divmod(rem, 100)
-        return f"{m:02d}:{s:02d}.{c:02d}"
+        finally:
+            self._lyrics_nudge = 0.0
+            self._lyrics_shown = None
 
     def increase_lyrics_font(self):
         self.lyrics_font_size = min(self.lyrics_font_size + 2, LYRICS_FONT_MAX)
@@ -2165,80 +2460,48 @@ class AudioPlayer(QMainWindow):
     # ──────────────────────────────────────────────────────────────────────
     # ── Letras async ─────────────────────────────────────────────────────
     # ──────────────────────────────────────────────────────────────────────
-    def _check_and_fetch_lyrics_async(self, dir_path, artist, song):
-        self._lyrics_queue.put((dir_path, artist, song))
-        if self._lyrics_worker_thread is None or not self._lyrics_worker_thread.is_alive():
-            self._lyrics_worker_thread = threading.Thread(
-                target=self._lyrics_queue_worker, daemon=True
-            )
-            self._lyrics_worker_thread.start()
-
-    def _lyrics_queue_worker(self):
-        while True:
-            try:
-                dir_path, artist, song = self._lyrics_queue.get(timeout=5)
-            except queue.Empty:
-                return
-            try:
-                lrc_path = Path(dir_path) / "lyrics.lrc"
-                needs_update = not lrc_path.exists()
-                if not needs_update:
-                    try:
-                        needs_update = (
-                            LYRICS_NOT_FOUND_TEXT
-                            in lrc_path.read_text(encoding="utf-8")
-                        )
-                    except Exception:
-                        needs_update = True
-                if needs_update:
-                    self._fetch_lyrics_from_api(artist, song, Path(dir_path))
-            except Exception:
-                pass
-            finally:
-                self._lyrics_queue.task_done()
+    def _check_and_fetch_lyrics_async(self, dir_path, artist, song, status=None):
+        self.lyrics_fetcher.submit(dir_path, artist, song, status)
 
     def _normalize_text(self, text: str) -> str:
-        normalized = unicodedata.normalize('NFKD', text.lower())
-        return ''.join(c for c in normalized if not unicodedata.combining(c))
+        return normalize_text(text)
 
-    def _fetch_lyrics_from_api(self, artist: str, song: str, output_dir: Path):
-        synced = (self._search_lrclib(artist, song)
-                  or self._search_syncedlyrics(artist, song))
-        self._write_lyrics_file(output_dir, artist, song, synced)
+    def _fetch_lyrics_from_api(self, artist: str, song: str, output_dir: Path) -> bool:
+        """Busca y escribe lyrics.lrc; True si encontró letras sincronizadas.
+        Si algún proveedor no respondió y ninguno las tenía, lanza
+        LookupFailed sin escribir el placeholder (no es un "no hay")."""
+        failed = None
+        try:
+            provider, synced = "lrclib", self._search_lrclib(artist, song)
+        except LookupFailed as e:
+            synced, failed = "", e
+        if not synced:
+            try:
+                provider, synced = "syncedlyrics", self._search_syncedlyrics(artist, song)
+            except LookupFailed as e:
+                failed = failed or e
+        if not synced and failed is not None:
+            raise failed
+        self._write_lyrics_file(output_dir, artist, song, synced, provider)
+        return bool(synced)
 
     def _search_lrclib(self, artist: str, song: str) -> str:
         """Búsqueda primaria en LRCLIB con coincidencia exacta normalizada."""
-        url = f"https://lrclib.net/api/search?q={quote(f'{artist} {song}')}"
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            norm_artist = self._normalize_text(artist)
-            norm_song = self._normalize_text(song)
-            for result in response.json():
-                if (self._normalize_text(result.get("artistName", "")) == norm_artist
-                        and self._normalize_text(result.get("trackName", "")) == norm_song
-                        and result.get("syncedLyrics")):
-                    return result["syncedLyrics"]
-        except Exception:
-            pass
-        return ""
+        return self.lyrics_fetcher.search_lrclib(artist, song)
 
     def _search_syncedlyrics(self, artist: str, song: str) -> str:
         """Fallback multi-proveedor (NetEase, Musixmatch, etc.) con matching fuzzy."""
-        try:
-            import syncedlyrics
-            return syncedlyrics.search(f"{song} {artist}", synced_only=True) or ""
-        except Exception:
-            return ""
+        return self.lyrics_fetcher.search_syncedlyrics(artist, song)
 
-    def _write_lyrics_file(self, output_dir: Path, artist: str, song: str, lyrics):
+    def _write_lyrics_file(self, output_dir: Path, artist: str, song: str, lyrics,
+                           provider: str = ""):
+        lines = []
         if not lyrics:
             content = (
                 f'[00:00.00]<center style="color: #ff2626;">'
                 f'{LYRICS_NOT_FOUND_TEXT}</center>\n'
             )
         else:
-            lines = []
             for line in lyrics.split('\n'):
                 if line.strip():
                     parts = line.split(']', 1)
@@ -2246,6 +2509,8 @@ class AudioPlayer(QMainWindow):
                         lines.append(f'{parts[0]}]<center>{parts[1].strip()}</center>')
             content = '\n'.join(lines) + '\n'
         (output_dir / "lyrics.lrc").write_text(content, encoding="utf-8")
+        write_lyrics_status(output_dir, artist, song, lyrics_status(
+            bool(lyrics), provider if lyrics else "", len(lines)))
 
     # ──────────────────────────────────────────────────────────────────────
     # ── Metadatos ────────────────────────────────────────────────────────
@@ -2300,6 +2565,59 @@ class AudioPlayer(QMainWindow):
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def _start_song_analysis(self, path: Path, track_paths, tracks=None):
+        """Carga (o calcula y guarda) el análisis offline de la canción.
+
+        `tracks` son los stems ya decodificados [(data, sr), ...]; sin ellos
+        (p. ej. recién separada) se decodifican en el mismo hilo.
+        """
+        if not self.song_analysis_enabled:
+            return
+        num_bars = self.analyzer.num_bars
+        fft_size = self.analyzer.fft_size
+        low_freq, high_freq = self.analyzer.low_freq, self.analyzer.high_freq
+
+        def worker():
+            try:
+                target = analysis_path(path)
+                mtime = stems_mtime(track_paths)
+                analysis = load_song_analysis(target, source_mtime=mtime,
+                                              num_bars=num_bars,
+                                              fft_size=fft_size)
+                if analysis is None:
+                    data = tracks or [
+                        sf.read(str(p), dtype='float32', always_2d=True)
+                        for p in track_paths
+                    ]
+                    analysis = compute_song_analysis(
+                        data, num_bars=num_bars, fft_size=fft_size,
+                        low_freq=low_freq, high_freq=high_freq,
+                        source_mtime=mtime)
+                    save_song_analysis(target, analysis)
+                self.song_analysis_ready.emit(str(path), analysis)
+            except Exception as e:
+                logger.error("Error en análisis de %s: %s", path, e)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _handle_song_analysis_ready(self, path: str, analysis):
+        # Solo si sigue sonando la canción para la que se pidió
+        if not (self.song_analysis_enabled
+                and 0 <= self.current_index < len(self.playlist)):
+            return
+        if str(Path(self.playlist[self.current_index]["path"])) == path:
+            self.analyzer.set_offline(analysis)
+
+    def _toggle_song_analysis(self, enabled: bool):
+        self.song_analysis_enabled = enabled
+        if not enabled:
+            self.analyzer.set_offline(None)
+        elif self._track_data and 0 <= self.current_index < len(self.playlist):
+            path = Path(self.playlist[self.current_index]["path"])
+            track_paths = self.lazy_audio.load_audio_lazy(path)
+            if track_paths:
+                self._start_song_analysis(path, track_paths, self._track_data)
+
     # ──────────────────────────────────────────────────────────────────────
     # ── Demucs ───────────────────────────────────────────────────────────
     # ──────────────────────────────────────────────────────────────────────
@@ -2312,108 +2630,282 @@ class AudioPlayer(QMainWindow):
                 QMessageBox.Icon.Warning,
             )
             return
-        self.split_dialog = SplitDialog(self)
+        self.split_dialog = SplitDialog(self, profiles=self.separation_profiles,
+                                        device=self._demucs_device())
         bg_image(self.split_dialog, 'images/split_dialog/split.png')
         self.split_dialog.process_started.connect(self.process_song)
         self.split_dialog.show()
 
-    def process_song(self, artist: str, song: str, file_path: str, timed: bool = False):
+    @property
+    def demucs_queue(self) -> list[dict]:
+        """Trabajos en espera (los que corren están en demucs_scheduler.running)."""
+        return self.demucs_scheduler.pending
+
+    @property
+    def demucs_active(self) -> bool:
+        return self.demucs_scheduler.active
+
+    def process_song(self, artist: str, song: str, file_path: str, timed: bool = False,
+                     profile: str | None = None, listen: bool = False):
+        """Encola una separación. `profile`: nombre de perfil, "auto" o None
+        (el predeterminado); se resuelve al arrancar el trabajo. `listen`:
+        empieza a sonar con el primer tramo separado (separación progresiva,
+        solo con el servidor; sin él, suena al terminar)."""
         self.last_in_queue = {"artist": artist, "song": song}
-        self.demucs_queue.append({"artist": artist, "song": song,
-                                  "file_path": file_path, "timed": timed})
-        if not self.demucs_active:
-            self._process_next_job()
-        else:
+        if self.demucs_active:
             self.processing_multiple = True
-            self.update_status()
-
-    def _process_next_job(self):
-        if not self.demucs_queue:
-            self.demucs_active = False
-            self.processing_multiple = False
-            self.update_status()
-            return
-        self._start_demucs_job(self.demucs_queue.pop(0))
+        self._update_demucs_batch_size()
+        self.demucs_scheduler.set_max_jobs(self._demucs_max_jobs())
+        self.demucs_scheduler.submit({"artist": artist, "song": song,
+                                      "file_path": file_path, "timed": timed,
+                                      "profile": profile, "listen": listen})
+        self.update_status()
 
-    def _start_demucs_job(self, job: dict):
+    def _demucs_device(self) -> str:
+        if IS_MAC:
+            return "MPS"
+        return "CUDA" if self.pytorch_cuda_available else "CPU"
+
+    def _demucs_max_jobs(self) -> int:
+        """Separaciones simultáneas: la del menú o la sugerida por hardware
+        (calculada una vez: consulta nvidia-smi)."""
+        if self._demucs_jobs_override is not None:
+            return self._demucs_jobs_override
+        if self._demucs_auto_jobs is None:
+            device = self._demucs_device()
+            self._demucs_auto_jobs = suggest_concurrency(
+                device, ram_gb=get_total_ram_gb(),
+                vram_gb=get_gpu_memory_gb() if device == "CUDA" else 0.0,
+            )
+        return self._demucs_auto_jobs
+
+    def _update_demucs_batch_size(self):
+        """Lotes de varias canciones por invocación solo sin el servidor
+        persistente: con él, el modelo ya queda cargado entre trabajos."""
+        self.demucs_scheduler.batch_size = (
+            BATCH_SIZE if DemucsWorker._server_unavailable else 1)
+
+    def _set_demucs_jobs(self, jobs: int | None):
+        """Fija las separaciones simultáneas (None = automático)."""
+        self._demucs_jobs_override = jobs
+        self.demucs_scheduler.set_max_jobs(self._demucs_max_jobs())
+        for act in getattr(self, '_demucs_jobs_actions', []):
+            act.setChecked(act.data() == (jobs or 0))
+
+    def _set_stem_format(self, fmt: str):
+        self.separation_profiles.set_stem_format(fmt)
+        for act in getattr(self, '_stem_format_actions', []):
+            act.setChecked(act.data() == fmt)
+
+    def _start_demucs_job(self, job: dict, slot: int):
         try:
-            self._cleanup_demucs_job()
-            self.demucs_active = True
-            self.demucs_progress = 0
+            job['progress'] = 0
             # Cronómetro opcional del proceso (benchmark de hardware)
             job['t0'] = time.monotonic()
-            self._current_demucs_job = job
+            jobs = self.demucs_scheduler.max_jobs
+            profile = self.separation_profiles.resolve(job.get('profile'),
+                                                       self._demucs_device())
+            members = job.get('batch') or [job]
+            # Con varios trabajos, cada uno con su parte de los núcleos
+            workers = []
+            for member in members:
+                member['profile'] = profile.name
+                workers.append(DemucsWorker(
+                    member['artist'], member['song'], member['file_path'], slot=slot,
+                    threads=threads_per_job(jobs) if jobs > 1 else None,
+                    profile=profile, index=self.separation_index,
+                    stem_format=self.separation_profiles.stem_format,
+                    live=bool(member.get('listen')),
+                ))
+            if len(workers) == 1:
+                worker = workers[0]
+                worker.live_ready.connect(lambda d, s=slot: self._play_live(s, d))
+            else:
+                worker = DemucsBatchWorker(workers)
+                worker.song_finished.connect(
+                    lambda i, s=slot: self._on_demucs_song_done(s, i))
+                worker.song_failed.connect(
+                    lambda i, msg, s=slot: self._on_demucs_song_failed(s, i, msg))
+            thread = QThread()
+            job['worker'], job['thread'] = worker, thread
+            worker.moveToThread(thread)
+            thread.started.connect(worker.run)
+            worker.finished.connect(lambda s=slot: self._on_demucs_success(s))
+            worker.error.connect(lambda msg, s=slot: self._handle_demucs_error(s, msg))
+            worker.progress.connect(lambda v, s=slot: self._update_demucs_progress(s, v))
+            worker.eta.connect(lambda secs, s=slot: self._update_demucs_eta(s, secs))
+            worker.cancelled.connect(lambda s=slot: self._on_demucs_cancelled(s))
+            thread.finished.connect(thread.deleteLater)
+            thread.start()
             self.update_status()
-
-            self.demucs_worker = DemucsWorker(job['artist'], job['song'], job['file_path'])
-            self.demucs_thread = QThread()
-            self.demucs_worker.moveToThread(self.demucs_thread)
-            self.demucs_thread.started.connect(self.demucs_worker.run)
-            self.demucs_worker.finished.connect(self._on_demucs_success)
-            self.demucs_worker.error.connect(self._handle_demucs_error)
-            self.demucs_worker.progress.connect(self._update_demucs_progress)
-            self.demucs_thread.finished.connect(self.demucs_thread.deleteLater)
-            self.demucs_thread.start()
         except Exception as e:
-            self._handle_demucs_error(f"Error iniciando separación: {e}")
-            self._process_next_job()
+            self._handle_demucs_error(slot, f"Error iniciando separación: {e}")
 
-    def _cleanup_demucs_job(self):
-        try:
-            if self.demucs_thread and self.demucs_thread.isRunning():
-                self.demucs_thread.quit()
-                self.demucs_thread.wait(1000)
-        except Exception:
-            pass
-        try:
-            if self.demucs_worker:
-                self.demucs_worker.deleteLater()
-        except Exception:
-            pass
-        self.demucs_thread = None
-        self.demucs_worker = None
+    def _resume_demucs_queue(self):
+        """Reanuda las separaciones que quedaron pendientes o a medias en la
+        sesión anterior (una vez, cuando se sabe que Demucs está)."""
+        if self._demucs_resumed or not self.demucs_available:
+            return
+        self._demucs_resumed = True
+        self.demucs_scheduler.set_max_jobs(self._demucs_max_jobs())
+        resumed = self.demucs_scheduler.resume()
+        if not resumed:
+            return
+        logger.info("Reanudando %d separaciones de la sesión anterior", resumed)
+        if resumed > 1:
+            self.processing_multiple = True
+        self.status_label.setText(f"Reanudando {resumed} separaciones pendientes")
+        self.update_status()
+
+    def _cleanup_demucs_jobs(self):
+        # Cierre normal: los trabajos en curso vuelven a pendientes en el
+        # diario (sin contar como intento) y la cola en espera se queda ahí
+        # para el próximo arranque
+        running = list(self.demucs_scheduler.running.values())
+        self.demucs_scheduler.interrupt()
+        for job in running:
+            try:
+                # Sin esto demucs sigue corriendo huérfano tras cerrar la app
+                if job.get('worker'):
+                    job['worker'].cancel()
+                thread = job.get('thread')
+                if thread and thread.isRunning():
+                    thread.quit()
+                    thread.wait(1000)
+            except Exception:
+                pass
+            try:
+                if job.get('worker'):
+                    job['worker'].deleteLater()
+            except Exception:
+                pass
 
-    def _on_demucs_success(self):
-        job = self._current_demucs_job
-        device = getattr(self.demucs_worker, 'device_used', 'CPU')
+    def _on_demucs_success(self, slot: int):
+        job = self.demucs_scheduler.running.get(slot)
+        if job is None:
+            return
+        worker = job.get('worker')
+        device = getattr(worker, 'device_used', 'CPU')
+        # En un lote cada canción ya se atendió al terminar (song_finished)
+        rtf = None if job.get('batch') else self._song_separated(worker)
         self.scan_folder(DEFAULT_LIBRARY)
-        self._finish_demucs_job()
-        self._process_next_job()
+        if job.get('listen'):
+            self._listen_finished(job, worker)
+        self._finish_demucs_job(slot, "done")
         if not self.demucs_queue and self.processing_multiple:
             self.processing_multiple = False
             self._start_file_verification()
         # Al final (con el track ya en la playlist y el siguiente trabajo de la
         # cola ya lanzado, para que el diálogo modal no la detenga)
-        if job and job.get('timed'):
+        if job.get('timed'):
             elapsed = time.monotonic() - job['t0']
             mins, secs = divmod(int(round(elapsed)), 60)
+            profile = getattr(worker, 'profile', None)
             styled_message_box(
                 self, "Tiempo de separación",
                 f"{job['artist']} - {job['song']}\n\n"
                 f"El proceso tomó {mins} min {secs} s.\n"
-                f"Procesado con: {device}",
+                f"Procesado con: {device}"
+                + (f"\nPerfil: {profile.label}" if profile else "")
+                + (f"\nFactor de tiempo real: {rtf:.2f}x" if rtf else "")
+                + ("\nStems reutilizados de una separación anterior del mismo audio"
+                   if getattr(worker, 'reused_from', None) else ""),
                 QMessageBox.Icon.Information,
             )
 
-    def _finish_demucs_job(self):
-        self.demucs_active = False
+    def _song_separated(self, worker) -> float | None:
+        """Canción lista: anota su RTF y arranca su análisis (listo antes de
+        la primera reproducción). Devuelve el RTF."""
+        rtf = self._record_separation_rtf(worker)
+        base_path = getattr(worker, 'base_path', None)
+        if base_path is not None:
+            track_paths = self.lazy_audio.load_audio_lazy(base_path)
+            if track_paths:
+                self._start_song_analysis(base_path, track_paths)
+        return rtf
+
+    def _on_demucs_song_done(self, slot: int, index: int):
+        """Una canción de un lote quedó lista: aparece en la playlist sin
+        esperar al resto."""
+        job = self.demucs_scheduler.running.get(slot)
+        if job is None:
+            return
+        self._song_separated(job['worker'].workers[index])
+        self.demucs_scheduler.record(job['batch'][index], "done")
+        self.scan_folder(DEFAULT_LIBRARY)
+
+    def _on_demucs_song_failed(self, slot: int, index: int, error_msg: str):
+        job = self.demucs_scheduler.running.get(slot)
+        if job is None:
+            return
+        member = job['batch'][index]
+        logger.warning("Separación fallida: %s - %s: %s",
+                       member['artist'], member['song'], error_msg)
+        self.demucs_scheduler.record(member, "failed", error_msg)
+
+    def _record_separation_rtf(self, worker) -> float | None:
+        """Anota el RTF (separación / duración del audio) del trabajo en la
+        tabla del dispositivo. Solo con la máquina entera para ese trabajo:
+        con varios simultáneos cada uno tiene una fracción de los núcleos
+        y el factor no sería comparable."""
+        audio_s = getattr(worker, 'audio_s', 0.0)
+        elapsed = getattr(worker, 'separation_s', 0.0)
+        if not audio_s or not elapsed:
+            return None
+        if getattr(worker, 'threads', None) is None:
+            self.separation_profiles.record(worker.device_used, worker.profile.name,
+                                            audio_s, elapsed)
+        return elapsed / audio_s
+
+    def _finish_demucs_job(self, slot: int, state: str = "done",
+                           error: str | None = None):
+        """Detiene el hilo del trabajo y libera su slot (arranca el
+        siguiente de la cola). `state` queda en el diario de la cola."""
+        job = self.demucs_scheduler.running.get(slot)
+        if job is not None and job is self._live_job and state != "done":
+            # Lo que sonaba ya no se va a completar
+            self.stop_playback()
+        thread = job.get('thread') if job else None
+        if thread and thread.isRunning():
+            thread.quit()
+            thread.wait(500)
+        self._update_demucs_batch_size()
+        self.demucs_scheduler.finished(slot, state, error)
+        if not self.demucs_active and not self.demucs_queue:
+            self.processing_multiple = False
+        self.update_status()
+
+    def cancel_demucs_jobs(self):
+        """Cancela las separaciones en curso y vacía la cola."""
+        self.demucs_scheduler.cancel_pending()
+        for job in self.demucs_scheduler.running.values():
+            if job.get('worker'):
+                job['worker'].cancel()
         self.update_status()
-        if self.demucs_thread and self.demucs_thread.isRunning():
-            self.demucs_thread.quit()
-            self.demucs_thread.wait(500)
-        self.demucs_thread = None
-        self.demucs_worker = None
-
-    def _handle_demucs_error(self, error_msg: str):
-        self._finish_demucs_job()
-        if not self.processing_multiple:
+
+    def _on_demucs_cancelled(self, slot: int):
+        job = self.demucs_scheduler.running.get(slot)
+        if job is not None:
+            logger.info("Separación cancelada: %s - %s", job['artist'], job['song'])
+        self._finish_demucs_job(slot, "cancelled")
+
+    def _handle_demucs_error(self, slot: int, error_msg: str):
+        show = not self.processing_multiple
+        self._finish_demucs_job(slot, "failed", error_msg)
+        if show:
             styled_message_box(self, "Error", error_msg, QMessageBox.Icon.Critical)
-        self._process_next_job()
 
-    def _update_demucs_progress(self, value: int):
-        self.demucs_progress = value
+    def _update_demucs_progress(self, slot: int, value: int):
+        job = self.demucs_scheduler.running.get(slot)
+        if job is not None:
+            job['progress'] = value
         self.update_status()
 
+    def _update_demucs_eta(self, slot: int, secs: int):
+        job = self.demucs_scheduler.running.get(slot)
+        if job is not None:
+            job['eta'] = secs if secs >= 0 else None
+
     # ──────────────────────────────────────────────────────────────────────
     # ── Verificación de archivos post-Demucs ─────────────────────────────
     # ──────────────────────────────────────────────────────────────────────
@@ -2449,9 +2941,8 @@ class AudioPlayer(QMainWindow):
                 / _sanitize_path_component(self.last_in_queue['artist'])
                 / _sanitize_path_component(self.last_in_queue['song'])
                 / "separated")
-        required = ['drums.mp3', 'vocals.mp3', 'bass.mp3', 'other.mp3']
 
-        if not base.exists() or not all((base / f).exists() for f in required):
+        if not base.exists() or not all(p.exists() for p in stem_paths(base.parent)):
             self._verification_attempts += 1
             return
 
@@ -2810,6 +3301,12 @@ class AudioPlayer(QMainWindow):
         self.show_visualizer_action.triggered.connect(self._toggle_visualizer)
         options_menu.addAction(self.show_visualizer_action)
 
+        self.song_analysis_action = QAction("Análisis previo del visualizador", self)
+        self.song_analysis_action.setCheckable(True)
+        self.song_analysis_action.setChecked(self.song_analysis_enabled)
+        self.song_analysis_action.triggered.connect(self._toggle_song_analysis)
+        options_menu.addAction(self.song_analysis_action)
+
         # Estilo del visualizador circular del fullscreen de letras
         # (también se cicla con V dentro del fullscreen).
         fs_viz_menu = options_menu.addMenu("Visualizador en pantalla completa")
@@ -2882,6 +3379,38 @@ class AudioPlayer(QMainWindow):
             tracks_menu.addAction(action)
             self.track_toggle_actions.append(action)
 
+        # Separaciones simultáneas: automático según núcleos/RAM/VRAM, o fijo
+        jobs_menu = options_menu.addMenu("Separaciones simultáneas")
+        assert jobs_menu is not None
+        self._demucs_jobs_actions = []
+        for jobs in range(MAX_JOBS + 1):
+            act = QAction("Automático" if jobs == 0 else str(jobs), self)
+            act.setCheckable(True)
+            act.setData(jobs)
+            act.setChecked(jobs == (self._demucs_jobs_override or 0))
+            act.triggered.connect(
+                lambda _=False, n=jobs: self._set_demucs_jobs(n or None))
+            jobs_menu.addAction(act)
+            self._demucs_jobs_actions.append(act)
+
+        # Formato de los stems de las próximas separaciones (las ya hechas
+        # conservan el suyo, anotado en su data.json)
+        format_menu = options_menu.addMenu("Formato de stems")
+        assert format_menu is not None
+        self._stem_format_actions = []
+        for fmt, (label, _) in STEM_FORMATS.items():
+            act = QAction(label, self)
+            act.setCheckable(True)
+            act.setData(fmt)
+            act.setChecked(fmt == self.separation_profiles.stem_format)
+            act.triggered.connect(lambda _=False, f=fmt: self._set_stem_format(f))
+            format_menu.addAction(act)
+            self._stem_format_actions.append(act)
+
+        cancel_jobs_action = QAction("Cancelar separaciones", self)
+        cancel_jobs_action.triggered.connect(self.cancel_demucs_jobs)
+        options_menu.addAction(cancel_jobs_action)
+
         cleanup_action = QAction("Limpiar Cache", self)
         cleanup_action.triggered.connect(self.cleanup_resources_manual)
         options_menu.addAction(cleanup_action)
@@ -28,40 +28,98 @@ Dos piezas:
   audio; emite ``bars_ready`` (Qt encola la señal hacia el hilo GUI de forma segura).
 - ``VisualizerWidget`` (QWidget): pinta las barras. Va detrás de los controles, con
   fondo transparente y sin robar clics del ratón.
+
+En modo por stem (``per_stem``) el analizador también emite las barras de cada
+stem, que alimentan los ``StemLevelMeter`` junto a los botones de mute.
+
+La geometría fija (posiciones, ancho, giro de cada barra radial, senos y
+cosenos del anillo) se cachea por tamaño y en cada frame solo se recalculan
+las alturas con NumPy. Las curvas ("wave", "electric") se muestrean en NumPy
+directo sobre el buffer de un ``QPolygonF`` y se pintan en bloque
+(``drawPolygon``/``drawLines``), sin un ``QPointF`` por vértice.
 """
 
 import time
 
 import numpy as np
-from PyQt6.QtCore import Qt, QObject, pyqtSignal, QRectF, QPointF
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QRectF
 from PyQt6.QtGui import (QPainter, QColor, QLinearGradient, QRadialGradient,
-                         QBrush, QPainterPath, QPen)
+                         QBrush, QPen, QPolygonF, QTransform)
 from PyQt6.QtWidgets import QWidget
 
 
+def log_band_edges(num_bars: int, fft_size: int, sample_rate: int,
+                   low_freq: float, high_freq: float) -> np.ndarray:
+    """Índices de bin (num_bars + 1,) que delimitan cada barra (espaciado
+    logarítmico). Compartido con el análisis offline (``song_analysis``)."""
+    nyquist = sample_rate / 2.0
+    half = fft_size // 2
+    edges = np.logspace(
+        np.log10(low_freq),
+        np.log10(min(high_freq, nyquist - 1)),
+        num_bars + 1,
+    )
+    idx = (edges / nyquist * half).astype(int)
+    idx = np.clip(idx, 1, half)
+    # Garantiza al menos un bin por barra y monotonía creciente.
+    for i in range(1, len(idx)):
+        if idx[i] <= idx[i - 1]:
+            idx[i] = idx[i - 1] + 1
+    return np.clip(idx, 1, half)
+
+
+def band_means(spec: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Promedio de magnitudes por barra sobre el último eje de `spec`.
+
+    Un solo ``reduceat`` en vez de un bucle por barra: sirve igual para un
+    espectro (bins,) que para (stems, bins) o (frames, bins). El último tramo
+    (del borde superior al final) se descarta; una banda vacía (solo con
+    sample rates muy bajos) devuelve su bin ``lo``.
+    """
+    sums = np.add.reduceat(spec, idx, axis=-1)[..., :-1]
+    return (sums / np.maximum(np.diff(idx), 1)).astype(np.float32)
+
+
 class AudioAnalyzer(QObject):
     """Convierte chunks de PCM en alturas de barras (0.0–1.0).
 
     El cálculo es barato (FFT de ``fft_size`` muestras, ~decenas de µs) y se limita a
     ``framerate`` fps para no recargar el hilo de audio ni el repintado.
+
+    El ritmo se adapta a lo que realmente se ve: sin widgets visibles
+    (``set_visible(False)``) no hace nada; con el audio en silencio deja caer
+    las barras por gravedad sin FFT y, ya en reposo, deja de emitir (cero
+    repintados). Si un frame excede ``frame_budget`` segundos de CPU el
+    intervalo se alarga (hasta ``MIN_FRAMERATE``) y se recupera cuando vuelve
+    a sobrar margen. ``frame_stats()`` expone los contadores para medirlo.
     """
 
+    SILENCE_LEVEL = 1e-4    # pico del chunk por debajo del cual es silencio
+    REST_LEVEL = 1e-3       # barras más bajas que esto se consideran en reposo
+    MIN_FRAMERATE = 10      # piso del recorte por presupuesto de CPU
+
     bars_ready = pyqtSignal(object)  # np.ndarray float32 (num_bars,) en [0, 1]
+    # Modo por stem: np.ndarray float32 (stems, num_bars) en [0, 1]
+    stem_bars_ready = pyqtSignal(object)
 
     def __init__(self, num_bars: int = 48, fft_size: int = 2048,
                  sample_rate: int = 44100, framerate: int = 30,
                  low_freq: float = 50.0, high_freq: float = 12000.0,
-                 parent=None):
+                 frame_budget: float = 0.002, parent=None):
         super().__init__(parent)
         self.num_bars = num_bars
         self.fft_size = fft_size
         self.low_freq = low_freq
         self.high_freq = high_freq
         self.enabled = True
+        self.visible = True        # algún widget que consume las barras se ve
+        self.frame_budget = frame_budget
 
         self.gravity = 0.92        # decaimiento por frame cuando la barra baja
         self._peak_decay = 0.999   # caída lenta de la auto-sensibilidad
-        self._interval = 1.0 / max(1, framerate)
+        self._target_interval = 1.0 / max(1, framerate)
+        self._interval = self._target_interval
+        self._at_rest = True
 
         self._window = np.hanning(fft_size).astype(np.float32)
         self._buf = np.zeros(fft_size, dtype=np.float32)
@@ -69,25 +127,67 @@ class AudioAnalyzer(QObject):
         self._peak = 1e-6
         self._last_emit = 0.0
 
+        # Modo por stem (``process_stems``): un buffer por stem, misma
+        # ventana y bandas; se dimensiona con el primer bloque.
+        self.per_stem = False
+        self._stem_buf = np.zeros((0, fft_size), dtype=np.float32)
+        self._stem_prev = np.zeros((0, num_bars), dtype=np.float32)
+        self._stem_peak = 1e-6
+        self._mix_weights = np.zeros(0, dtype=np.float32)
+
+        # Análisis precalculado de la canción (``song_analysis.SongAnalysis``):
+        # con él ``process_offline`` no hace FFT, solo lee por índice.
+        self.offline = None
+
+        self.reset_stats()
         self.configure(sample_rate)
 
+    def set_framerate(self, framerate: float):
+        """Cambia el fps objetivo (p. ej. al refresco de la pantalla)."""
+        self._target_interval = 1.0 / max(1.0, framerate)
+        self._interval = self._target_interval
+
+    def set_visible(self, visible: bool):
+        """Sin consumidores visibles ``process`` sale antes de tocar el PCM."""
+        self.visible = visible
+
+    def reset_stats(self):
+        self._stats_start = time.monotonic()
+        self._n_frames = 0
+        self._n_computed = 0
+        self._n_hidden = 0
+        self._n_silent = 0
+        self._n_throttled = 0
+        self._cpu_total = 0.0
+        self._cpu_max = 0.0
+
+    def frame_stats(self) -> dict:
+        """Contadores desde el último ``reset_stats``.
+
+        frames: frames emitidos; computed: con FFT; hidden/silent: chunks
+        descartados sin calcular; throttled: veces que se alargó el intervalo
+        por exceder el presupuesto; cpu_avg_ms/cpu_max_ms: costo por frame.
+        """
+        elapsed = max(1e-9, time.monotonic() - self._stats_start)
+        frames = self._n_frames
+        return {
+            "frames": frames,
+            "computed": self._n_computed,
+            "hidden": self._n_hidden,
+            "silent": self._n_silent,
+            "throttled": self._n_throttled,
+            "fps": frames / elapsed,
+            "target_fps": 1.0 / self._target_interval,
+            "current_fps": 1.0 / self._interval,
+            "cpu_avg_ms": self._cpu_total / frames * 1000.0 if frames else 0.0,
+            "cpu_max_ms": self._cpu_max * 1000.0,
+        }
+
     def configure(self, sample_rate: int):
         """Recalcula los rangos de bins por barra (espaciado logarítmico)."""
-        nyquist = sample_rate / 2.0
-        half = self.fft_size // 2
-        edges = np.logspace(
-            np.log10(self.low_freq),
-            np.log10(min(self.high_freq, nyquist - 1)),
-            self.num_bars + 1,
-        )
-        idx = (edges / nyquist * half).astype(int)
-        idx = np.clip(idx, 1, half)
-        # Garantiza al menos un bin por barra y monotonía creciente.
-        for i in range(1, len(idx)):
-            if idx[i] <= idx[i - 1]:
-                idx[i] = idx[i - 1] + 1
-        idx = np.clip(idx, 1, half)
-        self._bin_idx = idx
+        self._bin_idx = log_band_edges(self.num_bars, self.fft_size,
+                                       sample_rate, self.low_freq,
+                                       self.high_freq)
 
     def reset(self):
         """Limpia el estado de suavizado (al iniciar canción o tras un seek)."""
@@ -95,22 +195,146 @@ class AudioAnalyzer(QObject):
         self._prev[:] = 0.0
         self._peak = 1e-6
         self._last_emit = 0.0
+        self._at_rest = True
+        self._stem_buf[:] = 0.0
+        self._stem_prev[:] = 0.0
+        self._stem_peak = 1e-6
 
-    def process(self, chunk: np.ndarray):
-        """Recibe un chunk (frames, canales) o mono desde el hilo de audio."""
-        if not self.enabled:
-            return
+    def process(self, chunk: np.ndarray, peak: float | None = None):
+        """Recibe un chunk (frames, canales) o mono desde el hilo de audio.
 
-        mono = chunk.mean(axis=1) if chunk.ndim > 1 else chunk
+        ``peak`` es el pico absoluto del chunk si quien llama ya lo calculó
+        (``_stream_writer`` lo necesita para normalizar); si no, se mide aquí.
+        """
+        silent = self._gate(chunk, peak)
+        if silent is None:
+            return
+        mono = chunk @ self._downmix(chunk.shape[1]) if chunk.ndim > 1 else chunk
         self._append(mono.astype(np.float32, copy=False))
+        if self._due():
+            self._emit_frame(silent, self._compute)
+
+    def process_stems(self, blocks: np.ndarray, gains: np.ndarray,
+                      peak: float | None = None):
+        """Modo por stem: recibe los bloques de cada stem sin mezclar.
+
+        ``blocks`` es (stems, frames, canales) y ``gains`` la ganancia con la
+        que cada stem entra a la mezcla. Todas las FFT salen de un solo
+        ``rfft`` sobre (stems, fft_size); como la FFT es lineal, el espectro
+        de la mezcla es la combinación de los espectros complejos con
+        ``gains`` y no cuesta otra FFT. Emite ``bars_ready`` (mezcla) y
+        ``stem_bars_ready`` (stems, con sensibilidad compartida para que se
+        comparen entre sí).
+        """
+        silent = self._gate(blocks, peak)
+        if silent is None:
+            return
+        mono = blocks @ self._downmix(blocks.shape[2]) if blocks.ndim > 2 else blocks
+        self._append_stems(mono.astype(np.float32, copy=False))
+        if self._due():
+            self._emit_frame(silent,
+                             lambda: self._compute_stems(np.asarray(gains)),
+                             stems=True)
+
+    def set_offline(self, analysis):
+        """Usa (o deja de usar, con None) un análisis precalculado.
+
+        Debe haberse calculado con las mismas bandas (num_bars/fft_size).
+        """
+        if analysis is not None and (analysis.num_bars != self.num_bars
+                                     or analysis.fft_size != self.fft_size):
+            analysis = None
+        self.offline = analysis
+
+    def process_offline(self, seconds: float, gains: np.ndarray, peak: float):
+        """Frame desde el análisis precalculado en la posición `seconds`.
+
+        Las magnitudes por stem se combinan con ``gains`` (mutes y volúmenes
+        del momento; sumar magnitudes ignora la fase entre stems, diferencia
+        que no se nota en barras) y pasan por el mismo suavizado que el vivo;
+        el costo es el de unas decenas de multiplicaciones, sin FFT. Tras un
+        seek el primer frame ya muestra el estado real de la canción.
+        """
+        silent = self._gate(self._buf[:0], peak)
+        if silent is None or not self._due():
+            return
+        analysis = self.offline
+        mags = analysis.band_magnitudes(analysis.frame_at(seconds))
+
+        def compute():
+            if self.per_stem:
+                self._smooth_stems(mags)
+            return self._smooth(np.asarray(gains, dtype=np.float32) @ mags)
+
+        self._emit_frame(silent, compute, stems=self.per_stem)
 
+    def _downmix(self, channels: int) -> np.ndarray:
+        """Pesos para bajar a mono con un producto (más rápido que ``mean``
+        sobre el eje de canales, que no es contiguo)."""
+        if self._mix_weights.size != channels:
+            self._mix_weights = np.full(channels, 1.0 / channels, dtype=np.float32)
+        return self._mix_weights
+
+    def _gate(self, chunk: np.ndarray, peak: float | None) -> bool | None:
+        """None si el chunk se descarta sin analizar; si no, si es silencio."""
+        if not self.enabled:
+            return None
+        if not self.visible:
+            self._n_hidden += 1
+            return None
+        if peak is None:
+            peak = float(np.abs(chunk).max()) if chunk.size else 0.0
+        silent = peak < self.SILENCE_LEVEL
+        if silent and self._at_rest:
+            # Nada que mostrar ni que dejar caer: ni FFT ni repintado.
+            self._n_silent += 1
+            return None
+        return silent
+
+    def _due(self) -> bool:
         now = time.monotonic()
         if now - self._last_emit < self._interval:
-            return
+            return False
         self._last_emit = now
+        return True
 
-        bars = self._compute()
+    def _emit_frame(self, silent: bool, compute, stems: bool = False):
+        t0 = time.perf_counter()
+        if silent:
+            bars = self._decay()
+        else:
+            bars = compute()
+            self._n_computed += 1
+        self._at_rest = float(bars.max()) < self.REST_LEVEL
+        if self._at_rest:
+            # Último frame: deja las barras exactamente en cero.
+            self._prev[:] = 0.0
+            self._stem_prev[:] = 0.0
+            bars[:] = 0.0
         self.bars_ready.emit(bars)
+        if stems:
+            self.stem_bars_ready.emit(self._stem_prev.copy())
+        self._account(time.perf_counter() - t0)
+
+    def _account(self, cost: float):
+        """Registra el costo del frame y adapta el intervalo al presupuesto."""
+        self._n_frames += 1
+        self._cpu_total += cost
+        self._cpu_max = max(self._cpu_max, cost)
+        slowest = 1.0 / self.MIN_FRAMERATE
+        if cost > self.frame_budget:
+            if self._interval < slowest:
+                self._interval = min(slowest, self._interval * 1.5)
+                self._n_throttled += 1
+        elif (cost < self.frame_budget / 4
+              and self._interval > self._target_interval):
+            self._interval = max(self._target_interval, self._interval / 1.1)
+
+    def _decay(self) -> np.ndarray:
+        """Frame en silencio: solo gravedad, sin FFT."""
+        self._prev *= self.gravity
+        self._stem_prev *= self.gravity
+        return self._prev.copy()
 
     def _append(self, mono: np.ndarray):
         n = len(mono)
@@ -120,15 +344,44 @@ class AudioAnalyzer(QObject):
             self._buf[:-n] = self._buf[n:]
             self._buf[-n:] = mono
 
-    def _compute(self) -> np.ndarray:
-        spec = np.abs(np.fft.rfft(self._buf * self._window))
+    def _append_stems(self, mono: np.ndarray):
+        stems, n = mono.shape
+        if self._stem_buf.shape[0] != stems:
+            self._stem_buf = np.zeros((stems, self.fft_size), dtype=np.float32)
+            self._stem_prev = np.zeros((stems, self.num_bars), dtype=np.float32)
+        if n >= self.fft_size:
+            self._stem_buf[:] = mono[:, -self.fft_size:]
+        else:
+            self._stem_buf[:, :-n] = self._stem_buf[:, n:]
+            self._stem_buf[:, -n:] = mono
 
-        idx = self._bin_idx
-        out = np.empty(self.num_bars, dtype=np.float32)
-        for i in range(self.num_bars):
-            lo, hi = idx[i], idx[i + 1]
-            out[i] = spec[lo:hi].mean() if hi > lo else spec[lo]
+    def _band_means(self, spec: np.ndarray) -> np.ndarray:
+        return band_means(spec, self._bin_idx)
 
+    def _compute(self) -> np.ndarray:
+        spec = np.abs(np.fft.rfft(self._buf * self._window))
+        return self._smooth(self._band_means(spec))
+
+    def _compute_stems(self, gains: np.ndarray) -> np.ndarray:
+        spec = np.fft.rfft(self._stem_buf * self._window, axis=1)
+        self._smooth_stems(self._band_means(np.abs(spec)))
+        # float32 @ complex64: sin subir a complex128 (la mitad del costo)
+        mix = np.abs(gains.astype(np.float32, copy=False) @ spec)
+        return self._smooth(self._band_means(mix))
+
+    def _smooth_stems(self, bands: np.ndarray):
+        """Auto-sensibilidad compartida y gravedad para (stems, num_bars)."""
+        if self._stem_prev.shape != bands.shape:
+            self._stem_prev = np.zeros(bands.shape, dtype=np.float32)
+        stem_out = np.sqrt(bands)
+        cur = float(stem_out.max())
+        self._stem_peak = max(self._stem_peak * self._peak_decay, cur, 1e-6)
+        norm = np.clip(stem_out / self._stem_peak, 0.0, 1.0)
+        fall = self._stem_prev * self.gravity
+        self._stem_prev = np.where(norm > self._stem_prev, norm,
+                                   fall).astype(np.float32)
+
+    def _smooth(self, out: np.ndarray) -> np.ndarray:
         # Compresión de potencia: realza señales débiles (similar al look de CAVA).
         out = np.sqrt(out)
 
@@ -143,6 +396,36 @@ class AudioAnalyzer(QObject):
         return self._prev.copy()
 
 
+def polygon_array(poly: QPolygonF, n: int) -> np.ndarray:
+    """Vista NumPy (n, 2) float64 sobre el buffer de `poly`, redimensionado a n.
+
+    Escribir en la vista escribe directo en los QPointF, sin crear un objeto
+    Python por vértice. Solo es válida hasta el siguiente ``resize``.
+    """
+    poly.resize(n)
+    if n == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    ptr = poly.data()
+    ptr.setsize(n * 2 * 8)
+    return np.frombuffer(ptr, dtype=np.float64).reshape(n, 2)
+
+
+def _fill_ring_segments(segments: QPolygonF, pts: np.ndarray) -> QPolygonF:
+    """Convierte un anillo cerrado de puntos en sus n segmentos (i, i+1),
+    como pares consecutivos listos para ``drawLines``."""
+    out = polygon_array(segments, 2 * len(pts))
+    out[0::2] = pts
+    out[1::2] = np.roll(pts, -1, axis=0)
+    return segments
+
+
+def _outline_pen(color: QColor, width: float) -> QPen:
+    # Punta plana: los segmentos se tocan en los vértices y, a diferencia
+    # de trazar el polígono cerrado con RoundJoin, el raster de Qt no
+    # recorre el bounding box entero (≈8× más barato a 4K).
+    return QPen(color, width, Qt.PenStyle.SolidLine, Qt.PenCapStyle.FlatCap)
+
+
 class VisualizerWidget(QWidget):
     """Pinta las barras detrás de los controles. Transparente a fondo y a clics."""
 
@@ -154,6 +437,12 @@ class VisualizerWidget(QWidget):
         self._bars = np.zeros(0, dtype=np.float32)
         self._gradient = None
         self._gradient_h = -1
+        # Geometría cacheada por (ancho, alto, barras): x de cada barra,
+        # ancho y radio. Por frame solo se recalculan las alturas.
+        self._layout_key = None
+        self._xs = np.zeros(0)
+        self._bar_w = 0.0
+        self._radius = 0.0
 
     def set_bars(self, bars: np.ndarray):
         self._bars = bars
@@ -173,6 +462,19 @@ class VisualizerWidget(QWidget):
         self._gradient = QBrush(grad)
         self._gradient_h = h
 
+    def _update_layout(self, w: int, h: int, n: int):
+        key = (w, h, n)
+        if key == self._layout_key:
+            return
+        if self._gradient is None or self._gradient_h != h:
+            self._build_gradient(h)
+        slot = w / n
+        gap = max(1.0, slot * 0.25)
+        self._bar_w = slot - gap
+        self._radius = self._bar_w * 0.4
+        self._xs = np.arange(n) * slot + gap / 2.0
+        self._layout_key = key
+
     def paintEvent(self, event):
         n = self._bars.size
         if n == 0:
@@ -182,28 +484,63 @@ class VisualizerWidget(QWidget):
         if w <= 0 or h <= 0:
             return
 
-        if self._gradient is None or self._gradient_h != h:
-            self._build_gradient(h)
-        brush = self._gradient
-        assert brush is not None
+        self._update_layout(w, h, n)
+        bh = self._bars * h
+        visible = bh >= 1.0
+        if not visible.any():
+            return
 
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(brush)
+        painter.setBrush(self._gradient)
 
-        slot = w / n
-        gap = max(1.0, slot * 0.25)
-        bar_w = slot - gap
-        radius = bar_w * 0.4
+        bar_w, radius = self._bar_w, self._radius
+        for x, bar_h in zip(self._xs[visible].tolist(), bh[visible].tolist()):
+            painter.drawRoundedRect(QRectF(x, h - bar_h, bar_w, bar_h),
+                                    radius, radius)
+
+
+class StemLevelMeter(QWidget):
+    """Medidor de nivel de un stem: barra horizontal delgada con el mismo
+    degradado que el visualizador. Recibe el nivel (0.0–1.0) de la fila de
+    ``stem_bars_ready`` que le toca; sin clics ni fondo."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
+        self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground, True)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, True)
+        self.level = 0.0
+        self._gradient = None
+        self._gradient_w = -1
+
+    def set_level(self, level: float):
+        level = min(1.0, max(0.0, float(level)))
+        if level != self.level:
+            self.level = level
+            self.update()
+
+    def clear(self):
+        self.set_level(0.0)
 
-        for i in range(n):
-            bh = float(self._bars[i]) * h
-            if bh < 1.0:
-                continue
-            x = i * slot + gap / 2.0
-            rect = QRectF(x, h - bh, bar_w, bh)
-            painter.drawRoundedRect(rect, radius, radius)
+    def paintEvent(self, event):
+        w, h = self.width(), self.height()
+        fill = self.level * w
+        if fill < 1.0 or h <= 0:
+            return
+        if self._gradient is None or self._gradient_w != w:
+            grad = QLinearGradient(0, 0, w, 0)
+            grad.setColorAt(0.0, QColor(255, 255, 255, 100))
+            grad.setColorAt(0.55, QColor(200, 70, 230, 180))
+            grad.setColorAt(1.0, QColor(80, 150, 255, 150))
+            self._gradient = QBrush(grad)
+            self._gradient_w = w
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(self._gradient)
+        painter.drawRoundedRect(QRectF(0, 0, fill, h), h / 2, h / 2)
 
 
 class CircularVisualizerWidget(QWidget):
@@ -219,6 +556,9 @@ class CircularVisualizerWidget(QWidget):
 
     STYLES = ("bars", "wave", "electric", "hbars", "none")
 
+    # Muestras por tramo al aproximar con polilínea la curva de "wave".
+    WAVE_SAMPLES = 8
+
     def __init__(self, parent=None, style: str = "bars"):
         super().__init__(parent)
         self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
@@ -231,6 +571,18 @@ class CircularVisualizerWidget(QWidget):
         self._hgrad_h = -1.0
         self._style = style if style in self.STYLES else "bars"
         self._rng = np.random.default_rng()
+        # Geometría cacheada por (ancho, alto, barras): trigonometría del
+        # anillo, giro de cada barra radial y x de las barras espejadas.
+        self._layout_key = None
+        self._cos = np.zeros(0)
+        self._sin = np.zeros(0)
+        self._rotations: list[QTransform] = []
+        self._xs = np.zeros(0)
+        # Buffers reutilizables que se rellenan con NumPy en cada frame.
+        self._poly = QPolygonF()
+        self._segments = QPolygonF()
+        t = np.arange(self.WAVE_SAMPLES) / self.WAVE_SAMPLES
+        self._bezier = np.column_stack(((1 - t) ** 2, 2 * (1 - t) * t, t ** 2))
 
     def set_style(self, style: str):
         if style in self.STYLES:
@@ -257,30 +609,49 @@ class CircularVisualizerWidget(QWidget):
         self._gradient = QBrush(grad)
         self._gradient_r = rmax
 
+    def _update_layout(self, w: int, h: int, n: int):
+        key = (w, h, n)
+        if key == self._layout_key:
+            return
+        ang = np.linspace(0.0, 2.0 * np.pi, n, endpoint=False)
+        self._cos = np.cos(ang)
+        self._sin = np.sin(ang)
+        # Giro base de 45° a la derecha: los graves (barras largas) quedan
+        # en diagonal en vez de apuntar hacia arriba.
+        step = 360.0 / n
+        self._rotations = [QTransform().rotate(45.0 + i * step)
+                           for i in range(n)]
+        slot = w / n
+        gap = max(1.0, slot * 0.25)
+        self._xs = -w / 2.0 + np.arange(n) * slot + gap / 2.0
+        self._layout_key = key
+
     def _ring_points(self, r0: float, span: float,
                      jitter: float = 0.0) -> np.ndarray:
         """Puntos (x, y) del anillo modulado por el espectro.
 
         radio_i = r0 + bars_i * span (+ jitter aleatorio opcional).
         """
-        n = self._bars.size
-        ang = np.linspace(0.0, 2.0 * np.pi, n, endpoint=False)
         r = r0 + self._bars * span
         if jitter > 0.0:
-            r = r + self._rng.uniform(-jitter, jitter, n)
-        return np.column_stack((r * np.cos(ang), r * np.sin(ang)))
+            r = r + self._rng.uniform(-jitter, jitter, self._bars.size)
+        return np.column_stack((r * self._cos, r * self._sin))
 
-    @staticmethod
-    def _smooth_closed_path(pts: np.ndarray) -> QPainterPath:
+    def _smooth_closed_curve(self, pts: np.ndarray) -> np.ndarray:
         """Curva cerrada suave: cuadráticas entre puntos medios consecutivos
-        usando cada punto como control (técnica estándar de midpoints)."""
-        n = len(pts)
+        usando cada punto como control (técnica estándar de midpoints).
+
+        Se muestrea de una vez con NumPy en vez de armar un QPainterPath
+        punto por punto: devuelve (n * WAVE_SAMPLES, 2).
+        """
         mids = (pts + np.roll(pts, -1, axis=0)) / 2.0
-        path = QPainterPath(QPointF(*mids[-1]))
-        for i in range(n):
-            path.quadTo(QPointF(*pts[i]), QPointF(*mids[i]))
-        path.closeSubpath()
-        return path
+        starts = np.roll(mids, 1, axis=0)
+        wts = self._bezier[None, :, :, None]          # (1, muestras, 3, 1)
+        # B(t) = (1-t)²·P0 + 2(1-t)t·C + t²·P1, para todos los tramos a la vez
+        curve = (wts[:, :, 0] * starts[:, None, :]
+                 + wts[:, :, 1] * pts[:, None, :]
+                 + wts[:, :, 2] * mids[:, None, :])
+        return curve.reshape(-1, 2)
 
     def paintEvent(self, event):
         n = self._bars.size
@@ -295,6 +666,7 @@ class CircularVisualizerWidget(QWidget):
         r0 = side * 0.18            # radio del anillo interior
         rmax = side * 0.48          # alcance máximo
         span = rmax - r0
+        self._update_layout(w, h, n)
 
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -320,18 +692,16 @@ class CircularVisualizerWidget(QWidget):
         painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(self._gradient)
 
-        # Giro base de 45° a la derecha: los graves (barras largas) quedan
-        # en diagonal en vez de apuntar hacia arriba.
-        painter.rotate(45.0)
-        step = 360.0 / n
-        for i in range(n):
-            # Largo mínimo de 2px: en silencio queda un anillo punteado tenue.
-            length = 2.0 + float(self._bars[i]) * span
-            painter.save()
-            painter.rotate(i * step)
-            rect = QRectF(-bar_w / 2.0, -(r0 + length), bar_w, length)
-            painter.drawRoundedRect(rect, radius, radius)
-            painter.restore()
+        # Largo mínimo de 2px: en silencio queda un anillo punteado tenue.
+        # Giros precalculados: un setTransform por barra en vez de
+        # save/rotate/restore.
+        lengths = (2.0 + self._bars * span).tolist()
+        base = painter.transform()
+        for rot, length in zip(self._rotations, lengths):
+            painter.setTransform(rot * base)
+            painter.drawRoundedRect(
+                QRectF(-bar_w / 2.0, -(r0 + length), bar_w, length),
+                radius, radius)
 
     def _paint_hbars(self, painter: QPainter, w: float, h: float):
         """Barras espejadas: mismo look que la ventana principal, pero cada
@@ -361,13 +731,11 @@ class CircularVisualizerWidget(QWidget):
         gap = max(1.0, slot * 0.25)
         bar_w = slot - gap
         radius = bar_w * 0.4
-        for i in range(n):
-            bh = float(self._bars[i]) * half
-            if bh < 1.0:
-                continue
-            x = -w / 2.0 + i * slot + gap / 2.0
-            rect = QRectF(x, -bh, bar_w, 2.0 * bh)
-            painter.drawRoundedRect(rect, radius, radius)
+        bh = self._bars * half
+        visible = bh >= 1.0
+        for x, bar_h in zip(self._xs[visible].tolist(), bh[visible].tolist()):
+            painter.drawRoundedRect(QRectF(x, -bar_h, bar_w, 2.0 * bar_h),
+                                    radius, radius)
 
     def _paint_wave(self, painter: QPainter, r0: float, span: float,
                     rmax: float):
@@ -376,36 +744,33 @@ class CircularVisualizerWidget(QWidget):
         if self._gradient is None or self._gradient_r != rmax:
             self._build_gradient(r0, rmax)
 
-        # Capa principal: relleno con el gradiente y borde rosa.
-        path = self._smooth_closed_path(self._ring_points(r0, span))
-        painter.setPen(QPen(QColor(248, 143, 255, 170), 2.5))
+        # Capa principal: relleno con el gradiente y borde rosa. El borde va
+        # como segmentos sueltos (ver _outline_pen), no como trazo del polígono.
+        curve = self._smooth_closed_curve(self._ring_points(r0, span))
+        polygon_array(self._poly, len(curve))[:] = curve
+        painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(self._gradient)
-        painter.drawPath(path)
+        painter.drawPolygon(self._poly)
+        painter.setPen(_outline_pen(QColor(248, 143, 255, 170), 2.5))
+        painter.drawLines(_fill_ring_segments(self._segments, curve))
 
         # Eco interior: misma forma al 70%, solo contorno azul tenue.
-        echo = self._smooth_closed_path(self._ring_points(r0 * 0.7, span * 0.7))
-        painter.setPen(QPen(QColor(80, 150, 255, 90), 1.5))
-        painter.setBrush(Qt.BrushStyle.NoBrush)
-        painter.drawPath(echo)
+        echo = self._smooth_closed_curve(
+            self._ring_points(r0 * 0.7, span * 0.7))
+        painter.setPen(_outline_pen(QColor(80, 150, 255, 90), 1.5))
+        painter.drawLines(_fill_ring_segments(self._segments, echo))
 
     def _paint_electric(self, painter: QPainter, r0: float, span: float):
         """Anillo dentado tipo rayo: polilínea cerrada sin suavizar, con
         jitter aleatorio por frame (parpadeo) y glow en 3 pasadas."""
         pts = self._ring_points(r0, span, jitter=span * 0.05)
-        path = QPainterPath(QPointF(*pts[0]))
-        for x, y in pts[1:]:
-            path.lineTo(QPointF(x, y))
-        path.closeSubpath()
+        segments = _fill_ring_segments(self._segments, pts)
 
-        painter.setBrush(Qt.BrushStyle.NoBrush)
         # Glow exterior violeta → núcleo casi blanco.
         for width, color in (
             (7.0, QColor(200, 70, 230, 45)),
             (3.5, QColor(248, 143, 255, 100)),
             (1.4, QColor(235, 245, 255, 220)),
         ):
-            painter.setPen(QPen(color, width,
-                                Qt.PenStyle.SolidLine,
-                                Qt.PenCapStyle.RoundCap,
-                                Qt.PenJoinStyle.RoundJoin))
-            painter.drawPath(path)
+            painter.setPen(_outline_pen(color, width))
+            painter.drawLines(segments)
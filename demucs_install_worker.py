@@ -67,5 +67,13 @@ class DemucsInstallWorker(BaseInstallWorker):
                 'error_msg': 'Error descargando el modelo htdemucs_ft',
                 'timeout': 600,
             },
+            {
+                # Perfiles rápido/equilibrado; si falla, demucs lo baja al usarlo
+                'cmd': [python, '-c',
+                        'from demucs import pretrained; pretrained.get_model("htdemucs")'],
+                'error_msg': 'Error descargando el modelo htdemucs',
+                'timeout': 600,
+                'optional': True,
+            },
         ]
         return commands
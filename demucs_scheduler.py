@@ -0,0 +1,304 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Cola de separaciones con varios trabajos simultáneos.
+
+Una sola separación deja núcleos ociosos mientras decodifica, escribe y
+codifica los mp3. ``DemucsScheduler`` corre hasta ``max_jobs`` a la vez, cada
+uno en su "slot" (0..max_jobs-1): el slot identifica su proceso servidor y su
+límite de hilos, de modo que N trabajos de T hilos no se pisen los núcleos.
+
+``suggest_concurrency`` propone N según el dispositivo, los núcleos y la
+memoria (cada trabajo de htdemucs_ft ocupa unos GB de RAM, o de VRAM en
+CUDA). El usuario puede fijar N a mano desde el menú.
+
+Sin Qt: la ventana principal llama a ``submit``/``finished`` desde el hilo
+de la GUI y recibe ``start_job(job, slot)`` para lanzar cada trabajo.
+
+Con ``batch_size`` > 1 cada slot toma hasta ese número de trabajos en
+espera con el mismo perfil (un álbum encolado, típicamente) y los corre
+como un lote: una sola invocación de demucs para todos. El trabajo que
+ocupa el slot lleva la lista completa en ``job["batch"]``.
+
+``JobJournal`` guarda la cola en disco con el estado de cada trabajo
+(pendiente, corriendo, hecho, fallido): al cerrar la app o si se cae, los
+pendientes y los interrumpidos se reanudan en el siguiente arranque y los
+terminados no se repiten. Un cierre normal devuelve los que corrían a
+pendientes (``interrupt``); los que aparecen "corriendo" al arrancar son de
+una caída y cuentan como intento.
+"""
+
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS = 4
+CPU_THREADS_PER_JOB = 4     # con menos hilos cada separación se alarga de más
+RAM_PER_JOB_GB = 4.0        # pico de htdemucs_ft con split + audio decodificado
+VRAM_PER_JOB_GB = 4.0
+
+JOB_STATES = ("pending", "running", "done", "failed")
+JOB_FIELDS = ("artist", "song", "file_path", "timed", "profile")
+# Un trabajo interrumpido tantas veces probablemente es el que tumba la app
+MAX_ATTEMPTS = 3
+# Canciones por invocación de demucs cuando no hay servidor persistente
+BATCH_SIZE = 12
+JOURNAL_HISTORY = 200       # terminados que se conservan (para diagnóstico)
+
+
+def suggest_concurrency(device: str, cores: int | None = None,
+                        ram_gb: float = 0.0, vram_gb: float = 0.0) -> int:
+    """Trabajos simultáneos recomendados (1..MAX_JOBS).
+
+    - CPU: un trabajo por cada CPU_THREADS_PER_JOB núcleos, si la RAM alcanza.
+    - CUDA: los que quepan en la VRAM (y en la RAM).
+    - MPS: uno; la GPU integrada ya se satura con un trabajo.
+    RAM/VRAM en 0 = desconocida (no limita).
+    """
+    cores = cores or os.cpu_count() or 1
+    by_ram = int(ram_gb // RAM_PER_JOB_GB) if ram_gb else MAX_JOBS
+    if device == "MPS":
+        jobs = 1
+    elif device == "CUDA":
+        jobs = min(int(vram_gb // VRAM_PER_JOB_GB) if vram_gb else 1, by_ram)
+    else:
+        jobs = min(cores // CPU_THREADS_PER_JOB, by_ram)
+    return max(1, min(jobs, MAX_JOBS))
+
+
+def threads_per_job(jobs: int, cores: int | None = None) -> int:
+    """Hilos de torch por trabajo para repartir los núcleos entre `jobs`."""
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // max(1, jobs))
+
+
+class DemucsScheduler:
+    """Cola FIFO con hasta `max_jobs` trabajos corriendo a la vez.
+
+    `start_job(job, slot)` debe lanzar el trabajo sin bloquear; quien lo
+    lanzó avisa con `finished(slot)` al terminar (bien o mal), lo que libera
+    el slot y arranca el siguiente de la cola. En un lote, el resultado de
+    cada canción se anota con `record` a medida que llega.
+    """
+
+    def __init__(self, start_job, max_jobs: int = 1, journal: "JobJournal | None" = None,
+                 batch_size: int = 1):
+        self._start_job = start_job
+        self.max_jobs = max(1, max_jobs)
+        self.journal = journal
+        self.batch_size = max(1, batch_size)
+        self.pending: list[dict] = []
+        self.running: dict[int, dict] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.running)
+
+    def submit(self, job: dict) -> None:
+        if self.journal is not None and "id" not in job:
+            self.journal.add(job)
+        self.pending.append(job)
+        self._fill()
+
+    def finished(self, slot: int, state: str = "done",
+                 error: str | None = None) -> dict | None:
+        """Libera `slot`; devuelve el trabajo que lo ocupaba. `state`:
+        "done", "failed" o "cancelled" (cancelado: sale del diario); en un
+        lote, para las canciones sin resultado propio."""
+        job = self.running.pop(slot, None)
+        if job is not None:
+            for member in job.get("batch") or [job]:
+                if "result" not in member:
+                    self.record(member, state, error)
+        self._fill()
+        return job
+
+    def record(self, job: dict, state: str, error: str | None = None) -> None:
+        """Resultado de un trabajo (o de una canción de un lote)."""
+        job["result"] = state
+        if self.journal is None:
+            return
+        if state == "cancelled":
+            self.journal.remove(job)
+        else:
+            self.journal.update(job, state, error)
+
+    def cancel_pending(self) -> None:
+        """Vacía la cola de espera (también en el diario)."""
+        if self.journal is not None:
+            for job in self.pending:
+                self.journal.remove(job)
+        self.pending.clear()
+
+    def interrupt(self) -> None:
+        """Cierre ordenado de la app: los trabajos en curso vuelven a
+        "pending" en el diario sin contar como intento y la cola en espera
+        se queda ahí. El planificador queda vacío."""
+        if self.journal is not None:
+            for job in self.running.values():
+                for member in job.get("batch") or [job]:
+                    if "result" not in member:
+                        self.journal.update(member, "pending")
+        self.running.clear()
+        self.pending.clear()
+
+    def resume(self) -> int:
+        """Encola los trabajos pendientes e interrumpidos del diario;
+        devuelve cuántos."""
+        if self.journal is None:
+            return 0
+        jobs = self.journal.resumable()
+        self.pending.extend(jobs)
+        self._fill()
+        return len(jobs)
+
+    def set_max_jobs(self, max_jobs: int) -> None:
+        """Cambia el límite; los trabajos en curso no se interrumpen."""
+        self.max_jobs = max(1, max_jobs)
+        self._fill()
+
+    def _fill(self) -> None:
+        while self.pending and len(self.running) < self.max_jobs:
+            slot = next(s for s in range(self.max_jobs + len(self.running))
+                        if s not in self.running)
+            job = self.pending.pop(0)
+            batch = [job] + self._take_batch(job)
+            if len(batch) > 1:
+                job["batch"] = batch
+            self.running[slot] = job
+            if self.journal is not None:
+                # En un lote solo la cabeza queda "running": si la app se cae,
+                # el intento se cobra una vez y no a cada canción del lote
+                self.journal.update(job, "running")
+            try:
+                self._start_job(job, slot)
+            except Exception as e:
+                self.running.pop(slot, None)
+                if self.journal is not None:
+                    for member in batch:
+                        self.journal.update(member, "failed", str(e))
+                raise
+
+    def _take_batch(self, head: dict) -> list[dict]:
+        """Trabajos en espera que pueden ir en el lote de `head`: mismo
+        perfil pedido. Los cronometrados van solos (su tiempo es el de una
+        canción), igual que los que se escuchan mientras se separan."""
+        if self.batch_size <= 1 or head.get("timed") or head.get("listen"):
+            return []
+        batch = [j for j in self.pending
+                 if j.get("profile") == head.get("profile")
+                 and not j.get("timed") and not j.get("listen")]
+        batch = batch[:self.batch_size - 1]
+        for job in batch:
+            self.pending.remove(job)
+        return batch
+
+
+class JobJournal:
+    """Cola de separaciones en disco, en JSON:
+
+        {"jobs": [{"id": "...", "artist": "A", "song": "B",
+                   "file_path": "/.../B.mp3", "timed": false,
+                   "profile": "mejor", "state": "pending", "attempts": 0}]}
+
+    Cada trabajo del planificador lleva su "id". Cada cambio de estado se
+    escribe completo (temporal + rename): una caída a mitad de escritura
+    deja el diario anterior, nunca uno truncado. Solo desde el hilo de la GUI.
+    """
+
+    def __init__(self, path=None, history: int = JOURNAL_HISTORY):
+        self.path = Path(path) if path is not None else None
+        self.history = history
+        self.jobs: list[dict] = []
+        if self.path is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self.jobs = [j for j in data.get("jobs", [])
+                             if isinstance(j, dict) and j.get("id")
+                             and j.get("state") in JOB_STATES]
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Cola de separaciones ilegible (%s): %s", self.path, e)
+
+    def add(self, job: dict) -> None:
+        """Anota un trabajo nuevo como pendiente (le asigna `job["id"]`)."""
+        job["id"] = uuid.uuid4().hex
+        entry = {field: job.get(field) for field in JOB_FIELDS}
+        entry.update(id=job["id"], state="pending", attempts=0)
+        self.jobs.append(entry)
+        self._save()
+
+    def update(self, job: dict, state: str, error: str | None = None) -> None:
+        entry = self._entry(job)
+        if entry is None:
+            return
+        # El perfil ya resuelto ("auto" → uno concreto) queda anotado
+        entry.update({field: job[field] for field in JOB_FIELDS if field in job})
+        entry["state"] = state
+        if error:
+            entry["error"] = error[:500]
+        self._trim()
+        self._save()
+
+    def remove(self, job: dict) -> None:
+        entry = self._entry(job)
+        if entry is not None:
+            self.jobs.remove(entry)
+            self._save()
+
+    def resumable(self) -> list[dict]:
+        """Trabajos a reanudar, en orden: los pendientes y los que quedaron
+        "running" (la app se cayó en medio: un cierre normal los devuelve a
+        "pending"). Cada caída cuenta un intento; tras MAX_ATTEMPTS se dan
+        por fallidos."""
+        jobs = []
+        for entry in self.jobs:
+            if entry["state"] == "running":
+                entry["attempts"] = entry.get("attempts", 0) + 1
+                if entry["attempts"] >= MAX_ATTEMPTS:
+                    entry["state"] = "failed"
+                    entry["error"] = "Interrumpido demasiadas veces"
+                    continue
+            if entry["state"] in ("pending", "running"):
+                jobs.append({field: entry.get(field) for field in JOB_FIELDS}
+                            | {"id": entry["id"]})
+        self._save()
+        return jobs
+
+    def _entry(self, job: dict) -> dict | None:
+        job_id = job.get("id")
+        return next((e for e in self.jobs if e["id"] == job_id), None)
+
+    def _trim(self) -> None:
+        finished = [e for e in self.jobs if e["state"] in ("done", "failed")]
+        for entry in finished[:max(0, len(finished) - self.history)]:
+            self.jobs.remove(entry)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps({"jobs": self.jobs}, ensure_ascii=False, indent=2),
+                           encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning("No se pudo guardar %s: %s", self.path, e)
@@ -0,0 +1,580 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Servidor de separación persistente: carga Demucs una vez por sesión.
+
+`python -m demucs` por canción reimporta torch y recarga los cuatro modelos
+de htdemucs_ft en cada trabajo (decenas de segundos antes de procesar audio).
+Este archivo se ejecuta como script con el Python donde está instalado
+Demucs (get_python_cmd(), no el de la app), carga el modelo una vez y
+atiende trabajos por stdin/stdout, un JSON por línea:
+
+    → {"job": 1, "input": "...", "output": "...", "overlap": 0.25, "shifts": 1,
+       "two_stems": "vocals", "format": "flac", "live_dir": "..."}
+    ← {"event": "ready", "model": "htdemucs_ft", "device": "cuda", "load_s": 9.1}
+    ← {"event": "progress", "job": 1, "value": 0.42}
+    ← {"event": "done", "job": 1, "elapsed_s": 31.0}
+    ← {"event": "error", "job": 1, "message": "..."}
+
+La salida tiene la misma estructura que la CLI
+(``<output>/<modelo>/<nombre del archivo>/<stem>.<formato>``), así que el resto
+del flujo no cambia. El proceso termina solo tras SERVER_IDLE_S sin
+trabajos o cuando la app cierra su stdin (incluso si la app muere).
+
+Con ``live_dir`` la separación es progresiva: la canción se procesa por
+tramos consecutivos (cada uno con unos segundos de contexto a los lados,
+para que no se noten las uniones) y cada tramo se agrega a un WAV de 16 bits
+por stem en ``live_dir``. Tras el primer tramo aparece ``LIVE_INFO`` y la
+app ya puede reproducir lo separado mientras se calcula el resto (ver
+live_stems). Al final se guardan los stems completos como siempre.
+
+Del lado de la app, ``SeparationServer`` lanza y habla con el proceso, y
+``get_server`` lo reutiliza entre trabajos (uno por slot cuando corren
+varios a la vez, cada uno limitado a ``--threads`` hilos). Con ``--fake`` se usa un
+separador de prueba que no necesita torch.
+
+Solo biblioteca estándar a nivel de módulo: el intérprete externo no tiene
+PyQt ni el resto de la app.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "htdemucs_ft"
+STEMS = ("drums", "bass", "other", "vocals")
+MODEL_STEMS = {"htdemucs_6s": STEMS + ("guitar", "piano")}
+SERVER_IDLE_S = 300            # sin trabajos: el proceso termina y libera RAM/VRAM
+START_TIMEOUT_S = 900          # la primera vez Demucs descarga los pesos
+JOB_TIMEOUT_S = 7200           # mismo máximo que la CLI
+MP3_BITRATE = 320              # el mismo que usa `demucs --mp3`
+
+# Separación progresiva: el primer tramo es corto (lo que tarda en sonar) y
+# cada uno duplica al anterior hasta LIVE_CHUNK_MAX_S; el contexto de cada
+# lado se procesa de más y se descarta
+LIVE_INFO = "live.json"
+LIVE_FIRST_S = 8
+LIVE_CHUNK_MAX_S = 60
+LIVE_CONTEXT_S = 3
+
+# Junto al ejecutable en builds de PyInstaller (se empaqueta como dato)
+SERVER_SCRIPT = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent)) / "demucs_server.py"
+
+
+class SeparationError(RuntimeError):
+    """El servidor no arrancó o el trabajo falló."""
+
+
+def live_chunks(total: int, samplerate: int):
+    """Tramos (inicio, fin) en frames de la separación progresiva."""
+    start, size = 0, LIVE_FIRST_S * samplerate
+    while start < total:
+        end = min(total, start + size)
+        yield start, end
+        start, size = end, min(size * 2, LIVE_CHUNK_MAX_S * samplerate)
+
+
+class _LiveStems:
+    """WAV de 16 bits por stem que crecen tramo a tramo. `wave` reescribe la
+    cabecera en cada escritura: quien lee ve siempre un archivo válido con
+    los frames ya escritos. LIVE_INFO (largo total, formato, stems) se
+    escribe tras el primer tramo: desde ahí se puede reproducir."""
+
+    def __init__(self, live_dir: Path, stems, samplerate: int, channels: int,
+                 frames: int):
+        self.dir = Path(live_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.info = {"samplerate": samplerate, "channels": channels,
+                     "frames": frames, "stems": list(stems)}
+        self.written = 0
+        self._files = {}
+        for stem in stems:
+            w = wave.open(str(self.dir / f"{stem}.wav"), "wb")
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(samplerate)
+            self._files[stem] = w
+
+    def write(self, pcm: dict, frames: int) -> None:
+        """Agrega `frames` frames (bytes PCM de 16 bits por stem)."""
+        for stem, data in pcm.items():
+            self._files[stem].writeframes(data)
+        first = self.written == 0
+        self.written += frames
+        if first:
+            path = self.dir / LIVE_INFO
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(self.info), encoding="utf-8")
+            os.replace(tmp, path)
+
+    def close(self) -> None:
+        for w in self._files.values():
+            w.close()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# ── Lado del servidor (proceso externo) ──────────────────────────────────────
+# ──────────────────────────────────────────────────────────────────────────────
+class _DemucsSeparator:
+    """Modelo de Demucs cargado una vez; `separate` replica la CLI con
+    `--mp3`, `--flac` o sin opción (wav de 16 bits) según `format`."""
+
+    def __init__(self, model_name: str, device: str | None,
+                 threads: int | None = None):
+        import torch
+        from demucs.pretrained import get_model
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.model = get_model(model_name)
+        self.model.eval()
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.model_name = model_name
+
+    def separate(self, input_path: Path, out_dir: Path, on_progress,
+                 overlap: float = 0.25, shifts: int = 1,
+                 segment: float | None = None, two_stems: str | None = None,
+                 format: str = "mp3", live_dir: str | None = None) -> None:
+        from demucs.audio import AudioFile, save_audio
+
+        model = self.model
+        wav = AudioFile(input_path).read(
+            streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+        ref = wav.mean(0)
+        wav = (wav - ref.mean()) / ref.std()
+        options = {"shifts": shifts, "overlap": overlap, "segment": segment}
+        if live_dir:
+            sources = self._apply_live(wav, ref, Path(live_dir), on_progress,
+                                       two_stems, **options)
+        else:
+            sources = self._apply(wav, on_progress, **options)
+        sources = sources * ref.std() + ref.mean()
+
+        track_dir = out_dir / self.model_name / input_path.stem
+        track_dir.mkdir(parents=True, exist_ok=True)
+        for source, name in self._outputs(sources, two_stems):
+            # save_audio elige el codificador por la extensión
+            save_audio(source.cpu(), track_dir / f"{name}.{format}",
+                       samplerate=model.samplerate, bitrate=MP3_BITRATE,
+                       clip="rescale", bits_per_sample=16)
+
+    def _apply(self, wav, on_progress, shifts: int = 1, **options):
+        import demucs.apply
+        from demucs.apply import apply_model
+
+        model = self.model
+        # apply_model solo informa progreso con tqdm: se envuelve para contar
+        # segmentos. Un BagOfModels (htdemucs_ft) hace una pasada por modelo
+        # y cada shift repite la pasada.
+        passes = max(1, len(getattr(model, "models", [model]))) * max(1, shifts)
+        done_passes = [0]
+        real_tqdm = demucs.apply.tqdm.tqdm
+
+        def counting_tqdm(iterable, *args, **kwargs):
+            items = list(iterable)
+            for i, item in enumerate(items):
+                yield item
+                on_progress((done_passes[0] + (i + 1) / len(items)) / passes)
+            done_passes[0] = min(done_passes[0] + 1, passes - 1)
+
+        demucs.apply.tqdm.tqdm = counting_tqdm
+        try:
+            with self.torch.no_grad():
+                return apply_model(model, wav[None], device=self.device,
+                                   shifts=shifts, split=True, progress=True,
+                                   **options)[0]
+        finally:
+            demucs.apply.tqdm.tqdm = real_tqdm
+
+    def _apply_live(self, wav, ref, live_dir: Path, on_progress,
+                    two_stems: str | None, **options):
+        """Separación por tramos (ver live_chunks); cada tramo se agrega a
+        los WAV de `live_dir` apenas está. Devuelve las fuentes completas
+        (normalizadas, como _apply)."""
+        from demucs.apply import apply_model
+
+        torch = self.torch
+        sr = self.model.samplerate
+        total = wav.shape[-1]
+        context = LIVE_CONTEXT_S * sr
+        live = None
+        parts = []
+        try:
+            for start, end in live_chunks(total, sr):
+                a, b = max(0, start - context), min(total, end + context)
+                with torch.no_grad():
+                    out = apply_model(self.model, wav[None, :, a:b], device=self.device,
+                                      split=True, progress=False, **options)[0]
+                out = out[..., start - a:end - a]
+                parts.append(out)
+                outputs = self._outputs(out * ref.std() + ref.mean(), two_stems)
+                if live is None:
+                    live = _LiveStems(live_dir, [name for _, name in outputs], sr,
+                                      wav.shape[0], total)
+                live.write({name: (src.cpu().clamp(-1, 1) * 32767).round()
+                            .to(torch.int16).t().contiguous().numpy().tobytes()
+                            for src, name in outputs}, end - start)
+                on_progress(end / total)
+        finally:
+            if live is not None:
+                live.close()
+        return torch.cat(parts, dim=-1)
+
+    def _outputs(self, sources, two_stems: str | None) -> list:
+        """(fuente, nombre) de cada stem a guardar."""
+        names = self.model.sources
+        if not two_stems:
+            return list(zip(sources, names))
+        # Igual que `demucs --two-stems`: el stem pedido y la suma del resto
+        keep = names.index(two_stems)
+        rest = sum(src for i, src in enumerate(sources) if i != keep)
+        return [(sources[keep], two_stems), (rest, f"no_{two_stems}")]
+
+
+class _FakeSeparator:
+    """Separador de prueba: copia la entrada como cada stem (sin torch). En
+    modo progresivo la entrada tiene que ser un WAV de 16 bits; cada tramo
+    tarda `step_s`."""
+
+    def __init__(self, model_name: str, device: str | None, load_s: float = 0.0,
+                 step_s: float = 0.0):
+        time.sleep(load_s)
+        self.model_name = model_name
+        self.device = device or "cpu"
+        self.step_s = step_s
+
+    def separate(self, input_path: Path, out_dir: Path, on_progress,
+                 two_stems: str | None = None, format: str = "mp3",
+                 live_dir: str | None = None, **options) -> None:
+        if not input_path.exists():
+            raise FileNotFoundError(f"No existe: {input_path}")
+        track_dir = out_dir / self.model_name / input_path.stem
+        track_dir.mkdir(parents=True, exist_ok=True)
+        stems = MODEL_STEMS.get(self.model_name, STEMS)
+        if two_stems:
+            stems = (two_stems, f"no_{two_stems}")
+        if live_dir:
+            self._separate_live(input_path, Path(live_dir), stems, on_progress)
+        for i, stem in enumerate(stems, 1):
+            shutil.copyfile(input_path, track_dir / f"{stem}.{format}")
+            if not live_dir:
+                on_progress(i / len(stems))
+
+    def _separate_live(self, input_path: Path, live_dir: Path, stems, on_progress):
+        with wave.open(str(input_path), "rb") as src:
+            sr, total = src.getframerate(), src.getnframes()
+            live = _LiveStems(live_dir, stems, sr, src.getnchannels(), total)
+            try:
+                for start, end in live_chunks(total, sr):
+                    time.sleep(self.step_s)
+                    data = src.readframes(end - start)
+                    live.write({stem: data for stem in stems}, end - start)
+                    on_progress(end / total)
+            finally:
+                live.close()
+
+
+def serve(separator, stdin, stdout, idle_s: float = SERVER_IDLE_S, load_s: float = 0.0):
+    """Atiende trabajos hasta EOF en stdin o `idle_s` sin recibir ninguno."""
+    out_lock = threading.Lock()
+
+    def send(**msg):
+        with out_lock:
+            stdout.write(json.dumps(msg) + "\n")
+            stdout.flush()
+
+    lines: queue.Queue = queue.Queue()
+
+    def reader():
+        for line in stdin:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    send(event="ready", model=separator.model_name, device=separator.device,
+         load_s=round(load_s, 3), pid=os.getpid())
+
+    while True:
+        try:
+            line = lines.get(timeout=idle_s)
+        except queue.Empty:
+            return "idle"
+        if line is None:
+            return "eof"
+        if not line.strip():
+            continue
+        job = None
+        try:
+            req = json.loads(line)
+            job = req.get("job")
+            start = time.monotonic()
+            last = [-1.0]
+
+            def on_progress(value, job=job):
+                # Sin inundar el pipe: solo cambios de al menos 1%
+                if value - last[0] >= 0.01 or value >= 1.0:
+                    last[0] = value
+                    send(event="progress", job=job, value=round(min(value, 1.0), 4))
+
+            options = {k: req[k]
+                       for k in ("overlap", "shifts", "segment", "two_stems", "format",
+                                 "live_dir")
+                       if k in req}
+            separator.separate(Path(req["input"]), Path(req["output"]), on_progress,
+                               **options)
+            send(event="done", job=job, elapsed_s=round(time.monotonic() - start, 3))
+        except Exception as e:
+            send(event="error", job=job, message=f"{type(e).__name__}: {e}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor de separación de PlayIt")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="hilos de torch (varios trabajos simultáneos)")
+    parser.add_argument("--idle", type=float, default=SERVER_IDLE_S)
+    parser.add_argument("--fake", action="store_true",
+                        help="separador de prueba sin torch")
+    parser.add_argument("--fake-load-s", type=float, default=0.0)
+    parser.add_argument("--fake-step-s", type=float, default=0.0,
+                        help="demora por tramo de la separación progresiva falsa")
+    args = parser.parse_args(argv)
+
+    # El protocolo va por el stdout real; cualquier print de Demucs/torch
+    # termina en stderr (log) en lugar de corromperlo.
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    start = time.monotonic()
+    try:
+        if args.fake:
+            separator = _FakeSeparator(args.model, args.device, args.fake_load_s,
+                                       args.fake_step_s)
+        else:
+            separator = _DemucsSeparator(args.model, args.device, args.threads)
+    except Exception as e:
+        protocol_out.write(json.dumps({"event": "error", "job": None,
+                                       "message": f"{type(e).__name__}: {e}"}) + "\n")
+        protocol_out.flush()
+        return 1
+    serve(separator, sys.stdin, protocol_out, idle_s=args.idle,
+          load_s=time.monotonic() - start)
+    return 0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# ── Lado de la app ───────────────────────────────────────────────────────────
+# ──────────────────────────────────────────────────────────────────────────────
+class SeparationServer:
+    """Proceso servidor y su pipe. Un trabajo a la vez por proceso; un
+    proceso por slot del planificador."""
+
+    def __init__(self, cmd: list[str], env: dict | None = None, stderr=None,
+                 start_timeout: float = START_TIMEOUT_S):
+        self.cmd = cmd
+        self.env = env
+        self.stderr = stderr
+        self.start_timeout = start_timeout
+        self.proc: subprocess.Popen | None = None
+        self.info: dict = {}
+        self._events: queue.Queue = queue.Queue()
+        self._next_job = 0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> None:
+        """Lanza el proceso y espera a que el modelo esté cargado."""
+        try:
+            from platform_utils import get_hidden_subprocess_kwargs
+            extra = get_hidden_subprocess_kwargs()
+        except Exception:
+            extra = {}
+        self._events = queue.Queue()
+        self.proc = subprocess.Popen(
+            self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=self.stderr if self.stderr is not None else subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1, env=self.env, **extra,
+        )
+        threading.Thread(target=self._read, args=(self.proc, self._events),
+                         daemon=True).start()
+        msg = self._next_event(self.start_timeout)
+        if msg.get("event") != "ready":
+            self.close()
+            raise SeparationError(msg.get("message") or "El servidor no arrancó")
+        self.info = msg
+
+    @staticmethod
+    def _read(proc, events):
+        for line in proc.stdout:
+            try:
+                events.put(json.loads(line))
+            except ValueError:
+                continue
+        events.put({"event": "exit", "message": "El servidor de separación terminó"})
+
+    def _next_event(self, timeout: float) -> dict:
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            self.close()
+            raise SeparationError("El servidor de separación no responde") from None
+
+    def separate(self, input_path, output_dir, on_progress=None,
+                 timeout: float = JOB_TIMEOUT_S, **options) -> dict:
+        """Separa `input_path` en `output_dir` (estructura de la CLI).
+
+        `options` (overlap, shifts, segment, two_stems, format, live_dir) van
+        tal cual al separador.
+        `on_progress(0..1)` se llama desde este hilo. Devuelve el mensaje
+        "done"; lanza SeparationError si falla.
+        """
+        with self._lock:
+            if not self.alive:
+                self.start()
+            self._next_job += 1
+            job = self._next_job
+            req = {"job": job, "input": str(input_path), "output": str(output_dir),
+                   **{k: v for k, v in options.items() if v is not None}}
+            try:
+                self.proc.stdin.write(json.dumps(req) + "\n")
+                self.proc.stdin.flush()
+            except OSError as e:
+                self.close()
+                raise SeparationError(f"No se pudo enviar el trabajo: {e}") from e
+            deadline = time.monotonic() + timeout
+            while True:
+                msg = self._next_event(max(0.0, deadline - time.monotonic()))
+                event = msg.get("event")
+                if event == "exit":
+                    self.close()
+                    raise SeparationError(msg["message"])
+                if msg.get("job") != job:
+                    continue
+                if event == "progress":
+                    if on_progress is not None:
+                        on_progress(msg.get("value", 0.0))
+                elif event == "done":
+                    return msg
+                elif event == "error":
+                    raise SeparationError(msg.get("message", "Error desconocido"))
+
+    def kill(self) -> None:
+        """Mata el proceso ya (cancelar un trabajo en curso). El `separate`
+        que esperaba recibe el fin del proceso y lanza SeparationError; el
+        siguiente trabajo relanza el servidor."""
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def close(self) -> None:
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()      # EOF: el servidor sale por su cuenta
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+
+
+# Un servidor por slot del planificador (ver demucs_scheduler): trabajos
+# simultáneos = procesos con su propio modelo cargado.
+_servers: dict[int, SeparationServer] = {}
+_server_keys: dict[int, tuple] = {}
+_server_lock = threading.Lock()
+
+
+def server_command(python: str, device: str | None = None,
+                   model: str = DEFAULT_MODEL, idle_s: float = SERVER_IDLE_S,
+                   threads: int | None = None, extra_args=()) -> list[str]:
+    cmd = [python, str(SERVER_SCRIPT), "--model", model, "--idle", str(idle_s)]
+    if device:
+        cmd += ["--device", device]
+    if threads:
+        cmd += ["--threads", str(threads)]
+    return cmd + list(extra_args)
+
+
+def thread_limit_env(threads: int | None, base: dict | None = None) -> dict | None:
+    """Entorno con las librerías numéricas limitadas a `threads` hilos
+    (None = sin límite, se devuelve `base` tal cual)."""
+    if not threads:
+        return base
+    env = dict(base if base is not None else os.environ)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env[var] = str(threads)
+    return env
+
+
+def get_server(python: str, device: str | None = None, model: str = DEFAULT_MODEL,
+               log_path=None, extra_args=(), slot: int = 0,
+               threads: int | None = None) -> SeparationServer:
+    """Servidor del `slot`, reutilizado entre trabajos; se relanza si cambió
+    el intérprete/dispositivo/modelo/hilos o si terminó por inactividad."""
+    key = (python, device, model, threads, tuple(extra_args))
+    with _server_lock:
+        if slot in _servers and _server_keys.get(slot) != key:
+            _close_slot(slot)
+        if slot not in _servers:
+            env = None
+            if device == "mps":
+                # Las ops que MPS no soporta caen a CPU en vez de abortar
+                env = os.environ.copy()
+                env["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
+            stderr = open(log_path, "a", encoding="utf-8") if log_path else None
+            _servers[slot] = SeparationServer(
+                server_command(python, device, model, threads=threads,
+                               extra_args=extra_args),
+                env=thread_limit_env(threads, env), stderr=stderr)
+            _server_keys[slot] = key
+        return _servers[slot]
+
+
+def shutdown_server() -> None:
+    """Cierra todos los servidores (al salir de la app)."""
+    with _server_lock:
+        for slot in list(_servers):
+            _close_slot(slot)
+
+
+def _close_slot(slot: int) -> None:
+    server = _servers.pop(slot)
+    _server_keys.pop(slot, None)
+    server.close()
+    if server.stderr is not None:
+        server.stderr.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
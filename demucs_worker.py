@@ -21,21 +21,41 @@ import os
 import re
 import shutil
 import io
+import threading
+import time
+import uuid
 from pathlib import Path
 import mutagen
 from mutagen.flac import Picture
 from PIL import Image
 from PyQt6.QtCore import QObject, pyqtSignal
+import demucs_server
+from demucs_server import LIVE_INFO, SeparationError
+from separation_index import SeparationIndex, source_hash
+from separation_profiles import (
+    DEFAULT_PROFILE, DEFAULT_STEM_FORMAT, PROFILES, STEM_FORMATS, SeparationProfile,
+    song_stem_format,
+)
 from platform_utils import (
-    run_silent, get_python_cmd, get_data_dir,
+    ProcessCancelled, run_streaming, get_python_cmd, get_data_dir,
     check_pytorch_mps, check_pytorch_cuda,
 )
 
 logger = logging.getLogger(__name__)
 
+# Salida a medio hacer de la separación (dentro de la carpeta de la
+# canción); los stems pasan a "separated" de una sola vez al terminar
+STAGING_DIR = ".separating"
+OLD_STEMS_DIR = ".separated.old"
+# Stems parciales de la separación progresiva (ver live_stems); fuera de
+# STAGING_DIR porque la app los sigue leyendo tras el commit de los stems
+LIVE_DIR = ".live"
+# Salida de un lote (varias canciones por invocación), dentro de get_data_dir()
+BATCH_STAGING_DIR = ".demucs_batch"
+
 # Formatos de ENTRADA aceptados: demucs decodifica con torchaudio/ffmpeg, así
-# que lee cualquier contenedor que ffmpeg soporte. La salida siempre es mp3
-# (flag `--mp3` en `_exec_demucs`), sin importar el formato de origen.
+# que lee cualquier contenedor que ffmpeg soporte. La salida es la del
+# formato de stems elegido (STEM_FORMATS), sin importar el formato de origen.
 AUDIO_INPUT_EXTS = (
     "mp3", "wav", "flac", "ogg", "oga", "opus", "m4a", "mp4",
     "aac", "aiff", "aif", "wma", "wv", "alac",
@@ -115,8 +135,9 @@ def read_source_metadata(src) -> dict:
     "Desconocido" para las que falten. Nunca lanza: un archivo sin tags (o que
     mutagen no sepa leer) devuelve solo el formato.
     """
-    # De la extensión y no del tipo de mutagen: los stems ya son mp3, así que
-    # esta es la única forma de saber después con qué llegó el archivo.
+    # De la extensión y no del tipo de mutagen: los stems se escriben en otro
+    # formato, así que esta es la única forma de saber después con qué llegó
+    # el archivo.
     ext = Path(src).suffix.lstrip(".").upper()
     meta = {"formato": ext} if ext else {}
 
@@ -145,6 +166,75 @@ def read_source_metadata(src) -> dict:
     return meta
 
 
+# Barra de tqdm de demucs.apply:
+#   " 45%|████▌     | 105.3/234.0 [00:12<00:15,  8.50seconds/s]"
+_TQDM_RE = re.compile(
+    r"(\d{1,3})%\|.*?\|\s*([\d.]+)/([\d.]+)\s*\[([\d:]+)<([\d:]+|\?)"
+)
+# "Selected model is a bag of 4 models. You will see that many progress bars per track."
+_BAG_RE = re.compile(r"bag of (\d+) models")
+
+
+def _clock_seconds(text: str) -> int:
+    """'01:02:03' / '02:03' → segundos."""
+    secs = 0
+    for part in text.split(":"):
+        secs = secs * 60 + int(part)
+    return secs
+
+
+class DemucsProgress:
+    """Progreso real de `python -m demucs` a partir de su salida de tqdm.
+
+    htdemucs_ft es un "bag" de 4 modelos que corren uno tras otro, y cada
+    shift repite la pasada, cada una con su propia barra de 0 a 100%: cuando
+    la barra vuelve a empezar se cuenta una pasada más (y lo mismo con cada
+    canción de un lote, `tracks`). `fraction` (0..1) es el avance total y
+    `eta` los segundos restantes (None mientras tqdm no los estima).
+    """
+
+    def __init__(self, models: int = 4, shifts: int = 1, tracks: int = 1):
+        # Pasadas por modelo del bag
+        self.repeats = max(1, shifts) * max(1, tracks)
+        self.passes = models * self.repeats
+        self.fraction = 0.0
+        self.eta: int | None = None
+        self._pass = 0
+        self._last = 0.0
+
+    def update(self, line: str) -> bool:
+        """Procesa una línea; True si cambió el progreso."""
+        bag = _BAG_RE.search(line)
+        if bag:
+            self.passes = max(1, int(bag.group(1))) * self.repeats
+            return False
+        m = _TQDM_RE.search(line)
+        if not m:
+            return False
+        total = float(m.group(3))
+        frac = min(1.0, float(m.group(2)) / total) if total else int(m.group(1)) / 100
+        if frac < self._last:
+            self._pass = min(self._pass + 1, self.passes - 1)
+        self._last = frac
+        self.fraction = min(1.0, (self._pass + frac) / self.passes)
+        if m.group(5) == "?":
+            self.eta = None
+        else:
+            elapsed, remaining = _clock_seconds(m.group(4)), _clock_seconds(m.group(5))
+            # Las pasadas que faltan duran lo mismo que esta
+            self.eta = remaining + (self.passes - 1 - self._pass) * (elapsed + remaining)
+        return True
+
+
+def audio_duration(src) -> float:
+    """Duración en segundos según mutagen (0.0 si no se puede leer)."""
+    try:
+        audio = mutagen.File(src)
+        return float(audio.info.length) if audio is not None else 0.0
+    except Exception:
+        return 0.0
+
+
 def _sanitize_path_component(name: str) -> str:
     """Vuelve `name` seguro como componente de ruta en cualquier SO.
 
@@ -156,13 +246,46 @@ def _sanitize_path_component(name: str) -> str:
     return sanitized or '_'
 
 
+def _demucs_env(mps: bool, threads: int | None) -> dict | None:
+    env = None
+    if mps:
+        # Las ops que MPS no soporta caen a CPU en vez de abortar
+        env = os.environ.copy()
+        env["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
+    return demucs_server.thread_limit_env(threads, env)
+
+
 class DemucsWorker(QObject):
     finished = pyqtSignal()
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
-
-    def __init__(self, artist, song, src_path):
+    eta = pyqtSignal(int)       # segundos restantes de la separación (-1 = sin estimar)
+    cancelled = pyqtSignal()
+    live_ready = pyqtSignal(str)    # carpeta con el primer tramo ya separado
+
+    # El servidor persistente no pudo arrancar en esta sesión: solo CLI
+    _server_unavailable = False
+
+    def __init__(self, artist, song, src_path, slot: int = 0,
+                 threads: int | None = None,
+                 profile: SeparationProfile | None = None,
+                 index: SeparationIndex | None = None,
+                 stem_format: str = DEFAULT_STEM_FORMAT, live: bool = False):
         super().__init__()
+        self.profile = profile or PROFILES[DEFAULT_PROFILE]
+        self.stem_format = stem_format  # extensión de los stems (STEM_FORMATS)
+        # Separación progresiva (solo con el servidor): live_ready avisa
+        # cuando ya se puede escuchar lo separado
+        self.live = live
+        # Separaciones ya hechas por contenido: el mismo audio con el mismo
+        # perfil reutiliza los stems en vez de volver a separar
+        self.index = index
+        self.source_hash = ""
+        self.reused_from: Path | None = None
+        # slot/threads: posición en el planificador y límite de hilos cuando
+        # corren varias separaciones a la vez (ver demucs_scheduler)
+        self.slot = slot
+        self.threads = threads
         self.artist = artist
         self.song = song
         self.src_path = Path(src_path)
@@ -171,36 +294,160 @@ class DemucsWorker(QObject):
             / _sanitize_path_component(artist) / _sanitize_path_component(song)
         )
         self.device_used = "CPU"  # dispositivo con el que realmente corrió demucs
+        # Para la tabla de RTF: duración del audio y de la separación en sí
+        self.audio_s = 0.0
+        self.separation_s = 0.0
+        self._cancel = threading.Event()
+        self._server = None
+
+    def cancel(self):
+        """Cancela la separación desde cualquier hilo: mata el proceso de
+        demucs (o el servidor del slot, que se relanza en el siguiente
+        trabajo) sin esperar a que termine la canción."""
+        self._cancel.set()
+        server = self._server
+        if server is not None:
+            server.kill()
 
     def run(self):
         try:
-            self.progress.emit(5)
-            self.base_path.mkdir(parents=True, exist_ok=True)
-
-            self.progress.emit(15)
-            self._extract_cover()
-
-            self.progress.emit(17)
-            self._create_json()
-
-            self.progress.emit(26)
+            self.process()
+            self.progress.emit(100)
+            self.finished.emit()
+        except Exception as e:
+            self._discard_partial()
+            if self._cancel.is_set():
+                self.cancelled.emit()
+            else:
+                self.error.emit(f"Error: {str(e)}")
+
+    def process(self, prepared: bool = False):
+        """La separación completa de la canción; lanza excepción si falla
+        (sin limpiar: eso lo hace quien la llama, con _discard_partial).
+
+        Con `prepared` quien llama ya corrió _prepare (hash, restos, portada)
+        y no encontró separación previa: se va directo a demucs.
+        """
+        self.progress.emit(5)
+        existing = None if prepared else self._prepare()
+
+        self.progress.emit(26)
+        if existing is not None:
+            self._reuse_stems(existing)
+        else:
+            self.audio_s = audio_duration(self.src_path)
+            started = time.monotonic()
             self._run_demucs()
+            self.separation_s = time.monotonic() - started
 
             self.progress.emit(83)
             self._organize_output()
 
-            self.progress.emit(100)
-            self.finished.emit()
-        except Exception as e:
-            self.error.emit(f"Error: {str(e)}")
+        self.progress.emit(95)
+        self._complete()
+
+    def _prepare(self) -> Path | None:
+        """Carpeta, restos y portada; devuelve la separación previa del
+        mismo audio si la hay (ver _find_existing)."""
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        # Restos de un trabajo interrumpido (cierre o caída de la app)
+        self._recover_partial()
+        existing = self._find_existing()
+        self.progress.emit(15)
+        self._extract_cover()
+        return existing
+
+    def _complete(self):
+        # data.json al final: el escáner solo lista canciones con stems
+        self._create_json()
+        if self.index is not None and self.source_hash:
+            self.index.add(self.source_hash, self.profile.name, self.base_path)
+
+    def _find_existing(self) -> Path | None:
+        """Carpeta de una separación previa del mismo audio con este perfil."""
+        try:
+            self.source_hash = source_hash(self.src_path)
+        except OSError as e:
+            logger.warning("No se pudo calcular el hash de %s: %s", self.src_path, e)
+            return None
+        if self.index is None:
+            return None
+        # Re-encolada: sus propios stems, sin tocar nada
+        if SeparationIndex.matches(self.base_path, self.source_hash, self.profile.name):
+            return self.base_path
+        return self.index.lookup(self.source_hash, self.profile.name)
+
+    def _reuse_stems(self, existing: Path):
+        """Completa el trabajo con los stems de `existing`: hard link si el
+        sistema de archivos lo permite (no ocupa espacio), si no copia.
+        Quedan en el formato en que se separaron."""
+        self.reused_from = existing
+        self.stem_format = song_stem_format(existing)
+        if existing.resolve() == self.base_path.resolve():
+            return  # re-encolada: los stems ya están en su lugar
+        staged = self.base_path / STAGING_DIR / "stems"
+        staged.mkdir(parents=True, exist_ok=True)
+        for stem in self.profile.stems:
+            src = existing / "separated" / f"{stem}.{self.stem_format}"
+            dst = staged / src.name
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+        self._commit_stems(staged)
+
+    def _commit_stems(self, staged: Path):
+        """Reemplaza "separated" por `staged` con renames: en ningún momento
+        queda una carpeta de stems a medio escribir. Los stems de antes
+        (track repetido; con otro juego de stems, p. ej.) se descartan."""
+        target = self.base_path / "separated"
+        old = self.base_path / OLD_STEMS_DIR
+        shutil.rmtree(old, ignore_errors=True)
+        if target.exists():
+            os.replace(target, old)
+        os.replace(staged, target)
+        shutil.rmtree(old, ignore_errors=True)
+        shutil.rmtree(self.base_path / STAGING_DIR, ignore_errors=True)
+
+    def _recover_partial(self):
+        """Limpia la salida a medias de un trabajo interrumpido; si la caída
+        fue entre los dos renames de _commit_stems, vuelven los stems viejos."""
+        shutil.rmtree(self.base_path / STAGING_DIR, ignore_errors=True)
+        shutil.rmtree(self.base_path / LIVE_DIR, ignore_errors=True)
+        old = self.base_path / OLD_STEMS_DIR
+        if old.exists():
+            if (self.base_path / "separated").exists():
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                os.replace(old, self.base_path / "separated")
+
+    def _discard_partial(self):
+        """Borra lo que dejó una separación cancelada o fallida. Si la
+        canción ya tenía stems (track repetido) se conserva la carpeta."""
+        try:
+            self._recover_partial()
+        except OSError as e:
+            logger.warning("No se pudo limpiar %s: %s", self.base_path, e)
+        separated = self.base_path / "separated"
+        if not any(p.suffix[1:] in STEM_FORMATS for p in separated.glob("*")):
+            shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def _emit_separation(self, fraction: float, eta: int | None):
+        # La separación ocupa el tramo 26-83 de la barra
+        self.progress.emit(26 + int(57 * fraction))
+        self.eta.emit(-1 if eta is None else int(eta))
 
     def _run_demucs(self):
+        if self._cancel.is_set():
+            raise ProcessCancelled("Separación cancelada")
         use_mps = check_pytorch_mps()
         if use_mps:
             self.device_used = "MPS"
         else:
             # Sin -d explícito, demucs usa CUDA si torch la ve; misma detección
             self.device_used = "CUDA" if check_pytorch_cuda() else "CPU"
+        if self._run_on_server("mps" if use_mps else None):
+            return
         result = self._exec_demucs(mps=use_mps)
 
         # MPS puede fallar según la combinación torch/demucs;
@@ -219,22 +466,73 @@ class DemucsWorker(QObject):
             error_msg += f"\n\nLog completo en: {get_data_dir() / 'demucs_error.log'}"
             raise RuntimeError(error_msg)
 
+    def _run_on_server(self, device: str | None) -> bool:
+        """Separa con el servidor persistente (modelo ya cargado entre
+        canciones). False si no está disponible o falló: se usa la CLI."""
+        if DemucsWorker._server_unavailable:
+            return False
+        server = None
+        started = time.monotonic()
+        live_dir = self.base_path / LIVE_DIR if self.live else None
+        announced = [False]
+
+        def on_progress(p):
+            # El servidor solo reporta la fracción: ETA por extrapolación
+            elapsed = time.monotonic() - started
+            eta = elapsed * (1 - p) / p if p > 0.02 else None
+            self._emit_separation(p, eta)
+            if live_dir is not None and not announced[0] and (live_dir / LIVE_INFO).exists():
+                announced[0] = True
+                self.live_ready.emit(str(live_dir))
+
+        try:
+            server = demucs_server.get_server(
+                get_python_cmd(), device, model=self.profile.model,
+                log_path=get_data_dir() / "demucs_server.log",
+                slot=self.slot, threads=self.threads,
+            )
+            self._server = server
+            if self._cancel.is_set():
+                raise ProcessCancelled("Separación cancelada")
+            server.separate(self.src_path, self.base_path / STAGING_DIR,
+                            on_progress=on_progress, overlap=self.profile.overlap,
+                            shifts=self.profile.shifts, segment=self.profile.segment,
+                            two_stems=self.profile.two_stems, format=self.stem_format,
+                            live_dir=str(live_dir) if live_dir is not None else None)
+            return True
+        except (SeparationError, OSError) as e:
+            if self._cancel.is_set():
+                raise ProcessCancelled("Separación cancelada") from e
+            logger.warning("Servidor de separación falló, se usa la CLI: %s", e)
+            if server is None or not server.info:
+                # Nunca llegó a cargar el modelo (p. ej. Demucs viejo): no
+                # reintentar en cada canción de la sesión
+                DemucsWorker._server_unavailable = True
+            return False
+        finally:
+            self._server = None
+
     def _exec_demucs(self, mps: bool):
         python = get_python_cmd()
-        env = None
-        if mps:
-            # Las ops que MPS no soporta caen a CPU en vez de abortar
-            env = os.environ.copy()
-            env["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
+        env = _demucs_env(mps, self.threads)
         cmd = [
             python, "-m", "demucs",
-            "-n", "htdemucs_ft",
+            *self.profile.cli_args(),
             *(["-d", "mps"] if mps else []),
-            "-o", str(self.base_path / "separated"),
-            "--mp3",
+            *STEM_FORMATS[self.stem_format][1],
+            "-o", str(self.base_path / STAGING_DIR),
             str(self.src_path),
         ]
-        return run_silent(cmd, timeout=7200, env=env)  # 2 horas máximo
+        tracker = DemucsProgress(self.profile.bag_size, self.profile.shifts)
+
+        def on_line(line):
+            if tracker.update(line):
+                self._emit_separation(tracker.fraction, tracker.eta)
+
+        # Salida en streaming: progreso real y memoria acotada (solo la cola
+        # de líneas para el log de errores); cancel() mata el árbol
+        return run_streaming(cmd, on_line=on_line, timeout=7200,  # 2 horas máximo
+                             cancel_event=self._cancel, env=env)
 
     @staticmethod
     def _relevant_output(result) -> str:
@@ -275,40 +573,239 @@ class DemucsWorker(QObject):
             logger.error("No se pudo extraer portada: %s", e)
 
     def _create_json(self):
-        # Track repetido: el JSON se reescribe con la metadata del archivo
-        # nuevo (el anterior ya no existe, se destruye tras separarlo).
-        data = {
-            self.artist: {
-                self.song: {
-                    "path": str(self.base_path),
-                    "metadata": read_source_metadata(self.src_path),
-                }
-            }
-        }
-        (self.base_path / "data.json").write_text(
-            json.dumps(data, indent=4), encoding='utf-8'
-        )
+        # Track repetido: path, metadata y separación se reescriben con los
+        # del archivo nuevo (el anterior ya no existe, se destruye tras
+        # separarlo); el resto de la entrada (estado de letras) se conserva.
+        path = self.base_path / "data.json"
+        entry = self._existing_entry(path)
+        entry.update({
+            "path": str(self.base_path),
+            "metadata": read_source_metadata(self.src_path),
+            "separation": {"profile": self.profile.name,
+                           "model": self.profile.model,
+                           "stems": list(self.profile.stems),
+                           "format": self.stem_format,
+                           "source_hash": self.source_hash},
+        })
+        data = {self.artist: {self.song: entry}}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, indent=4), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _existing_entry(path: Path) -> dict:
+        """Entrada de la canción en su data.json previo ({} si no hay)."""
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            for songs in data.values():
+                for song_data in songs.values():
+                    if isinstance(song_data, dict):
+                        return song_data
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("data.json ilegible en %s: %s", path, e)
+        return {}
 
     def _organize_output(self):
-        input_stem = self.src_path.stem
-        demucs_dir = self.base_path / "separated" / "htdemucs_ft" / input_stem
+        staging = self.base_path / STAGING_DIR
+        demucs_dir = staging / self.profile.model / self.src_path.stem
 
         if not demucs_dir.exists():
             # Fallback: intentar con solo el nombre de la canción
-            demucs_dir = self.base_path / "separated" / "htdemucs_ft" / self.song
+            demucs_dir = staging / self.profile.model / self.song
             if not demucs_dir.exists():
                 raise FileNotFoundError(
                     f"No se encontró la carpeta de Demucs en: {demucs_dir}"
                 )
 
-        target_dir = self.base_path / "separated"
-        target_dir.mkdir(exist_ok=True)
-
-        for stem in ("drums", "bass", "other", "vocals"):
-            src = demucs_dir / f"{stem}.mp3"
+        staged = staging / "stems"
+        staged.mkdir(exist_ok=True)
+        for stem in self.profile.stems:
+            src = demucs_dir / f"{stem}.{self.stem_format}"
             if not src.exists():
                 raise FileNotFoundError(f"Archivo no encontrado: {src}")
-            shutil.move(str(src), str(target_dir / f"{stem}.mp3"))
+            os.replace(src, staged / src.name)
+        self._commit_stems(staged)
+
+
+class DemucsBatchWorker(QObject):
+    """Varias canciones con una sola invocación de `python -m demucs`.
+
+    Sin el servidor persistente, cada trabajo paga arrancar Python, importar
+    torch y cargar el modelo (varios segundos con htdemucs_ft); demucs acepta
+    varios archivos por invocación y ese costo se paga una vez por lote. Los
+    resultados se reparten por canción (`_organize_output` de cada una) y
+    cada una avisa por su lado: `song_finished(i)` / `song_failed(i, msg)`.
+    Las que el lote no llegó a producir (demucs corta en el primer archivo
+    que no puede leer) se reintentan de a una, para que un archivo roto no
+    arrastre al resto. `finished` llega al terminar todo el lote.
+
+    Con el servidor disponible el modelo ya está cargado entre trabajos: las
+    canciones se separan de a una, igual que sin lote.
+    """
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    eta = pyqtSignal(int)
+    cancelled = pyqtSignal()
+    song_finished = pyqtSignal(int)
+    song_failed = pyqtSignal(int, str)
 
-        # Limpiar carpeta temporal de Demucs
-        shutil.rmtree(demucs_dir.parent)
+    def __init__(self, workers: list[DemucsWorker]):
+        super().__init__()
+        self.workers = workers
+        self.profile = workers[0].profile
+        self.stem_format = workers[0].stem_format
+        self.threads = workers[0].threads
+        self.device_used = "CPU"
+        self._cancel = threading.Event()
+        self._done: set[int] = set()
+        self._progress = 0
+
+    def cancel(self):
+        self._cancel.set()
+        for worker in self.workers:
+            worker.cancel()
+
+    def run(self):
+        try:
+            self._set_progress(5)
+            if DemucsWorker._server_unavailable:
+                self._run_batch()
+            else:
+                for i in range(len(self.workers)):
+                    self._run_single(i)
+            self._set_progress(100)
+            self.finished.emit()
+        except Exception as e:
+            for i, worker in enumerate(self.workers):
+                if i not in self._done:
+                    worker._discard_partial()
+            if self._cancel.is_set():
+                self.cancelled.emit()
+            else:
+                self.error.emit(f"Error: {str(e)}")
+
+    def _run_batch(self):
+        todo = []
+        for i, worker in enumerate(self.workers):
+            try:
+                existing = worker._prepare()
+                if existing is not None:
+                    worker._reuse_stems(existing)
+                    worker._complete()
+                    self._song_done(i)
+                    continue
+            except Exception as e:
+                self._song_error(i, e)
+                continue
+            todo.append(i)
+
+        # demucs nombra la carpeta de salida con el nombre del archivo: dos
+        # "01 Intro.mp3" en el mismo lote se pisarían; el repetido va aparte
+        batch, alone, names = [], [], set()
+        for i in todo:
+            name = self.workers[i].src_path.stem
+            (alone if name in names else batch).append(i)
+            names.add(name)
+        if len(batch) > 1:
+            alone = self._separate_together(batch) + alone
+        else:
+            alone = batch + alone
+        for i in alone:
+            self._run_single(i, prepared=True)
+
+    def _separate_together(self, indices: list[int]) -> list[int]:
+        """Una invocación de demucs para `indices`; devuelve los que no
+        produjo."""
+        if self._cancel.is_set():
+            raise ProcessCancelled("Separación cancelada")
+        workers = [self.workers[i] for i in indices]
+        use_mps = check_pytorch_mps()
+        self.device_used = ("MPS" if use_mps
+                            else "CUDA" if check_pytorch_cuda() else "CPU")
+        staging = get_data_dir() / BATCH_STAGING_DIR / uuid.uuid4().hex
+        cmd = [
+            get_python_cmd(), "-m", "demucs",
+            *self.profile.cli_args(),
+            *(["-d", "mps"] if use_mps else []),
+            *STEM_FORMATS[self.stem_format][1],
+            "-o", str(staging),
+            *(str(w.src_path) for w in workers),
+        ]
+        tracker = DemucsProgress(self.profile.bag_size, self.profile.shifts,
+                                 tracks=len(workers))
+
+        def on_line(line):
+            if tracker.update(line):
+                self._set_progress(26 + int(57 * tracker.fraction))
+                self.eta.emit(-1 if tracker.eta is None else int(tracker.eta))
+
+        try:
+            started = time.monotonic()
+            result = run_streaming(cmd, on_line=on_line, timeout=7200 * len(workers),
+                                   cancel_event=self._cancel,
+                                   env=_demucs_env(use_mps, self.threads))
+            elapsed = time.monotonic() - started
+            if result.returncode != 0:
+                DemucsWorker._log_failure(
+                    result, f"Lote de {len(workers)} canciones falló; se reintentan de a una")
+            missing, produced = [], []
+            for i, worker in zip(indices, workers):
+                out = staging / self.profile.model / worker.src_path.stem
+                if all((out / f"{stem}.{self.stem_format}").exists()
+                       for stem in self.profile.stems):
+                    produced.append((i, worker, out))
+                else:
+                    missing.append(i)
+            # Para la tabla de RTF: el tiempo del lote se reparte entre las
+            # que produjo según su duración (la carga del modelo, entre todas)
+            for _, worker, _ in produced:
+                worker.audio_s = audio_duration(worker.src_path)
+                worker.device_used = self.device_used
+            total_audio = sum(worker.audio_s for _, worker, _ in produced)
+            for i, worker, out in produced:
+                if total_audio:
+                    worker.separation_s = elapsed * worker.audio_s / total_audio
+                try:
+                    # A la carpeta de la canción, donde la busca _organize_output
+                    dest = worker.base_path / STAGING_DIR / self.profile.model / out.name
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(out), str(dest))
+                    worker._organize_output()
+                    worker._complete()
+                    self._song_done(i)
+                except Exception as e:
+                    self._song_error(i, e)
+            return missing
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _run_single(self, i: int, prepared: bool = False):
+        if self._cancel.is_set():
+            raise ProcessCancelled("Separación cancelada")
+        try:
+            self.workers[i].process(prepared)
+        except Exception as e:
+            if self._cancel.is_set():
+                raise
+            self._song_error(i, e)
+            return
+        self._song_done(i)
+
+    def _song_done(self, i: int):
+        self._done.add(i)
+        self._set_progress(int(100 * len(self._done) / len(self.workers)))
+        self.song_finished.emit(i)
+
+    def _song_error(self, i: int, exc: Exception):
+        self.workers[i]._discard_partial()
+        self._done.add(i)
+        self.song_failed.emit(i, f"Error: {str(exc)}")
+
+    def _set_progress(self, value: int):
+        # Con canciones de a una y reintentos la barra nunca retrocede
+        if value > self._progress:
+            self._progress = value
+            self.progress.emit(value)
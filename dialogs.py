@@ -14,10 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from PyQt6.QtCore import Qt, pyqtSignal, QUrl, QPoint,QDir
+from PyQt6.QtCore import Qt, pyqtSignal, QUrl, QPoint,QDir, QTimer
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QLabel, QPushButton, QLineEdit, QHBoxLayout, QFileDialog, QMessageBox, QCheckBox
-from demucs_worker import AUDIO_INPUT_FILTER
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QLabel, QPushButton, QLineEdit, QHBoxLayout, QFileDialog, QMessageBox, QCheckBox, QComboBox
+from demucs_worker import AUDIO_INPUT_FILTER, audio_duration
+from separation_profiles import AUTO_PROFILE, PROFILES, ProfileStore
 from resources import resource_path, bg_image, styled_message_box, style_url
 from ui_components import DialogTitleBar, StyledButtons
 from version import __version__
@@ -231,16 +232,27 @@ class UpdateDialog(BaseDialog):
 
 
 class QueueDialog(BaseDialog):
+    REFRESH_MS = 500
+
     def __init__(self, audio_player, parent=None):
         super().__init__(parent, "Canciones en Cola", (400, 550))
+        self._audio_player = audio_player
         self._setup_queue_display(audio_player)
+        # El progreso de cada separación en curso se refresca mientras el
+        # diálogo está abierto
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.timeout.connect(self._refresh)
+        self._refresh_timer.start(self.REFRESH_MS)
 
     def _setup_queue_display(self, audio_player):
-        queue_html = self._generate_queue_html(audio_player.demucs_queue)
+        self._queue_html = self._generate_queue_html(
+            audio_player.demucs_queue,
+            audio_player.demucs_scheduler.running.values(),
+        )
 
         queue_edit = QTextEdit()
         queue_edit.setReadOnly(True)
-        queue_edit.setHtml(queue_html)
+        queue_edit.setHtml(self._queue_html)
         queue_edit.setObjectName("queue_text")
         queue_edit.setStyleSheet("""
             #queue_text {
@@ -254,10 +266,20 @@ class QueueDialog(BaseDialog):
                 font-size: 16px;
             }
         """)
+        self._queue_edit = queue_edit
 
         self.main_layout.addWidget(queue_edit)
 
-    def _generate_queue_html(self, queue: list) -> str:
+    def _refresh(self):
+        html = self._generate_queue_html(
+            self._audio_player.demucs_queue,
+            self._audio_player.demucs_scheduler.running.values(),
+        )
+        if html != self._queue_html:
+            self._queue_html = html
+            self._queue_edit.setHtml(html)
+
+    def _generate_queue_html(self, queue: list, running=()) -> str:
         html = """
         <H1 style='color: #3AABEF;'><center>Artista - Canción</center></H1>
         <style>
@@ -266,6 +288,16 @@ class QueueDialog(BaseDialog):
         </style><ul>
         """
 
+        # En curso primero, con su porcentaje (un lote, con el de todo el lote
+        # en las canciones que aún no terminan)
+        for job in running:
+            for item in job.get('batch') or [job]:
+                state = ("listo" if item.get('result') == "done"
+                         else "falló" if item.get('result') == "failed"
+                         else f"{job.get('progress', 0)}%")
+                html += (f"<li><center>{item['artist']} - {item['song']} "
+                         f"<sub>{state}</sub></center></li>\n")
+
         for item in queue:
             html += f"<li><center>{item['artist']} - {item['song']}</center></li>\n"
 
@@ -274,13 +306,19 @@ class QueueDialog(BaseDialog):
 
 
 class SplitDialog(BaseDialog):
-    process_started = pyqtSignal(str, str, str, bool)
+    # artista, canción, archivo, cronometrar, perfil de separación,
+    # escuchar mientras se separa
+    process_started = pyqtSignal(str, str, str, bool, str, bool)
     dialog_closed = pyqtSignal()
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profiles: ProfileStore | None = None,
+                 device: str = "CPU"):
         # 460 de alto: los widgets nativos de macOS son más altos y con 440
-        # el botón MP3 quedaba pegado al textbox
-        super().__init__(parent, "Dividir Canción", (360, 460))
+        # el botón MP3 quedaba pegado al textbox (+90 del selector de perfil,
+        # +25 de "Escuchar mientras se separa")
+        super().__init__(parent, "Dividir Canción", (360, 575))
+        self.profiles = profiles or ProfileStore()
+        self.device = device
         self._setup_split_ui()
 
     def _setup_split_ui(self):
@@ -303,32 +341,90 @@ class SplitDialog(BaseDialog):
         self.main_layout.addWidget(self.artist)
         self.main_layout.addWidget(QLabel("Canción*"))
         self.main_layout.addWidget(self.song)
+        self.main_layout.addWidget(QLabel("Perfil de separación"))
+        self.main_layout.addWidget(self._create_profile_combo())
+        self.main_layout.addWidget(self.estimate_label)
+        self.main_layout.addWidget(self.default_chk)
         self.main_layout.addWidget(self._create_timing_checkbox())
+        self.main_layout.addWidget(self._create_listen_checkbox())
         self.main_layout.addLayout(btn_layout)
 
         self._setup_validation()
+        self.file_path.textChanged.connect(self._update_estimate)
+        self._update_estimate()
+
+    def _create_profile_combo(self) -> QComboBox:
+        """Selector de perfil (rápido / equilibrado / mejor, o automático:
+        el más rápido que cumple el piso de calidad según lo medido)."""
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("Automático", AUTO_PROFILE)
+        for profile in PROFILES.values():
+            self.profile_combo.addItem(profile.label, profile.name)
+        self.profile_combo.setCurrentIndex(
+            max(0, self.profile_combo.findData(self.profiles.default)))
+        self.profile_combo.setStyleSheet(
+            "QComboBox { color: #cfcfe0; background: #2a2a3a; padding: 3px; }"
+        )
+        self.profile_combo.currentIndexChanged.connect(self._update_estimate)
+
+        self.estimate_label = QLabel()
+        self.estimate_label.setStyleSheet("color: #cfcfe0; font-size: 11px;")
+        self.default_chk = self._styled_checkbox(
+            "Usar como predeterminado",
+            "Los próximos trabajos empiezan con este perfil seleccionado",
+        )
+        return self.profile_combo
+
+    def _update_estimate(self):
+        """Duración prevista con la tabla de RTF medida en este equipo."""
+        choice = self.profile_combo.currentData()
+        name = self.profiles.resolve(choice, self.device).name
+        parts = [f"Se usará: {PROFILES[name].label}"] if choice == AUTO_PROFILE else []
+        path = self.file_path.text().strip()
+        if path and Path(path).is_file():
+            predicted = self.profiles.predict(self.device, name, audio_duration(path))
+            if predicted:
+                mins, secs = divmod(int(round(predicted)), 60)
+                parts.append(f"Tiempo estimado: ~{mins} min {secs:02d} s")
+        self.estimate_label.setText(" · ".join(parts))
 
     def _create_timing_checkbox(self) -> QCheckBox:
         """Checkbox para medir cuánto tarda la separación (benchmark de hardware)."""
-        self.timing_chk = QCheckBox("Cronometrar proceso")
-        self.timing_chk.setChecked(False)
-        self.timing_chk.setToolTip(
-            "Al terminar la separación muestra el tiempo total que tomó el proceso"
+        self.timing_chk = self._styled_checkbox(
+            "Cronometrar proceso",
+            "Al terminar la separación muestra el tiempo total que tomó el proceso",
         )
+        return self.timing_chk
+
+    def _create_listen_checkbox(self) -> QCheckBox:
+        """Separación progresiva: suena con lo ya separado en vez de esperar
+        la canción entera."""
+        self.listen_chk = self._styled_checkbox(
+            "Escuchar mientras se separa",
+            "Empieza a sonar en cuanto está el primer tramo separado. Si la "
+            "reproducción alcanza a la separación, espera en silencio",
+        )
+        return self.listen_chk
+
+    @staticmethod
+    def _styled_checkbox(text: str, tooltip: str) -> QCheckBox:
+        chk = QCheckBox(text)
+        chk.setChecked(False)
+        chk.setToolTip(tooltip)
         # Mismos assets de checkbox que el resto de la app (incluyen la
         # palomita); el indicador default pierde la marca sobre el tema oscuro.
         unchecked = style_url('images/split_dialog/checkbox_unchecked.png')
         checked = style_url('images/split_dialog/checkbox_checked.png')
         hover = style_url('images/split_dialog/checkbox_hover01.png')
         hover_checked = style_url('images/split_dialog/checkbox_hover02.png')
-        self.timing_chk.setStyleSheet(f"""
+        chk.setStyleSheet(f"""
             QCheckBox {{ color: #cfcfe0; spacing: 8px; font-size: 12px; }}
             QCheckBox::indicator {{ width: 18px; height: 18px; image: url({unchecked}); }}
             QCheckBox::indicator:checked {{ image: url({checked}); }}
             QCheckBox::indicator:unchecked:hover {{ image: url({hover}); }}
             QCheckBox::indicator:checked:hover {{ image: url({hover_checked}); }}
         """)
-        return self.timing_chk
+        return chk
 
     def _create_file_button(self) -> QPushButton:
         btn = QPushButton()
@@ -428,11 +524,16 @@ class SplitDialog(BaseDialog):
             self._start_process()
 
     def _start_process(self):
+        profile = self.profile_combo.currentData()
+        if self.default_chk.isChecked():
+            self.profiles.set_default(profile)
         self.process_started.emit(
             self.artist.text().strip(),
             self.song.text().strip(),
             self.file_path.text(),
-            self.timing_chk.isChecked()
+            self.timing_chk.isChecked(),
+            profile,
+            self.listen_chk.isChecked(),
         )
         self.hide()
         self.dialog_closed.emit()
@@ -24,17 +24,21 @@ from PyQt6.QtCore import QObject, pyqtSignal, Qt
 from PyQt6.QtGui import QPixmap, QIcon, QImage
 from PIL import Image
 import io
+import mutagen
 from mutagen.mp3 import MP3
-import re
+
+from lrc_parser import load_lrc
+from separation_profiles import stem_paths
 
 logger = logging.getLogger(__name__)
 
 
 def get_song_duration(song_folder: Path) -> str:
-    """Duración de la canción como "M:SS" leyendo solo el header del stem
-    (todos los stems duran lo mismo). Cadena vacía si no se puede leer."""
+    """Duración de la canción como "M:SS" leyendo solo el header de un stem
+    (todos duran lo mismo; mutagen lee mp3, flac y wav). Cadena vacía si no
+    se puede leer."""
     try:
-        seconds = MP3(str(song_folder / "separated" / "other.mp3")).info.length
+        seconds = mutagen.File(str(stem_paths(song_folder)[0])).info.length
         return f"{int(seconds) // 60}:{int(seconds) % 60:02d}"
     except Exception:
         return ""
@@ -215,10 +219,8 @@ class LazyAudioManager:
                         return None
 
                     # Verificar que todos los archivos existan antes de cargar
-                    track_files = [
-                        separated_path / f"{track}.mp3"
-                        for track in ("drums", "vocals", "bass", "other")
-                    ]
+                    # (los stems y el formato de la canción según su data.json)
+                    track_files = stem_paths(path)
 
                     if not all(f.exists() for f in track_files):
                         return None
@@ -368,8 +370,8 @@ class LazyLyricsManager:
         self.cache = ResourceCache(max_size=cache_size)
         self._loading_semaphore = threading.Semaphore(3)
 
-    def load_lyrics_lazy(self, path: Path) -> list:
-        """Carga letras de forma perezosa con parsing mejorado"""
+    def load_lyrics_lazy(self, path: Path):
+        """Letras parseadas (ParsedLyrics) de la canción, o [] si no hay."""
         cache_key = f"lyrics_{path}"
 
         def loader():
@@ -378,36 +380,9 @@ class LazyLyricsManager:
                 return []
 
             try:
-                lyrics = []
-                current_time = None
-                current_text = []
-
-                with open(lyrics_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
-                for line in lines:
-                    line = line.rstrip('\n\r')
-
-                    # Timestamp [mm:ss.xx] inicia un bloque nuevo
-                    time_match = re.match(r'\[(\d+):(\d+\.\d+)\]', line)
-                    if time_match:
-                        if current_time is not None and current_text:
-                            lyrics.append((current_time, '\n'.join(current_text)))
-
-                        minutes = int(time_match.group(1))
-                        seconds = float(time_match.group(2))
-                        current_time = minutes * 60 + seconds
-                        current_text = [line[time_match.end():]]
-                    elif current_time is not None and line:
-                        # Línea sin timestamp: continúa el bloque actual
-                        current_text.append(line)
-
-                if current_time is not None and current_text:
-                    lyrics.append((current_time, '\n'.join(current_text)))
-
-                return lyrics
-
-            except Exception:
+                return load_lrc(lyrics_path)
+            except Exception as e:
+                logger.error("Error leyendo %s: %s", lyrics_path, e)
                 return []
 
         return self.cache.get(cache_key, loader)
@@ -502,9 +477,9 @@ class LazyPlaylistLoader(QObject):
                                 if self._should_stop:
                                     break
 
-                                # Validar que existe la carpeta y archivos separados (other.mp3)
+                                # Validar que existen los stems separados
                                 song_folder = dir_path
-                                separated_folder = song_folder / "separated" / "other.mp3"
+                                separated_folder = stem_paths(song_folder)[0]
 
                                 song_info = {
                                     "artist": artist,
@@ -0,0 +1,101 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Lectura de los stems que el servidor va escribiendo (separación progresiva).
+
+Con "Escuchar mientras se separa" el servidor separa la canción por tramos
+y agrega cada uno a un WAV por stem en ``<canción>/.live`` (ver
+demucs_server). ``LiveStems`` reserva desde el principio arreglos del largo
+total de la canción y en cada ``refresh`` copia lo nuevo; ``frontier`` es
+el último frame con audio en todos los stems. El mezclador no lee más allá
+de ese frame: si la reproducción alcanza a la separación, espera en
+silencio en vez de terminar la canción.
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from demucs_server import LIVE_INFO
+
+logger = logging.getLogger(__name__)
+
+
+class LiveStems:
+    """Stems de una separación en curso, en memoria. Solo `refresh` y
+    `finish` escriben (hilo de la GUI); el hilo de audio lee hasta
+    `frontier`, que se adelanta después de copiar los datos."""
+
+    def __init__(self, live_dir):
+        self.dir = Path(live_dir)
+        info = json.loads((self.dir / LIVE_INFO).read_text(encoding="utf-8"))
+        self.samplerate = int(info["samplerate"])
+        self.frames = int(info["frames"])
+        self.stems = tuple(info["stems"])
+        channels = int(info["channels"])
+        self.tracks = [np.zeros((self.frames, channels), dtype=np.float32)
+                       for _ in self.stems]
+        self._filled = [0] * len(self.stems)
+        self.frontier = 0
+        self.complete = False
+        self.refresh()
+
+    @property
+    def track_data(self) -> list:
+        """Mismo formato que AudioPlayer._track_data: [(datos, sr)]."""
+        return [(track, self.samplerate) for track in self.tracks]
+
+    @property
+    def seconds(self) -> float:
+        return self.frontier / self.samplerate
+
+    def refresh(self) -> bool:
+        """Copia lo que el servidor agregó desde la última vez. True si
+        avanzó la frontera."""
+        if self.complete:
+            return False
+        for i, stem in enumerate(self.stems):
+            try:
+                with sf.SoundFile(str(self.dir / f"{stem}.wav")) as f:
+                    end = min(f.frames, self.frames)
+                    if end <= self._filled[i]:
+                        continue
+                    f.seek(self._filled[i])
+                    data = f.read(end - self._filled[i], dtype="float32", always_2d=True)
+            except (OSError, RuntimeError) as e:
+                # Cabecera a medio reescribir o carpeta ya borrada
+                logger.debug("No se pudo leer %s: %s", stem, e)
+                continue
+            self.tracks[i][self._filled[i]:self._filled[i] + len(data)] = data
+            self._filled[i] += len(data)
+        frontier = min(self._filled)
+        if frontier <= self.frontier:
+            return False
+        self.frontier = frontier
+        return True
+
+    def finish(self) -> bool:
+        """La separación terminó: último refresh y se borra la carpeta.
+        True si quedó la canción entera (si el servidor cayó a mitad, el
+        resto hay que cargarlo de los stems finales)."""
+        self.refresh()
+        self.complete = self.frontier >= self.frames
+        shutil.rmtree(self.dir, ignore_errors=True)
+        return self.complete
@@ -0,0 +1,232 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Parser LRC compartido por la vista de letras y el editor de sincronización.
+
+Un solo recorrido por línea con regex precompiladas. Soporta:
+
+- Varios timestamps en una línea (``[00:12.00][01:30.00]Coro``): el texto se
+  repite en cada tiempo.
+- Líneas de continuación sin timestamp: se anexan al bloque actual.
+- ``[offset:±ms]``: se aplica a todos los tiempos (positivo = antes, como en
+  la especificación LRC). Las demás etiquetas de cabecera se ignoran.
+- Timestamps por palabra del LRC extendido (``<00:12.50>palabra``): se
+  guardan en ``words`` y se quitan del HTML de pantalla.
+
+El resultado (``ParsedLyrics``) trae todo precalculado para el bucle de
+reproducción: tiempos en un array para ``searchsorted``, el HTML listo para
+``setHtml`` y la marca de auto-unmute por línea.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Colores opcionales para distinguir cantantes (canciones a varias voces).
+# La etiqueta es un <font color> HTML: la ventana principal la pinta sola al
+# hacer setHtml, y en el editor se oculta con strip_tags y se detecta con
+# extract_color. None = color por defecto de cada vista.
+LYRIC_COLORS = {
+    "azul": "#3AABEF",
+    "blanco": "#F6F5F4",
+    # Rojo (apagado): marca líneas que disparan el auto-unmute de voz igual
+    # que una línea en blanco, aunque tengan texto.
+    "rojo": "#B23A36",
+}
+# Color que actúa como "línea en blanco" para el auto-unmute aunque tenga texto.
+AUTO_UNMUTE_COLOR = "rojo"
+
+LRC_CACHE_SIZE = 64         # archivos parseados en memoria (LRU por ruta)
+
+# Un bloque: línea con uno o más [mm:ss.xx] (también [mm:ss] y [mm:ss:xx])
+# al inicio, más las líneas siguientes que no empiezan con otro timestamp
+# (continuación multilínea; de ahí se descartan cabeceras y renglones vacíos).
+_BLOCK = re.compile(
+    r'^(\[\d+:\d+(?:[.:]\d+)?\](?:\[\d+:\d+(?:[.:]\d+)?\])*)'
+    r'([^\n]*(?:\n(?!\[\d)[^\n]*)*)',
+    re.MULTILINE,
+)
+_META = re.compile(r'\[[A-Za-z#][\w#]*:[^\]]*\]\s*$')
+_TS = re.compile(r'\[(\d+):(\d+(?:\.\d+)?)\]')
+_TS_COLON_FRAC = re.compile(r'(\[\d+:\d+):(\d+\])')
+_OFFSET = re.compile(r'^\[offset:\s*([+-]?\d+)\s*\][ \t]*$',
+                     re.MULTILINE | re.IGNORECASE)
+# La línea entera (con su salto) para reescribir la cabecera
+_OFFSET_LINE = re.compile(r'^\[offset:[^\]\n]*\][ \t]*(?:\r?\n|$)',
+                          re.MULTILINE | re.IGNORECASE)
+_WORD_TS = re.compile(r'<(\d+):(\d+(?:\.\d+)?)>')
+_TAG = re.compile(r'<[^>]*>')
+_RED = f'color="{LYRIC_COLORS[AUTO_UNMUTE_COLOR].lower()}"'
+# Separador para procesar todos los textos con una sola pasada de regex
+_SEP = '\x00'
+
+
+@dataclass
+class ParsedLyrics:
+    """Letra parseada, ordenada por tiempo.
+
+    Se indexa como la lista de antes: ``lyrics[i]`` es ``(inicio, texto)``
+    con el texto tal como está en el .lrc (etiquetas incluidas).
+    """
+
+    starts: np.ndarray                  # float64, segundos (offset aplicado)
+    texts: list[str]                    # texto crudo de cada línea
+    html: list[str]                     # listo para setHtml ('\n' -> <br>)
+    blank: np.ndarray                   # bool: vacía o roja (auto-unmute)
+    words: list = field(default_factory=list)  # tiempos por palabra o None
+    offset: float = 0.0                 # segundos del [offset:] del archivo
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        return float(self.starts[i]), self.texts[i]
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.texts)
+
+    def index_at(self, seconds: float) -> int:
+        """Línea vigente en `seconds`, o -1 antes de la primera."""
+        return int(np.searchsorted(self.starts, seconds, side='right')) - 1
+
+    @classmethod
+    def from_pairs(cls, pairs) -> "ParsedLyrics":
+        """Desde [(inicio, texto), ...] (p. ej. letras armadas en memoria)."""
+        entries = sorted(((float(t), text, None) for t, text in pairs),
+                         key=lambda e: e[0])
+        return _build(entries, 0.0)
+
+
+def _build(entries, offset: float) -> ParsedLyrics:
+    texts = [text for _, text, _ in entries]
+    return _finish(np.array([t for t, _, _ in entries], dtype=np.float64),
+                   texts, [w for _, _, w in entries], offset)
+
+
+def _finish(starts: np.ndarray, texts: list[str], words: list,
+            offset: float) -> ParsedLyrics:
+    """Arma el resultado calculando HTML y marcas de todas las líneas con
+    una pasada de regex sobre los textos unidos (no una por línea)."""
+    if not texts:
+        return ParsedLyrics(starts=np.zeros(0), texts=[], html=[],
+                            blank=np.zeros(0, dtype=bool), offset=offset)
+    joined = _SEP.join(texts)
+    html = _WORD_TS.sub('', joined).replace('\n', '<br>').split(_SEP)
+    plain = _TAG.sub('', joined).replace('&nbsp;', '').split(_SEP)
+    blank = np.array([not t.strip() for t in plain], dtype=bool)
+    if 'olor=' in joined and _RED in joined.lower():
+        blank |= np.array([_RED in t.lower() for t in texts], dtype=bool)
+    return ParsedLyrics(starts=starts, texts=texts, html=html, blank=blank,
+                        words=words, offset=offset)
+
+
+def parse_lrc_text(content: str) -> ParsedLyrics:
+    """Parsea el contenido de un .lrc (ver docstring del módulo)."""
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    offset = 0.0
+    # La búsqueda literal es mucho más barata que la regex multilínea
+    has_offset = 'ffset:' in content or 'FFSET:' in content
+    m = _OFFSET.search(content) if has_offset else None
+    if m:
+        offset = int(m.group(1)) / 1000.0
+
+    blocks = _BLOCK.findall(content)
+    tags = ''.join(tag for tag, _ in blocks)
+    if _TS_COLON_FRAC.search(tags):
+        # [mm:ss:xx] → [mm:ss.xx] (raro; solo si aparece)
+        tags = _TS_COLON_FRAC.sub(r'\1.\2', tags)
+    pairs = _TS.findall(tags)
+    if not pairs:
+        return _finish(np.zeros(0), [], [], offset)
+    starts = np.maximum(np.array(
+        [int(mm) * 60 + float(ss) for mm, ss in pairs]) - offset, 0.0)
+
+    texts = []
+    for _, body in blocks:
+        if '\n' in body:
+            rows = body.split('\n')
+            body = '\n'.join([rows[0]] + [
+                r for r in rows[1:] if r.strip() and not _META.match(r)])
+        texts.append(body)
+    if len(pairs) != len(blocks):
+        # Varios timestamps por línea: el texto se repite en cada uno
+        texts = [t for t, (tag, _) in zip(texts, blocks)
+                 for _ in range(tag.count('['))]
+
+    words = [None] * len(texts)
+    if _WORD_TS.search(content):
+        for i, text in enumerate(texts):
+            found = _WORD_TS.findall(text)
+            if found:
+                words[i] = np.maximum(np.array(
+                    [int(mm) * 60 + float(ss) for mm, ss in found]) - offset, 0.0)
+
+    if len(starts) > 1 and (np.diff(starts) < 0).any():
+        # Estable: con tiempos iguales conserva el orden del archivo
+        order = np.argsort(starts, kind='stable')
+        starts = starts[order]
+        texts = [texts[i] for i in order]
+        words = [words[i] for i in order]
+    return _finish(starts, texts, words, offset)
+
+
+_cache: OrderedDict[str, tuple[int, int, ParsedLyrics]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_lrc(path) -> ParsedLyrics:
+    """Parsea `path` con caché en memoria por ruta, válido mientras no cambien
+    la fecha de modificación ni el tamaño del archivo."""
+    path = Path(path)
+    st = path.stat()
+    key = str(path)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            _cache.move_to_end(key)
+            return hit[2]
+    parsed = parse_lrc_text(path.read_text(encoding='utf-8'))
+    with _cache_lock:
+        _cache[key] = (st.st_mtime_ns, st.st_size, parsed)
+        _cache.move_to_end(key)
+        while len(_cache) > LRC_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def set_lrc_offset(path, offset: float) -> None:
+    """Guarda `offset` (segundos, + = antes) como cabecera ``[offset:]`` de
+    `path`, sin tocar ningún timestamp. Con 0 la cabecera se quita.
+
+    Escritura atómica (temporal + rename), como el resto de cachés y datos.
+    """
+    path = Path(path)
+    content = _OFFSET_LINE.sub('', path.read_text(encoding='utf-8'))
+    ms = round(offset * 1000)
+    if ms:
+        content = f"[offset:{ms:+d}]\n" + content
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(content, encoding='utf-8')
+    os.replace(tmp, path)
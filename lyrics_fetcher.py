@@ -0,0 +1,373 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Descarga de letras en segundo plano para la biblioteca.
+
+- Pocos workers concurrentes (FETCH_WORKERS) sobre una cola: las búsquedas
+  son casi todo espera de red, así que unos pocos hilos bastan para no
+  tardar minutos al cargar una biblioteca grande sin saturar a nadie.
+- Una ``requests.Session`` compartida: reutiliza las conexiones keep-alive
+  a LRCLIB en lugar de abrir TCP+TLS por cada canción.
+- Un ``RateLimiter`` por proveedor: los workers se reparten los turnos, así
+  la concurrencia nunca supera el ritmo permitido de cada servicio.
+- ``FailedLookups``: registro persistente de búsquedas sin resultado con
+  backoff exponencial. Una canción con el placeholder de "no encontradas"
+  solo se vuelve a buscar cuando vence su espera, no en cada arranque.
+  Solo cuenta cuando un proveedor respondió sin coincidencias: si la
+  petición falla (sin red, timeout, 429/5xx) los buscadores lanzan
+  ``LookupFailed``, no se escribe placeholder y se reintenta en la próxima
+  carga.
+- Estado de letras por canción en su data.json (bloque ``"lyrics"``: estado,
+  último intento, proveedor y número de líneas), actualizado cada vez que se
+  escribe el .lrc. Al cargar la biblioteca se decide con él, sin abrir
+  ningún .lrc; las canciones sin ese bloque se revisan una vez y se anota.
+
+La URL de LRCLIB es configurable para probar contra un servidor local.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lrc_parser import parse_lrc_text
+from version import __version__
+
+logger = logging.getLogger(__name__)
+
+# Texto del .lrc placeholder que se escribe cuando no hay letras; su presencia
+# marca la canción como pendiente de reintento.
+LYRICS_NOT_FOUND_TEXT = "Letras no encontradas"
+
+LRCLIB_SEARCH_URL = "https://lrclib.net/api/search"
+FETCH_WORKERS = 3               # búsquedas simultáneas
+FETCH_IDLE_S = 5.0              # un worker sin trabajo termina tras esto
+HTTP_TIMEOUT_S = 10
+# Separación mínima entre peticiones a cada proveedor (entre todos los hilos)
+LRCLIB_INTERVAL_S = 0.2
+SYNCEDLYRICS_INTERVAL_S = 1.0   # consulta varios servicios por búsqueda
+# Backoff de búsquedas fallidas: 6 h, 12 h, 24 h... hasta 30 días
+BACKOFF_BASE_S = 6 * 3600
+BACKOFF_MAX_S = 30 * 24 * 3600
+
+# Valores de "status" en el bloque "lyrics" de data.json
+LYRICS_FOUND = "found"
+LYRICS_MISSING = "not_found"
+
+
+class LookupFailed(RuntimeError):
+    """El proveedor no respondió (red, timeout o error HTTP): no es lo
+    mismo que "no tiene esas letras"."""
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin acentos, para comparar artista/título."""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def lyrics_status(found: bool, provider: str = "", lines: int = 0) -> dict:
+    """Bloque "lyrics" de data.json para un .lrc recién escrito."""
+    return {
+        "status": LYRICS_FOUND if found else LYRICS_MISSING,
+        "attempted_at": int(time.time()),
+        "provider": provider,
+        "lines": lines,
+    }
+
+
+def read_lyrics_status(dir_path) -> dict | None:
+    """Bloque "lyrics" del data.json de la canción (None si no hay)."""
+    try:
+        data = json.loads((Path(dir_path) / "data.json").read_text(encoding="utf-8"))
+        for songs in data.values():
+            for song_data in songs.values():
+                status = song_data.get("lyrics")
+                if isinstance(status, dict):
+                    return status
+    except Exception:
+        pass
+    return None
+
+
+def write_lyrics_status(dir_path, artist: str, song: str, status: dict) -> None:
+    """Guarda `status` en la entrada de la canción de su data.json.
+
+    Si data.json no existe o no tiene esa canción no escribe nada: crear la
+    entrada haría aparecer una canción nueva en la biblioteca.
+    """
+    path = Path(dir_path) / "data.json"
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        entry = data.get(artist, {}).get(song)
+        if not isinstance(entry, dict):
+            return
+        entry["lyrics"] = status
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, indent=4), encoding="utf-8")
+        os.replace(tmp, path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("No se pudo guardar el estado de letras en %s: %s", path, e)
+
+
+class RateLimiter:
+    """Reparte turnos separados al menos `interval` segundos entre hilos."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class FailedLookups:
+    """Búsquedas sin resultado, persistidas en JSON con backoff exponencial.
+
+    Clave: artista y título normalizados (sobrevive a mover la carpeta).
+    Los cambios se acumulan en memoria y se escriben con ``save()``: con
+    miles de canciones fallidas, reescribir el archivo en cada una sería
+    cuadrático.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = Path(path) if path is not None else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._entries: dict[str, dict] = {}
+        if self.path is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(data, dict):
+                    self._entries = data
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Registro de letras fallidas ilegible (%s): %s",
+                               self.path, e)
+
+    @staticmethod
+    def _key(artist: str, song: str) -> str:
+        return f"{normalize_text(artist.strip())}\t{normalize_text(song.strip())}"
+
+    def should_retry(self, artist: str, song: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(self._key(artist, song))
+        return entry is None or self._clock() >= entry.get("retry_at", 0)
+
+    def record(self, artist: str, song: str, found: bool) -> None:
+        key = self._key(artist, song)
+        with self._lock:
+            if found:
+                if self._entries.pop(key, None) is not None:
+                    self._dirty = True
+                return
+            failures = self._entries.get(key, {}).get("failures", 0) + 1
+            wait = min(BACKOFF_BASE_S * 2 ** (failures - 1), BACKOFF_MAX_S)
+            self._entries[key] = {"failures": failures,
+                                  "retry_at": self._clock() + wait}
+            self._dirty = True
+
+    def failures(self, artist: str, song: str) -> int:
+        with self._lock:
+            return self._entries.get(self._key(artist, song), {}).get("failures", 0)
+
+    def save(self) -> None:
+        """Escribe el registro si cambió (temporal + rename)."""
+        # Un guardado a la vez: quien llega después espera a que el archivo
+        # esté escrito (close() no debe volver antes que el worker)
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty or self.path is None:
+                    return
+                content = json.dumps(self._entries, ensure_ascii=False)
+                self._dirty = False
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            try:
+                tmp.write_text(content, encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.warning("No se pudo guardar %s: %s", self.path, e)
+
+
+class LyricsFetcher:
+    """Cola de búsqueda de letras con FETCH_WORKERS hilos.
+
+    `fetch(artist, song, dir_path) -> bool` hace la búsqueda y escribe el
+    .lrc (placeholder si no hubo suerte); devuelve True si encontró letras y
+    lanza LookupFailed si no pudo preguntar. Lo aporta la ventana
+    principal, que usa los buscadores de aquí.
+    """
+
+    def __init__(self, fetch, failures_path=None, workers: int = FETCH_WORKERS,
+                 lrclib_url: str = LRCLIB_SEARCH_URL, idle_s: float = FETCH_IDLE_S):
+        self._fetch = fetch
+        self.failures = FailedLookups(failures_path)
+        self.workers = workers
+        self.lrclib_url = lrclib_url
+        self.idle_s = idle_s
+        self.lrclib_limiter = RateLimiter(LRCLIB_INTERVAL_S)
+        self.syncedlyrics_limiter = RateLimiter(SYNCEDLYRICS_INTERVAL_S)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = (
+            f"PlayIt/{__version__} (https://github.com/RavilesX/playit)")
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    # ── Cola ─────────────────────────────────────────────────────────────
+    def submit(self, dir_path, artist: str, song: str,
+               status: dict | None = None) -> None:
+        """Encola la canción si hace falta buscar sus letras.
+
+        `status` es el bloque "lyrics" de su data.json, si ya se leyó (al
+        cargar la biblioteca): con él se decide sin tocar disco. Sin él, el
+        worker lo lee de data.json o, en canciones viejas, revisa el .lrc.
+        """
+        if status is not None and not self._should_fetch(dir_path, artist, song, status):
+            return
+        self._queue.put((Path(dir_path), artist, song, status))
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if len(self._threads) < min(self.workers, self._queue.qsize()):
+                t = threading.Thread(target=self._worker, daemon=True,
+                                     name="lyrics-fetch")
+                self._threads.append(t)
+                t.start()
+
+    def join(self) -> None:
+        """Espera a que se procese todo lo encolado."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self.failures.save()
+        self.session.close()
+
+    def _worker(self):
+        while True:
+            try:
+                dir_path, artist, song, status = self._queue.get(timeout=self.idle_s)
+            except queue.Empty:
+                self.failures.save()
+                # Salir bajo el lock: un submit que llegó mientras se
+                # guardaba vio este hilo vivo y no lanzó otro
+                with self._lock:
+                    if not self._queue.empty():
+                        continue
+                    self._threads.remove(threading.current_thread())
+                return
+            try:
+                self._process(dir_path, artist, song, status)
+            except Exception as e:
+                logger.error("Error buscando letras de %s - %s: %s", artist, song, e)
+            finally:
+                self._queue.task_done()
+            if self._queue.unfinished_tasks == 0:
+                self.failures.save()
+
+    def _should_fetch(self, dir_path, artist: str, song: str, status: dict) -> bool:
+        if status.get("status") == LYRICS_FOUND:
+            # Un stat basta para no fiarse de un .lrc que ya se borró
+            return not (Path(dir_path) / "lyrics.lrc").exists()
+        # Sin letras: solo cuando vence la espera del backoff
+        return self.failures.should_retry(artist, song)
+
+    def _process(self, dir_path: Path, artist: str, song: str,
+                 status: dict | None) -> None:
+        if status is None:
+            status = read_lyrics_status(dir_path)
+        if status is None:
+            # Canción sin estado (anterior al índice): revisar el .lrc una
+            # vez y anotarlo para no volver a leerlo en cada carga
+            status = self._backfill_status(dir_path, artist, song)
+        if status is not None and not self._should_fetch(dir_path, artist, song, status):
+            return
+        try:
+            found = bool(self._fetch(artist, song, dir_path))
+        except LookupFailed as e:
+            # Sin respuesta no hay backoff: se reintenta en la próxima carga
+            logger.info("Letras de %s - %s pendientes: %s", artist, song, e)
+            return
+        self.failures.record(artist, song, found)
+
+    @staticmethod
+    def _backfill_status(dir_path: Path, artist: str, song: str) -> dict | None:
+        """Estado deducido del .lrc existente (None si no hay .lrc)."""
+        try:
+            content = (dir_path / "lyrics.lrc").read_text(encoding="utf-8")
+        except Exception:
+            return None
+        found = LYRICS_NOT_FOUND_TEXT not in content
+        status = lyrics_status(found, lines=len(parse_lrc_text(content)) if found else 0)
+        status["attempted_at"] = 0      # desconocido
+        write_lyrics_status(dir_path, artist, song, status)
+        return status
+
+    # ── Proveedores ──────────────────────────────────────────────────────
+    def search_lrclib(self, artist: str, song: str) -> str:
+        """Búsqueda primaria en LRCLIB con coincidencia exacta normalizada.
+        "" si no hay coincidencia; LookupFailed si la petición falló."""
+        url = f"{self.lrclib_url}?q={quote(f'{artist} {song}')}"
+        self.lrclib_limiter.wait()
+        try:
+            response = self.session.get(url, timeout=HTTP_TIMEOUT_S)
+            response.raise_for_status()
+            results = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise LookupFailed(f"LRCLIB: {e}") from e
+        norm_artist = normalize_text(artist)
+        norm_song = normalize_text(song)
+        for result in results if isinstance(results, list) else []:
+            if (normalize_text(result.get("artistName", "")) == norm_artist
+                    and normalize_text(result.get("trackName", "")) == norm_song
+                    and result.get("syncedLyrics")):
+                return result["syncedLyrics"]
+        return ""
+
+    def search_syncedlyrics(self, artist: str, song: str) -> str:
+        """Fallback multi-proveedor (NetEase, Musixmatch, etc.) con matching fuzzy."""
+        try:
+            import syncedlyrics
+        except Exception:
+            return ""
+        self.syncedlyrics_limiter.wait()
+        try:
+            return syncedlyrics.search(f"{song} {artist}", synced_only=True) or ""
+        except Exception as e:
+            raise LookupFailed(f"syncedlyrics: {e}") from e
@@ -16,32 +16,39 @@
 
 """Editor de sincronización de lyrics basado en forma de onda.
 
-Abre una ventana aparte que dibuja la onda de la voz (vocals.mp3) y los
+Abre una ventana aparte que dibuja la onda de la voz (stem vocals) y los
 bloques de cada línea del archivo .lrc. El usuario arrastra el inicio de
 cada línea sobre la onda para corregir la sincronización línea por línea,
 sin afectar las partes ya correctas (a diferencia del offset global).
 
 Diseño modular:
-  - load_vocals()      : genera los peaks de la onda (función pura).
-  - MiniVocalsPlayer   : reproduce solo la voz desde una posición dada.
+  - load_vocals()      : pirámide de peaks de la onda, cacheada en disco.
+  - detect_onsets()    : ataques de la voz para el imán de bordes (cacheados).
+  - AuditionEngine     : escucha por callback (voz o mezcla), bucle y scrub.
   - WaveformWidget     : dibuja la onda + bloques y maneja arrastre/scroll.
   - LyricsSyncDialog   : compone todo con el estilo de la app (BaseDialog).
 """
 
 from __future__ import annotations
 
+import bisect
+import logging
+import os
 import re
 import threading
+import time
 import unicodedata
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
 
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import (
-    QColor, QFont, QFontMetrics, QKeySequence, QPainter, QPen, QShortcut,
-    QTextCharFormat, QTextCursor, QTextOption,
+    QColor, QFont, QFontMetrics, QKeySequence, QPainter, QPen, QPixmap,
+    QPolygonF, QShortcut, QTextCharFormat, QTextCursor, QTextOption,
 )
 from PyQt6.QtWidgets import (
     QBoxLayout,
@@ -59,7 +66,9 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from audio_visualizer import polygon_array
 from dialogs import BaseDialog
+from lrc_parser import LYRIC_COLORS, load_lrc
 from resources import (
     FONT_EDITOR,
     FONT_SYMBOLS,
@@ -67,8 +76,11 @@ from resources import (
     style_url,
     styled_message_box,
 )
+from separation_profiles import song_stems
 from ui_components import SizeGrip
 
+logger = logging.getLogger(__name__)
+
 # Sin límite superior de tamaño (permite maximizar / agrandar libremente).
 _QWIDGETSIZE_MAX = 16777215
 
@@ -76,33 +88,36 @@ _QWIDGETSIZE_MAX = 16777215
 # Constantes de configuración
 # ──────────────────────────────────────────────────────────────────────
 PEAKS_PER_SECOND = 200      # resolución de los peaks precalculados
+PEAK_LEVELS = 4             # niveles de la pirámide: 200, 50, 12.5, ~3 /s
+PEAK_LEVEL_FACTOR = 4       # reducción entre un nivel y el siguiente
+PEAKS_CACHE_SUFFIX = ".peaks.npz"  # vocals.mp3 -> vocals.peaks.npz
+PEAKS_CACHE_VERSION = 1
+ONSETS_CACHE_SUFFIX = ".onsets.npz"  # vocals.mp3 -> vocals.onsets.npz
+ONSETS_CACHE_VERSION = 1
+ONSET_SR = 11025            # frecuencia a la que se analiza la voz
+ONSET_FFT = 512             # ventana del análisis (~46 ms a ONSET_SR)
+ONSET_HOP_S = 0.01          # salto entre ventanas (resolución de los onsets)
+ONSET_MIN_GAP_S = 0.08      # separación mínima entre onsets
+ONSET_DELTA = 0.05          # margen del flujo sobre su media móvil
+ONSET_ACTIVE_DB = -35.0     # voz activa: energía respecto del máximo
+ONSET_FLOOR_DB = -60.0      # ...y nunca por debajo de este piso absoluto
+ONSET_SNAP_PX = 10          # radio del imán al arrastrar un borde
+ONSET_SNAP_S = 0.5          # radio de "ajustar a onsets" de la selección
+WAVE_TILE_PX = 512          # ancho de cada tile cacheado de onda + rejilla
+WAVE_TILE_CACHE = 32        # tiles en memoria (LRU); la vista usa unos pocos
+TEXT_LAYOUT_CACHE = 512     # layouts de texto de bloque en memoria (LRU)
 DEFAULT_PX_PER_SEC = 150    # escala horizontal fija (zoom queda como variable)
 EDGE_GRAB_PX = 6            # margen en px para "agarrar" el inicio de una línea
 MIN_GAP = 0.05             # separación mínima en segundos entre líneas
-UNDO_MAX = 100             # tope de snapshots del historial de deshacer
+UNDO_MAX = 100             # tope de comandos del historial de deshacer
 WHEEL_SCROLL_SECONDS = 0.6  # cuánto desplaza la rueda del mouse por muesca
 TOOLBAR_BTN_H = 28          # alto común de los botones de las barras del editor
 LYRIC_EDIT_FONT_PX = 18     # tamaño del texto en los diálogos de agregar/editar
 
-# Regex del timestamp LRC: [mm:ss.xx]
-_LRC_TS = re.compile(r'\[(\d+):(\d+\.\d+)\]')
 # Etiquetas HTML (p.ej. <center>) presentes en el .lrc; se ocultan al mostrar
 # el texto sobre la onda, pero se conservan en el archivo al guardar.
 _HTML_TAG = re.compile(r'<[^>]+>')
 
-# Colores opcionales para distinguir cantantes (canciones a varias voces).
-# La etiqueta es un <font color> HTML: la ventana principal la pinta sola al
-# hacer setHtml, y en el editor se oculta con strip_tags y se detecta con
-# extract_color. None = color por defecto de cada vista.
-LYRIC_COLORS = {
-    "azul": "#3AABEF",
-    "blanco": "#F6F5F4",
-    # Rojo (apagado): marca líneas que disparan el auto-unmute de voz igual
-    # que una línea en blanco, aunque tengan texto. Ver _current_lyric_is_blank.
-    "rojo": "#B23A36",
-}
-# Color que actúa como "línea en blanco" para el auto-unmute aunque tenga texto.
-AUTO_UNMUTE_COLOR = "rojo"
 # Texto de ayuda (tooltip) de cada botón de color.
 LYRIC_COLOR_TIPS = {
     "azul": "Azul: segundo cantante",
@@ -120,13 +135,29 @@ DEFAULT_LYRIC_HEX = "#F88FFF"
 # ──────────────────────────────────────────────────────────────────────
 @dataclass
 class VocalsAudio:
-    """Audio de la voz ya cargado y resumido en peaks para dibujar."""
+    """Audio de la voz resumido en peaks para dibujar.
+
+    `samples` es None cuando viene de load_vocals: la onda se dibuja con la
+    pirámide y AuditionEngine decodifica `path` en segundo plano.
+    """
 
-    samples: np.ndarray     # mono, float32
+    samples: np.ndarray | None  # mono, float32 (o None: se lee de `path`)
     sr: int                 # sample rate
     duration: float         # segundos
-    peaks: np.ndarray       # shape (n, 2): [min, max] por ventana
+    peaks: np.ndarray       # shape (n, 2): [min, max] por ventana (nivel fino)
     peaks_per_second: float
+    # Pirámide [(peaks, peaks_per_second), ...] de fino a grueso; el primer
+    # nivel es `peaks`. Vacía = solo el nivel fino.
+    levels: list = field(default_factory=list)
+    path: str | None = None
+
+    def peaks_for(self, px_per_sec: float) -> tuple[np.ndarray, float]:
+        """Nivel más grueso que aún da al menos un peak por pixel."""
+        best = (self.peaks, self.peaks_per_second)
+        for peaks, pps in self.levels:
+            if pps >= px_per_sec:
+                best = (peaks, pps)
+        return best
 
 
 @dataclass
@@ -141,62 +172,250 @@ class LyricLine:
 # Carga de audio / generación de peaks (funciones puras)
 # ──────────────────────────────────────────────────────────────────────
 def load_vocals(path) -> VocalsAudio:
-    """Carga vocals.mp3 a mono y precalcula peaks min/max por ventana.
+    """Pirámide de peaks min/max de vocals.mp3, desde el caché si está al día.
 
-    Resumir a ~PEAKS_PER_SECOND valores por segundo mantiene el repintado
-    barato aun en canciones largas.
+    El caché (``vocals.peaks.npz`` junto a los stems) se valida con la fecha
+    de modificación y el tamaño del audio; si falta o quedó viejo se recorre
+    el archivo por bloques (sin tenerlo entero en memoria) y se reescribe.
+    Las muestras no se conservan: el reproductor las lee del archivo.
     """
-    data, sr = sf.read(str(path), dtype='float32', always_2d=True)
-    mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
-
-    win = max(1, int(sr / PEAKS_PER_SECOND))
-    n = len(mono) // win
-    if n == 0:
-        peaks = np.zeros((1, 2), dtype=np.float32)
+    path = Path(path)
+    st = path.stat()
+    cache = path.with_name(path.stem + PEAKS_CACHE_SUFFIX)
+    cached = _load_peaks_cache(cache, st.st_mtime, st.st_size)
+    if cached is not None:
+        sr, frames, levels = cached
     else:
-        block = mono[:n * win].reshape(n, win)
-        peaks = np.empty((n, 2), dtype=np.float32)
-        peaks[:, 0] = block.min(axis=1)
-        peaks[:, 1] = block.max(axis=1)
+        sr, frames, finest = _scan_peaks(path)
+        levels = build_peak_levels(finest, sr / max(1, int(sr / PEAKS_PER_SECOND)))
+        _save_peaks_cache(cache, st.st_mtime, st.st_size, sr, frames, levels)
 
     return VocalsAudio(
-        samples=mono,
+        samples=None,
         sr=sr,
-        duration=len(mono) / sr if sr else 0.0,
-        peaks=peaks,
+        duration=frames / sr if sr else 0.0,
+        peaks=levels[0][0],
         # Resolución REAL: int(sr/200) redondea, así que sr/win != 200 exacto.
         # Usar el nominal causaba drift acumulado entre onda y audio.
-        peaks_per_second=sr / win,
+        peaks_per_second=levels[0][1],
+        levels=levels,
+        path=str(path),
     )
 
 
-def parse_lrc(path) -> list[LyricLine]:
-    """Lee un .lrc y devuelve las líneas con timestamp (ordenadas).
+def _scan_peaks(path) -> tuple[int, int, np.ndarray]:
+    """(sr, frames, peaks del nivel fino) recorriendo el audio por bloques."""
+    sr = sf.info(str(path)).samplerate
+    win = max(1, int(sr / PEAKS_PER_SECOND))
+    parts = []
+    frames = 0
+    # Bloques múltiplos de la ventana: solo el último puede quedar corto, y
+    # su cola (< win muestras) se descarta igual que antes.
+    for data in sf.blocks(str(path), blocksize=win * 4096, dtype='float32',
+                          always_2d=True):
+        frames += len(data)
+        mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+        n = len(mono) // win
+        if n:
+            block = mono[:n * win].reshape(n, win)
+            parts.append(np.stack((block.min(axis=1), block.max(axis=1)), axis=1))
+    if not parts:
+        return sr, frames, np.zeros((1, 2), dtype=np.float32)
+    return sr, frames, np.concatenate(parts).astype(np.float32, copy=False)
+
+
+def build_peak_levels(peaks: np.ndarray, pps: float,
+                      count: int = PEAK_LEVELS) -> list[tuple[np.ndarray, float]]:
+    """Pirámide de peaks: cada nivel junta PEAK_LEVEL_FACTOR del anterior
+    (min de los mínimos, max de los máximos)."""
+    levels = [(peaks, pps)]
+    f = PEAK_LEVEL_FACTOR
+    for _ in range(count - 1):
+        prev, prev_pps = levels[-1]
+        n = len(prev) // f
+        if n == 0:
+            break
+        block = prev[:n * f].reshape(n, f, 2)
+        level = np.stack((block[:, :, 0].min(axis=1),
+                          block[:, :, 1].max(axis=1)), axis=1)
+        levels.append((level, prev_pps / f))
+    return levels
+
+
+def _load_peaks_cache(path, mtime: float, size: int):
+    """(sr, frames, levels) del caché, o None si no existe o quedó viejo."""
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as z:
+            if (int(z["version"]) != PEAKS_CACHE_VERSION
+                    or float(z["mtime"]) != mtime or int(z["size"]) != size):
+                return None
+            pps = z["pps"]
+            levels = [(z[f"level{i}"], float(pps[i])) for i in range(len(pps))]
+            return int(z["sr"]), int(z["frames"]), levels
+    except Exception as e:
+        logger.error("Caché de peaks ilegible en %s: %s", path, e)
+        return None
+
 
-    Las líneas sin timestamp se anexan al bloque actual (texto multilínea),
-    igual que hace el parser principal de la app.
+def _save_peaks_cache(path, mtime: float, size: int, sr: int, frames: int,
+                      levels) -> None:
+    # Atómico (temporal + rename); si la carpeta no es escribible, el editor
+    # funciona igual y solo pierde el caché.
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, version=np.int32(PEAKS_CACHE_VERSION),
+                mtime=np.float64(mtime), size=np.int64(size),
+                sr=np.int64(sr), frames=np.int64(frames),
+                pps=np.array([pps for _, pps in levels]),
+                **{f"level{i}": peaks for i, (peaks, _) in enumerate(levels)},
+            )
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.error("No se pudo guardar el caché de peaks %s: %s", path, e)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Onsets de la voz (para el imán de bordes)
+# ──────────────────────────────────────────────────────────────────────
+def detect_onsets(samples: np.ndarray, sr: int) -> np.ndarray:
+    """Tiempos (s, float32 ordenados) donde entra o ataca la voz.
+
+    Todo vectorizado sobre la canción completa:
+
+    1. Se baja a ~ONSET_SR promediando bloques de muestras (la voz y sus
+       ataques viven por debajo de 5 kHz) y se cortan ventanas de
+       ONSET_FFT con salto ONSET_HOP_S.
+    2. Flujo espectral: suma de los aumentos de la magnitud log entre una
+       ventana y la anterior. Marca ataques de sílaba aunque no haya silencio
+       de por medio.
+    3. Actividad vocal por energía: ventanas a más de ONSET_ACTIVE_DB del
+       máximo. Una entrada tras silencio es siempre un onset, y el flujo
+       solo cuenta dentro de zonas activas (el ruido residual del stem no
+       genera onsets).
+    4. Picos del flujo: máximo local en ±ONSET_MIN_GAP_S y por encima de su
+       media móvil + ONSET_DELTA.
     """
-    lines: list[LyricLine] = []
-    current_start: float | None = None
-    current_text: list[str] = []
+    factor = max(1, int(sr // ONSET_SR))
+    x = np.asarray(samples, dtype=np.float32)
+    n = len(x) // factor
+    if n < ONSET_FFT:
+        return np.empty(0, dtype=np.float32)
+    if factor > 1:
+        x = x[:n * factor].reshape(n, factor).mean(axis=1)
+    rate = sr / factor
+    hop = max(1, int(rate * ONSET_HOP_S))
+    # Ventana i centrada en i*hop: la mitad de ONSET_FFT de ceros delante.
+    padded = np.concatenate((np.zeros(ONSET_FFT // 2, dtype=np.float32), x))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, ONSET_FFT)[::hop]
+    window = np.hanning(ONSET_FFT).astype(np.float32)
+
+    count = len(frames)
+    energy = np.empty(count, dtype=np.float32)
+    flux = np.zeros(count, dtype=np.float32)
+    prev = None
+    for start in range(0, count, 4096):
+        block = frames[start:start + 4096]
+        energy[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        mag = np.log1p(100.0 * np.abs(np.fft.rfft(block * window, axis=1)))
+        if prev is not None:
+            mag_prev = np.concatenate((prev[None], mag[:-1]))
+        else:
+            mag_prev = np.concatenate((mag[:1], mag[:-1]))
+        flux[start:start + len(block)] = np.maximum(mag - mag_prev, 0.0).sum(axis=1)
+        prev = mag[-1]
+
+    db = 10.0 * np.log10(np.maximum(energy / ONSET_FFT, 1e-12))
+    active = db > max(db.max() + ONSET_ACTIVE_DB, ONSET_FLOOR_DB)
+    entries = np.flatnonzero(active[1:] & ~active[:-1]) + 1
+    if active[0]:
+        entries = np.concatenate(([0], entries))
+
+    flux *= active
+    peak = flux.max()
+    picks = np.empty(0, dtype=np.int64)
+    if peak > 0:
+        flux /= peak
+        w = max(1, int(ONSET_MIN_GAP_S / ONSET_HOP_S))
+        edge = np.pad(flux, w, mode='constant')
+        local_max = np.lib.stride_tricks.sliding_window_view(
+            edge, 2 * w + 1).max(axis=1)
+        kernel = np.ones(4 * w + 1, dtype=np.float32) / (4 * w + 1)
+        mean = np.convolve(flux, kernel, mode='same')
+        picks = np.flatnonzero((flux == local_max) & (flux > mean + ONSET_DELTA))
+
+    idx = np.union1d(entries, picks)
+    times = (idx * hop / rate).astype(np.float32)
+    # Entrada y ataque de la misma sílaba caen a un par de ventanas: queda
+    # el primero de cada racimo.
+    if len(times) > 1:
+        keep = np.concatenate(([True], np.diff(times) >= ONSET_MIN_GAP_S))
+        times = times[keep]
+    return times
+
+
+def nearest_onset(onsets: np.ndarray, t: float, max_dist: float) -> float | None:
+    """Onset más cercano a `t` a no más de `max_dist` segundos, o None."""
+    if not len(onsets):
+        return None
+    k = int(np.searchsorted(onsets, t))
+    best = None
+    for j in (k - 1, k):
+        if 0 <= j < len(onsets):
+            d = abs(float(onsets[j]) - t)
+            if d <= max_dist and (best is None or d < abs(best - t)):
+                best = float(onsets[j])
+    return best
+
+
+def onsets_cache_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.stem + ONSETS_CACHE_SUFFIX)
+
+
+def load_onsets(path) -> np.ndarray | None:
+    """Onsets cacheados de `path`, o None si faltan o quedaron viejos
+    (misma validación que el caché de peaks: fecha y tamaño del audio)."""
+    cache = onsets_cache_path(path)
+    if not cache.exists():
+        return None
+    try:
+        st = Path(path).stat()
+        with np.load(cache) as z:
+            if (int(z["version"]) != ONSETS_CACHE_VERSION
+                    or float(z["mtime"]) != st.st_mtime
+                    or int(z["size"]) != st.st_size):
+                return None
+            return z["onsets"]
+    except Exception as e:
+        logger.error("Caché de onsets ilegible en %s: %s", cache, e)
+        return None
+
 
-    with open(path, 'r', encoding='utf-8') as f:
-        for raw in f:
-            line = raw.rstrip('\n')
-            m = _LRC_TS.match(line)
-            if m:
-                if current_start is not None and current_text:
-                    lines.append(LyricLine(current_start, '\n'.join(current_text)))
-                current_start = int(m.group(1)) * 60 + float(m.group(2))
-                current_text = [line[m.end():]]
-            elif current_start is not None and line.strip():
-                current_text.append(line)
+def save_onsets(path, onsets: np.ndarray) -> None:
+    cache = onsets_cache_path(path)
+    tmp = cache.with_name(cache.name + ".tmp")
+    try:
+        st = Path(path).stat()
+        with open(tmp, "wb") as f:
+            np.savez(f, version=np.int32(ONSETS_CACHE_VERSION),
+                     mtime=np.float64(st.st_mtime), size=np.int64(st.st_size),
+                     onsets=np.asarray(onsets, dtype=np.float32))
+        os.replace(tmp, cache)
+    except OSError as e:
+        logger.error("No se pudo guardar el caché de onsets %s: %s", cache, e)
 
-    if current_start is not None and current_text:
-        lines.append(LyricLine(current_start, '\n'.join(current_text)))
 
-    lines.sort(key=lambda ln: ln.start)
-    return lines
+def parse_lrc(path) -> list[LyricLine]:
+    """Lee un .lrc y devuelve las líneas con timestamp (ordenadas).
+
+    Usa el parser compartido (lrc_parser): las líneas sin timestamp se
+    anexan al bloque actual, igual que en la ventana principal.
+    """
+    return [LyricLine(start, text) for start, text in load_lrc(path)]
 
 
 def strip_tags(text: str) -> str:
@@ -336,63 +555,271 @@ def write_lrc(path, lines: list[LyricLine]) -> None:
 
 
 # ──────────────────────────────────────────────────────────────────────
-# Mini reproductor (solo voz)
+# Historial de edición: comandos inversos
 # ──────────────────────────────────────────────────────────────────────
-class MiniVocalsPlayer:
-    """Reproduce únicamente la voz desde una posición, en su propio hilo.
+# Cada mutación del editor se expresa como un comando que sabe aplicarse y
+# revertirse sobre la lista de líneas. El historial guarda solo lo que cambió
+# (índices y valores viejos/nuevos), no copias de la letra entera.
+@dataclass
+class MoveLines:
+    """Nuevos inicios para `indices` (arrastre, arrastre grupal, offset)."""
+
+    indices: list[int]
+    old: list[float]
+    new: list[float]
 
-    Sigue el mismo patrón que el reproductor principal (OutputStream +
-    hilo escritor) pero en mono y sin mezcla de stems.
+    def apply(self, lines: list[LyricLine]) -> None:
+        for i, t in zip(self.indices, self.new):
+            lines[i].start = t
+
+    def revert(self, lines: list[LyricLine]) -> None:
+        for i, t in zip(self.indices, self.old):
+            lines[i].start = t
+
+
+@dataclass
+class SetTexts:
+    """Nuevo texto para `indices` (editar, color)."""
+
+    indices: list[int]
+    old: list[str]
+    new: list[str]
+
+    def apply(self, lines: list[LyricLine]) -> None:
+        for i, text in zip(self.indices, self.new):
+            lines[i].text = text
+
+    def revert(self, lines: list[LyricLine]) -> None:
+        for i, text in zip(self.indices, self.old):
+            lines[i].text = text
+
+
+@dataclass
+class InsertLine:
+    """Inserta `line` en `index` (agregar, separar)."""
+
+    index: int
+    line: LyricLine
+
+    def apply(self, lines: list[LyricLine]) -> None:
+        lines.insert(self.index, self.line)
+
+    def revert(self, lines: list[LyricLine]) -> None:
+        del lines[self.index]
+
+
+@dataclass
+class DeleteLines:
+    """Borra `indices` (ascendentes) guardando las líneas para restaurarlas."""
+
+    indices: list[int]
+    removed: list[LyricLine]
+
+    def apply(self, lines: list[LyricLine]) -> None:
+        for i in reversed(self.indices):
+            del lines[i]
+
+    def revert(self, lines: list[LyricLine]) -> None:
+        for i, line in zip(self.indices, self.removed):
+            lines.insert(i, line)
+
+
+@dataclass
+class EditGroup:
+    """Varios comandos como un solo paso de deshacer (unir, editar+separar)."""
+
+    commands: list
+
+    def apply(self, lines: list[LyricLine]) -> None:
+        for cmd in self.commands:
+            cmd.apply(lines)
+
+    def revert(self, lines: list[LyricLine]) -> None:
+        for cmd in reversed(self.commands):
+            cmd.revert(lines)
+
+
+def _drop_noops(command):
+    """`command` sin los textos que no cambian (aceptar el diálogo sin
+    tocar nada, recolorear con el mismo color); None si no queda nada."""
+    if isinstance(command, SetTexts):
+        keep = [k for k, (old, new) in enumerate(zip(command.old, command.new))
+                if old != new]
+        if len(keep) == len(command.indices):
+            return command
+        if not keep:
+            return None
+        return SetTexts([command.indices[k] for k in keep],
+                        [command.old[k] for k in keep],
+                        [command.new[k] for k in keep])
+    if isinstance(command, EditGroup):
+        commands = [c for c in map(_drop_noops, command.commands) if c is not None]
+        return EditGroup(commands) if commands else None
+    return command
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Motor de escucha (voz o mezcla)
+# ──────────────────────────────────────────────────────────────────────
+AUDITION_BLOCK = 256        # frames por callback (~6 ms a 44.1 kHz)
+SCRUB_GRAIN_S = 0.06        # duración de cada grano del scrub
+SCRUB_INTERVAL_S = 0.04     # mínimo entre granos (limita la tasa del scrub)
+
+
+def _mix_paths(vocals_path) -> list[Path]:
+    """Stems hermanos de `vocals_path` (misma carpeta y extensión, los que
+    anota el data.json de la canción); vacío si falta alguno, y entonces la
+    escucha queda solo en la voz."""
+    vocals = Path(vocals_path)
+    stems = song_stems(vocals.parent.parent)
+    paths = [vocals.with_name(f"{name}{vocals.suffix}") for name in stems]
+    return paths if all(p.exists() for p in paths) else []
+
+
+class AuditionEngine:
+    """Escucha del editor con un único OutputStream por callback.
+
+    El stream se abre una vez y queda abierto mientras el editor viva: un
+    seek solo cambia la posición que lee el callback, así que el audio nuevo
+    sale en el siguiente bloque (AUDITION_BLOCK frames + latencia del
+    dispositivo, muy por debajo de 30 ms). Además de reproducir, hace bucle
+    sobre un rango (previa de una línea) y scrub: granos cortos con fundido
+    mientras se arrastra un borde.
+
+    Las muestras se decodifican en un hilo al crear el motor (el editor
+    abre al instante con los peaks del caché); hasta entonces suena silencio.
+    `source` elige entre solo la voz ("vocals") o la mezcla de los stems
+    ("mix"), que se decodifica la primera vez que se pide.
     """
 
-    def __init__(self, audio: VocalsAudio):
+    def __init__(self, audio: VocalsAudio, mix_paths=()):
         self.audio = audio
+        self.sr = audio.sr
+        self.mix_paths = [Path(p) for p in mix_paths]
+        self.source = "vocals"
+        self._sources: dict[str, np.ndarray | None] = {
+            "vocals": audio.samples, "mix": None}
+        self._lock = threading.Lock()
         self._stream: sd.OutputStream | None = None
-        self._thread: threading.Thread | None = None
-        self._cancel = threading.Event()
-        self._pos_frame = 0
+        self._pos = 0
+        self._loop: tuple[int, int] | None = None
+        self._grain: np.ndarray | None = None
+        self._grain_pos = 0
+        self._last_scrub = 0.0
+        self._loaders: dict[str, threading.Thread] = {}
         self.playing = False
+        if audio.samples is None and audio.path:
+            self._decode("vocals", [Path(audio.path)])
 
+    # ── Estado ─────────────────────────────────────────────────────────
     @property
     def position(self) -> float:
-        return self._pos_frame / self.audio.sr if self.audio.sr else 0.0
+        return self._pos / self.sr if self.sr else 0.0
+
+    @property
+    def can_mix(self) -> bool:
+        return bool(self.mix_paths)
+
+    def set_source(self, source: str) -> None:
+        """"vocals" o "mix"; mientras la mezcla se decodifica suena la voz."""
+        if source == "mix" and self._sources["mix"] is None and self.mix_paths:
+            self._decode("mix", self.mix_paths)
+        self.source = source
+
+    def _decode(self, source: str, paths) -> None:
+        def worker():
+            try:
+                total = None
+                for p in paths:
+                    data, _ = sf.read(str(p), dtype='float32', always_2d=True)
+                    mono = data.mean(axis=1)
+                    if total is None:
+                        total = mono
+                    else:
+                        n = min(len(total), len(mono))
+                        total = total[:n] + mono[:n]
+                if total is not None and source == "mix":
+                    peak = float(np.abs(total).max()) if len(total) else 0.0
+                    if peak > 1.0:
+                        total /= peak
+                self._sources[source] = total
+            except Exception as e:
+                logger.error("No se pudo decodificar %s: %s", paths, e)
+
+        loader = threading.Thread(target=worker, daemon=True)
+        self._loaders[source] = loader
+        loader.start()
+
+    def vocals_samples(self) -> np.ndarray | None:
+        """Muestras de la voz; espera la decodificación si sigue en curso
+        (solo desde un hilo de trabajo, nunca desde el de la interfaz)."""
+        loader = self._loaders.get("vocals")
+        if loader is not None:
+            loader.join()
+        return self._sources["vocals"]
+
+    def _samples(self) -> np.ndarray | None:
+        samples = self._sources.get(self.source)
+        return samples if samples is not None else self._sources["vocals"]
+
+    # ── Control ────────────────────────────────────────────────────────
+    def _ensure_stream(self) -> None:
+        if self._stream is None:
+            self._stream = sd.OutputStream(
+                samplerate=self.sr, channels=1, dtype='float32',
+                blocksize=AUDITION_BLOCK, latency='low',
+                callback=self._callback,
+            )
+            self._stream.start()
 
     def play(self, start_seconds: float) -> None:
-        self.stop()
-        self._pos_frame = int(max(0.0, start_seconds) * self.audio.sr)
-        self._cancel = threading.Event()
-        self._stream = sd.OutputStream(
-            samplerate=self.audio.sr, channels=1, dtype='float32',
-        )
-        self._stream.start()
-        self.playing = True
-        self._thread = threading.Thread(target=self._writer, daemon=True)
-        self._thread.start()
-
-    def _writer(self) -> None:
-        stream = self._stream
-        if stream is None:
+        self._ensure_stream()
+        with self._lock:
+            self._pos = int(max(0.0, start_seconds) * self.sr)
+            self._loop = None
+            self.playing = True
+
+    def play_loop(self, start: float, end: float) -> None:
+        """Repite [start, end) hasta stop() o el siguiente play()."""
+        self._ensure_stream()
+        lo = int(max(0.0, start) * self.sr)
+        hi = max(lo + 1, int(end * self.sr))
+        with self._lock:
+            self._loop = (lo, hi)
+            self._pos = lo
+            self.playing = True
+
+    @property
+    def looping(self) -> bool:
+        return self.playing and self._loop is not None
+
+    def scrub(self, seconds: float) -> None:
+        """Grano corto en `seconds`; se descartan los pedidos que llegan
+        antes de SCRUB_INTERVAL_S desde el anterior."""
+        now = time.monotonic()
+        if now - self._last_scrub < SCRUB_INTERVAL_S:
             return
-        chunk = 1024
-        samples = self.audio.samples
-        total = len(samples)
-        while self._pos_frame < total:
-            if self._cancel.is_set():
-                break
-            end = min(self._pos_frame + chunk, total)
-            block = samples[self._pos_frame:end].reshape(-1, 1)
-            try:
-                stream.write(block)
-            except Exception:
-                break
-            self._pos_frame = end
-        self.playing = False
+        samples = self._samples()
+        if samples is None:
+            return
+        self._last_scrub = now
+        start = int(max(0.0, seconds) * self.sr)
+        grain = samples[start:start + int(SCRUB_GRAIN_S * self.sr)]
+        if not len(grain):
+            return
+        self._ensure_stream()
+        with self._lock:
+            self._grain = grain * np.hanning(len(grain)).astype(np.float32)
+            self._grain_pos = 0
 
     def stop(self) -> None:
-        self._cancel.set()
-        if self._thread is not None:
-            self._thread.join(timeout=1.0)
-            self._thread = None
+        with self._lock:
+            self.playing = False
+            self._loop = None
+            self._grain = None
+
+    def close(self) -> None:
+        self.stop()
         if self._stream is not None:
             try:
                 self._stream.stop()
@@ -400,7 +827,37 @@ class MiniVocalsPlayer:
             except Exception:
                 pass
             self._stream = None
-        self.playing = False
+
+    # ── Callback de audio ──────────────────────────────────────────────
+    def _callback(self, outdata, frames, _time, _status) -> None:
+        out = outdata[:, 0]
+        out.fill(0.0)
+        with self._lock:
+            samples = self._samples()
+            if self.playing and samples is not None:
+                self._render(samples, out)
+            grain = self._grain
+            if grain is not None:
+                chunk = grain[self._grain_pos:self._grain_pos + frames]
+                out[:len(chunk)] += chunk
+                self._grain_pos += len(chunk)
+                if self._grain_pos >= len(grain):
+                    self._grain = None
+
+    def _render(self, samples: np.ndarray, out: np.ndarray) -> None:
+        filled = 0
+        while filled < len(out):
+            end = len(samples) if self._loop is None else min(self._loop[1], len(samples))
+            n = min(len(out) - filled, end - self._pos)
+            if n > 0:
+                out[filled:filled + n] = samples[self._pos:self._pos + n]
+                filled += n
+                self._pos += n
+            if self._pos >= end:
+                if self._loop is None or self._loop[0] >= end:
+                    self.playing = False
+                    return
+                self._pos = self._loop[0]
 
 
 # ──────────────────────────────────────────────────────────────────────
@@ -421,6 +878,7 @@ class WaveformWidget(QWidget):
     seek_requested = pyqtSignal(float)       # click pide reposicionar cursor
     view_changed = pyqtSignal()              # cambió start_pos (sincroniza scrollbar)
     selection_changed = pyqtSignal()         # cambió el conjunto de seleccionados
+    scrub_requested = pyqtSignal(float)      # arrastre de borde: escuchar ahí
 
     # Colores (estilo de la captura de Subtitle Edit)
     _C_BG = QColor(18, 22, 22)
@@ -430,6 +888,7 @@ class WaveformWidget(QWidget):
     _C_BLOCK_SEL = QColor(255, 180, 60, 60)
     _C_EDGE = QColor(0xC0, 0x4A, 0xD6)
     _C_CURSOR = QColor(80, 220, 255)
+    _C_ONSET = QColor(255, 214, 102, 150)
     _C_TEXT = QColor(220, 220, 220)
     # Color por defecto del texto de lyric (igual que la ventana principal).
     _C_LYRIC_DEFAULT = QColor("#F88FFF")
@@ -438,6 +897,13 @@ class WaveformWidget(QWidget):
         super().__init__(parent)
         self.audio = audio
         self.lines = lines
+        # Inicios ordenados, espejo de `lines` para buscar con bisect; el
+        # arrastre lo actualiza en sitio y el resto de mutaciones avisan con
+        # lines_changed().
+        self._starts: list[float] = []
+        self.lines_changed()
+        # (texto, ancho) -> [(x, texto recortado, color)] de cada renglón.
+        self._text_layouts: OrderedDict[tuple[str, int], list] = OrderedDict()
         self.px_per_sec = float(DEFAULT_PX_PER_SEC)
         self.start_pos = 0.0
         self.playback_pos = 0.0
@@ -455,6 +921,10 @@ class WaveformWidget(QWidget):
         # Alcance del arrastre grupal, espejo del checkbox "Desde el cursor":
         # True mueve de la línea agarrada en adelante, False mueve todas.
         self.group_drag_from_line = True
+        # Onsets de la voz (segundos, ordenados) para el imán de bordes;
+        # llegan del hilo de detección del diálogo. Alt lo suspende.
+        self.onsets = np.empty(0, dtype=np.float32)
+        self.snap_to_onsets = True
 
         self.setMinimumHeight(240)
         self.setMouseTracking(True)
@@ -465,6 +935,14 @@ class WaveformWidget(QWidget):
         self._head_font = QFont("Sans", 11)
         self._lyric_font = QFont(load_font_family(FONT_EDITOR) or "Sans", 11)
         self._lyric_fm = QFontMetrics(self._lyric_font)
+        # Pares de puntos (una línea vertical por columna) para drawLines;
+        # se reusa entre repintados.
+        self._wave_lines = QPolygonF()
+        # Capa estática (fondo + rejilla + onda) en tiles de WAVE_TILE_PX px
+        # en coordenadas absolutas (t * px_per_sec): al desplazarse solo se
+        # componen tiles ya pintados. Se vacía si cambia la clave del caché.
+        self._tiles: OrderedDict[int, QPixmap] = OrderedDict()
+        self._tiles_key = None
 
     # ── Mapeo tiempo/pixel ─────────────────────────────────────────────
     def sec_to_x(self, t: float) -> float:
@@ -482,6 +960,26 @@ class WaveformWidget(QWidget):
     def max_start(self) -> float:
         return max(0.0, self.audio.duration - self.visible_seconds)
 
+    def lines_changed(self) -> None:
+        """Resincroniza el índice de inicios tras mutar `lines` desde fuera."""
+        self._starts = [ln.start for ln in self.lines]
+        self.update()
+
+    def line_end(self, i: int) -> float:
+        """Fin de la línea `i`: el inicio de la siguiente o el del audio."""
+        return (self._starts[i + 1] if i + 1 < len(self._starts)
+                else self.audio.duration)
+
+    def _visible_lines(self) -> range:
+        """Índices de las líneas cuyo bloque toca la vista."""
+        if len(self._starts) != len(self.lines):
+            self.lines_changed()
+        # Primera cuyo fin (inicio de la siguiente) llega a la vista
+        lo = max(0, bisect.bisect_left(self._starts, self.start_pos) - 1)
+        hi = bisect.bisect_right(self._starts,
+                                 self.start_pos + self.visible_seconds)
+        return range(lo, hi)
+
     def set_start_pos(self, seconds: float, *, emit: bool = True) -> None:
         seconds = min(max(0.0, seconds), self.max_start)
         if seconds != self.start_pos:
@@ -500,51 +998,109 @@ class WaveformWidget(QWidget):
     # ── Dibujo ─────────────────────────────────────────────────────────
     def paintEvent(self, _event):
         p = QPainter(self)
-        p.fillRect(self.rect(), self._C_BG)
-        self._draw_grid(p)
-        self._draw_waveform(p)
+        self._draw_tiles(p)
         self._draw_blocks(p)
         self._draw_cursor(p)
         p.end()
 
-    def _draw_grid(self, p: QPainter):
+    def invalidate_tiles(self) -> None:
+        """Descarta la capa estática (p. ej. si cambiaron los peaks)."""
+        self._tiles.clear()
+        self._tiles_key = None
+        self.update()
+
+    def set_onsets(self, onsets: np.ndarray) -> None:
+        self.onsets = onsets
+        self.invalidate_tiles()
+
+    def _draw_tiles(self, p: QPainter):
+        key = (self.px_per_sec, self.height(), self.devicePixelRatioF(),
+               id(self.audio.peaks))
+        if key != self._tiles_key:
+            self._tiles.clear()
+            self._tiles_key = key
+        offset = self.start_pos * self.px_per_sec
+        first = int(offset // WAVE_TILE_PX)
+        last = int((offset + self.width()) // WAVE_TILE_PX)
+        for k in range(first, last + 1):
+            tile = self._tiles.get(k)
+            if tile is None:
+                tile = self._render_tile(k)
+                self._tiles[k] = tile
+                if len(self._tiles) > WAVE_TILE_CACHE:
+                    self._tiles.popitem(last=False)
+            else:
+                self._tiles.move_to_end(k)
+            p.drawPixmap(round(k * WAVE_TILE_PX - offset), 0, tile)
+
+    def _render_tile(self, k: int) -> QPixmap:
+        dpr = self.devicePixelRatioF()
+        h = self.height()
+        tile = QPixmap(round(WAVE_TILE_PX * dpr), round(h * dpr))
+        tile.setDevicePixelRatio(dpr)
+        tile.fill(self._C_BG)
+        tp = QPainter(tile)
+        self._draw_grid(tp, k * WAVE_TILE_PX, WAVE_TILE_PX)
+        self._draw_waveform(tp, k * WAVE_TILE_PX, WAVE_TILE_PX)
+        self._draw_onsets(tp, k * WAVE_TILE_PX, WAVE_TILE_PX)
+        tp.end()
+        return tile
+
+    def _draw_grid(self, p: QPainter, origin: float, width: int):
+        """Rejilla de segundos para `width` px desde el pixel absoluto
+        `origin` (t * px_per_sec en x=0)."""
         h = self.height()
         p.setPen(QPen(self._C_GRID, 1))
         p.setFont(QFont("Sans", 7))
-        first = int(self.start_pos)
-        last = int(self.start_pos + self.visible_seconds) + 1
+        start = origin / self.px_per_sec
+        # Un segundo antes: su etiqueta puede asomar al borde izquierdo.
+        first = max(0, int(start) - 1)
+        last = int(start + width / self.px_per_sec) + 1
         for sec in range(first, last + 1):
-            x = int(self.sec_to_x(sec))
+            # Redondeo en coordenadas absolutas: la misma línea cae en el
+            # mismo pixel sea cual sea el tile que la pinte.
+            x = round(sec * self.px_per_sec - origin)
             p.drawLine(x, 0, x, h)
             label = f"{sec // 60:02d}:{sec % 60:02d}"
             p.setPen(QPen(self._C_GRID.lighter(160), 1))
             p.drawText(x + 2, h - 4, label)
             p.setPen(QPen(self._C_GRID, 1))
 
-    def _draw_waveform(self, p: QPainter):
+    def _draw_waveform(self, p: QPainter, origin: float, width: int):
+        """Onda para `width` columnas desde el pixel absoluto `origin`."""
         h = self.height()
         mid = h / 2
         amp = (h / 2) * 0.85
-        peaks = self.audio.peaks
-        n = len(peaks)
-        pps = self.audio.peaks_per_second
+        peaks, pps = self.audio.peaks_for(self.px_per_sec)
+        # Columna -> índice de peak para todo el ancho de una vez; un solo
+        # drawLines sin importar el ancho ni el zoom.
+        xs = np.arange(width, dtype=np.float64)
+        idx = ((origin + xs) / self.px_per_sec * pps).astype(np.int64)
+        ok = (idx >= 0) & (idx < len(peaks))
+        xs, idx = xs[ok], idx[ok]
+        pts = polygon_array(self._wave_lines, 2 * len(xs)).reshape(-1, 2, 2)
+        pts[:, :, 0] = xs[:, None]
+        pts[:, 0, 1] = np.trunc(mid - peaks[idx, 1] * amp)
+        pts[:, 1, 1] = np.trunc(mid - peaks[idx, 0] * amp)
         p.setPen(QPen(self._C_WAVE, 1))
-        for x in range(self.width()):
-            t = self.x_to_sec(x)
-            idx = int(t * pps)
-            if 0 <= idx < n:
-                mn, mx = peaks[idx]
-                y1 = mid - mx * amp
-                y2 = mid - mn * amp
-                p.drawLine(x, int(y1), x, int(y2))
+        p.drawLines(self._wave_lines)
+
+    def _draw_onsets(self, p: QPainter, origin: float, width: int):
+        """Marcas cortas arriba de la onda en cada onset del tramo."""
+        lo, hi = np.searchsorted(
+            self.onsets, (origin / self.px_per_sec,
+                          (origin + width) / self.px_per_sec))
+        p.setPen(QPen(self._C_ONSET, 1))
+        for t in self.onsets[lo:hi + 1]:
+            x = round(float(t) * self.px_per_sec - origin)
+            p.drawLine(x, 0, x, 8)
 
     def _draw_blocks(self, p: QPainter):
         h = self.height()
-        fm = self._lyric_fm
-        for i, line in enumerate(self.lines):
+        for i in self._visible_lines():
+            line = self.lines[i]
             x0 = self.sec_to_x(line.start)
-            end = self.lines[i + 1].start if i + 1 < len(self.lines) else self.audio.duration
-            x1 = self.sec_to_x(end)
+            x1 = self.sec_to_x(self.line_end(i))
             if x1 < 0 or x0 > self.width():
                 continue
             # Relleno del bloque
@@ -559,28 +1115,47 @@ class WaveformWidget(QWidget):
             p.setFont(self._lyric_font)
             head = f"#{i + 1}  {line.start:.3f}"
             avail = max(10, int(x1 - x0) - 8)
-            tx = int(x0) + 4
-            remaining = avail
-            rows = split_rows(line.text)
-            for j, (txt, cname) in enumerate(rows):
-                seg = txt if j == len(rows) - 1 else txt + ' '
-                pen = (QColor(LYRIC_COLORS[cname]) if cname
-                       else self._C_LYRIC_DEFAULT)
-                elided = fm.elidedText(
-                    seg, Qt.TextElideMode.ElideRight, remaining)
-                p.setPen(QPen(pen, 1))
-                p.drawText(tx, 14, elided)
-                if elided != seg:      # se truncó: ya no cabe más texto
-                    break
-                w_seg = fm.horizontalAdvance(elided)
-                tx += w_seg
-                remaining -= w_seg
-                if remaining <= 10:
-                    break
+            for dx, elided, color in self._text_layout(line.text, avail):
+                p.setPen(QPen(color, 1))
+                p.drawText(int(x0) + 4 + dx, 14, elided)
             p.setPen(QPen(self._C_TEXT, 1))
             p.setFont(self._head_font)
             p.drawText(int(x0) + 4, h - 16, head)
 
+    def _text_layout(self, text: str, avail: int) -> list:
+        """Renglones de `text` recortados a `avail` px: [(x, texto, color)].
+
+        Medir y recortar es lo caro del repintado; el resultado solo cambia
+        con el texto o el ancho del bloque, así que se cachea por ambos.
+        """
+        key = (text, avail)
+        runs = self._text_layouts.get(key)
+        if runs is not None:
+            self._text_layouts.move_to_end(key)
+            return runs
+        fm = self._lyric_fm
+        runs = []
+        tx = 0
+        remaining = avail
+        rows = split_rows(text)
+        for j, (txt, cname) in enumerate(rows):
+            seg = txt if j == len(rows) - 1 else txt + ' '
+            pen = (QColor(LYRIC_COLORS[cname]) if cname
+                   else self._C_LYRIC_DEFAULT)
+            elided = fm.elidedText(seg, Qt.TextElideMode.ElideRight, remaining)
+            runs.append((tx, elided, pen))
+            if elided != seg:      # se truncó: ya no cabe más texto
+                break
+            w_seg = fm.horizontalAdvance(elided)
+            tx += w_seg
+            remaining -= w_seg
+            if remaining <= 10:
+                break
+        self._text_layouts[key] = runs
+        if len(self._text_layouts) > TEXT_LAYOUT_CACHE:
+            self._text_layouts.popitem(last=False)
+        return runs
+
     def _draw_cursor(self, p: QPainter):
         x = self.sec_to_x(self.playback_pos)
         if 0 <= x <= self.width():
@@ -589,18 +1164,26 @@ class WaveformWidget(QWidget):
 
     # ── Hit-testing ────────────────────────────────────────────────────
     def _edge_at(self, x: float) -> int | None:
-        for i, line in enumerate(self.lines):
-            if abs(x - self.sec_to_x(line.start)) <= EDGE_GRAB_PX:
+        if len(self._starts) != len(self.lines):
+            self.lines_changed()
+        # Primer inicio dentro del margen; se verifica en pixeles igual que
+        # antes, con un vecino de holgura por redondeo.
+        t = self.x_to_sec(x - EDGE_GRAB_PX)
+        first = max(0, bisect.bisect_left(self._starts, t) - 1)
+        for i in range(first, min(first + 3, len(self._starts))):
+            if abs(x - self.sec_to_x(self._starts[i])) <= EDGE_GRAB_PX:
                 return i
         return None
 
     def _block_at(self, x: float) -> int | None:
-        for i, line in enumerate(self.lines):
-            x0 = self.sec_to_x(line.start)
-            end = self.lines[i + 1].start if i + 1 < len(self.lines) else self.audio.duration
-            x1 = self.sec_to_x(end)
-            if x0 <= x <= x1:
-                return i
+        if len(self._starts) != len(self.lines):
+            self.lines_changed()
+        # Último inicio <= t; en una frontera exacta gana el bloque anterior.
+        i = bisect.bisect_right(self._starts, self.x_to_sec(x)) - 1
+        for j in (i - 1, i):
+            if 0 <= j < len(self._starts):
+                if self.sec_to_x(self._starts[j]) <= x <= self.sec_to_x(self.line_end(j)):
+                    return j
         return None
 
     # ── Interacción del mouse ──────────────────────────────────────────
@@ -636,12 +1219,20 @@ class WaveformWidget(QWidget):
                            else Qt.CursorShape.ArrowCursor)
             return
 
+        snap = (self.snap_to_onsets and not
+                event.modifiers() & Qt.KeyboardModifier.AltModifier)
         if self._drag_group:
-            self._move_group((x - self._drag_start_x) / self.px_per_sec)
+            delta = (x - self._drag_start_x) / self.px_per_sec
+            if snap:
+                delta = self._snap(self._drag_orig + delta) - self._drag_orig
+            self._move_group(delta)
+            self.scrub_requested.emit(self._starts[self._drag_group[0]])
             return
 
         i = self._drag_index
         new_start = self._drag_orig + (x - self._drag_start_x) / self.px_per_sec
+        if snap:
+            new_start = self._snap(new_start)
         # Topes: no cruzar la línea anterior ni la siguiente.
         if i > 0:
             new_start = max(new_start, self.lines[i - 1].start + MIN_GAP)
@@ -649,6 +1240,8 @@ class WaveformWidget(QWidget):
             new_start = min(new_start, self.lines[i + 1].start - MIN_GAP)
         new_start = max(0.0, min(new_start, self.audio.duration))
         self.lines[i].start = new_start
+        self._starts[i] = new_start
+        self.scrub_requested.emit(new_start)
         self.update()
 
     def mouseReleaseEvent(self, _event):
@@ -658,6 +1251,11 @@ class WaveformWidget(QWidget):
             self._drag_group = []
             self._drag_group_orig = []
 
+    def _snap(self, t: float) -> float:
+        """`t` llevado al onset más cercano si está a ONSET_SNAP_PX px."""
+        onset = nearest_onset(self.onsets, t, ONSET_SNAP_PX / self.px_per_sec)
+        return t if onset is None else onset
+
     # ── Arrastre grupal (Ctrl) ─────────────────────────────────────────
     def _start_group_drag(self, edge: int) -> None:
         """Prepara el bloque de líneas que se moverán junto con `edge`.
@@ -674,6 +1272,7 @@ class WaveformWidget(QWidget):
         delta = self._clamp_group_delta(delta)
         for i, orig in zip(self._drag_group, self._drag_group_orig):
             self.lines[i].start = orig + delta
+            self._starts[i] = orig + delta
         self.update()
 
     def _clamp_group_delta(self, delta: float) -> float:
@@ -752,6 +1351,8 @@ class WaveformWidget(QWidget):
 class LyricsSyncDialog(BaseDialog):
     """Ventana del editor de sincronización (mismo estilo que la app)."""
 
+    onsets_ready = pyqtSignal(object)   # onsets de la voz (hilo → interfaz)
+
     def __init__(self, parent, vocals_path, lrc_path):
         self._vocals_path = vocals_path
         self._lrc_path = lrc_path
@@ -781,13 +1382,18 @@ class LyricsSyncDialog(BaseDialog):
 
         self.audio = load_vocals(vocals_path)
         self.lines = parse_lrc(lrc_path)
-        self.player = MiniVocalsPlayer(self.audio)
+        self.player = AuditionEngine(self.audio, _mix_paths(vocals_path))
         # Estado inicial para detectar cambios sin guardar.
         self._original = self._snapshot()
-        # Historial de deshacer/rehacer: copias de self.lines previas a cada
-        # mutación; el redo se llena al deshacer y se vacía con cada mutación.
-        self._undo_stack: list[list[LyricLine]] = []
-        self._redo_stack: list[list[LyricLine]] = []
+        # Historial de deshacer/rehacer: comandos inversos (MoveLines,
+        # SetTexts, ...); el redo se llena al deshacer y se vacía con cada
+        # mutación. `_dirty` cuenta los comandos netos desde la apertura.
+        self._undo_stack: list = []
+        self._redo_stack: list = []
+        self._dirty = 0
+        # Inicios al agarrar un borde: el arrastre entero (cientos de
+        # mouseMove) se cierra como un único MoveLines.
+        self._pending_move: list[float] | None = None
         # Formato automático del texto (mayúscula inicial por renglón). Activo
         # por defecto; el checkbox de los diálogos de texto lo cambia y el
         # estado se mantiene mientras el editor esté abierto.
@@ -796,6 +1402,7 @@ class LyricsSyncDialog(BaseDialog):
         self._build_content()
         self._wire()
         self._create_grips()
+        self._start_onsets()
 
         self._timer = QTimer(self)
         self._timer.timeout.connect(self._tick)
@@ -922,6 +1529,10 @@ class LyricsSyncDialog(BaseDialog):
         self.play_btn = QPushButton("▶")
         self.play_btn.setFixedSize(44, TOOLBAR_BTN_H)
         bar.addWidget(self.play_btn)
+        self.loop_btn = QPushButton("⟲")
+        self.loop_btn.setToolTip("Repetir la línea seleccionada (Ctrl+L)")
+        self.loop_btn.setFixedSize(44, TOOLBAR_BTN_H)
+        bar.addWidget(self.loop_btn)
         self.add_btn = QPushButton("＋ Línea")
         self.add_btn.setToolTip(
             "Clic: agrega línea en blanco (Ctrl+N)\n"
@@ -936,7 +1547,15 @@ class LyricsSyncDialog(BaseDialog):
         self.merge_btn.setEnabled(False)
         bar.addWidget(self.merge_btn)
         # Mismo alto que el resto de la barra (los de color quedan a 22 px).
-        for b in (self.add_btn, self.del_btn, self.merge_btn):
+        # Ajustar a onsets: se activa cuando termina la detección.
+        self.snap_btn = QPushButton("⇤ Onset")
+        self.snap_btn.setToolTip(
+            "Lleva el inicio de las líneas seleccionadas al ataque de voz "
+            "más cercano (Ctrl+G)"
+        )
+        self.snap_btn.setEnabled(False)
+        bar.addWidget(self.snap_btn)
+        for b in (self.add_btn, self.del_btn, self.merge_btn, self.snap_btn):
             b.setFixedHeight(TOOLBAR_BTN_H)
 
         # Muestras de color: aplican color (o lo quitan) a TODAS las líneas
@@ -995,6 +1614,24 @@ class LyricsSyncDialog(BaseDialog):
         self.from_cursor_chk.setChecked(True)
         self.from_cursor_chk.setStyleSheet(self._checkbox_css())
         bar2.addWidget(self.from_cursor_chk)
+        # Escuchar la mezcla de los stems en vez de solo la voz.
+        self.mix_chk = QCheckBox("Mezcla completa")
+        self.mix_chk.setToolTip(
+            "Marcado: se escucha la canción completa (todos los stems).\n"
+            "Sin marcar: solo la voz."
+        )
+        self.mix_chk.setEnabled(self.player.can_mix)
+        self.mix_chk.setStyleSheet(self._checkbox_css())
+        bar2.addWidget(self.mix_chk)
+        # Imán: al arrastrar un borde se pega al onset de voz más cercano.
+        self.snap_chk = QCheckBox("Imán")
+        self.snap_chk.setToolTip(
+            "Marcado: el borde arrastrado se pega a los ataques de la voz "
+            "(marcas amarillas). Alt mientras arrastras lo suelta."
+        )
+        self.snap_chk.setChecked(True)
+        self.snap_chk.setStyleSheet(self._checkbox_css())
+        bar2.addWidget(self.snap_chk)
         bar2.addStretch(1)
 
         # Buscador de texto: Enter salta al siguiente registro coincidente,
@@ -1033,7 +1670,7 @@ class LyricsSyncDialog(BaseDialog):
         actions = QHBoxLayout()
         actions.setContentsMargins(6, 4, 6, 6)
         actions.setSpacing(6)
-        self.hint = QLabel("Espacio: play/pausa · Supr: borrar · Ctrl+Z/Ctrl+Shift+Z: deshacer/rehacer · Ctrl/Shift: multi-selección · arrastra el borde (Ctrl: en bloque) · doble-click edita")
+        self.hint = QLabel("Espacio: play/pausa · Ctrl+L: repetir línea · Supr: borrar · Ctrl+Z/Ctrl+Shift+Z: deshacer/rehacer · Ctrl/Shift: multi-selección · arrastra el borde (Ctrl: en bloque) · doble-click edita")
         self.hint.setStyleSheet("color:#9aa; background: transparent; border: none;")
         actions.addWidget(self.hint)
         actions.addStretch(1)
@@ -1047,8 +1684,10 @@ class LyricsSyncDialog(BaseDialog):
 
         # Sin foco de teclado: así la barra espaciadora nunca activa un botón
         # por accidente y siempre llega al keyPressEvent del diálogo.
-        for btn in (self.play_btn, self.add_btn, self.del_btn, self.merge_btn,
+        for btn in (self.play_btn, self.loop_btn, self.add_btn, self.del_btn,
+                    self.merge_btn, self.snap_btn,
                     self.back_btn, self.fwd_btn, self.from_cursor_chk,
+                    self.mix_chk, self.snap_chk,
                     self.goto_start_btn, self.search_prev_btn,
                     self.search_next_btn, self.goto_end_btn,
                     self.save_btn, self.cancel_btn):
@@ -1066,6 +1705,12 @@ class LyricsSyncDialog(BaseDialog):
 
     def _wire(self):
         self.play_btn.clicked.connect(self._toggle_play)
+        self.loop_btn.clicked.connect(self._toggle_loop)
+        self._add_shortcut("Ctrl+L", self._toggle_loop)
+        self.mix_chk.toggled.connect(
+            lambda on: self.player.set_source("mix" if on else "vocals"))
+        # Arrastrar un borde deja oír granos cortos en la nueva posición.
+        self.waveform.scrub_requested.connect(self.player.scrub)
         # Botón "＋ Línea": clic normal agrega línea en blanco; mantenerlo
         # presionado 1 s abre el diálogo de texto. Se usa un temporizador que
         # arranca al presionar; si dispara antes de soltar, abre el diálogo y
@@ -1081,13 +1726,18 @@ class LyricsSyncDialog(BaseDialog):
         self._add_shortcut("Ctrl+N", self._add_line_blank)
         self._add_shortcut("Ctrl+Shift+N", self._add_line_with_text)
         # Deshacer/rehacer: cada mutación (agregar, borrar, unir, separar,
-        # editar, color, offset, arrastre de borde) empuja un snapshot previo.
+        # editar, color, offset, arrastre de borde) se registra como comando.
         self._add_shortcut("Ctrl+Z", self._undo)
         self._add_shortcut("Ctrl+Shift+Z", self._redo)
         self._add_shortcut("Ctrl+Y", self._redo)
         self.waveform.drag_started.connect(self._push_undo)
         self.del_btn.clicked.connect(self._delete_line)
         self.merge_btn.clicked.connect(self._merge_lines)
+        self.snap_btn.clicked.connect(self._snap_selected_to_onsets)
+        self._add_shortcut("Ctrl+G", self._snap_selected_to_onsets)
+        self.snap_chk.toggled.connect(
+            lambda on: setattr(self.waveform, "snap_to_onsets", on))
+        self.onsets_ready.connect(self._on_onsets_ready)
         # Ctrl+A une las líneas seleccionadas (solo dentro del editor).
         self._add_shortcut("Ctrl+A", self._merge_shortcut)
         self.waveform.selection_changed.connect(self._update_merge_state)
@@ -1150,6 +1800,16 @@ class LyricsSyncDialog(BaseDialog):
             self.player.play(self.waveform.playback_pos)
             self.play_btn.setText("❚❚")
 
+    def _toggle_loop(self):
+        """Repite la línea seleccionada (de su inicio al de la siguiente)."""
+        i = self.waveform.selected
+        if self.player.looping or not 0 <= i < len(self.lines):
+            self.player.stop()
+            self.play_btn.setText("▶")
+            return
+        self.player.play_loop(self.lines[i].start, self.waveform.line_end(i))
+        self.play_btn.setText("❚❚")
+
     def _on_seek(self, seconds: float):
         self.waveform.playback_pos = seconds
         if self.player.playing:
@@ -1215,12 +1875,11 @@ class LyricsSyncDialog(BaseDialog):
 
     def _insert_line(self, text: str):
         """Inserta una línea con `text` en la posición del cursor y la selecciona."""
-        self._push_undo()
         pos = self.waveform.playback_pos
         new_line = LyricLine(pos, wrap_lyric(self._format_text(text)))
-        self.lines.append(new_line)
-        self.lines.sort(key=lambda ln: ln.start)
-        index = next(i for i, ln in enumerate(self.lines) if ln is new_line)
+        # Tras las de igual inicio, como el append + sort estable de antes
+        index = bisect.bisect_right(self.lines, pos, key=lambda ln: ln.start)
+        self._push_undo(InsertLine(index, new_line))
         self.waveform.select_single(index)
 
     def _add_line_blank(self):
@@ -1252,9 +1911,7 @@ class LyricsSyncDialog(BaseDialog):
         sel = sorted(i for i in self.waveform.selection if 0 <= i < len(self.lines))
         if not sel:
             return
-        self._push_undo()
-        for i in reversed(sel):
-            del self.lines[i]
+        self._push_undo(DeleteLines(sel, [self.lines[i] for i in sel]))
         self.waveform.clear_selection()
 
     def _can_merge(self) -> bool:
@@ -1270,16 +1927,16 @@ class LyricsSyncDialog(BaseDialog):
         """
         if not self._can_merge():
             return
-        self._push_undo()
         sel = sorted(self.waveform.selection)
-        start = self.lines[sel[0]].start
-        color = extract_color(self.lines[sel[0]].text)
+        first = self.lines[sel[0]]
+        color = extract_color(first.text)
         textos = [strip_tags(self.lines[i].text).strip() for i in sel]
         merged = ' '.join(t for t in textos if t)
-        self.lines[sel[0]] = LyricLine(
-            start, wrap_lyric(self._format_text(merged), color))
-        for i in reversed(sel[1:]):
-            del self.lines[i]
+        self._push_undo(EditGroup([
+            SetTexts([sel[0]], [first.text],
+                     [wrap_lyric(self._format_text(merged), color)]),
+            DeleteLines(sel[1:], [self.lines[i] for i in sel[1:]]),
+        ]))
         self.waveform.select_single(sel[0])
 
     def _merge_shortcut(self):
@@ -1303,15 +1960,61 @@ class LyricsSyncDialog(BaseDialog):
         sel = sorted(i for i in self.waveform.selection if 0 <= i < len(self.lines))
         if not sel:
             return
-        self._push_undo()
         if color is not None and all(
             extract_color(self.lines[i].text) == color for i in sel
         ):
             color = None
+        old = [self.lines[i].text for i in sel]
+        self._push_undo(SetTexts(
+            sel, old, [wrap_lyric(strip_tags(t), color) for t in old]))
+
+    # ── Onsets de la voz ───────────────────────────────────────────────
+    def _start_onsets(self):
+        """Onsets del caché o, si faltan, detectados en un hilo con las
+        muestras que decodifica el motor de escucha."""
+        path = self._vocals_path
+
+        def worker():
+            onsets = load_onsets(path)
+            if onsets is None:
+                samples = (self.audio.samples if self.audio.samples is not None
+                           else self.player.vocals_samples())
+                if samples is None:
+                    return
+                onsets = detect_onsets(samples, self.audio.sr)
+                save_onsets(path, onsets)
+            try:
+                self.onsets_ready.emit(onsets)
+            except RuntimeError:
+                pass  # el diálogo ya se destruyó
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_onsets_ready(self, onsets):
+        self.waveform.set_onsets(onsets)
+        self.snap_btn.setEnabled(len(onsets) > 0)
+
+    def _snap_selected_to_onsets(self):
+        """Ctrl+G: cada línea seleccionada va al onset más cercano (a no más
+        de ONSET_SNAP_S), sin cruzar a sus vecinas. Un solo paso de deshacer."""
+        onsets = self.waveform.onsets
+        sel = sorted(i for i in self.waveform.selection if 0 <= i < len(self.lines))
+        starts = [ln.start for ln in self.lines]
+        moved = []
         for i in sel:
-            clean = strip_tags(self.lines[i].text)
-            self.lines[i].text = wrap_lyric(clean, color)
-        self.waveform.update()
+            t = nearest_onset(onsets, starts[i], ONSET_SNAP_S)
+            if t is None or t == starts[i]:
+                continue
+            lo = starts[i - 1] + MIN_GAP if i > 0 else 0.0
+            hi = (starts[i + 1] - MIN_GAP if i + 1 < len(starts)
+                  else self.audio.duration)
+            if lo <= t <= hi:
+                starts[i] = t
+                moved.append(i)
+        if moved:
+            self._push_undo(MoveLines(
+                moved, [self.lines[i].start for i in moved],
+                [starts[i] for i in moved]))
 
     def _sync_group_drag_scope(self, from_cursor: bool):
         """Propaga el alcance del checkbox al arrastre grupal con Ctrl."""
@@ -1323,14 +2026,13 @@ class LyricsSyncDialog(BaseDialog):
         Con "Desde el cursor" marcado, afecta únicamente las líneas
         cuyo inicio es >= la posición del cursor de reproducción.
         """
-        self._push_undo()
         dur = self.audio.duration
         threshold = (self.waveform.playback_pos
                      if self.from_cursor_chk.isChecked() else -1.0)
-        for line in self.lines:
-            if line.start >= threshold:
-                line.start = max(0.0, min(dur, line.start + delta))
-        self.waveform.update()
+        indices = [i for i, ln in enumerate(self.lines) if ln.start >= threshold]
+        old = [self.lines[i].start for i in indices]
+        self._push_undo(MoveLines(
+            indices, old, [max(0.0, min(dur, t + delta)) for t in old]))
         # Sacar el foco del spinbox de offset: si no, la barra espaciadora
         # seguiría editando su valor en vez de reanudar la reproducción.
         self.waveform.setFocus()
@@ -1639,7 +2341,6 @@ class LyricsSyncDialog(BaseDialog):
                     lay.insertSpacing(bidx + 1, 24)
 
         if dlg.exec():
-            self._push_undo()
             if editor is not None and block_color_fn is not None:
                 # Releer texto y color renglón por renglón del documento.
                 doc = editor.document()
@@ -1650,52 +2351,78 @@ class LyricsSyncDialog(BaseDialog):
                     new_rows.append((self._format_text(block.text()),
                                      block_color_fn(block)))
                     block = block.next()
-                self.lines[index].text = join_rows(new_rows)
+                text = join_rows(new_rows)
             else:
-                self.lines[index].text = wrap_lyric(
-                    self._format_text(dlg.textValue()))
+                text = wrap_lyric(self._format_text(dlg.textValue()))
+            commands = [SetTexts([index], [self.lines[index].text], [text])]
             if split["do"]:
-                self.lines.append(
-                    LyricLine(self.waveform.playback_pos,
-                              wrap_lyric(self._format_text(split["after"]),
-                                         split.get("color")))
-                )
-                self.lines.sort(key=lambda ln: ln.start)
-            self.waveform.update()
+                pos = self.waveform.playback_pos
+                commands.append(InsertLine(
+                    bisect.bisect_right(self.lines, pos,
+                                        key=lambda ln: ln.start),
+                    LyricLine(pos, wrap_lyric(self._format_text(split["after"]),
+                                              split.get("color")))))
+            self._push_undo(EditGroup(commands))
 
     # ── Deshacer / Rehacer ─────────────────────────────────────────────
-    def _copy_lines(self) -> list[LyricLine]:
-        return [LyricLine(ln.start, ln.text) for ln in self.lines]
-
-    def _push_undo(self):
-        """Guarda una copia de las líneas antes de una mutación.
+    def _push_undo(self, command=None):
+        """Aplica `command` y lo registra en el historial.
 
+        Sin comando abre un movimiento pendiente (se conecta a drag_started):
+        los cambios de inicio hasta la próxima operación del historial se
+        guardan como un solo MoveLines con las líneas que de verdad se
+        movieron; agarrar un borde sin moverlo no deja nada que deshacer.
         Toda mutación nueva invalida el historial de rehacer (igual que en
-        cualquier editor: tras deshacer y editar, ya no hay qué rehacer).
+        cualquier editor: tras deshacer y editar, ya no hay qué rehacer). Un
+        comando que no cambia nada no deja paso ni marca cambios sin guardar.
         """
-        self._undo_stack.append(self._copy_lines())
+        self._close_pending_move()
+        if command is None:
+            self._pending_move = [ln.start for ln in self.lines]
+            return
+        command = _drop_noops(command)
+        if command is None:
+            return
+        command.apply(self.lines)
+        self._record(command)
+        self.waveform.lines_changed()
+
+    def _record(self, command) -> None:
+        self._undo_stack.append(command)
         if len(self._undo_stack) > UNDO_MAX:
             del self._undo_stack[0]
         self._redo_stack.clear()
+        self._dirty += 1
 
-    def _restore_from(self, source: list, target: list) -> None:
-        """Restaura el último snapshot de `source` distinto al actual,
-        empujando el estado vigente a `target` (deshacer↔rehacer).
-
-        Los snapshots iguales al estado actual (p. ej. agarrar un borde sin
-        moverlo) se descartan para que cada atajo produzca un cambio
-        visible. Restaura in-place: waveform.lines es la misma lista.
-        """
-        while source:
-            snap = source.pop()
-            if snap != self.lines:
-                target.append(self._copy_lines())
-                self.lines[:] = snap
-                # Los índices seleccionados pueden ya no existir; limpiar
-                # también refresca el estado del botón Unir.
-                self.waveform.clear_selection()
-                self.waveform.update()
-                break
+    def _close_pending_move(self) -> None:
+        before, self._pending_move = self._pending_move, None
+        if before is None or len(before) != len(self.lines):
+            return
+        moved = [i for i, (t, ln) in enumerate(zip(before, self.lines))
+                 if ln.start != t]
+        if moved:
+            self._record(MoveLines(moved, [before[i] for i in moved],
+                                   [self.lines[i].start for i in moved]))
+
+    def _restore_from(self, source: list, target: list, undo: bool) -> None:
+        """Revierte (o reaplica) el último comando de `source` y lo pasa a
+        `target` (deshacer↔rehacer). Opera in-place: waveform.lines es la
+        misma lista."""
+        self._close_pending_move()
+        if not source:
+            return
+        command = source.pop()
+        if undo:
+            command.revert(self.lines)
+            self._dirty -= 1
+        else:
+            command.apply(self.lines)
+            self._dirty += 1
+        target.append(command)
+        # Los índices seleccionados pueden ya no existir; limpiar
+        # también refresca el estado del botón Unir.
+        self.waveform.clear_selection()
+        self.waveform.lines_changed()
 
     def _undo(self):
         """Ctrl+Z. Con el foco en un campo de texto (buscador, spinbox)
@@ -1704,7 +2431,7 @@ class LyricsSyncDialog(BaseDialog):
         if isinstance(w, QLineEdit):
             w.undo()
             return
-        self._restore_from(self._undo_stack, self._redo_stack)
+        self._restore_from(self._undo_stack, self._redo_stack, undo=True)
 
     def _redo(self):
         """Ctrl+Shift+Z / Ctrl+Y. Misma delegación que _undo."""
@@ -1712,13 +2439,19 @@ class LyricsSyncDialog(BaseDialog):
         if isinstance(w, QLineEdit):
             w.redo()
             return
-        self._restore_from(self._redo_stack, self._undo_stack)
+        self._restore_from(self._redo_stack, self._undo_stack, undo=False)
 
     # ── Detección de cambios ───────────────────────────────────────────
     def _snapshot(self):
         return [(round(ln.start, 3), ln.text) for ln in self.lines]
 
     def _has_changes(self) -> bool:
+        self._close_pending_move()
+        if self._dirty:
+            return True
+        # Contador en cero: confirmar contra el estado inicial, que también
+        # cubre cambios hechos por fuera del historial. Solo corre al
+        # guardar o cancelar.
         return self._snapshot() != self._original
 
     # ── Guardar ────────────────────────────────────────────────────────
@@ -1746,14 +2479,14 @@ class LyricsSyncDialog(BaseDialog):
     # ── Cierre ─────────────────────────────────────────────────────────
     def closeEvent(self, event):
         self._timer.stop()
-        self.player.stop()
+        self.player.close()
         super().closeEvent(event)
 
     def accept(self):
         # accept() no dispara closeEvent: detener aquí el audio y el timer
         # para que la reproducción no siga tras cerrar al guardar.
         self._timer.stop()
-        self.player.stop()
+        self.player.close()
         super().accept()
 
     def reject(self):
@@ -1766,7 +2499,7 @@ class LyricsSyncDialog(BaseDialog):
             if resp != QMessageBox.StandardButton.Yes:
                 return  # seguir editando
         self._timer.stop()
-        self.player.stop()
+        self.player.close()
         super().reject()
 
     # ── Redimensionado (frameless) ─────────────────────────────────────
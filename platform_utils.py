@@ -16,8 +16,14 @@
 
 import logging
 import os
+import queue
+import re
+import signal
 import sys
 import subprocess
+import threading
+import time
+from collections import deque
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
@@ -123,6 +129,98 @@ def run_silent(cmd, *, timeout=300, check=False, **extra_kwargs) -> subprocess.C
     return subprocess.run(cmd, check=check, **kwargs)
 
 
+class ProcessCancelled(Exception):
+    """run_streaming: se pidió cancelar y se mató el árbol del proceso."""
+
+
+STREAM_TAIL_LINES = 200     # líneas finales que se conservan para reportar errores
+
+
+def kill_process_tree(proc: subprocess.Popen) -> None:
+    """Mata `proc` y sus hijos (demucs lanza workers propios)."""
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(proc.pid)],
+                           capture_output=True, timeout=10,
+                           **get_hidden_subprocess_kwargs())
+        else:
+            # Lanzado con start_new_session: su grupo es su pid
+            os.killpg(proc.pid, signal.SIGKILL)
+    except Exception:
+        pass
+    try:
+        proc.kill()
+        proc.wait(timeout=5)
+    except Exception:
+        pass
+
+
+def run_streaming(cmd, *, on_line=None, timeout=300, cancel_event=None,
+                  tail_lines=STREAM_TAIL_LINES, **extra_kwargs) -> subprocess.CompletedProcess:
+    """Como run_silent, pero entrega la salida línea a línea mientras corre.
+
+    stdout y stderr van juntos; tanto '\\n' como '\\r' (barras de progreso de
+    tqdm) cortan línea. `on_line(texto)` se llama desde el hilo que llama.
+    La memoria queda acotada: solo se guardan las últimas `tail_lines`
+    líneas, que vuelven en `stdout` del resultado (stderr queda vacío).
+
+    Con `cancel_event` activado, o al vencer `timeout`, se mata el árbol
+    del proceso y se lanza ProcessCancelled o TimeoutExpired.
+    """
+    kwargs = {**get_hidden_subprocess_kwargs(), **extra_kwargs}
+    kwargs['env'] = _augment_mac_path(kwargs.get('env'))
+    if sys.platform != 'win32':
+        kwargs.setdefault('start_new_session', True)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            stdin=subprocess.DEVNULL, **kwargs)
+    lines: queue.Queue = queue.Queue()
+
+    def reader():
+        buf = b''
+        while True:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                break
+            buf += chunk
+            parts = re.split(rb'[\r\n]', buf)
+            buf = parts.pop()
+            for part in parts:
+                if part.strip():
+                    lines.put(part.decode('utf-8', errors='replace'))
+        if buf.strip():
+            lines.put(buf.decode('utf-8', errors='replace'))
+        lines.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    tail: deque[str] = deque(maxlen=tail_lines)
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                kill_process_tree(proc)
+                raise ProcessCancelled(' '.join(map(str, cmd)))
+            if deadline is not None and time.monotonic() > deadline:
+                kill_process_tree(proc)
+                raise subprocess.TimeoutExpired(cmd, timeout, output='\n'.join(tail))
+            try:
+                line = lines.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if line is None:
+                break
+            tail.append(line)
+            if on_line is not None:
+                on_line(line)
+        returncode = proc.wait()
+    finally:
+        if proc.poll() is None:
+            kill_process_tree(proc)
+        proc.stdout.close()
+    return subprocess.CompletedProcess(cmd, returncode, stdout='\n'.join(tail), stderr='')
+
+
 def check_command_exists(cmd: str) -> bool:
     locator = 'where' if IS_WINDOWS else 'which'
     try:
@@ -186,6 +284,47 @@ def detect_nvidia_gpu() -> bool:
             return False
 
 
+def get_total_ram_gb() -> float:
+    """Memoria física total en GB (0.0 si no se puede leer)."""
+    try:
+        if IS_WINDOWS:
+            import ctypes
+
+            class _MemStatus(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong),
+                            ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong),
+                            ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong),
+                            ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong),
+                            ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = _MemStatus()
+            status.dwLength = ctypes.sizeof(_MemStatus)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullTotalPhys / 1024 ** 3
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+    except Exception:
+        return 0.0
+
+
+def get_gpu_memory_gb() -> float:
+    """VRAM de la GPU NVIDIA más grande en GB, vía nvidia-smi (0.0 si no hay)."""
+    if IS_MAC or not check_command_exists('nvidia-smi'):
+        return 0.0
+    try:
+        result = run_silent(
+            ['nvidia-smi', '--query-gpu=memory.total', '--format=csv,noheader,nounits'],
+            timeout=10,
+        )
+        values = [float(v) for v in result.stdout.split() if v.strip()]
+        return max(values) / 1024 if values else 0.0
+    except Exception:
+        return 0.0
+
+
 def check_visual_cpp() -> bool:
     if not IS_WINDOWS:
         return True  # Linux no necesita Visual C++ Redistributable
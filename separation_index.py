@@ -0,0 +1,146 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Índice de separaciones por contenido del archivo de origen.
+
+El mismo audio encolado dos veces (otro nombre, o por accidente) costaba
+otra separación completa. ``source_hash`` resume el archivo leyendo solo
+unos bloques repartidos (unos cientos de KB aunque pese 100 MB) y
+``SeparationIndex`` recuerda qué carpeta de la biblioteca tiene los stems de
+cada (hash, perfil). El hash queda también en el data.json de la canción
+(``separation.source_hash``), así que el índice se reconstruye de la
+biblioteca si se pierde. Pedir otro perfil sí separa de nuevo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from separation_profiles import read_separation_info, stem_paths
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK = 64 * 1024
+HASH_BLOCKS = 8             # bloques muestreados (inicio, fin y repartidos)
+
+
+def source_hash(path) -> str:
+    """Hash muestreado del archivo: tamaño + HASH_BLOCKS bloques de
+    HASH_BLOCK bytes repartidos (los archivos chicos se leen enteros)."""
+    path = Path(path)
+    size = path.stat().st_size
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= HASH_BLOCK * HASH_BLOCKS:
+            h.update(f.read())
+        else:
+            step = (size - HASH_BLOCK) / (HASH_BLOCKS - 1)
+            for i in range(HASH_BLOCKS):
+                f.seek(int(i * step))
+                h.update(f.read(HASH_BLOCK))
+    return h.hexdigest()
+
+
+class SeparationIndex:
+    """(hash de origen, perfil) → carpeta de la canción, en JSON:
+
+        {"<hash>": {"mejor": "/.../music_library/Artista/Canción"}}
+
+    Lo usan varios workers a la vez; cada cambio se escribe completo
+    (temporal + rename). Si el archivo no existe, la primera consulta lo
+    arma con los data.json de `library`.
+    """
+
+    def __init__(self, path=None, library=None):
+        self.path = Path(path) if path is not None else None
+        self.library = Path(library) if library is not None else None
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, str]] | None = None
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        # Con el lock tomado
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        if self.path is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(data, dict):
+                    self._entries = data
+                    return self._entries
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Índice de separaciones ilegible (%s): %s", self.path, e)
+        self._rebuild()
+        return self._entries
+
+    def _rebuild(self) -> None:
+        if self.library is None or not self.library.is_dir():
+            return
+        for data_json in self.library.glob("*/*/data.json"):
+            info = read_separation_info(data_json.parent) or {}
+            digest, profile = info.get("source_hash"), info.get("profile")
+            if digest and profile:
+                self._entries.setdefault(digest, {})[profile] = str(data_json.parent)
+        self._save()
+
+    def lookup(self, digest: str, profile: str) -> Path | None:
+        """Carpeta con los stems de (digest, perfil), o None. Se verifica
+        contra su data.json y los archivos: una canción borrada o separada
+        después con otro perfil deja de contar."""
+        with self._lock:
+            folder = self._load().get(digest, {}).get(profile)
+        if folder is None or not self.matches(folder, digest, profile):
+            return None
+        return Path(folder)
+
+    @staticmethod
+    def matches(folder, digest: str, profile: str) -> bool:
+        """True si `folder` tiene hoy los stems de (digest, perfil)."""
+        folder = Path(folder)
+        info = read_separation_info(folder) or {}
+        if info.get("source_hash") != digest or info.get("profile") != profile:
+            return False
+        return all(path.exists() for path in stem_paths(folder))
+
+    def add(self, digest: str, profile: str, folder) -> None:
+        """Anota que `folder` tiene ahora los stems de (digest, perfil).
+        La carpeta deja de valer para cualquier otra entrada."""
+        folder = str(folder)
+        with self._lock:
+            entries = self._load()
+            for by_profile in entries.values():
+                for name in [n for n, f in by_profile.items() if f == folder]:
+                    del by_profile[name]
+            entries.setdefault(digest, {})[profile] = folder
+            for key in [k for k, v in entries.items() if not v]:
+                del entries[key]
+            self._save()
+
+    def _save(self) -> None:
+        # Con el lock tomado
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(self._entries, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning("No se pudo guardar %s: %s", self.path, e)
@@ -0,0 +1,274 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Perfiles de separación (rápido / equilibrado / mejor...) y su velocidad medida.
+
+htdemucs_ft es un "bag" de cuatro modelos: unas 4 veces más lento que
+htdemucs solo, a cambio de algo más de calidad. Cada perfil fija modelo,
+``--overlap``, ``--shifts`` y ``--segment``; se elige por trabajo en
+SplitDialog y queda anotado en el data.json de la canción, junto con los
+stems que produjo: además de los cuatro de siempre hay un perfil karaoke
+(``--two-stems vocals``: voz + instrumental, la mitad de audio que decodificar
+y mezclar) y uno de seis stems (htdemucs_6s, con guitarra y piano).
+``song_stems`` dice qué stems tiene una canción; el resto de la app (carga,
+verificación, mezcla y botones) se guía por eso. También queda el formato en
+que se guardaron (``STEM_FORMATS``: mp3, flac o wav de 16 bits) y
+``stem_paths`` arma las rutas con la extensión de cada canción.
+
+``ProfileStore`` guarda (en JSON) el perfil predeterminado y una tabla por
+dispositivo del factor de tiempo real (RTF = segundos de proceso / segundos
+de audio) de cada perfil, medido en cada separación. Con eso predice cuánto
+tardará un trabajo y resuelve el perfil "auto": el más rápido que cumpla un
+piso de calidad. Sin mediciones en un perfil se estima a partir de los
+medidos y del costo relativo de cada uno.
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODEL_BAG_SIZES = {"htdemucs_ft": 4}
+
+# Orden de carga y de la mezcla (el de siempre para las canciones de 4 stems:
+# el análisis guardado por canción indexa los stems en este orden)
+DEFAULT_STEMS = ("drums", "vocals", "bass", "other")
+MODEL_STEMS = {"htdemucs_6s": DEFAULT_STEMS + ("guitar", "piano")}
+# Todos los que puede tener una canción, en el orden de los controles
+ALL_STEMS = DEFAULT_STEMS + ("guitar", "piano", "no_vocals")
+
+# Formato de los stems en disco → (etiqueta, opciones de `python -m demucs`).
+# mp3 ocupa poco, pero cada reproducción decodifica todos los stems y el
+# seek va por frames; flac es sin pérdida; wav (PCM de 16 bits, lo que
+# demucs escribe sin opciones) ocupa más y se lee casi sin procesar.
+STEM_FORMATS = {
+    "mp3": ("MP3 320 kbps (ocupa poco)", ("--mp3",)),
+    "flac": ("FLAC (sin pérdida)", ("--flac",)),
+    "wav": ("WAV 16 bits (carga más rápida)", ()),
+}
+DEFAULT_STEM_FORMAT = "mp3"     # el de siempre
+
+
+@dataclass(frozen=True)
+class SeparationProfile:
+    name: str
+    label: str
+    model: str
+    overlap: float = 0.25
+    shifts: int = 1
+    segment: int | None = None  # None = el del modelo
+    two_stems: str | None = None    # "vocals" = voz + no_vocals (karaoke)
+    quality: int = 1            # 1..3; comparado contra el piso de "auto"
+    cost: float = 1.0           # costo relativo previsto (htdemucs, overlap 0.25 = 1)
+
+    @property
+    def stems(self) -> tuple[str, ...]:
+        """Stems que produce, en orden de carga."""
+        if self.two_stems:
+            return (self.two_stems, f"no_{self.two_stems}")
+        return MODEL_STEMS.get(self.model, DEFAULT_STEMS)
+
+    @property
+    def bag_size(self) -> int:
+        """Modelos que corren uno tras otro por canción."""
+        return MODEL_BAG_SIZES.get(self.model, 1)
+
+    def cli_args(self) -> list[str]:
+        """Argumentos de `python -m demucs` para este perfil."""
+        args = ["-n", self.model, "--overlap", str(self.overlap),
+                "--shifts", str(self.shifts)]
+        if self.segment:
+            args += ["--segment", str(self.segment)]
+        if self.two_stems:
+            args += ["--two-stems", self.two_stems]
+        return args
+
+
+# El costo sigue a los segmentos procesados (~1/(1-overlap)), las pasadas
+# aleatorias (shifts) y los modelos del bag
+PROFILES = {
+    p.name: p for p in (
+        SeparationProfile("rapido", "Rápido", "htdemucs", overlap=0.1,
+                          quality=1, cost=0.85),
+        SeparationProfile("equilibrado", "Equilibrado", "htdemucs", shifts=2,
+                          quality=2, cost=2.0),
+        SeparationProfile("mejor", "Mejor calidad", "htdemucs_ft",
+                          quality=3, cost=4.0),
+        # Misma inferencia que "rapido"; ahorra codificar y reproducir stems
+        SeparationProfile("karaoke", "Karaoke (voz + instrumental)", "htdemucs",
+                          overlap=0.1, two_stems="vocals", quality=1, cost=0.8),
+        SeparationProfile("seis", "6 stems (guitarra y piano)", "htdemucs_6s",
+                          quality=2, cost=1.0),
+    )
+}
+DEFAULT_PROFILE = "mejor"       # lo que la app hacía siempre
+AUTO_PROFILE = "auto"
+AUTO_QUALITY_FLOOR = 2
+RTF_ALPHA = 0.3                 # peso de la última medición en la media móvil
+
+
+def song_stems(dir_path) -> tuple[str, ...]:
+    """Stems de la canción según su data.json; las separadas antes de que
+    se anotaran son de 4."""
+    stems = (read_separation_info(dir_path) or {}).get("stems")
+    if isinstance(stems, list) and stems and all(s in ALL_STEMS for s in stems):
+        return tuple(stems)
+    return DEFAULT_STEMS
+
+
+def song_stem_format(dir_path) -> str:
+    """Formato de los stems de la canción; las anteriores a la opción son mp3."""
+    fmt = (read_separation_info(dir_path) or {}).get("format")
+    return fmt if fmt in STEM_FORMATS else DEFAULT_STEM_FORMAT
+
+
+def stem_paths(dir_path) -> list[Path]:
+    """Rutas de los stems de la canción, en orden de carga."""
+    dir_path = Path(dir_path)
+    ext = song_stem_format(dir_path)
+    return [dir_path / "separated" / f"{stem}.{ext}" for stem in song_stems(dir_path)]
+
+
+def read_separation_info(dir_path) -> dict | None:
+    """Bloque "separation" del data.json de la canción (None si no hay)."""
+    try:
+        data = json.loads((Path(dir_path) / "data.json").read_text(encoding="utf-8"))
+        for songs in data.values():
+            for song_data in songs.values():
+                info = song_data.get("separation")
+                if isinstance(info, dict):
+                    return info
+    except Exception:
+        pass
+    return None
+
+
+class ProfileStore:
+    """Perfil predeterminado, formato de los stems y tabla de RTF por
+    dispositivo, en JSON:
+
+        {"default": "mejor", "format": "mp3",
+         "rtf": {"CPU": {"mejor": {"rtf": 1.9, "samples": 3}}}}
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._data: dict = {"default": DEFAULT_PROFILE, "format": DEFAULT_STEM_FORMAT,
+                            "rtf": {}}
+        if self.path is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(data, dict) and isinstance(data.get("rtf", {}), dict):
+                    self._data.update(data)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Tabla de perfiles ilegible (%s): %s", self.path, e)
+
+    @property
+    def default(self) -> str:
+        name = self._data.get("default")
+        return name if name in PROFILES or name == AUTO_PROFILE else DEFAULT_PROFILE
+
+    def set_default(self, name: str) -> None:
+        if name not in PROFILES and name != AUTO_PROFILE:
+            raise ValueError(f"Perfil desconocido: {name}")
+        with self._lock:
+            self._data["default"] = name
+        self.save()
+
+    @property
+    def stem_format(self) -> str:
+        fmt = self._data.get("format")
+        return fmt if fmt in STEM_FORMATS else DEFAULT_STEM_FORMAT
+
+    def set_stem_format(self, fmt: str) -> None:
+        if fmt not in STEM_FORMATS:
+            raise ValueError(f"Formato desconocido: {fmt}")
+        with self._lock:
+            self._data["format"] = fmt
+        self.save()
+
+    def record(self, device: str, profile: str, audio_s: float, elapsed_s: float) -> None:
+        """Anota una separación de `audio_s` segundos que tardó `elapsed_s`."""
+        if audio_s <= 0 or elapsed_s <= 0:
+            return
+        rtf = elapsed_s / audio_s
+        with self._lock:
+            entry = self._data["rtf"].setdefault(device, {}).get(profile)
+            if entry:
+                rtf = (1 - RTF_ALPHA) * entry["rtf"] + RTF_ALPHA * rtf
+                samples = entry.get("samples", 0) + 1
+            else:
+                samples = 1
+            self._data["rtf"][device][profile] = {"rtf": round(rtf, 4), "samples": samples}
+        self.save()
+
+    def rtf(self, device: str, profile: str) -> float | None:
+        """RTF medido, o estimado desde los otros perfiles medidos en el
+        mismo dispositivo; None si el dispositivo no tiene mediciones."""
+        with self._lock:
+            measured = {name: e["rtf"] for name, e in self._data["rtf"].get(device, {}).items()
+                        if name in PROFILES}
+        if profile in measured:
+            return measured[profile]
+        if not measured:
+            return None
+        cost = PROFILES[profile].cost
+        guesses = [r / PROFILES[name].cost * cost for name, r in measured.items()]
+        return sum(guesses) / len(guesses)
+
+    def predict(self, device: str, profile: str, audio_s: float) -> float | None:
+        """Segundos previstos para separar `audio_s` segundos de audio."""
+        rtf = self.rtf(device, profile)
+        return rtf * audio_s if rtf is not None and audio_s > 0 else None
+
+    def fastest(self, device: str, min_quality: int = AUTO_QUALITY_FLOOR) -> str:
+        """Perfil más rápido con calidad >= `min_quality` (sin mediciones,
+        el de menor costo previsto). Solo entre los de 4 stems: "auto" no
+        cambia los controles que el usuario tiene en pantalla."""
+        candidates = [p for p in PROFILES.values()
+                      if p.quality >= min_quality and p.stems == DEFAULT_STEMS]
+        if not candidates:
+            return DEFAULT_PROFILE
+        return min(candidates,
+                   key=lambda p: self.rtf(device, p.name) or p.cost).name
+
+    def resolve(self, name: str | None, device: str) -> SeparationProfile:
+        """Perfil concreto para un trabajo: None = el predeterminado,
+        "auto" = el más rápido que cumple el piso de calidad."""
+        name = name or self.default
+        if name == AUTO_PROFILE:
+            name = self.fastest(device)
+        return PROFILES.get(name, PROFILES[DEFAULT_PROFILE])
+
+    def save(self) -> None:
+        """Escribe el JSON (temporal + rename)."""
+        if self.path is None:
+            return
+        with self._lock:
+            content = json.dumps(self._data, ensure_ascii=False, indent=2)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            try:
+                tmp.write_text(content, encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.warning("No se pudo guardar %s: %s", self.path, e)
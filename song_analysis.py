@@ -0,0 +1,249 @@
+# PlayIt - Reproductor de audio de escritorio con separación de pistas
+# Copyright (C) 2025-2026  Ricardo Aviles Sanders
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Análisis offline por canción: espectro por barras, loudness y picos.
+
+Se calcula una sola vez (al reproducir o separar una canción por primera vez)
+y se guarda comprimido junto a los stems (``separated/analysis.npz``). Con él
+el visualizador lee las barras por índice del reloj de reproducción en vez de
+hacer FFTs en tiempo real, y un seek tiene estado visual inmediato.
+
+Todo se cuantiza a uint8 para que el archivo pese poco:
+
+- ``bands``: magnitud media por barra, por stem y por frame del visualizador,
+  como ``sqrt(magnitud / band_scale) * 255`` (misma compresión que la
+  pantalla). Por stem y sin mezclar: la mezcla se arma en reproducción con
+  las ganancias/mutes del momento.
+- ``loudness``: nivel RMS de la mezcla en ventanas de 400 ms, dBFS de -80 a 0.
+- ``peaks``: pico absoluto por stem en cada intervalo entre frames.
+
+El archivo se invalida solo: guarda la fecha de modificación de los stems y
+los parámetros del análisis, y no se usa si no coinciden.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from audio_visualizer import band_means, log_band_edges
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_FILE = "analysis.npz"
+ANALYSIS_VERSION = 1
+ANALYSIS_FPS = 30
+LOUDNESS_WINDOW_S = 0.4
+LOUDNESS_FLOOR_DB = -80.0
+
+# Frames del visualizador por lote de FFT: acota la memoria de las ventanas
+# (512 × 2048 float64 ≈ 8 MB) sin perder el beneficio del rfft por lotes.
+_FFT_BATCH = 512
+
+
+@dataclass
+class SongAnalysis:
+    fps: float
+    sample_rate: int
+    num_bars: int
+    fft_size: int
+    source_mtime: float
+    band_scale: float
+    bands: np.ndarray       # uint8 (stems, frames, num_bars)
+    loudness: np.ndarray    # uint8 (frames,)
+    peaks: np.ndarray       # uint8 (stems, frames)
+
+    @property
+    def num_frames(self) -> int:
+        return self.bands.shape[1]
+
+    def frame_at(self, seconds: float) -> int:
+        """Índice del frame vigente en `seconds` (acotado al rango)."""
+        idx = int(seconds * self.fps)
+        return min(max(idx, 0), self.num_frames - 1)
+
+    def band_magnitudes(self, index: int) -> np.ndarray:
+        """Magnitudes por barra (stems, num_bars) del frame `index`."""
+        q = self.bands[:, index].astype(np.float32) / 255.0
+        return q * q * self.band_scale
+
+    def loudness_db(self, index: int) -> float:
+        span = -LOUDNESS_FLOOR_DB
+        return float(self.loudness[index]) / 255.0 * span + LOUDNESS_FLOOR_DB
+
+    def peak_envelope(self, stem: int) -> np.ndarray:
+        """Picos del stem como float32 en [0, 1], un valor por frame."""
+        return self.peaks[stem].astype(np.float32) / 255.0
+
+
+def analysis_path(song_path) -> Path:
+    return Path(song_path) / "separated" / ANALYSIS_FILE
+
+
+def stems_mtime(track_paths) -> float:
+    return max((Path(p).stat().st_mtime for p in track_paths), default=0.0)
+
+
+def _frame_ends(n_samples: int, sr: int, fps: float) -> np.ndarray:
+    """Muestra final (exclusiva) de cada frame: el frame k ve el audio
+    reproducido hasta k/fps, igual que el buffer del analizador en vivo."""
+    n_frames = max(1, int(np.ceil(n_samples / sr * fps)))
+    return np.minimum((np.arange(n_frames) * (sr / fps)).astype(np.int64),
+                      n_samples)
+
+
+def _stem_bands(mono: np.ndarray, ends: np.ndarray, window: np.ndarray,
+                idx: np.ndarray) -> np.ndarray:
+    """Magnitud media por barra (frames, num_bars) de un stem mono."""
+    fft_size = len(window)
+    # fft_size ceros delante: la ventana del frame k es padded[end:end+fft]
+    padded = np.concatenate((np.zeros(fft_size, dtype=np.float32), mono))
+    view = np.lib.stride_tricks.sliding_window_view(padded, fft_size)
+    out = np.empty((len(ends), len(idx) - 1), dtype=np.float32)
+    for start in range(0, len(ends), _FFT_BATCH):
+        block = view[ends[start:start + _FFT_BATCH]] * window
+        spec = np.abs(np.fft.rfft(block, axis=1))
+        out[start:start + _FFT_BATCH] = band_means(spec, idx)
+    return out
+
+
+def _to_mono(data: np.ndarray) -> np.ndarray:
+    if data.ndim == 1:
+        return data.astype(np.float32, copy=False)
+    weights = np.full(data.shape[1], 1.0 / data.shape[1], dtype=np.float32)
+    return (data @ weights).astype(np.float32, copy=False)
+
+
+def _per_interval(x: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                   ufunc) -> np.ndarray:
+    """``ufunc.reduceat`` por intervalo [start_k, end_k); vacíos valen 0."""
+    out = ufunc.reduceat(x, np.minimum(starts, len(x) - 1),
+                         dtype=np.float64 if ufunc is np.add else None)
+    out[starts >= ends] = 0.0
+    return out
+
+
+def compute_song_analysis(tracks, num_bars: int = 48, fft_size: int = 2048,
+                          fps: float = ANALYSIS_FPS, low_freq: float = 50.0,
+                          high_freq: float = 12000.0,
+                          source_mtime: float = 0.0) -> SongAnalysis:
+    """Analiza los stems `tracks` [(data (frames, canales), sr), ...].
+
+    Los parámetros de bandas deben coincidir con los del ``AudioAnalyzer``
+    que va a consumir el resultado. Procesa stem por stem para no duplicar
+    en memoria la canción completa (ya cargada por el reproductor).
+    """
+    sr = tracks[0][1]
+    n_samples = min(len(data) for data, _ in tracks)
+    ends = _frame_ends(n_samples, sr, fps)
+    # Intervalo propio de cada frame: [end_{k-1}, end_k)
+    starts = np.concatenate(([0], ends[:-1]))
+    window = np.hanning(fft_size).astype(np.float32)
+    idx = log_band_edges(num_bars, fft_size, sr, low_freq, high_freq)
+
+    bands = np.empty((len(tracks), len(ends), num_bars), dtype=np.float32)
+    peaks = np.empty((len(tracks), len(ends)), dtype=np.float32)
+    mix = np.zeros(n_samples, dtype=np.float32)
+    for i, (data, _) in enumerate(tracks):
+        mono = _to_mono(data[:n_samples])
+        bands[i] = _stem_bands(mono, ends, window, idx)
+        peaks[i] = _per_interval(np.abs(mono), starts, ends, np.maximum)
+        mix += mono
+        del mono
+
+    band_scale = float(bands.max()) or 1.0
+    bands_q = np.round(np.sqrt(bands / band_scale) * 255.0).astype(np.uint8)
+    peaks_q = np.round(np.clip(peaks, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+    # Loudness corto de la mezcla a ganancia unitaria: energía por intervalo
+    # y suma móvil de los últimos LOUDNESS_WINDOW_S segundos de frames.
+    np.square(mix, out=mix)
+    energy = np.concatenate(([0.0], np.cumsum(
+        _per_interval(mix, starts, ends, np.add))))
+    k = np.arange(len(ends))
+    lo = np.maximum(k + 1 - max(1, round(LOUDNESS_WINDOW_S * fps)), 0)
+    rms = np.sqrt((energy[k + 1] - energy[lo])
+                  / np.maximum(ends - starts[lo], 1))
+    db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    span = -LOUDNESS_FLOOR_DB
+    loud_q = np.round(
+        (np.clip(db, LOUDNESS_FLOOR_DB, 0.0) - LOUDNESS_FLOOR_DB) / span * 255.0
+    ).astype(np.uint8)
+
+    return SongAnalysis(
+        fps=float(fps), sample_rate=int(sr), num_bars=num_bars,
+        fft_size=fft_size, source_mtime=source_mtime, band_scale=band_scale,
+        bands=bands_q, loudness=loud_q, peaks=peaks_q,
+    )
+
+
+def save_song_analysis(path, analysis: SongAnalysis):
+    """Escritura atómica: a un temporal y luego rename, para que un cierre a
+    media escritura nunca deje un .npz truncado."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            version=np.int32(ANALYSIS_VERSION),
+            fps=np.float64(analysis.fps),
+            sample_rate=np.int64(analysis.sample_rate),
+            num_bars=np.int32(analysis.num_bars),
+            fft_size=np.int32(analysis.fft_size),
+            source_mtime=np.float64(analysis.source_mtime),
+            band_scale=np.float64(analysis.band_scale),
+            bands=analysis.bands,
+            loudness=analysis.loudness,
+            peaks=analysis.peaks,
+        )
+    os.replace(tmp, path)
+
+
+def load_song_analysis(path, source_mtime: float | None = None,
+                       num_bars: int | None = None,
+                       fft_size: int | None = None) -> SongAnalysis | None:
+    """Lee el análisis, o None si no existe, está corrupto o quedó viejo
+    (stems más nuevos que el análisis o parámetros de bandas distintos)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as z:
+            if int(z["version"]) != ANALYSIS_VERSION:
+                return None
+            analysis = SongAnalysis(
+                fps=float(z["fps"]),
+                sample_rate=int(z["sample_rate"]),
+                num_bars=int(z["num_bars"]),
+                fft_size=int(z["fft_size"]),
+                source_mtime=float(z["source_mtime"]),
+                band_scale=float(z["band_scale"]),
+                bands=z["bands"],
+                loudness=z["loudness"],
+                peaks=z["peaks"],
+            )
+    except Exception as e:
+        logger.error("Análisis ilegible en %s: %s", path, e)
+        return None
+    if source_mtime is not None and analysis.source_mtime != source_mtime:
+        return None
+    if num_bars is not None and analysis.num_bars != num_bars:
+        return None
+    if fft_size is not None and analysis.fft_size != fft_size:
+        return None
+    return analysis
@@ -3,6 +3,9 @@
 Los tests corren headless (QT_QPA_PLATFORM=offscreen) y NO requieren
 audio ni red. AudioPlayer se instancia una sola vez por sesión porque
 su __init__ construye toda la UI.
+
+Los benchmarks (``@pytest.mark.benchmark``) miden tiempos de reloj y solo
+corren con ``pytest --benchmark``.
 """
 import os
 import sys
@@ -16,6 +19,24 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import pytest
 
 
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true",
+                     help="corre también los benchmarks (lentos, miden tiempos)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: mide tiempos; solo con --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark: correr con --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(scope="session")
 def app():
     from PyQt6.QtWidgets import QApplication
@@ -24,11 +45,20 @@ def app():
 
 
 @pytest.fixture(scope="session")
-def player(app):
-    from audio_player import AudioPlayer
-    p = AudioPlayer()
+def player(app, tmp_path_factory):
+    import audio_player
+    from lyrics_fetcher import LyricsFetcher
+    # Los archivos de datos (cola de Demucs, letras fallidas, perfiles) van
+    # a una carpeta temporal y no a la raíz del repo
+    data_dir = tmp_path_factory.mktemp("data")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(audio_player, "get_data_dir", lambda: data_dir)
+    p = audio_player.AudioPlayer()
+    # Sin red: las letras que encole la app no llegan a los proveedores
+    p.lyrics_fetcher = LyricsFetcher(lambda artist, song, dir_path: "")
     yield p
     p._control_channels('stop')
+    patch.undo()
 
 
 @pytest.fixture(autouse=True)
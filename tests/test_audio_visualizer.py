@@ -0,0 +1,238 @@
+"""Tests del visualizador: pintado de los widgets y DSP del AudioAnalyzer."""
+import numpy as np
+import pytest
+from PyQt6.QtCore import QPoint
+from PyQt6.QtGui import QImage, QRegion
+from PyQt6.QtWidgets import QWidget
+
+from audio_visualizer import CircularVisualizerWidget, VisualizerWidget
+
+
+def _render(widget) -> QImage:
+    img = QImage(widget.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    img.fill(0)
+    # Sin DrawWindowBackground: solo lo que pinta el widget
+    widget.render(img, QPoint(), QRegion(), QWidget.RenderFlag(0))
+    return img
+
+
+def _pintados(img: QImage) -> int:
+    """Pixeles no transparentes (muestreo cada 4 px)."""
+    return sum(
+        img.pixelColor(x, y).alpha() > 0
+        for x in range(0, img.width(), 4)
+        for y in range(0, img.height(), 4)
+    )
+
+
+class TestVisualizerWidget:
+    def test_barras_pintan_desde_la_base(self, app):
+        w = VisualizerWidget()
+        w.resize(480, 100)
+        bars = np.zeros(48, dtype=np.float32)
+        bars[0] = 1.0
+        w.set_bars(bars)
+        img = _render(w)
+        assert img.pixelColor(5, 98).alpha() > 0
+        assert img.pixelColor(5, 5).alpha() > 0
+        # Barras en cero no pintan nada
+        assert img.pixelColor(400, 98).alpha() == 0
+
+    def test_cambio_de_tamano_recalcula_geometria(self, app):
+        w = VisualizerWidget()
+        w.resize(200, 50)
+        w.set_bars(np.ones(8, dtype=np.float32))
+        _render(w)
+        w.resize(400, 50)
+        img = _render(w)
+        assert img.pixelColor(390, 40).alpha() > 0
+
+
+class TestCircularVisualizerWidget:
+    @pytest.mark.parametrize("style", ["bars", "wave", "electric", "hbars"])
+    def test_cada_estilo_pinta(self, app, style):
+        w = CircularVisualizerWidget(style=style)
+        w.resize(300, 200)
+        w.set_bars(np.random.default_rng(0).random(48).astype(np.float32))
+        assert _pintados(_render(w)) > 0
+
+    def test_estilo_none_no_pinta(self, app):
+        w = CircularVisualizerWidget(style="none")
+        w.resize(300, 200)
+        w.set_bars(np.ones(48, dtype=np.float32))
+        assert _pintados(_render(w)) == 0
+
+    def test_curva_suave_pasa_por_los_puntos_medios(self, app):
+        w = CircularVisualizerWidget()
+        pts = np.array([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]])
+        curve = w._smooth_closed_curve(pts)
+        assert curve.shape == (4 * w.WAVE_SAMPLES, 2)
+        # Cada tramo arranca en el punto medio del tramo anterior
+        mids = (pts + np.roll(pts, -1, axis=0)) / 2.0
+        assert np.allclose(curve[w.WAVE_SAMPLES], mids[0])
+
+
+def _tono(frames=1024, sr=44100, freq=440.0):
+    t = np.arange(frames) / sr
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)[:, None]
+
+
+class TestRitmoDelAnalizador:
+    @staticmethod
+    def _analyzer(**kw):
+        from audio_visualizer import AudioAnalyzer
+        an = AudioAnalyzer(**kw)
+        an.set_framerate(1e9)  # sin límite de fps en tests
+        emitted = []
+        an.bars_ready.connect(emitted.append)
+        return an, emitted
+
+    def test_oculto_no_calcula(self, app):
+        an, emitted = self._analyzer()
+        an.set_visible(False)
+        for _ in range(5):
+            an.process(_tono())
+        assert emitted == []
+        assert an.frame_stats()["hidden"] == 5
+
+    def test_silencio_cae_a_reposo_y_deja_de_emitir(self, app):
+        an, emitted = self._analyzer()
+        an.process(_tono())
+        assert emitted and emitted[-1].max() > 0
+        silencio = np.zeros((1024, 1), dtype=np.float32)
+        for _ in range(200):
+            an.process(silencio)
+        # La caída por gravedad termina en un frame exactamente en cero...
+        assert emitted[-1].max() == 0.0
+        n = len(emitted)
+        for _ in range(20):
+            an.process(silencio)
+        # ...y después ya no hay más frames ni FFT.
+        assert len(emitted) == n
+        stats = an.frame_stats()
+        assert stats["computed"] == 1
+        assert stats["silent"] >= 20
+
+    def test_presupuesto_excedido_baja_el_fps(self, app):
+        an, _ = self._analyzer(frame_budget=0.0)
+        an.set_framerate(60)
+        an._last_emit = 0.0
+        an.process(_tono())
+        stats = an.frame_stats()
+        assert stats["throttled"] == 1
+        assert stats["current_fps"] < stats["target_fps"]
+        assert stats["cpu_max_ms"] >= stats["cpu_avg_ms"] > 0
+
+
+def _stems(frames=1024, sr=44100):
+    """Cuatro stems sintéticos (stems, frames, 2): tonos distintos y uno mudo."""
+    t = np.arange(frames) / sr
+    out = np.zeros((4, frames, 2), dtype=np.float32)
+    for i, freq in enumerate((80.0, 440.0, 2500.0)):
+        out[i] = (0.3 * np.sin(2 * np.pi * freq * t))[:, None]
+    return out
+
+
+class TestAnalisisPorStem:
+    @staticmethod
+    def _analyzer():
+        from audio_visualizer import AudioAnalyzer
+        an = AudioAnalyzer()
+        an.set_framerate(1e9)
+        return an
+
+    def test_mezcla_igual_a_la_del_chunk_mezclado(self, app):
+        stems = _stems()
+        gains = np.array([1.0, 0.5, 0.8, 1.0], dtype=np.float32)
+        mixed = (stems * gains[:, None, None]).sum(axis=0)
+
+        a, b = self._analyzer(), self._analyzer()
+        got_a, got_b = [], []
+        a.bars_ready.connect(got_a.append)
+        b.bars_ready.connect(got_b.append)
+        a.process(mixed)
+        b.process_stems(stems, gains)
+        assert np.allclose(got_a[-1], got_b[-1], atol=1e-5)
+
+    def test_barras_por_stem(self, app):
+        an = self._analyzer()
+        got = []
+        an.stem_bars_ready.connect(got.append)
+        an.process_stems(_stems(), np.ones(4, dtype=np.float32))
+        bars = got[-1]
+        assert bars.shape == (4, an.num_bars)
+        # El grave pega abajo, el agudo arriba y el stem mudo queda en cero
+        assert bars[0].argmax() < bars[2].argmax()
+        assert bars[3].max() == 0.0
+
+    def test_band_means_equivale_al_bucle_por_barra(self, app):
+        an = self._analyzer()
+        for sr in (44100, 8000):
+            an.configure(sr)
+            spec = np.abs(np.random.default_rng(1).standard_normal(
+                an.fft_size // 2 + 1))
+            idx = an._bin_idx
+            ref = [spec[lo:hi].mean() if hi > lo else spec[lo]
+                   for lo, hi in zip(idx[:-1], idx[1:])]
+            assert np.allclose(an._band_means(spec), ref)
+
+
+class TestMedidoresPorStem:
+    def test_cada_stem_a_su_medidor(self, player):
+        assert player.analyzer.per_stem
+        saved = player._track_names
+        try:
+            player._track_names = ["vocals", "drums", "bass", "other"]
+            bars = np.zeros((4, 48), dtype=np.float32)
+            bars[0, 3], bars[2, 40] = 0.8, 0.3
+            player._set_stem_levels(bars)
+            levels = [player._track_meters[t].level for t in player._track_names]
+            assert levels == pytest.approx([0.8, 0.0, 0.3, 0.0])
+            # Filas de otra canción (otro juego de stems): se ignoran
+            player._set_stem_levels(np.ones((2, 48), dtype=np.float32))
+            assert player._track_meters["drums"].level == 0.0
+            player._update_playback_ui("Detenido")
+            assert all(m.level == 0.0 for m in player._track_meters.values())
+        finally:
+            player._track_names = saved
+
+
+def _legacy_frame(buf, window, idx, num_bars, chunk):
+    """Frame del camino de un solo espectro tal como era antes del modo por
+    stem (mean por canales + bucle por barra): la referencia del presupuesto."""
+    mono = chunk.mean(axis=1)
+    buf[:-len(mono)] = buf[len(mono):]
+    buf[-len(mono):] = mono
+    spec = np.abs(np.fft.rfft(buf * window))
+    out = np.empty(num_bars, dtype=np.float32)
+    for i in range(num_bars):
+        lo, hi = idx[i], idx[i + 1]
+        out[i] = spec[lo:hi].mean() if hi > lo else spec[lo]
+    return np.sqrt(out)
+
+
+@pytest.mark.benchmark
+class TestBenchmarkPorStem:
+    def test_por_stem_cuesta_menos_de_1_5x_el_espectro_unico(self, app):
+        import timeit
+
+        from audio_visualizer import AudioAnalyzer
+        an = AudioAnalyzer()
+        an.set_framerate(1e9)
+        an.frame_budget = 1.0
+        stems = _stems()
+        gains = np.ones(4, dtype=np.float32)
+        mixed = stems.sum(axis=0)
+        buf = np.zeros(an.fft_size, dtype=np.float32)
+        # Como en _stream_writer: cada stem entero y el bloque por chunk
+        tracks = [np.tile(stem, (8, 1)) for stem in stems]
+        pos, end = 1024, 2048
+
+        def best(fn):
+            return min(timeit.repeat(fn, number=300, repeat=5)) / 300
+
+        single = best(lambda: _legacy_frame(buf, an._window, an._bin_idx,
+                                            an.num_bars, mixed))
+        per_stem = best(lambda: an.process_stems(
+            np.stack([td[pos:end] for td in tracks]), gains, peak=0.5))
+        assert per_stem <= 1.5 * single
@@ -0,0 +1,134 @@
+"""Tests de los lotes: varias canciones por invocación de demucs."""
+import sys
+import time
+
+import pytest
+
+import demucs_worker
+from demucs_worker import BATCH_STAGING_DIR, DemucsBatchWorker, DemucsWorker
+from separation_profiles import PROFILES
+from test_demucs_progress import _FAKE_DEMUCS
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """Arma un DemucsBatchWorker sobre un demucs falso que anota cada
+    invocación (CLI: sin servidor persistente)."""
+    runs = tmp_path / "runs.txt"
+    pkg = tmp_path / "fake" / "demucs"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "__main__.py").write_text(
+        f"open({str(runs)!r}, 'a').write('x')\n" + _FAKE_DEMUCS)
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path / "fake"))
+    monkeypatch.setattr(demucs_worker, "get_python_cmd", lambda: sys.executable)
+    monkeypatch.setattr(demucs_worker, "get_data_dir", lambda: tmp_path)
+    monkeypatch.setattr(DemucsWorker, "_server_unavailable", True)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_mps", lambda: False)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_cuda", lambda: False)
+
+    def make(names, contents=None):
+        workers = []
+        for n, name in enumerate(names):
+            src = tmp_path / "src" / f"{n}" / f"{name}.mp3"
+            src.parent.mkdir(parents=True, exist_ok=True)
+            src.write_bytes((contents or {}).get(name, f"ID3 {n}".encode()))
+            worker = DemucsWorker("A", f"{name} {n}", src, profile=PROFILES["rapido"])
+            worker.base_path = tmp_path / "lib" / "A" / f"{name} {n}"
+            workers.append(worker)
+        return DemucsBatchWorker(workers)
+
+    make.runs = lambda: len(runs.read_text()) if runs.exists() else 0
+    make.tmp_path = tmp_path
+    return make
+
+
+def _run(worker):
+    events = []
+    worker.song_finished.connect(lambda i: events.append(("ok", i)))
+    worker.song_failed.connect(lambda i, msg: events.append(("error", i)))
+    worker.finished.connect(lambda: events.append("fin"))
+    worker.error.connect(lambda msg: events.append(("lote", msg)))
+    progress = []
+    worker.progress.connect(progress.append)
+    worker.run()
+    return events, progress
+
+
+class TestDemucsBatchWorker:
+    def test_una_invocacion_para_todo_el_lote(self, batch):
+        worker = batch(["uno", "dos", "tres"])
+        events, progress = _run(worker)
+        assert batch.runs() == 1
+        assert events == [("ok", 0), ("ok", 1), ("ok", 2), "fin"]
+        assert progress == sorted(progress) and progress[-1] == 100
+        for w in worker.workers:
+            assert (w.base_path / "separated" / "vocals.mp3").exists()
+            assert (w.base_path / "data.json").exists()
+        assert not list((batch.tmp_path / BATCH_STAGING_DIR).iterdir())
+
+    def test_un_archivo_roto_no_arrastra_al_resto(self, batch, monkeypatch):
+        prepared = []
+        real_prepare = DemucsWorker._prepare
+        monkeypatch.setattr(DemucsWorker, "_prepare",
+                            lambda self: prepared.append(self.song) or real_prepare(self))
+        # demucs corta en "dos": "tres" se reintenta sola y "dos" falla sola
+        worker = batch(["uno", "dos", "tres"], contents={"dos": b"roto"})
+        events, _ = _run(worker)
+        # Los reintentos no repiten hash, limpieza ni portada
+        assert sorted(prepared) == ["dos 1", "tres 2", "uno 0"]
+        assert sorted(e for e in events if e != "fin") == [
+            ("error", 1), ("ok", 0), ("ok", 2)]
+        assert events[-1] == "fin"
+        assert batch.runs() == 3
+        assert not worker.workers[1].base_path.exists()
+
+    def test_cada_cancion_con_su_parte_del_tiempo(self, batch, monkeypatch):
+        durations = {"uno": 60.0, "dos": 120.0, "tres": 180.0}
+        monkeypatch.setattr(demucs_worker, "audio_duration",
+                            lambda src: durations[src.stem])
+        worker = batch(list(durations))
+        events, _ = _run(worker)
+        assert events[-1] == "fin"
+        songs = worker.workers
+        # Mismo RTF para todas (el del lote) y el tiempo repartido por duración
+        assert [w.audio_s for w in songs] == [60.0, 120.0, 180.0]
+        assert all(w.separation_s > 0 for w in songs)
+        rtfs = [w.separation_s / w.audio_s for w in songs]
+        assert rtfs == pytest.approx([rtfs[0]] * 3)
+        assert all(w.device_used == worker.device_used for w in songs)
+
+    def test_una_invocacion_por_lote(self, batch):
+        for start in (0, 3):
+            events, _ = _run(batch([f"s{start + n}" for n in range(3)]))
+            assert events == [("ok", 0), ("ok", 1), ("ok", 2), "fin"]
+        assert batch.runs() == 2
+
+    def test_nombres_repetidos_van_aparte(self, batch):
+        worker = batch(["01 Intro", "01 Intro", "otra"])
+        events, _ = _run(worker)
+        assert sorted(e for e in events if e != "fin") == [("ok", 0), ("ok", 1), ("ok", 2)]
+        assert batch.runs() == 2
+
+
+def _per_song(batch, size: int, songs: int) -> float:
+    """Segundos de reloj por canción separando `songs` en lotes de `size`."""
+    t0 = time.monotonic()
+    for start in range(0, songs, size):
+        worker = batch([f"s{start + n}" for n in range(min(size, songs - start))])
+        _run(worker)
+    return (time.monotonic() - t0) / songs
+
+
+@pytest.mark.benchmark
+class TestBenchmarkLote:
+    def test_tiempo_por_cancion_segun_tamano_del_lote(self, batch, monkeypatch):
+        # Carga del modelo sintética (0.3 s) y 0.12 s de separación por canción
+        monkeypatch.setenv("FAKE_DEMUCS_LOAD", "0.3")
+        monkeypatch.setenv("FAKE_DEMUCS_STEP", "0.02")
+        songs = 12
+        times = {}
+        for size in (1, 4, 12):
+            times[size] = _per_song(batch, size, songs)
+        assert times[4] < times[1] * 0.75
+        assert times[12] < times[4]
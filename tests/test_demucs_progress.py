@@ -0,0 +1,274 @@
+"""Tests del runner en streaming, el progreso de tqdm y la cancelación."""
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+import demucs_worker
+from demucs_worker import OLD_STEMS_DIR, STAGING_DIR, DemucsProgress, DemucsWorker
+from platform_utils import ProcessCancelled, run_streaming
+
+# Imita `python -m demucs`: barras de tqdm con '\r' en stderr, una por modelo
+_FAKE_DEMUCS = textwrap.dedent("""\
+    import os, subprocess, sys, time
+    # Arranque de Python + import de torch + carga del modelo
+    time.sleep(float(os.environ.get("FAKE_DEMUCS_LOAD", "0")))
+    sys.stderr.write("Selected model is a bag of 2 models. "
+                     "You will see that many progress bars per track.\\n")
+    if os.environ.get("FAKE_DEMUCS_HANG"):
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        open(os.environ["FAKE_DEMUCS_HANG"], "w").write(str(child.pid))
+        sys.stderr.write("  0%|          | 0.0/10.0 [00:00<?, ?seconds/s]")
+        sys.stderr.flush()
+        time.sleep(60)
+    args = sys.argv
+    model = args[args.index("-n") + 1]
+    stems = ["drums", "bass", "other", "vocals"]
+    if model == "htdemucs_6s":
+        stems += ["guitar", "piano"]
+    if "--two-stems" in args:
+        stem = args[args.index("--two-stems") + 1]
+        stems = [stem, "no_" + stem]
+    ext = "mp3" if "--mp3" in args else "flac" if "--flac" in args else "wav"
+    step = float(os.environ.get("FAKE_DEMUCS_STEP", "0.05"))
+    # Como demucs: un archivo tras otro, y corta en el primero que no puede leer
+    for track in args[args.index("-o") + 2:]:
+        if open(track, "rb").read(4) == b"roto":
+            sys.stderr.write(f"Could not load file {track}\\n")
+            sys.exit(1)
+        for _ in range(2):
+            for n in range(0, 11, 5):
+                sys.stderr.write(f"\\r{n * 10:3d}%|###       | {n}.0/10.0 [00:0{n // 5}<00:0{2 - n // 5}, 5.0seconds/s]")
+                sys.stderr.flush()
+                time.sleep(step)
+            sys.stderr.write("\\n")
+        out = os.path.join(args[args.index("-o") + 1], model,
+                           os.path.splitext(os.path.basename(track))[0])
+        os.makedirs(out, exist_ok=True)
+        for stem in stems:
+            open(os.path.join(out, stem + "." + ext), "wb").write(ext.encode())
+""")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    # Un zombi ya está muerto aunque su padre no lo haya recogido
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+class TestRunStreaming:
+    def test_lineas_incrementales_y_cola_acotada(self):
+        code = ("import sys, time\n"
+                "for i in range(500):\n"
+                "    sys.stdout.write(f'{i}\\r' if i % 2 else f'{i}\\n')\n"
+                "sys.stdout.flush()\n"
+                "time.sleep(0.3)\n"
+                "sys.stderr.write('fin\\n')\n")
+        stamps = []
+        result = run_streaming([sys.executable, "-c", code], tail_lines=10,
+                               on_line=lambda ln: stamps.append((ln, time.monotonic())))
+        assert result.returncode == 0
+        assert [ln for ln, _ in stamps] == [str(i) for i in range(500)] + ["fin"]
+        # Las líneas llegan mientras el proceso corre, no todas al final
+        assert stamps[-1][1] - stamps[0][1] >= 0.25
+        assert result.stdout.splitlines() == [str(i) for i in range(491, 500)] + ["fin"]
+
+    def test_timeout_mata_el_proceso(self):
+        t0 = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            run_streaming([sys.executable, "-c", "import time; time.sleep(30)"],
+                          timeout=0.5)
+        assert time.monotonic() - t0 < 5
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="lee /proc")
+    def test_cancelar_mata_el_arbol(self, tmp_path):
+        pid_file = tmp_path / "child.pid"
+        code = ("import subprocess, sys, time\n"
+                "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+                f"open({str(pid_file)!r}, 'w').write(str(c.pid))\n"
+                "time.sleep(60)\n")
+        cancel = threading.Event()
+        threading.Thread(target=lambda: (_wait_for(pid_file), cancel.set()),
+                         daemon=True).start()
+        t0 = time.monotonic()
+        with pytest.raises(ProcessCancelled):
+            run_streaming([sys.executable, "-c", code], cancel_event=cancel)
+        assert time.monotonic() - t0 < 10
+        child = int(pid_file.read_text())
+        _wait_until(lambda: not _alive(child))
+
+
+def _wait_for(path, timeout=10.0):
+    _wait_until(lambda: path.exists() and path.read_text(), timeout)
+
+
+def _wait_until(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "tiempo agotado"
+        time.sleep(0.05)
+
+
+class TestDemucsProgress:
+    def test_pasadas_del_bag_y_eta(self):
+        p = DemucsProgress()
+        assert not p.update("Selected model is a bag of 4 models. You will see ...")
+        assert p.update("  0%|          | 0.0/234.0 [00:00<?, ?seconds/s]")
+        assert p.fraction == 0.0 and p.eta is None
+        assert p.update(" 50%|#####     | 117.0/234.0 [00:10<00:10,  11.7seconds/s]")
+        assert p.fraction == pytest.approx(0.125)
+        # 10 s de esta pasada + 3 pasadas de 20 s
+        assert p.eta == 70
+        p.update("100%|##########| 234.0/234.0 [00:20<00:00,  11.7seconds/s]")
+        p.update("  0%|          | 0.0/234.0 [00:00<?, ?seconds/s]")
+        p.update(" 50%|#####     | 117.0/234.0 [00:10<00:10,  11.7seconds/s]")
+        assert p.fraction == pytest.approx(0.375) and p.eta == 50
+
+    def test_shifts_repiten_las_pasadas(self):
+        p = DemucsProgress(models=1, shifts=2)
+        p.update("100%|##########| 10.0/10.0 [00:05<00:00, 2.0seconds/s]")
+        p.update(" 50%|#####     | 5.0/10.0 [00:02<00:02, 2.0seconds/s]")
+        assert p.fraction == pytest.approx(0.75) and p.eta == 2
+
+    def test_ignora_lineas_sin_barra(self):
+        p = DemucsProgress()
+        assert not p.update("Separated tracks will be stored in /tmp/x")
+        assert not p.update("Downloading: \"https://dl.fbaipublicfiles.com/...\"")
+        assert p.fraction == 0.0
+
+
+class TestDemucsWorkerCli:
+    @pytest.fixture
+    def worker(self, tmp_path, monkeypatch):
+        pkg = tmp_path / "fake" / "demucs"
+        pkg.mkdir(parents=True)
+        (pkg / "__init__.py").write_text("")
+        (pkg / "__main__.py").write_text(_FAKE_DEMUCS)
+        monkeypatch.setenv("PYTHONPATH", str(tmp_path / "fake"))
+        monkeypatch.setattr(demucs_worker, "get_python_cmd", lambda: sys.executable)
+        src = tmp_path / "Canción.mp3"
+        src.write_bytes(b"ID3")
+        w = DemucsWorker("A", "B", src)
+        w.base_path = tmp_path / "lib" / "A" / "B"
+        w.base_path.mkdir(parents=True)
+        return w
+
+    def test_progreso_real_en_streaming(self, worker):
+        got, etas = [], []
+        worker.progress.connect(got.append)
+        worker.eta.connect(etas.append)
+        result = worker._exec_demucs(mps=False)
+        assert result.returncode == 0
+        assert got == sorted(got) and got[0] == 26 and got[-1] == 83
+        assert len(set(got)) >= 4
+        assert etas[-1] == 0
+        worker._organize_output()
+        assert (worker.base_path / "separated" / "vocals.mp3").exists()
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="lee /proc")
+    def test_cancelar_mata_demucs_y_limpia(self, worker, tmp_path, monkeypatch):
+        pid_file = tmp_path / "child.pid"
+        monkeypatch.setenv("FAKE_DEMUCS_HANG", str(pid_file))
+        monkeypatch.setattr(DemucsWorker, "_server_unavailable", True)
+        monkeypatch.setattr(demucs_worker, "check_pytorch_mps", lambda: False)
+        monkeypatch.setattr(demucs_worker, "check_pytorch_cuda", lambda: False)
+        events = []
+        worker.cancelled.connect(lambda: events.append("cancelled"))
+        worker.error.connect(events.append)
+        threading.Thread(target=lambda: (_wait_for(pid_file), worker.cancel()),
+                         daemon=True).start()
+        t0 = time.monotonic()
+        worker.run()
+        assert events == ["cancelled"]
+        assert time.monotonic() - t0 < 15
+        _wait_until(lambda: not _alive(int(pid_file.read_text())))
+        # Canción nueva sin stems: no queda carpeta a medias en la biblioteca
+        assert not worker.base_path.exists()
+
+
+class TestCommitAtomico:
+    """Los stems pasan a separated/ de una vez y data.json va al final: una
+    caída o un fallo nunca deja una canción listada sin stems."""
+
+    @pytest.fixture
+    def worker(self, tmp_path, monkeypatch):
+        pkg = tmp_path / "fake" / "demucs"
+        pkg.mkdir(parents=True)
+        (pkg / "__init__.py").write_text("")
+        (pkg / "__main__.py").write_text(_FAKE_DEMUCS)
+        monkeypatch.setenv("PYTHONPATH", str(tmp_path / "fake"))
+        monkeypatch.setattr(demucs_worker, "get_python_cmd", lambda: sys.executable)
+        monkeypatch.setattr(DemucsWorker, "_server_unavailable", True)
+        monkeypatch.setattr(demucs_worker, "check_pytorch_mps", lambda: False)
+        monkeypatch.setattr(demucs_worker, "check_pytorch_cuda", lambda: False)
+        src = tmp_path / "Canción.mp3"
+        src.write_bytes(b"ID3")
+        w = DemucsWorker("A", "B", src)
+        w.base_path = tmp_path / "lib" / "A" / "B"
+        return w
+
+    @staticmethod
+    def _old_song(base_path):
+        (base_path / "separated").mkdir(parents=True)
+        for stem in ("drums", "vocals", "bass", "other"):
+            (base_path / "separated" / f"{stem}.mp3").write_bytes(b"viejo")
+        (base_path / "data.json").write_text('{"A": {"B": {}}}')
+
+    def test_data_json_despues_de_los_stems(self, worker, monkeypatch):
+        seen = []
+        create_json = worker._create_json
+        monkeypatch.setattr(worker, "_create_json", lambda: (
+            seen.append((worker.base_path / "separated" / "vocals.mp3").exists()),
+            create_json()))
+        worker.run()
+        assert seen == [True]
+        assert (worker.base_path / "data.json").exists()
+        assert not (worker.base_path / STAGING_DIR).exists()
+        assert sorted(p.name for p in (worker.base_path / "separated").iterdir()) == [
+            "bass.mp3", "drums.mp3", "other.mp3", "vocals.mp3"]
+
+    def test_fallo_conserva_la_separacion_anterior(self, worker, monkeypatch):
+        self._old_song(worker.base_path)
+
+        def fail():
+            out = worker.base_path / STAGING_DIR / "htdemucs_ft" / "Canción"
+            out.mkdir(parents=True)
+            (out / "vocals.mp3").write_bytes(b"a medias")
+            raise RuntimeError("Demucs falló con código 1")
+
+        monkeypatch.setattr(worker, "_run_demucs", fail)
+        errors = []
+        worker.error.connect(errors.append)
+        worker.run()
+        assert errors and "código 1" in errors[0]
+        assert (worker.base_path / "separated" / "vocals.mp3").read_bytes() == b"viejo"
+        assert (worker.base_path / "data.json").read_text() == '{"A": {"B": {}}}'
+        assert not (worker.base_path / STAGING_DIR).exists()
+
+    def test_fallo_en_cancion_nueva_no_deja_carpeta(self, worker, monkeypatch):
+        def fail():
+            raise RuntimeError("falló")
+
+        monkeypatch.setattr(worker, "_run_demucs", fail)
+        worker.run()
+        assert not worker.base_path.exists()
+
+    def test_caida_entre_los_renames_recupera_los_stems(self, worker):
+        self._old_song(worker.base_path)
+        (worker.base_path / "separated").rename(worker.base_path / OLD_STEMS_DIR)
+        (worker.base_path / STAGING_DIR / "stems").mkdir(parents=True)
+        worker._recover_partial()
+        assert (worker.base_path / "separated" / "vocals.mp3").read_bytes() == b"viejo"
+        assert not (worker.base_path / OLD_STEMS_DIR).exists()
+        assert not (worker.base_path / STAGING_DIR).exists()
@@ -0,0 +1,265 @@
+"""Tests del planificador de separaciones simultáneas y su benchmark."""
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from demucs_scheduler import (MAX_ATTEMPTS, MAX_JOBS, DemucsScheduler, JobJournal,
+                              suggest_concurrency, threads_per_job)
+
+
+class TestSuggestConcurrency:
+    def test_cpu_segun_nucleos_y_ram(self):
+        assert suggest_concurrency("CPU", cores=16, ram_gb=64) == 4
+        assert suggest_concurrency("CPU", cores=16, ram_gb=8) == 2
+        assert suggest_concurrency("CPU", cores=4, ram_gb=64) == 1
+        assert suggest_concurrency("CPU", cores=2, ram_gb=2) == 1
+
+    def test_gpu(self):
+        assert suggest_concurrency("CUDA", cores=8, ram_gb=32, vram_gb=12) == 3
+        assert suggest_concurrency("CUDA", cores=8, ram_gb=32) == 1
+        assert suggest_concurrency("MPS", cores=10, ram_gb=64) == 1
+
+    def test_nunca_pasa_del_maximo(self):
+        assert suggest_concurrency("CPU", cores=128, ram_gb=512) == MAX_JOBS
+
+    def test_hilos_por_trabajo(self):
+        assert threads_per_job(4, cores=16) == 4
+        assert threads_per_job(3, cores=2) == 1
+
+
+class TestDemucsScheduler:
+    def test_fifo_con_slots_limitados(self):
+        started = []
+        sched = DemucsScheduler(lambda job, slot: started.append((job["n"], slot)),
+                                max_jobs=2)
+        for n in range(4):
+            sched.submit({"n": n})
+        assert started == [(0, 0), (1, 1)]
+        assert [j["n"] for j in sched.pending] == [2, 3]
+        assert sched.finished(1)["n"] == 1
+        assert started[-1] == (2, 1)
+        sched.finished(0)
+        sched.finished(1)
+        sched.finished(0)
+        assert started == [(0, 0), (1, 1), (2, 1), (3, 0)]
+        assert not sched.active and not sched.pending
+
+    def test_cambiar_limite(self):
+        started = []
+        sched = DemucsScheduler(lambda job, slot: started.append(slot), max_jobs=1)
+        for n in range(3):
+            sched.submit({"n": n})
+        sched.set_max_jobs(3)
+        assert sorted(started) == [0, 1, 2]
+        # Bajar el límite no corta trabajos en curso; solo frena los nuevos
+        sched.set_max_jobs(1)
+        sched.submit({"n": 3})
+        sched.finished(2)
+        sched.finished(1)
+        assert len(started) == 3
+        sched.finished(0)
+        assert started[-1] == 0
+
+    def test_error_al_lanzar_libera_el_slot(self):
+        def start(job, slot):
+            raise RuntimeError("boom")
+
+        sched = DemucsScheduler(start, max_jobs=2)
+        with pytest.raises(RuntimeError):
+            sched.submit({"n": 0})
+        assert not sched.running
+
+
+class TestLotes:
+    def test_agrupa_por_perfil_y_deja_solos_los_cronometrados(self):
+        started = []
+        sched = DemucsScheduler(lambda job, slot: started.append(job), batch_size=3)
+        sched.pending = [{"n": 0, "profile": None}, {"n": 1, "profile": "rapido"},
+                         {"n": 2, "profile": None}, {"n": 3, "profile": None, "timed": True},
+                         {"n": 4, "profile": None}, {"n": 5, "profile": None}]
+        sched._fill()
+        assert [j["n"] for j in started[0]["batch"]] == [0, 2, 4]
+        sched.finished(0)
+        assert "batch" not in started[1] and started[1]["n"] == 1
+        sched.finished(0)
+        assert "batch" not in started[2] and started[2]["n"] == 3
+        sched.finished(0)
+        assert started[3]["n"] == 5 and "batch" not in started[3]
+
+    def test_resultado_por_cancion_en_el_diario(self, tmp_path):
+        journal = JobJournal(tmp_path / "cola.json")
+        sched = DemucsScheduler(lambda job, slot: None, journal=journal, batch_size=4)
+        sched.pending = []
+        jobs = [{"artist": "A", "song": f"s{n}", "file_path": f"/m/s{n}.mp3",
+                 "timed": False, "profile": None} for n in range(3)]
+        for job in jobs:
+            journal.add(job)
+            sched.pending.append(job)
+        sched._fill()
+        batch = sched.running[0]["batch"]
+        sched.record(batch[1], "failed", "Error: archivo roto")
+        sched.record(batch[0], "done")
+        # Si la app se cae aquí, s2 queda para el próximo arranque (en espera:
+        # el intento del lote lo cobra solo la cabeza)
+        states = [e["state"] for e in JobJournal(tmp_path / "cola.json").jobs]
+        assert states == ["done", "failed", "pending"]
+        # Al cancelar el lote, solo la canción sin resultado propio sale
+        sched.finished(0, "cancelled")
+        assert [e["song"] for e in journal.jobs] == ["s0", "s1"]
+
+
+class TestDiarioDeLaCola:
+    @staticmethod
+    def _job(n):
+        return {"artist": "A", "song": f"s{n}", "file_path": f"/m/s{n}.mp3",
+                "timed": False, "profile": None}
+
+    def test_sobrevive_a_un_cierre_y_reanuda(self, tmp_path):
+        path = tmp_path / "cola.json"
+        started = []
+        sched = DemucsScheduler(lambda job, slot: started.append(job["song"]),
+                                journal=JobJournal(path))
+        for n in range(4):
+            sched.submit(self._job(n))
+        sched.running[0]["profile"] = "rapido"     # resuelto al arrancar
+        sched.finished(0)                          # s0 hecho, arranca s1
+        sched.finished(0, "failed", "Demucs falló")
+        assert started == ["s0", "s1", "s2"]
+        # La app se cae con s2 corriendo y s3 en espera
+        started.clear()
+        sched = DemucsScheduler(lambda job, slot: started.append(job["song"]),
+                                journal=JobJournal(path))
+        assert sched.resume() == 2
+        assert started == ["s2"] and [j["song"] for j in sched.pending] == ["s3"]
+        states = {e["song"]: (e["state"], e["profile"]) for e in sched.journal.jobs}
+        assert states == {"s0": ("done", "rapido"), "s1": ("failed", None),
+                          "s2": ("running", None), "s3": ("pending", None)}
+        assert not path.with_name("cola.json.tmp").exists()
+
+    def test_cancelar_saca_del_diario(self, tmp_path):
+        journal = JobJournal(tmp_path / "cola.json")
+        sched = DemucsScheduler(lambda job, slot: None, journal=journal)
+        for n in range(3):
+            sched.submit(self._job(n))
+        sched.cancel_pending()
+        sched.finished(0, "cancelled")
+        assert not sched.pending and JobJournal(tmp_path / "cola.json").jobs == []
+
+    def test_el_que_tumba_la_app_no_se_reanuda_siempre(self, tmp_path):
+        path = tmp_path / "cola.json"
+        for _ in range(MAX_ATTEMPTS):
+            sched = DemucsScheduler(lambda job, slot: None, journal=JobJournal(path))
+            if not sched.resume():
+                sched.submit(self._job(0))
+        journal = JobJournal(path)
+        assert journal.resumable() == []
+        assert journal.jobs[0]["state"] == "failed"
+
+    def test_cerrar_la_app_no_cuenta_como_intento(self, tmp_path):
+        path = tmp_path / "cola.json"
+        for _ in range(MAX_ATTEMPTS + 2):
+            sched = DemucsScheduler(lambda job, slot: None, journal=JobJournal(path))
+            if not sched.resume():
+                sched.submit(self._job(0))
+            sched.interrupt()                   # cierre normal con s0 corriendo
+        entry, = JobJournal(path).jobs
+        assert entry["state"] == "pending" and entry["attempts"] == 0
+
+    def test_caida_en_un_lote_cobra_un_solo_intento(self, tmp_path):
+        path = tmp_path / "cola.json"
+        sched = DemucsScheduler(lambda job, slot: None, journal=JobJournal(path),
+                                batch_size=4)
+        sched.submit(self._job(0))
+        for n in range(1, 4):
+            sched.submit(self._job(n))
+        sched.finished(0)                       # s0 solo; s1-s3 van en lote
+        sched.record(sched.running[0]["batch"][1], "done")
+        journal = JobJournal(path)              # la app se cae aquí
+        assert len(journal.resumable()) == 2
+        attempts = {e["song"]: (e["state"], e["attempts"]) for e in journal.jobs}
+        assert attempts == {"s0": ("done", 0), "s1": ("running", 1),
+                            "s2": ("done", 0), "s3": ("pending", 0)}
+
+    def test_diario_ilegible_o_historial_acotado(self, tmp_path):
+        path = tmp_path / "cola.json"
+        path.write_text("{no es json")
+        journal = JobJournal(path, history=2)
+        assert journal.jobs == []
+        sched = DemucsScheduler(lambda job, slot: None, journal=journal)
+        for n in range(5):
+            sched.submit(self._job(n))
+            sched.finished(0)
+        assert [e["song"] for e in JobJournal(path).jobs] == ["s3", "s4"]
+
+
+class TestColaEnLaVentana:
+    def test_varios_trabajos_y_progreso_por_trabajo(self, player, monkeypatch):
+        from dialogs import QueueDialog
+        started = []
+        monkeypatch.setattr(player.demucs_scheduler, "_start_job",
+                            lambda job, slot: started.append(slot))
+        monkeypatch.setattr(player.demucs_scheduler, "journal", None)
+        try:
+            player._set_demucs_jobs(2)
+            for n in range(3):
+                player.process_song("A", f"s{n}", "/tmp/x.mp3")
+            assert started == [0, 1]
+            assert [j["song"] for j in player.demucs_queue] == ["s2"]
+            player._update_demucs_progress(0, 40)
+            player._update_demucs_progress(1, 20)
+            assert "Separando 2" in player._format_demucs_progress()
+            assert "30%" in player._format_demucs_progress()
+            html = QueueDialog(player)._queue_html
+            assert "s0 <sub>40%</sub>" in html and "s2</center>" in html
+            player._finish_demucs_job(1)
+            assert started == [0, 1, 1]
+        finally:
+            player.demucs_scheduler.running.clear()
+            player.demucs_scheduler.pending.clear()
+            player.processing_multiple = False
+            player._set_demucs_jobs(None)
+
+
+# Trabajo sintético: CPU de un hilo + espera (decodificar/escribir mp3)
+_SYNTH_JOB = (
+    "import time\n"
+    "t = time.process_time()\n"
+    "while time.process_time() - t < {cpu}:\n"
+    "    sum(i * i for i in range(2000))\n"
+    "time.sleep({io})\n"
+)
+
+
+def _run_batch(songs: int, jobs: int, cpu: float, io: float) -> float:
+    """Corre `songs` trabajos sintéticos (un proceso cada uno) con el
+    planificador; devuelve canciones/hora."""
+    done: queue.Queue = queue.Queue()
+    code = _SYNTH_JOB.format(cpu=cpu, io=io)
+
+    def start(job, slot):
+        def run():
+            subprocess.run([sys.executable, "-c", code], check=True)
+            done.put(slot)
+        threading.Thread(target=run, daemon=True).start()
+
+    sched = DemucsScheduler(start, max_jobs=jobs)
+    t0 = time.monotonic()
+    for n in range(songs):
+        sched.submit({"n": n})
+    while sched.active:
+        sched.finished(done.get(timeout=30))
+    return songs / (time.monotonic() - t0) * 3600
+
+
+@pytest.mark.benchmark
+class TestBenchmarkThroughput:
+    def test_serie_vs_paralelo(self):
+        # MAX_JOBS aunque haya pocos núcleos: la espera de E/S se solapa igual
+        jobs = MAX_JOBS
+        serial = _run_batch(8, 1, cpu=0.1, io=0.3)
+        parallel = _run_batch(8, jobs, cpu=0.1, io=0.3)
+        assert parallel > serial * 1.3
@@ -0,0 +1,112 @@
+"""Tests del servidor de separación persistente con el separador de prueba."""
+import sys
+import time
+
+import pytest
+
+import demucs_server
+from demucs_server import SeparationError, SeparationServer, server_command
+
+FAKE_LOAD_S = 0.5
+
+
+def _server(idle_s=30.0, load_s=FAKE_LOAD_S):
+    return SeparationServer(server_command(
+        sys.executable, idle_s=idle_s,
+        extra_args=["--fake", "--fake-load-s", str(load_s)]))
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "Mi canción.mp3"
+    path.write_bytes(b"ID3 audio de prueba")
+    return path
+
+
+class TestSeparationServer:
+    def test_modelo_se_carga_una_vez_entre_trabajos(self, src, tmp_path):
+        server = _server()
+        try:
+            progress = []
+            t0 = time.monotonic()
+            server.separate(src, tmp_path / "out1", on_progress=progress.append)
+            first = time.monotonic() - t0
+            pid = server.proc.pid
+            t0 = time.monotonic()
+            server.separate(src, tmp_path / "out2")
+            second = time.monotonic() - t0
+        finally:
+            server.close()
+        assert server.info["event"] == "ready" and server.info["pid"] == pid
+        # El segundo trabajo no paga la carga del modelo
+        assert first >= FAKE_LOAD_S > second
+        assert progress == sorted(progress) and progress[-1] == 1.0
+        # Misma estructura que la CLI: <out>/<modelo>/<nombre>/<stem>.mp3
+        for stem in demucs_server.STEMS:
+            out = tmp_path / "out2" / "htdemucs_ft" / src.stem / f"{stem}.mp3"
+            assert out.read_bytes() == src.read_bytes()
+
+    def test_error_de_trabajo_no_tumba_el_servidor(self, src, tmp_path):
+        server = _server(load_s=0.0)
+        try:
+            with pytest.raises(SeparationError, match="No existe"):
+                server.separate(tmp_path / "falta.mp3", tmp_path / "out")
+            pid = server.proc.pid
+            server.separate(src, tmp_path / "out")
+            assert server.proc.pid == pid
+        finally:
+            server.close()
+
+    def test_termina_por_inactividad_y_se_relanza(self, src, tmp_path):
+        server = _server(idle_s=0.3, load_s=0.0)
+        try:
+            server.separate(src, tmp_path / "out")
+            first_pid = server.proc.pid
+            server.proc.wait(timeout=5)
+            assert not server.alive
+            server.separate(src, tmp_path / "out")
+            assert server.proc.pid != first_pid
+        finally:
+            server.close()
+
+    def test_arranque_fallido(self):
+        server = SeparationServer([sys.executable, "-c", "import sys; sys.exit(3)"])
+        with pytest.raises(SeparationError):
+            server.start()
+        assert not server.alive
+
+
+class TestDemucsWorkerServidor:
+    def _worker(self, src, tmp_path, monkeypatch):
+        from demucs_worker import DemucsWorker
+        monkeypatch.setattr(DemucsWorker, "_server_unavailable", False)
+        worker = DemucsWorker("A", "B", src)
+        worker.base_path = tmp_path / "lib"
+        return worker
+
+    def test_usa_el_servidor_y_organiza_stems(self, src, tmp_path, monkeypatch):
+        server = _server(load_s=0.0)
+        monkeypatch.setattr(demucs_server, "get_server", lambda *a, **k: server)
+        worker = self._worker(src, tmp_path, monkeypatch)
+        got = []
+        worker.progress.connect(got.append)
+        try:
+            assert worker._run_on_server(None) is True
+        finally:
+            server.close()
+        assert got[-1] == 83
+        worker._organize_output()
+        for stem in demucs_server.STEMS:
+            assert (worker.base_path / "separated" / f"{stem}.mp3").exists()
+
+    def test_sin_servidor_cae_a_la_cli(self, src, tmp_path, monkeypatch):
+        from demucs_worker import DemucsWorker
+        broken = SeparationServer([sys.executable, "-c", "pass"])
+        monkeypatch.setattr(demucs_server, "get_server", lambda *a, **k: broken)
+        worker = self._worker(src, tmp_path, monkeypatch)
+        assert worker._run_on_server(None) is False
+        # No se reintenta en cada canción de la sesión
+        assert DemucsWorker._server_unavailable is True
+        monkeypatch.setattr(demucs_server, "get_server",
+                            lambda *a, **k: pytest.fail("no debe relanzarse"))
+        assert worker._run_on_server(None) is False
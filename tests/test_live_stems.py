@@ -0,0 +1,253 @@
+"""Tests de la separación progresiva: tramos, stems parciales y mezclador."""
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import demucs_server
+from demucs_scheduler import DemucsScheduler
+from demucs_server import (
+    LIVE_INFO, SeparationServer, _LiveStems, live_chunks, server_command,
+)
+from live_stems import LiveStems
+
+SR = 8000
+
+
+def _wav(path, seconds, sr=SR):
+    """WAV mono de 16 bits con una rampa (cada frame distinto)."""
+    frames = (np.arange(int(seconds * sr)) % 20000 - 10000).astype(np.int16)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(frames.tobytes())
+    return frames
+
+
+def _pcm(frames):
+    return frames.astype(np.int16).tobytes()
+
+
+class TestTramos:
+    def test_primero_corto_y_luego_duplican(self):
+        chunks = list(live_chunks(200 * SR, SR))
+        sizes = [(end - start) // SR for start, end in chunks]
+        assert sizes == [8, 16, 32, 60, 60, 24]
+        assert chunks[0][0] == 0 and chunks[-1][1] == 200 * SR
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+
+
+class TestLiveStems:
+    def test_lee_hasta_la_frontera_de_todos_los_stems(self, tmp_path):
+        audio = np.arange(3 * SR, dtype=np.int16)
+        writer = _LiveStems(tmp_path / "live", ("vocals", "no_vocals"), SR, 1, len(audio))
+        try:
+            writer.write({"vocals": _pcm(audio[:SR]), "no_vocals": _pcm(audio[:SR])}, SR)
+            live = LiveStems(tmp_path / "live")
+            assert live.stems == ("vocals", "no_vocals")
+            assert live.frontier == SR and live.tracks[0].shape == (3 * SR, 1)
+            # Un stem adelantado no mueve la frontera
+            writer._files["vocals"].writeframes(_pcm(audio[SR:2 * SR]))
+            assert not live.refresh() and live.frontier == SR
+            writer._files["no_vocals"].writeframes(_pcm(audio[SR:2 * SR]))
+            assert live.refresh() and live.frontier == 2 * SR
+            expected = audio[:2 * SR] / 32768.0
+            assert np.allclose(live.tracks[1][:2 * SR, 0], expected)
+            assert not live.tracks[1][2 * SR:].any()
+            writer.write({"vocals": _pcm(audio[2 * SR:]), "no_vocals": _pcm(audio[2 * SR:])},
+                         SR)
+        finally:
+            writer.close()
+        assert live.finish() and live.complete
+        assert live.frontier == 3 * SR and not (tmp_path / "live").exists()
+
+
+class TestServidorProgresivo:
+    def test_separador_falso_escribe_tramo_a_tramo(self, tmp_path):
+        audio = _wav(tmp_path / "tema.wav", 70)
+        server = SeparationServer(server_command(
+            sys.executable, extra_args=["--fake", "--fake-step-s", "0.3"]))
+        live_dir = tmp_path / "live"
+        seen = []
+
+        def on_progress(p):
+            # Qué había en disco cada vez que avanzó la separación
+            info = (live_dir / LIVE_INFO).exists()
+            with wave.open(str(live_dir / "vocals.wav"), "rb") as w:
+                seen.append((p, info, w.getnframes()))
+
+        try:
+            server.separate(tmp_path / "tema.wav", tmp_path / "out", on_progress,
+                            two_stems="vocals", live_dir=str(live_dir))
+        finally:
+            server.close()
+        assert [frames for _, _, frames in seen] == [8 * SR, 24 * SR, 56 * SR, 70 * SR]
+        assert all(info for _, info, _ in seen)
+        for stem in ("vocals", "no_vocals"):
+            with wave.open(str(live_dir / f"{stem}.wav"), "rb") as w:
+                assert np.array_equal(np.frombuffer(w.readframes(w.getnframes()), np.int16),
+                                      audio)
+            assert (tmp_path / "out" / "htdemucs_ft" / "tema" / f"{stem}.mp3").exists()
+
+
+@pytest.fixture
+def live_worker(tmp_path, monkeypatch):
+    """DemucsWorker con escucha progresiva sobre el servidor falso."""
+    from demucs_worker import LIVE_DIR, DemucsWorker
+    _wav(tmp_path / "tema.wav", 70)
+    server = SeparationServer(server_command(
+        sys.executable, extra_args=["--fake", "--fake-step-s", "0.3"]))
+    server.start()      # el modelo ya cargado, como entre canciones
+    monkeypatch.setattr(demucs_server, "get_server", lambda *a, **k: server)
+    monkeypatch.setattr(DemucsWorker, "_server_unavailable", False)
+    worker = DemucsWorker("A", "B", tmp_path / "tema.wav", live=True)
+    worker.base_path = tmp_path / "lib" / "A" / "B"
+    yield worker, worker.base_path / LIVE_DIR
+    server.close()
+
+
+class TestWorkerProgresivo:
+    def test_avisa_con_el_primer_tramo(self, live_worker):
+        worker, live_dir = live_worker
+        started = time.monotonic()
+        ready, errors = [], []
+        worker.live_ready.connect(
+            lambda d: ready.append((d, time.monotonic() - started)))
+        worker.error.connect(errors.append)
+        worker.run()
+        total = time.monotonic() - started
+        assert not errors and len(ready) == 1
+        assert ready[0][0] == str(live_dir)
+        # 4 tramos de 0.3 s: el primero suena bastante antes del final
+        assert ready[0][1] < total / 2
+        assert (worker.base_path / "separated" / "vocals.mp3").exists()
+        # La app lee los WAV parciales hasta el final: siguen ahí
+        assert LiveStems(live_dir).frontier == 70 * SR
+
+    def test_los_que_se_escuchan_no_van_en_lote(self):
+        scheduler = DemucsScheduler(lambda job, slot: None, max_jobs=1, batch_size=4)
+        scheduler.submit({"song": "en curso", "profile": "mejor"})
+        for i, listen in enumerate((False, True, False)):
+            scheduler.submit({"song": str(i), "profile": "mejor", "listen": listen})
+        scheduler.finished(0)
+        assert [j["song"] for j in scheduler.running[0]["batch"]] == ["0", "2"]
+        scheduler.finished(0)
+        assert scheduler.running[0]["song"] == "1" and "batch" not in scheduler.running[0]
+
+
+class TestMezcladorConFrontera:
+    def _state(self, player):
+        return (player._track_data, player._track_names, player._track_frontier,
+                dict(player.mute_states), player.auto_unmute_enabled)
+
+    def _restore(self, player, saved):
+        (player._track_data, player._track_names, player._track_frontier,
+         player.mute_states, player.auto_unmute_enabled) = saved
+
+    def test_no_lee_mas_alla_de_lo_separado(self, player):
+        saved = self._state(player)
+        data = np.full((10000, 2), 0.5, dtype=np.float32)
+        written = []
+        cancel = threading.Event()
+
+        class Stream:
+            def write(self, chunk):
+                written.append(chunk.copy())
+                time.sleep(0.001)
+
+        def played():
+            return sum(len(c) for c in written if c.any())
+
+        def wait_silence(n=3):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if len(written) >= n and not any(c.any() for c in written[-n:]):
+                    return
+                time.sleep(0.01)
+            raise AssertionError("el mezclador no esperó en la frontera")
+
+        try:
+            player._track_data, player._track_names = [(data, SR)], ["vocals"]
+            player.mute_states["vocals"] = False
+            player.auto_unmute_enabled = False
+            player._track_frontier = 3000
+            writer = threading.Thread(target=player._stream_writer,
+                                      args=(Stream(), 0, cancel), daemon=True)
+            writer.start()
+            wait_silence()
+            assert played() == 3000
+            assert player._seek_position == 3000
+            # Llega otro tramo: sigue desde donde estaba
+            player._track_frontier = 7000
+            written.clear()
+            wait_silence()
+            assert played() == 4000
+            # Al final tampoco termina mientras la separación siga en curso
+            player._track_frontier = len(data)
+            written.clear()
+            wait_silence()
+            assert writer.is_alive() and player._seek_position == len(data)
+        finally:
+            cancel.set()
+            writer.join(2)
+            self._restore(player, saved)
+
+    def test_seek_no_pasa_la_frontera(self, player):
+        saved = self._state(player)
+        try:
+            player._track_data = [(np.zeros((60 * SR, 2), dtype=np.float32), SR)]
+            player._set_song_length(60)
+            player._track_frontier = 10 * SR
+            player.seek_to(40_000)
+            assert player._seek_position == 10 * SR
+        finally:
+            self._restore(player, saved)
+            player._seek_position = 0
+
+
+class TestReproduccionEnVivo:
+    def test_suena_mientras_separa_y_queda_en_la_playlist(self, player, tmp_path,
+                                                          monkeypatch):
+        monkeypatch.setattr(player, "_control_channels", lambda action: None)
+        metadata = []
+        monkeypatch.setattr(player, "_update_metadata",
+                            lambda: metadata.append(player.current_index))
+        song = tmp_path / "A" / "B"
+        live_dir = song / ".live"
+        audio = np.arange(20 * SR, dtype=np.int16)
+        writer = _LiveStems(live_dir, ("vocals", "no_vocals"), SR, 1, len(audio))
+        job = {"artist": "A", "song": "B", "listen": True}
+        player.demucs_scheduler.running[7] = job
+        try:
+            writer.write({s: _pcm(audio[:8 * SR]) for s in ("vocals", "no_vocals")}, 8 * SR)
+            player._play_live(7, str(live_dir))
+            assert player._live_job is job and player.current_index == -1
+            assert player._track_names == ["vocals", "no_vocals"]
+            assert player._track_frontier == 8 * SR
+            assert player.progress_song.maximum() == 20_000
+
+            writer.write({s: _pcm(audio[8 * SR:]) for s in ("vocals", "no_vocals")},
+                         12 * SR)
+            player._refresh_live()
+            assert player._track_frontier == 20 * SR
+
+            # Terminó el trabajo: la canción ya está en la playlist
+            player.playlist.append({"artist": "A", "song": "B", "path": str(song)})
+
+            class Worker:
+                base_path = song
+
+            player._listen_finished(job, Worker())
+            assert player._track_frontier is None and player._live is None
+            assert player.current_index == 0 and metadata == [0]
+            assert not live_dir.exists()
+            assert np.allclose(player._track_data[1][0][:, 0], audio / 32768.0)
+        finally:
+            writer.close()
+            player.demucs_scheduler.running.pop(7, None)
+            player.stop_playback()
+            player._track_data, player._track_names = [], []
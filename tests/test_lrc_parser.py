@@ -0,0 +1,176 @@
+"""Tests del parser LRC compartido (lrc_parser) y su benchmark."""
+import os
+import re
+import timeit
+
+import numpy as np
+import pytest
+
+import lrc_parser
+from lrc_parser import ParsedLyrics, load_lrc, parse_lrc_text, set_lrc_offset
+
+LRC_COMPLETO = """[ar:Artista]
+[ti:Título]
+[offset:+500]
+[00:01.00]<center>Primera</center>
+continuación
+
+[00:03.50][01:00.00]<center>Coro</center>
+[00:02:25]<00:02.25>pa <00:02.75>la
+[00:05.00]<center><font color="#B23A36">Rojo</font></center>
+[00:06]<center></center>
+"""
+
+
+class TestParseLrcText:
+    def test_bloques_ordenados_con_offset(self):
+        lyrics = parse_lrc_text(LRC_COMPLETO)
+        # +500 ms adelanta todo medio segundo
+        assert lyrics.offset == 0.5
+        assert list(lyrics.starts) == pytest.approx([0.5, 1.75, 3.0, 4.5, 5.5, 59.5])
+        assert lyrics[0] == (0.5, "<center>Primera</center>\ncontinuación")
+
+    def test_varios_timestamps_repiten_el_texto(self):
+        lyrics = parse_lrc_text(LRC_COMPLETO)
+        assert lyrics.texts[2] == lyrics.texts[5] == "<center>Coro</center>"
+
+    def test_html_y_marcas_precalculadas(self):
+        lyrics = parse_lrc_text(LRC_COMPLETO)
+        assert lyrics.html[0] == "<center>Primera</center><br>continuación"
+        # Los timestamps por palabra no se muestran
+        assert lyrics.html[1] == "pa la"
+        assert list(lyrics.blank) == [False, False, False, True, True, False]
+
+    def test_timestamps_por_palabra(self):
+        lyrics = parse_lrc_text(LRC_COMPLETO)
+        assert list(lyrics.words[1]) == pytest.approx([1.75, 2.25])
+        assert lyrics.words[0] is None
+
+    def test_index_at(self):
+        lyrics = parse_lrc_text(LRC_COMPLETO)
+        assert lyrics.index_at(0.0) == -1
+        assert lyrics.index_at(0.5) == 0
+        assert lyrics.index_at(3.2) == 2
+        assert lyrics.index_at(999.0) == len(lyrics) - 1
+
+    def test_vacio_y_sin_timestamps(self):
+        assert len(parse_lrc_text("")) == 0
+        assert len(parse_lrc_text("[ar:X]\nsolo texto\n")) == 0
+
+    def test_from_pairs(self):
+        lyrics = ParsedLyrics.from_pairs([(2.0, "<center></center>"),
+                                          (1.0, "a\nb")])
+        assert list(lyrics) == [(1.0, "a\nb"), (2.0, "<center></center>")]
+        assert lyrics.html[0] == "a<br>b"
+        assert list(lyrics.blank) == [False, True]
+
+
+class TestLoadLrc:
+    def test_cache_por_fecha_de_modificacion(self, tmp_path):
+        lrc = tmp_path / "lyrics.lrc"
+        lrc.write_text("[00:01.00]uno\n", encoding="utf-8")
+        first = load_lrc(lrc)
+        assert load_lrc(lrc) is first
+        lrc.write_text("[00:01.00]uno\n[00:02.00]dos\n", encoding="utf-8")
+        assert len(load_lrc(lrc)) == 2
+
+    def test_mismo_tamano_con_otra_fecha_se_relee(self, tmp_path):
+        lrc = tmp_path / "lyrics.lrc"
+        lrc.write_text("[00:01.00]uno\n", encoding="utf-8")
+        load_lrc(lrc)
+        lrc.write_text("[00:09.00]uno\n", encoding="utf-8")
+        st = lrc.stat()
+        os.utime(lrc, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert load_lrc(lrc)[0][0] == 9.0
+
+
+class TestSetLrcOffset:
+    def test_reemplaza_cabecera_sin_tocar_timestamps(self, tmp_path):
+        lrc = tmp_path / "lyrics.lrc"
+        lrc.write_text("[ar:X]\n[offset:+100]\n[00:01.00]uno\n", encoding="utf-8")
+        set_lrc_offset(lrc, -0.25)
+        assert lrc.read_text(encoding="utf-8") == (
+            "[offset:-250]\n[ar:X]\n[00:01.00]uno\n")
+        assert load_lrc(lrc)[0][0] == 1.25
+        assert not (tmp_path / "lyrics.lrc.tmp").exists()
+
+    def test_cero_quita_la_cabecera(self, tmp_path):
+        lrc = tmp_path / "lyrics.lrc"
+        lrc.write_text("[offset:+100]\n[00:01.00]uno\n", encoding="utf-8")
+        set_lrc_offset(lrc, 0.0)
+        assert lrc.read_text(encoding="utf-8") == "[00:01.00]uno\n"
+
+
+def _corpus(tmp_path, files=200, lines=80, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for k in range(files):
+        rows = ["[ar:Artista]", "[ti:Título]"]
+        t = 0.0
+        for i in range(lines):
+            t += rng.uniform(1.0, 5.0)
+            words = " ".join(f"palabra{j}" for j in range(rng.integers(3, 9)))
+            rows.append(f"[{int(t // 60):02d}:{t % 60:05.2f}]<center>{words}</center>")
+            if i % 7 == 0:
+                rows.append("continuación del bloque")
+        path = tmp_path / f"{k}.lrc"
+        path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _legacy_parse(path):
+    """Parser de LazyLyricsManager antes del parser compartido."""
+    lyrics, current_time, current_text = [], None, []
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    for line in lines:
+        line = line.rstrip('\n\r')
+        m = re.match(r'\[(\d+):(\d+\.\d+)\]', line)
+        if m:
+            if current_time is not None and current_text:
+                lyrics.append((current_time, '\n'.join(current_text)))
+            current_time = int(m.group(1)) * 60 + float(m.group(2))
+            current_text = [line[m.end():]]
+        elif current_time is not None and line:
+            current_text.append(line)
+    if current_time is not None and current_text:
+        lyrics.append((current_time, '\n'.join(current_text)))
+    return lyrics
+
+
+def _legacy_tick(lyrics, now):
+    """Búsqueda de línea y HTML de update_lyrics_display antes del cambio."""
+    current_html = next_html = ""
+    for i, (t, html) in enumerate(lyrics):
+        if now >= t:
+            current_html = html
+            next_html = lyrics[i + 1][1] if i + 1 < len(lyrics) else ""
+        else:
+            break
+    return current_html.replace('\n', '<br>'), next_html.replace('\n', '<br>')
+
+
+@pytest.mark.benchmark
+class TestBenchmarkCorpus:
+    def test_corpus_sintetico(self, tmp_path, monkeypatch):
+        paths = _corpus(tmp_path)
+        monkeypatch.setattr(lrc_parser, "LRC_CACHE_SIZE", len(paths))
+
+        def per_file(fn):
+            return min(timeit.repeat(lambda: [fn(p) for p in paths],
+                                     number=1, repeat=3)) / len(paths)
+
+        legacy = per_file(_legacy_parse)
+        cached = per_file(load_lrc)
+
+        lyrics = load_lrc(paths[0])
+        old_list = _legacy_parse(paths[0])
+        assert [t for t, _ in old_list] == pytest.approx(list(lyrics.starts))
+        now = float(lyrics.starts[-2])
+        tick_old = min(timeit.repeat(lambda: _legacy_tick(old_list, now),
+                                     number=500, repeat=3)) / 500
+        tick_new = min(timeit.repeat(lambda: lyrics.html[lyrics.index_at(now)],
+                                     number=500, repeat=3)) / 500
+        assert cached * 5 < legacy
+        assert tick_new * 3 < tick_old
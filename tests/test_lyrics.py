@@ -1,8 +1,11 @@
 """Tests de letras: parsing LRC, ajuste de timing, placeholder de reintento."""
 
+import json
+
 import pytest
 
 from audio_player import LYRICS_NOT_FOUND_TEXT
+from lyrics_fetcher import read_lyrics_status
 
 LRC_EJEMPLO = """[00:01.00]<center>Primera línea</center>
 [00:03.50]<center>Segunda línea</center>
@@ -36,18 +39,41 @@ class TestParsingLRC:
 
 
 class TestAjusteTiming:
-    def test_adjust_time_suma_offset(self, player):
-        assert player._adjust_time("00:10.00", 0.5) == "00:10.50"
-        assert player._adjust_time("01:59.80", 0.5) == "02:00.30"
-
-    def test_adjust_time_no_baja_de_cero(self, player):
-        assert player._adjust_time("00:00.20", -0.5) == "00:00.00"
-
-    def test_process_lines_conserva_lineas_sin_timestamp(self, player):
-        lines = ["sin timestamp\n", "[00:05.00]con timestamp\n"]
-        result = player._process_lines(lines, 1.0)
-        assert result[0] == "sin timestamp\n"
-        assert result[1].startswith("[00:06.00]")
+    @pytest.fixture
+    def cancion(self, player, tmp_path):
+        (tmp_path / "lyrics.lrc").write_text(LRC_EJEMPLO, encoding="utf-8")
+        player.playlist = [{"path": str(tmp_path)}]
+        player.current_index = 0
+        player.lyrics = player.lazy_lyrics.load_lyrics_lazy(tmp_path)
+        return tmp_path / "lyrics.lrc"
+
+    def test_ajuste_no_toca_el_archivo_hasta_guardar(self, player, cancion):
+        player.adjust_lyrics_timing(0.5)
+        player.adjust_lyrics_timing(0.5)
+        assert cancion.read_text(encoding="utf-8") == LRC_EJEMPLO
+        assert player._lyrics_offset_timer.isActive()
+        # Mostrar 1 s después: en 1.5 s aún no empieza la primera línea
+        assert player._lyrics_index(1.5) == -1
+        assert player._lyrics_index(2.0) == 0
+
+    def test_guardar_escribe_offset_sin_tocar_timestamps(self, player, cancion):
+        player.adjust_lyrics_timing(0.5)
+        player._save_lyrics_offset()
+        content = cancion.read_text(encoding="utf-8")
+        assert content == "[offset:-500]\n" + LRC_EJEMPLO
+        assert not player._lyrics_offset_timer.isActive()
+        # La letra recargada ya trae el offset y el ajuste pendiente es 0
+        assert player._lyrics_nudge == 0.0
+        assert player.lyrics[0][0] == 1.5
+        assert player._lyrics_index(1.5) == 0
+
+    def test_ajustes_se_acumulan_y_cero_quita_la_cabecera(self, player, cancion):
+        player.adjust_lyrics_timing(-0.5)
+        player._save_lyrics_offset()
+        assert cancion.read_text(encoding="utf-8").startswith("[offset:+500]")
+        player.adjust_lyrics_timing(0.5)
+        player._save_lyrics_offset()
+        assert cancion.read_text(encoding="utf-8") == LRC_EJEMPLO
 
 
 class TestFallbackHibrido:
@@ -73,6 +99,19 @@ class TestFallbackHibrido:
         assert "<center>mundo</center>" in content
         assert LYRICS_NOT_FOUND_TEXT not in content
 
+    def test_estado_queda_en_data_json(self, player, tmp_path, monkeypatch):
+        (tmp_path / "data.json").write_text(
+            json.dumps({"A": {"B": {"path": str(tmp_path)}}}), encoding="utf-8")
+        monkeypatch.setattr(player, "_search_lrclib", lambda a, s: "")
+        monkeypatch.setattr(
+            player, "_search_syncedlyrics", lambda a, s: "[00:02.00]x\n[00:03.00]y"
+        )
+        assert player._fetch_lyrics_from_api("A", "B", tmp_path) is True
+        status = read_lyrics_status(tmp_path)
+        assert status["status"] == "found"
+        assert status["provider"] == "syncedlyrics"
+        assert status["lines"] == 2
+
     def test_placeholder_si_ambos_fallan(self, player, tmp_path, monkeypatch):
         monkeypatch.setattr(player, "_search_lrclib", lambda a, s: "")
         monkeypatch.setattr(player, "_search_syncedlyrics", lambda a, s: "")
@@ -80,6 +119,21 @@ class TestFallbackHibrido:
         content = (tmp_path / "lyrics.lrc").read_text(encoding="utf-8")
         assert LYRICS_NOT_FOUND_TEXT in content
 
+    def test_proveedor_caido_no_escribe_placeholder(self, player, tmp_path, monkeypatch):
+        from lyrics_fetcher import LookupFailed
+
+        def down(a, s):
+            raise LookupFailed("503")
+
+        monkeypatch.setattr(player, "_search_lrclib", down)
+        monkeypatch.setattr(player, "_search_syncedlyrics", lambda a, s: "")
+        with pytest.raises(LookupFailed):
+            player._fetch_lyrics_from_api("A", "B", tmp_path)
+        assert not (tmp_path / "lyrics.lrc").exists()
+        # Si el otro sí las tiene, se usan
+        monkeypatch.setattr(player, "_search_syncedlyrics", lambda a, s: "[00:02.00]x")
+        assert player._fetch_lyrics_from_api("A", "B", tmp_path) is True
+
     def test_search_syncedlyrics_tolera_paquete_ausente(self, player, monkeypatch):
         import builtins
         real_import = builtins.__import__
@@ -0,0 +1,256 @@
+"""Tests del buscador concurrente de letras contra un servidor LRCLIB local."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import lyrics_fetcher
+from lyrics_fetcher import (BACKOFF_BASE_S, LYRICS_FOUND, LYRICS_MISSING,
+                            LYRICS_NOT_FOUND_TEXT, FailedLookups, LyricsFetcher,
+                            RateLimiter, lyrics_status, read_lyrics_status,
+                            write_lyrics_status)
+
+
+class _StubLrclib(BaseHTTPRequestHandler):
+    """Responde /api/search con `syncedLyrics` solo para los títulos de
+    `server.known`; anota cada petición y el puerto cliente (conexión)."""
+
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def do_GET(self):
+        q = parse_qs(urlparse(self.path).query)["q"][0]
+        artist, song = q.split(" ", 1)
+        with self.server.lock:
+            self.server.queries.append(q)
+            self.server.ports.add(self.client_address[1])
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        results = []
+        if song in self.server.known:
+            results.append({"artistName": artist, "trackName": song,
+                            "syncedLyrics": f"[00:01.00]{song}"})
+        body = json.dumps(results).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def lrclib():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLrclib)
+    server.lock = threading.Lock()
+    server.queries, server.ports, server.known = [], set(), set()
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/api/search"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(lrclib, tmp_path, monkeypatch):
+    monkeypatch.setattr(lyrics_fetcher, "LRCLIB_INTERVAL_S", 0.0)
+
+    def fetch(artist, song, dir_path):
+        lyrics = f.search_lrclib(artist, song)
+        text = lyrics or f"[00:00.00]{LYRICS_NOT_FOUND_TEXT}"
+        (dir_path / "lyrics.lrc").write_text(text, encoding="utf-8")
+        return bool(lyrics)
+
+    f = LyricsFetcher(fetch, failures_path=tmp_path / "failures.json",
+                      lrclib_url=lrclib.url, idle_s=0.2)
+    yield f
+    f.close()
+
+
+def _songs(tmp_path, n):
+    dirs = []
+    for i in range(n):
+        d = tmp_path / f"song{i}"
+        d.mkdir()
+        dirs.append((d, "Artista", f"tema{i}"))
+    return dirs
+
+
+class TestLyricsFetcher:
+    def test_busca_en_paralelo_reutilizando_conexiones(self, fetcher, lrclib, tmp_path):
+        songs = _songs(tmp_path, 30)
+        lrclib.known.update(song for _, _, song in songs[:20])
+        for d, artist, song in songs:
+            fetcher.submit(d, artist, song)
+        fetcher.join()
+        assert len(lrclib.queries) == 30
+        # Keep-alive: como mucho una conexión por worker, no una por canción
+        assert len(lrclib.ports) <= fetcher.workers
+        assert (songs[0][0] / "lyrics.lrc").read_text(encoding="utf-8") == "[00:01.00]tema0"
+        assert fetcher.failures.failures("Artista", "tema25") == 1
+
+    def test_no_rebusca_con_letras_ni_durante_el_backoff(self, fetcher, lrclib, tmp_path):
+        songs = _songs(tmp_path, 4)
+        lrclib.known.add("tema0")
+        (songs[1][0] / "lyrics.lrc").write_text("[00:01.00]ya estaba", encoding="utf-8")
+        for _ in range(2):
+            for d, artist, song in songs:
+                fetcher.submit(d, artist, song)
+            fetcher.join()
+        # Primera ronda: 0, 2 y 3; segunda: nada (0 tiene letras, 2-3 en espera)
+        assert sorted(lrclib.queries) == ["Artista tema0", "Artista tema2",
+                                          "Artista tema3"]
+
+    def test_registro_persiste_entre_sesiones(self, fetcher, lrclib, tmp_path):
+        (d, artist, song), = _songs(tmp_path, 1)
+        fetcher.submit(d, artist, song)
+        fetcher.join()
+        fetcher.close()
+        again = FailedLookups(tmp_path / "failures.json")
+        assert again.failures(artist, song) == 1
+        assert not again.should_retry(artist, song)
+
+    def test_sin_respuesta_no_hay_backoff(self, fetcher, lrclib, tmp_path):
+        (d, artist, song), = _songs(tmp_path, 1)
+        lrclib.status = 503
+        fetcher.submit(d, artist, song)
+        fetcher.join()
+        fetcher.close()
+        assert lrclib.queries == ["Artista tema0"]
+        assert not (d / "lyrics.lrc").exists()
+        assert fetcher.failures.failures(artist, song) == 0
+        assert not (tmp_path / "failures.json").exists()
+        # Vuelve el servicio: la siguiente carga sí busca
+        lrclib.status = 200
+        fetcher.submit(d, artist, song)
+        fetcher.join()
+        assert len(lrclib.queries) == 2 and fetcher.failures.failures(artist, song) == 1
+
+    def test_error_de_conexion_no_es_un_no_hay(self, fetcher, lrclib):
+        fetcher.lrclib_url = "http://127.0.0.1:9/api/search"
+        with pytest.raises(lyrics_fetcher.LookupFailed):
+            fetcher.search_lrclib("Artista", "tema")
+        fetcher.lrclib_url = lrclib.url
+        assert fetcher.search_lrclib("Artista", "otro") == ""
+
+    def test_submit_al_vencer_la_espera_no_queda_varado(self, fetcher, lrclib, tmp_path):
+        (d0, artist, song0), (d1, _, song1) = _songs(tmp_path, 2)
+        real_save = fetcher.failures.save
+        saves = []
+
+        def save():
+            saves.append(1)
+            if len(saves) == 2:
+                # El worker venció la espera y está guardando: llega otra
+                fetcher.submit(d1, artist, song1)
+            real_save()
+
+        fetcher.failures.save = save
+        fetcher.submit(d0, artist, song0)
+        deadline = time.monotonic() + 5
+        while len(lrclib.queries) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert lrclib.queries == [f"{artist} {song0}", f"{artist} {song1}"]
+
+
+def _data_json(dir_path, artist, song, **entry):
+    entry.setdefault("path", str(dir_path))
+    (dir_path / "data.json").write_text(json.dumps({artist: {song: entry}}),
+                                        encoding="utf-8")
+
+
+class TestEstadoLetras:
+    def test_con_estado_no_se_lee_ningun_lrc(self, fetcher, lrclib, tmp_path,
+                                             monkeypatch):
+        songs = _songs(tmp_path, 3)
+        reads = []
+        real_read = lyrics_fetcher.Path.read_text
+        monkeypatch.setattr(lyrics_fetcher.Path, "read_text",
+                            lambda self, *a, **k: reads.append(self) or real_read(self, *a, **k))
+        (songs[0][0] / "lyrics.lrc").write_text("[00:01.00]a\n", encoding="utf-8")
+        fetcher.failures.record("Artista", "tema1", found=False)
+        statuses = [lyrics_status(True, "lrclib", 12), lyrics_status(False), None]
+        for (d, artist, song), status in zip(songs, statuses):
+            fetcher.submit(d, artist, song, status)
+        fetcher.join()
+        # Solo la canción sin estado (y sin .lrc ni data.json) se revisó y buscó
+        assert lrclib.queries == ["Artista tema2"]
+        assert {p.parent.name for p in reads if p.name == "lyrics.lrc"} <= {"song2"}
+
+    def test_encontrada_sin_lrc_se_vuelve_a_buscar(self, fetcher, lrclib, tmp_path):
+        (d, artist, song), = _songs(tmp_path, 1)
+        lrclib.known.add(song)
+        # data.json dice "found" pero el .lrc se borró a mano
+        fetcher.submit(d, artist, song, lyrics_status(True, "lrclib", 12))
+        fetcher.join()
+        assert lrclib.queries == [f"{artist} {song}"]
+        assert (d / "lyrics.lrc").exists()
+
+    def test_cancion_vieja_se_revisa_una_vez_y_se_anota(self, fetcher, lrclib, tmp_path):
+        (d, artist, song), = _songs(tmp_path, 1)
+        _data_json(d, artist, song)
+        (d / "lyrics.lrc").write_text("[00:01.00]a\n[00:02.00]b\n", encoding="utf-8")
+        fetcher.submit(d, artist, song)
+        fetcher.join()
+        status = read_lyrics_status(d)
+        assert status["status"] == LYRICS_FOUND and status["lines"] == 2
+        assert lrclib.queries == []
+
+    def test_escribir_estado_no_crea_canciones(self, tmp_path):
+        _data_json(tmp_path, "A", "B", metadata={"album": "X"})
+        write_lyrics_status(tmp_path, "Otro", "B", lyrics_status(True))
+        assert read_lyrics_status(tmp_path) is None
+        write_lyrics_status(tmp_path, "A", "B", lyrics_status(False))
+        data = json.loads((tmp_path / "data.json").read_text(encoding="utf-8"))
+        assert data["A"]["B"]["metadata"] == {"album": "X"}
+        assert data["A"]["B"]["lyrics"]["status"] == LYRICS_MISSING
+        write_lyrics_status(tmp_path / "no_existe", "A", "B", lyrics_status(True))
+
+
+class TestFailedLookups:
+    def test_backoff_exponencial_y_reset_al_encontrar(self):
+        now = [1000.0]
+        f = FailedLookups(None, clock=lambda: now[0])
+        f.record("Á", "b", found=False)
+        assert not f.should_retry("a", "b")   # clave normalizada
+        now[0] += BACKOFF_BASE_S
+        assert f.should_retry("a", "b")
+        f.record("a", "b", found=False)
+        now[0] += BACKOFF_BASE_S
+        assert not f.should_retry("a", "b")   # la segunda espera es el doble
+        now[0] += BACKOFF_BASE_S
+        assert f.should_retry("a", "b")
+        f.record("a", "b", found=True)
+        assert f.failures("a", "b") == 0
+
+    def test_archivo_corrupto_empieza_vacio(self, tmp_path):
+        path = tmp_path / "failures.json"
+        path.write_text("{no es json", encoding="utf-8")
+        assert FailedLookups(path).should_retry("a", "b")
+
+
+class TestRateLimiter:
+    def test_turnos_separados_entre_hilos(self):
+        limiter = RateLimiter(0.05)
+        stamps = []
+
+        def call():
+            limiter.wait()
+            stamps.append(time.monotonic())
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stamps.sort()
+        assert all(b - a >= 0.045 for a, b in zip(stamps, stamps[1:]))
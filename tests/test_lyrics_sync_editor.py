@@ -9,13 +9,16 @@ Headless (QT_QPA_PLATFORM=offscreen). No requieren red. El audio se genera
 sintéticamente con soundfile en archivos temporales.
 """
 
+import json
+
 import numpy as np
 import pytest
 import soundfile as sf
 from PyQt6.QtCore import QEvent, QPointF, Qt
-from PyQt6.QtGui import QMouseEvent
+from PyQt6.QtGui import QImage, QMouseEvent, QPainter
 
 import lyrics_sync_editor as lse
+from separation_profiles import DEFAULT_STEMS
 from lyrics_sync_editor import (
     LyricLine,
     LyricsSyncDialog,
@@ -163,6 +166,222 @@ class TestLoadVocals:
         assert audio.peaks.shape[1] == 2
         assert audio.sr == 8000
 
+    def test_piramide_de_peaks(self, tmp_path):
+        _make_wav(tmp_path / "v.wav", sr=8000, seconds=4.0)
+        audio = load_vocals(tmp_path / "v.wav")
+        assert len(audio.levels) == lse.PEAK_LEVELS
+        fine, pps = audio.levels[0]
+        coarse, coarse_pps = audio.levels[1]
+        assert coarse_pps == pytest.approx(pps / lse.PEAK_LEVEL_FACTOR)
+        f = lse.PEAK_LEVEL_FACTOR
+        assert coarse[0, 0] == fine[:f, 0].min()
+        assert coarse[0, 1] == fine[:f, 1].max()
+        # Con pocos pixeles por segundo se dibuja desde un nivel grueso
+        assert audio.peaks_for(40.0)[1] == pytest.approx(pps / f)
+        assert audio.peaks_for(500.0)[1] == pytest.approx(pps)
+
+    def test_cache_en_disco_evita_releer(self, tmp_path, monkeypatch):
+        _make_wav(tmp_path / "vocals.wav", sr=8000, seconds=2.0)
+        first = load_vocals(tmp_path / "vocals.wav")
+        assert (tmp_path / "vocals.peaks.npz").exists()
+
+        def no_scan(path):
+            raise AssertionError("no debe recorrer el audio")
+        monkeypatch.setattr(lse, "_scan_peaks", no_scan)
+        cached = load_vocals(tmp_path / "vocals.wav")
+        assert np.array_equal(cached.peaks, first.peaks)
+        assert cached.duration == first.duration
+
+    def test_cache_se_invalida_si_cambia_el_audio(self, tmp_path):
+        _make_wav(tmp_path / "vocals.wav", sr=8000, seconds=2.0)
+        load_vocals(tmp_path / "vocals.wav")
+        _make_wav(tmp_path / "vocals.wav", sr=8000, seconds=3.0)
+        audio = load_vocals(tmp_path / "vocals.wav")
+        assert audio.duration == pytest.approx(3.0, abs=0.01)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Onsets de la voz
+# ──────────────────────────────────────────────────────────────────────
+def _voz_sintetica(seconds, entradas, sr=44100, seed=0):
+    """Ruido de fondo muy bajo + notas de 0.4 s (con fundido) en `entradas`."""
+    rng = np.random.default_rng(seed)
+    x = (rng.standard_normal(int(seconds * sr)) * 1e-4).astype(np.float32)
+    t = np.arange(int(0.4 * sr)) / sr
+    env = np.minimum(1.0, (0.4 - t) / 0.1) * np.exp(-3.0 * t)
+    for i, start in enumerate(entradas):
+        nota = 0.3 * np.sin(2 * np.pi * (200 + 50 * (i % 5)) * t) * env
+        a = int(start * sr)
+        x[a:a + len(nota)] += nota.astype(np.float32)
+    return x
+
+
+class TestOnsets:
+    def test_detecta_entradas_tras_silencio(self):
+        entradas = [1.0, 1.7, 2.5, 4.0, 4.45, 6.0]
+        onsets = lse.detect_onsets(_voz_sintetica(8.0, entradas), 44100)
+        assert len(onsets) == len(entradas)
+        assert np.allclose(onsets, entradas, atol=0.03)
+
+    def test_detecta_cambio_de_nota_sin_silencio(self):
+        sr = 44100
+        t = np.arange(3 * sr) / sr
+        freq = np.where(t < 1.0, 220.0, np.where(t < 2.0, 330.0, 262.0))
+        legato = 0.3 * np.sin(2 * np.pi * np.cumsum(freq) / sr)
+        x = np.concatenate((np.zeros(sr // 2), legato)).astype(np.float32)
+        onsets = lse.detect_onsets(x, sr)
+        assert np.allclose(onsets, [0.5, 1.5, 2.5], atol=0.03)
+
+    def test_silencio_no_tiene_onsets(self):
+        assert len(lse.detect_onsets(np.zeros(44100, dtype=np.float32), 44100)) == 0
+        assert len(lse.detect_onsets(np.zeros(10, dtype=np.float32), 44100)) == 0
+
+    def test_nearest_onset_respeta_el_radio(self):
+        onsets = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+        assert lse.nearest_onset(onsets, 2.3, 0.5) == pytest.approx(2.0)
+        assert lse.nearest_onset(onsets, 2.6, 0.5) == pytest.approx(3.0)
+        assert lse.nearest_onset(onsets, 5.0, 0.5) is None
+        assert lse.nearest_onset(onsets[:0], 1.0, 0.5) is None
+
+    def test_cache_junto_al_audio(self, tmp_path):
+        _make_wav(tmp_path / "vocals.wav", sr=8000, seconds=1.0)
+        assert lse.load_onsets(tmp_path / "vocals.wav") is None
+        lse.save_onsets(tmp_path / "vocals.wav", np.array([0.5], dtype=np.float32))
+        assert (tmp_path / "vocals.onsets.npz").exists()
+        assert list(lse.load_onsets(tmp_path / "vocals.wav")) == [0.5]
+        # Audio reescrito: el caché queda viejo
+        _make_wav(tmp_path / "vocals.wav", sr=8000, seconds=2.0)
+        assert lse.load_onsets(tmp_path / "vocals.wav") is None
+
+    def test_benchmark_cancion_de_5_minutos(self):
+        import time
+        entradas = list(np.arange(1.0, 299.0, 0.7))
+        x = _voz_sintetica(300.0, entradas)
+        t0 = time.perf_counter()
+        onsets = lse.detect_onsets(x, 44100)
+        elapsed = time.perf_counter() - t0
+        print(f"\nonsets de 5 min a 44.1 kHz: {elapsed * 1e3:.0f} ms, "
+              f"{len(onsets)} onsets")
+        assert len(onsets) == len(entradas)
+        assert elapsed < 1.0
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Motor de escucha: callback, bucle, scrub y mezcla
+# ──────────────────────────────────────────────────────────────────────
+class _StreamFalso:
+    """OutputStream sin dispositivo: los tests llaman al callback a mano."""
+    abiertos = 0
+
+    def __init__(self, **kw):
+        self.kw = kw
+        _StreamFalso.abiertos += 1
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _rampa(n=8000, sr=8000):
+    """VocalsAudio cuya muestra k vale k (así se lee la posición del bloque)."""
+    audio = _synthetic_audio(duration=n / sr, sr=sr)
+    audio.samples = np.arange(n, dtype=np.float32)
+    return audio
+
+
+def _bloque(engine, frames=lse.AUDITION_BLOCK):
+    out = np.zeros((frames, 1), dtype=np.float32)
+    engine._callback(out, frames, None, None)
+    return out[:, 0]
+
+
+@pytest.fixture
+def stream_falso(monkeypatch):
+    _StreamFalso.abiertos = 0
+    monkeypatch.setattr(lse.sd, "OutputStream", _StreamFalso)
+    return _StreamFalso
+
+
+class TestAuditionEngine:
+    def test_un_solo_stream_y_seek_en_el_siguiente_bloque(self, stream_falso):
+        eng = lse.AuditionEngine(_rampa())
+        eng.play(0.0)
+        assert _bloque(eng)[0] == 0
+        eng.play(0.5)
+        assert _bloque(eng)[0] == 4000
+        eng.play(0.25)
+        assert stream_falso.abiertos == 1
+        assert eng._stream.kw["blocksize"] == lse.AUDITION_BLOCK
+
+    def test_termina_al_final_del_audio(self, stream_falso):
+        eng = lse.AuditionEngine(_rampa(n=300))
+        eng.play(0.0)
+        out = _bloque(eng)
+        out = _bloque(eng)
+        assert out[43] == 299 and out[44:].max() == 0
+        assert not eng.playing
+
+    def test_bucle_vuelve_al_inicio(self, stream_falso):
+        eng = lse.AuditionEngine(_rampa())
+        eng.play_loop(0.1, 0.125)  # frames [800, 1000)
+        out = _bloque(eng)
+        assert out[0] == 800 and out[199] == 999 and out[200] == 800
+        assert eng.looping
+        eng.stop()
+        assert not eng.looping and _bloque(eng).max() == 0
+
+    def test_scrub_limita_la_tasa_de_granos(self, stream_falso, monkeypatch):
+        ahora = [100.0]
+        monkeypatch.setattr(lse.time, "monotonic", lambda: ahora[0])
+        audio = _synthetic_audio(duration=1.0)
+        audio.samples = np.ones(8000, dtype=np.float32)
+        eng = lse.AuditionEngine(audio)
+        eng.scrub(0.5)
+        grano = eng._grain
+        assert len(grano) == int(lse.SCRUB_GRAIN_S * 8000)
+        # Pedidos más rápidos que SCRUB_INTERVAL_S se descartan
+        ahora[0] += lse.SCRUB_INTERVAL_S / 2
+        eng.scrub(0.2)
+        assert eng._grain is grano
+        ahora[0] += lse.SCRUB_INTERVAL_S
+        eng.scrub(0.2)
+        assert eng._grain is not grano
+        # El grano suena con fundido aunque no haya reproducción
+        out = _bloque(eng, frames=len(eng._grain))
+        assert out[0] == 0 and out.max() > 0.9
+        assert eng._grain is None
+
+    def test_mezcla_suma_los_stems(self, stream_falso, tmp_path):
+        for i, name in enumerate(DEFAULT_STEMS):
+            sf.write(str(tmp_path / f"{name}.wav"),
+                     np.full(800, 0.1 * (i + 1), dtype=np.float32), 8000)
+        paths = lse._mix_paths(tmp_path / "vocals.wav")
+        assert len(paths) == 4
+        eng = lse.AuditionEngine(_synthetic_audio(duration=0.1), paths)
+        eng.set_source("mix")
+        eng._loaders["mix"].join(timeout=5)
+        eng.play(0.0)
+        assert _bloque(eng)[0] == pytest.approx(1.0, abs=1e-3)
+
+    def test_mezcla_con_los_stems_de_la_cancion(self, tmp_path):
+        separated = tmp_path / "separated"
+        separated.mkdir()
+        (tmp_path / "data.json").write_text(json.dumps(
+            {"A": {"B": {"separation": {"stems": ["vocals", "no_vocals"]}}}}),
+            encoding="utf-8")
+        for name in ("vocals", "no_vocals"):
+            sf.write(str(separated / f"{name}.wav"), np.zeros(800, dtype=np.float32), 8000)
+        paths = lse._mix_paths(separated / "vocals.wav")
+        assert [p.stem for p in paths] == ["vocals", "no_vocals"]
+
+    def test_sin_stems_no_hay_mezcla(self, tmp_path):
+        assert lse._mix_paths(tmp_path / "vocals.wav") == []
+
 
 # ──────────────────────────────────────────────────────────────────────
 # Widget de onda: mapeo y hit-testing
@@ -199,6 +418,132 @@ class TestWaveformMapeo:
         assert w._block_at(300) == 0      # entre 1.0s(x150) y 5.0s(x750)
         assert w._block_at(800) == 1
 
+    def test_bisect_equivale_al_recorrido_completo(self, app):
+        rng = np.random.default_rng(3)
+        starts = np.sort(rng.uniform(0, 290, 400))
+        lines = [LyricLine(float(t), "x") for t in starts]
+        w = WaveformWidget(_synthetic_audio(duration=300.0), lines)
+        w.resize(800, 240)
+        w.start_pos = 100.0
+
+        def edge_ref(x):
+            return next((i for i, ln in enumerate(lines)
+                         if abs(x - w.sec_to_x(ln.start)) <= lse.EDGE_GRAB_PX), None)
+
+        def block_ref(x):
+            for i, ln in enumerate(lines):
+                end = lines[i + 1].start if i + 1 < len(lines) else 300.0
+                if w.sec_to_x(ln.start) <= x <= w.sec_to_x(end):
+                    return i
+            return None
+
+        for x in np.linspace(-50, 850, 901):
+            assert w._edge_at(x) == edge_ref(x)
+            assert w._block_at(x) == block_ref(x)
+        vis = w._visible_lines()
+        ends = [ln.start for ln in lines[1:]] + [300.0]
+        ref = [i for i, (ln, end) in enumerate(zip(lines, ends))
+               if w.sec_to_x(end) >= 0 and w.sec_to_x(ln.start) <= w.width()]
+        assert set(ref) <= set(vis)
+        assert len(vis) < 40              # solo la ventana, no las 400
+
+    def test_mutacion_externa_avisada_con_lines_changed(self, app):
+        lines = [LyricLine(1.0, "a"), LyricLine(5.0, "b")]
+        w = WaveformWidget(_synthetic_audio(), lines)
+        w.px_per_sec = 150.0
+        lines[1].start = 3.0
+        w.lines_changed()
+        assert w._edge_at(450) == 1
+        # Agregar o quitar líneas se detecta aunque no se avise
+        lines.append(LyricLine(8.0, "c"))
+        assert w._block_at(1250) == 2
+
+    def test_layout_de_texto_se_cachea(self, app, monkeypatch):
+        lines = [LyricLine(1.0, "<center>hola mundo</center>")]
+        w = WaveformWidget(_synthetic_audio(), lines)
+        w.resize(600, 240)
+        llamadas = []
+        original = lse.split_rows
+        monkeypatch.setattr(lse, "split_rows",
+                            lambda t: llamadas.append(t) or original(t))
+        w.grab()
+        w.set_start_pos(0.5)
+        w.grab()
+        assert len(llamadas) == 1
+        lines[0].text = "<center>otra</center>"
+        w.update()
+        w.grab()
+        assert len(llamadas) == 2
+
+
+class TestWaveformDibujo:
+    def _pintar(self, w):
+        img = QImage(w.size(), QImage.Format.Format_ARGB32_Premultiplied)
+        img.fill(0)
+        p = QPainter(img)
+        w._draw_waveform(p, w.start_pos * w.px_per_sec, w.width())
+        p.end()
+        return img
+
+    def test_una_columna_por_peak_y_nada_fuera_del_audio(self, app):
+        audio = _synthetic_audio(duration=2.0)
+        audio.peaks[:, 0] = -0.5
+        audio.peaks[:, 1] = 0.5
+        w = WaveformWidget(audio, [])
+        w.resize(600, 240)          # 600 px a 150 px/s = 4 s > 2 s de audio
+        img = self._pintar(w)
+        mid, amp = 120, 120 * 0.85
+        x = 150                     # 1 s: dentro del audio
+        assert img.pixelColor(x, mid).alpha() > 0
+        assert img.pixelColor(x, int(mid - 0.5 * amp)).alpha() > 0
+        assert img.pixelColor(x, int(mid - 0.5 * amp) - 2).alpha() == 0
+        # Más allá de la duración no hay peaks que pintar
+        assert img.pixelColor(450, mid).alpha() == 0
+
+    def test_respeta_start_pos(self, app):
+        audio = _synthetic_audio(duration=4.0)
+        audio.peaks[400:, 1] = 0.5   # solo desde los 2 s
+        w = WaveformWidget(audio, [])
+        w.resize(300, 240)
+        w.start_pos = 1.0
+        img = self._pintar(w)
+        assert img.pixelColor(140, 80).alpha() == 0   # 1.93 s
+        assert img.pixelColor(160, 80).alpha() > 0    # 2.07 s
+
+
+class TestWaveformTiles:
+    def _contar_tiles(self, w, monkeypatch):
+        pintados = []
+        original = w._render_tile
+
+        def render_tile(k):
+            pintados.append(k)
+            return original(k)
+        monkeypatch.setattr(w, "_render_tile", render_tile)
+        return pintados
+
+    def test_desplazar_reusa_los_tiles(self, app, monkeypatch):
+        w = WaveformWidget(_synthetic_audio(duration=60.0), [])
+        w.resize(1000, 240)
+        pintados = self._contar_tiles(w, monkeypatch)
+        w.grab()
+        iniciales = len(pintados)
+        assert iniciales == 2           # 1000 px en tiles de 512
+        # Seguir la reproducción unos pixeles no vuelve a pintar la onda
+        for _ in range(5):
+            w.set_start_pos(w.start_pos + 0.05)
+            w.grab()
+        assert len(pintados) == iniciales + 1   # solo el tile que entra
+
+    def test_cambio_de_alto_invalida(self, app, monkeypatch):
+        w = WaveformWidget(_synthetic_audio(duration=60.0), [])
+        w.resize(400, 240)
+        pintados = self._contar_tiles(w, monkeypatch)
+        w.grab()
+        w.resize(400, 300)
+        w.grab()
+        assert pintados == [0, 0]
+
 
 class TestWaveformArrastre:
     def _widget(self):
@@ -227,6 +572,24 @@ class TestWaveformArrastre:
         w.mouseMoveEvent(_move(w, 50))      # intenta ir antes de 1.0s
         assert lines[1].start == pytest.approx(1.0 + lse.MIN_GAP)
 
+    def test_iman_pega_el_borde_al_onset(self, app):
+        w, lines = self._widget()
+        w.onsets = np.array([2.05], dtype=np.float32)
+        w.mousePressEvent(_press(w, 150))
+        w.mouseMoveEvent(_move(w, 300))     # 2.0s, a 7.5 px del onset
+        assert lines[0].start == pytest.approx(2.05)
+        w.snap_to_onsets = False
+        w.mouseMoveEvent(_move(w, 300))
+        assert lines[0].start == pytest.approx(2.0)
+
+    def test_arrastre_pide_scrub_en_la_nueva_posicion(self, app):
+        w, _ = self._widget()
+        got = []
+        w.scrub_requested.connect(got.append)
+        w.mousePressEvent(_press(w, 150))
+        w.mouseMoveEvent(_move(w, 300))
+        assert got == [pytest.approx(2.0)]
+
 
 CTRL = Qt.KeyboardModifier.ControlModifier
 
@@ -330,7 +693,7 @@ def dialog(app, tmp_path):
     dlg = LyricsSyncDialog(None, tmp_path / "vocals.wav", lrc)
     yield dlg
     dlg._timer.stop()
-    dlg.player.stop()
+    dlg.player.close()
 
 
 class TestDialogShift:
@@ -352,6 +715,30 @@ class TestDialogShift:
         assert [round(ln.start, 2) for ln in dialog.lines] == [1.0, 5.5, 9.5]
 
 
+class TestDialogEscucha:
+    def test_ctrl_l_repite_la_linea_seleccionada(self, dialog, stream_falso):
+        dialog.waveform.select_single(1)
+        dialog._toggle_loop()
+        assert dialog.player.looping
+        assert dialog.player._loop == (5 * 8000, 9 * 8000)
+        dialog._toggle_loop()
+        assert not dialog.player.playing
+
+    def test_ajustar_seleccion_a_onsets(self, dialog):
+        dialog._on_onsets_ready(np.array([1.2, 4.2, 8.7, 9.1], dtype=np.float32))
+        assert dialog.snap_btn.isEnabled()
+        dialog.waveform.selection = {0, 1, 2}
+        dialog._snap_selected_to_onsets()
+        # 5.0 no tiene onset a menos de ONSET_SNAP_S; 9.0 va al más cercano
+        assert [ln.start for ln in dialog.lines] == [
+            pytest.approx(1.2), 5.0, pytest.approx(9.1)]
+        dialog._undo()
+        assert [ln.start for ln in dialog.lines] == [1.0, 5.0, 9.0]
+
+    def test_mezcla_deshabilitada_sin_stems(self, dialog):
+        assert not dialog.mix_chk.isEnabled()
+
+
 class TestSentenceCase:
     def test_primera_mayuscula_resto_minusculas(self):
         assert sentence_case("HOLA MUNDO cruel") == "Hola mundo cruel"
@@ -800,6 +1187,53 @@ class TestDialogDeshacer:
         dialog._undo()
         assert dialog.waveform.selection == set()
 
+    def test_arrastre_completo_es_un_solo_comando(self, dialog):
+        dialog.waveform.drag_started.emit()
+        for t in (1.2, 1.5, 2.0, 2.4):      # mouseMove intermedios
+            dialog.lines[0].start = t
+        dialog._undo()
+        assert dialog.lines[0].start == pytest.approx(1.0)
+        assert dialog._undo_stack == []
+        dialog._redo()
+        assert dialog.lines[0].start == pytest.approx(2.4)
+
+    def test_historial_guarda_solo_lo_que_cambia(self, dialog):
+        dialog.waveform.selection = {2}
+        dialog._apply_color("azul")
+        dialog.waveform.drag_started.emit()
+        dialog.lines[1].start = 6.0
+        dialog._undo()
+        move, color = dialog._redo_stack[0], dialog._undo_stack[0]
+        assert isinstance(move, lse.MoveLines) and move.indices == [1]
+        assert isinstance(color, lse.SetTexts) and color.indices == [2]
+
+    def test_undo_revierte_merge_y_redo_lo_reaplica(self, dialog):
+        dialog.waveform.selection = {1, 2}
+        dialog._merge_lines()
+        unida = dialog.lines[1].text
+        dialog._undo()
+        assert [strip_tags(ln.text) for ln in dialog.lines] == ["uno", "dos", "tres"]
+        dialog._redo()
+        assert len(dialog.lines) == 2
+        assert dialog.lines[1].text == unida
+
+    def test_aceptar_sin_editar_no_deja_paso(self, dialog, monkeypatch):
+        dialog.lines[0].text = wrap_lyric("Uno")
+        monkeypatch.setattr(lse.QInputDialog, "exec", lambda dlg_self: 1)
+        dialog._edit_text(0)
+        assert dialog._undo_stack == [] and dialog._dirty == 0
+
+    def test_recolorear_solo_registra_lo_que_cambia(self, dialog):
+        dialog.waveform.selection = {0}
+        dialog._apply_color("azul")
+        dialog.waveform.selection = {0, 1}
+        dialog._apply_color("azul")
+        assert [cmd.indices for cmd in dialog._undo_stack] == [[0], [1]]
+        # Quitar el color a líneas que no lo tienen: nada que deshacer
+        dialog.waveform.selection = {2}
+        dialog._apply_color(None)
+        assert len(dialog._undo_stack) == 2 and dialog._dirty == 2
+
     def test_undo_hasta_original_sin_cambios(self, dialog):
         dialog.from_cursor_chk.setChecked(False)
         dialog._shift_all(0.5)
@@ -0,0 +1,132 @@
+"""Tests del índice de separaciones por contenido (deduplicación)."""
+import json
+import sys
+
+import pytest
+
+from separation_index import HASH_BLOCK, HASH_BLOCKS, SeparationIndex, source_hash
+from separation_profiles import PROFILES
+
+
+def _song(library, name, digest, profile="mejor", stems=("drums", "vocals", "bass", "other")):
+    folder = library / "A" / name
+    (folder / "separated").mkdir(parents=True)
+    for stem in stems:
+        (folder / "separated" / f"{stem}.mp3").write_bytes(b"mp3")
+    (folder / "data.json").write_text(json.dumps({"A": {name: {
+        "path": str(folder),
+        "separation": {"profile": profile, "stems": list(stems),
+                       "source_hash": digest}}}}), encoding="utf-8")
+    return folder
+
+
+class TestSourceHash:
+    def test_mismo_contenido_otro_nombre(self, tmp_path):
+        a, b, c = tmp_path / "a.mp3", tmp_path / "copia.flac", tmp_path / "c.mp3"
+        a.write_bytes(b"audio" * 1000)
+        b.write_bytes(b"audio" * 1000)
+        c.write_bytes(b"audio" * 999 + b"otro!")
+        assert source_hash(a) == source_hash(b) != source_hash(c)
+
+    def test_archivo_grande_se_muestrea(self, tmp_path):
+        size = HASH_BLOCK * HASH_BLOCKS * 4
+        data = bytearray(size)
+        path = tmp_path / "grande.wav"
+        path.write_bytes(bytes(data))
+        base = source_hash(path)
+        data[-1] = 1                        # el último bloque siempre entra
+        path.write_bytes(bytes(data))
+        assert source_hash(path) != base
+
+
+class TestSeparationIndex:
+    def test_busqueda_validada_contra_la_biblioteca(self, tmp_path):
+        index = SeparationIndex(tmp_path / "index.json", library=tmp_path / "lib")
+        folder = _song(tmp_path / "lib", "B", "h1")
+        index.add("h1", "mejor", folder)
+        assert index.lookup("h1", "mejor") == folder
+        assert index.lookup("h1", "rapido") is None
+        # Faltan stems: no sirve
+        (folder / "separated" / "bass.mp3").unlink()
+        assert index.lookup("h1", "mejor") is None
+
+    def test_otra_separacion_en_la_carpeta_la_invalida(self, tmp_path):
+        index = SeparationIndex(tmp_path / "index.json")
+        folder = _song(tmp_path / "lib", "B", "h1")
+        index.add("h1", "mejor", folder)
+        index.add("h2", "mejor", folder)
+        assert json.loads((tmp_path / "index.json").read_text()) == {
+            "h2": {"mejor": str(folder)}}
+
+    def test_se_reconstruye_de_los_data_json(self, tmp_path):
+        folder = _song(tmp_path / "lib", "B", "h1", profile="karaoke",
+                       stems=("vocals", "no_vocals"))
+        _song(tmp_path / "lib", "Vieja", "")    # separada antes del hash
+        index = SeparationIndex(tmp_path / "index.json", library=tmp_path / "lib")
+        assert index.lookup("h1", "karaoke") == folder
+        assert json.loads((tmp_path / "index.json").read_text()) == {
+            "h1": {"karaoke": str(folder)}}
+
+
+@pytest.fixture
+def separate(tmp_path, monkeypatch):
+    """Corre DemucsWorker con un demucs falso que anota cada ejecución."""
+    import demucs_worker
+    from demucs_worker import DemucsWorker
+    from test_demucs_progress import _FAKE_DEMUCS
+    runs = tmp_path / "runs.txt"
+    pkg = tmp_path / "fake" / "demucs"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "__main__.py").write_text(
+        f"open({str(runs)!r}, 'a').write('x')\n" + _FAKE_DEMUCS)
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path / "fake"))
+    monkeypatch.setattr(demucs_worker, "get_python_cmd", lambda: sys.executable)
+    monkeypatch.setattr(DemucsWorker, "_server_unavailable", True)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_mps", lambda: False)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_cuda", lambda: False)
+    index = SeparationIndex(tmp_path / "index.json", library=tmp_path / "lib")
+
+    def run(song, src, profile="mejor"):
+        worker = DemucsWorker("A", song, src, profile=PROFILES[profile], index=index)
+        worker.base_path = tmp_path / "lib" / "A" / song
+        errors = []
+        worker.error.connect(errors.append)
+        worker.run()
+        assert not errors
+        return worker
+
+    run.count = lambda: len(runs.read_text()) if runs.exists() else 0
+    return run
+
+
+class TestDeduplicacion:
+    def test_mismo_audio_reutiliza_los_stems(self, separate, tmp_path):
+        src = tmp_path / "tema.mp3"
+        src.write_bytes(b"ID3 audio" * 100)
+        copy = tmp_path / "otro nombre.mp3"
+        copy.write_bytes(src.read_bytes())
+        first = separate("Original", src)
+        second = separate("Copia", copy)
+        assert separate.count() == 1
+        assert second.reused_from == first.base_path and second.separation_s == 0
+        for stem in PROFILES["mejor"].stems:
+            a = first.base_path / "separated" / f"{stem}.mp3"
+            b = second.base_path / "separated" / f"{stem}.mp3"
+            assert b.read_bytes() == a.read_bytes()
+        info = json.loads((second.base_path / "data.json").read_text())
+        assert info["A"]["Copia"]["separation"]["source_hash"] == second.source_hash
+
+        # Re-encolada por accidente: tampoco separa
+        again = separate("Original", src)
+        assert separate.count() == 1 and again.reused_from == again.base_path
+
+    def test_otro_perfil_si_separa(self, separate, tmp_path):
+        src = tmp_path / "tema.mp3"
+        src.write_bytes(b"ID3 audio" * 100)
+        separate("Original", src)
+        worker = separate("Original", src, profile="karaoke")
+        assert separate.count() == 2 and worker.reused_from is None
+        # La carpeta ya no tiene los stems de "mejor": no se reutiliza
+        worker = separate("Copia", src)
+        assert separate.count() == 3 and worker.reused_from is None
@@ -0,0 +1,272 @@
+"""Tests de los perfiles de separación y la tabla de RTF por dispositivo."""
+import json
+import sys
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from separation_profiles import (AUTO_PROFILE, DEFAULT_PROFILE, DEFAULT_STEMS,
+                                 PROFILES, STEM_FORMATS, ProfileStore,
+                                 read_separation_info, song_stem_format, song_stems,
+                                 stem_paths)
+
+
+class TestPerfiles:
+    def test_argumentos_de_la_cli(self):
+        assert PROFILES["mejor"].cli_args() == [
+            "-n", "htdemucs_ft", "--overlap", "0.25", "--shifts", "1"]
+        assert PROFILES["rapido"].cli_args()[:2] == ["-n", "htdemucs"]
+        assert PROFILES["mejor"].bag_size == 4 and PROFILES["rapido"].bag_size == 1
+
+    def test_sin_cambios_el_predeterminado_es_el_de_siempre(self):
+        assert ProfileStore().resolve(None, "CPU").model == "htdemucs_ft"
+
+
+class TestProfileStore:
+    def test_rtf_medido_y_prediccion(self, tmp_path):
+        store = ProfileStore(tmp_path / "p.json")
+        assert store.predict("CPU", "mejor", 200) is None
+        store.record("CPU", "mejor", audio_s=200, elapsed_s=400)
+        assert store.predict("CPU", "mejor", 100) == pytest.approx(200)
+        # Media móvil: una medición atípica no borra la historia
+        store.record("CPU", "mejor", audio_s=200, elapsed_s=800)
+        assert 2.0 < store.rtf("CPU", "mejor") < 4.0
+        # Otro dispositivo, otra tabla
+        assert store.rtf("CUDA", "mejor") is None
+
+    def test_estimacion_de_perfiles_sin_medir(self):
+        store = ProfileStore()
+        store.record("CPU", "mejor", audio_s=100, elapsed_s=200)
+        ratio = PROFILES["rapido"].cost / PROFILES["mejor"].cost
+        assert store.rtf("CPU", "rapido") == pytest.approx(2.0 * ratio)
+
+    def test_auto_elige_el_mas_rapido_sobre_el_piso(self):
+        store = ProfileStore()
+        # Sin mediciones: el de menor costo previsto con calidad >= 2
+        assert store.resolve(AUTO_PROFILE, "CPU").name == "equilibrado"
+        assert store.fastest("CPU", min_quality=1) == "rapido"
+        # Si en este equipo "mejor" resultó más rápido, gana
+        store.record("CUDA", "equilibrado", audio_s=100, elapsed_s=50)
+        store.record("CUDA", "mejor", audio_s=100, elapsed_s=20)
+        assert store.resolve(AUTO_PROFILE, "CUDA").name == "mejor"
+
+    def test_persiste_entre_sesiones(self, tmp_path):
+        path = tmp_path / "p.json"
+        store = ProfileStore(path)
+        store.set_default("rapido")
+        store.record("CPU", "rapido", audio_s=100, elapsed_s=30)
+        again = ProfileStore(path)
+        assert again.default == "rapido"
+        assert again.rtf("CPU", "rapido") == pytest.approx(0.3)
+        with pytest.raises(ValueError):
+            again.set_default("no_existe")
+
+    def test_archivo_corrupto_usa_valores_por_defecto(self, tmp_path):
+        path = tmp_path / "p.json"
+        path.write_text("{roto", encoding="utf-8")
+        assert ProfileStore(path).default == DEFAULT_PROFILE
+
+
+@pytest.fixture
+def run_worker(tmp_path, monkeypatch):
+    """Corre un DemucsWorker completo contra un `python -m demucs` falso."""
+    import demucs_worker
+    from demucs_worker import DemucsWorker
+    from test_demucs_progress import _FAKE_DEMUCS
+    pkg = tmp_path / "fake" / "demucs"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "__main__.py").write_text(_FAKE_DEMUCS)
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path / "fake"))
+    monkeypatch.setattr(demucs_worker, "get_python_cmd", lambda: sys.executable)
+    monkeypatch.setattr(DemucsWorker, "_server_unavailable", True)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_mps", lambda: False)
+    monkeypatch.setattr(demucs_worker, "check_pytorch_cuda", lambda: False)
+    src = tmp_path / "tema.mp3"
+    src.write_bytes(b"ID3")
+
+    def run(profile, stem_format="mp3"):
+        worker = DemucsWorker("A", "B", src, profile=PROFILES[profile],
+                              stem_format=stem_format)
+        worker.base_path = tmp_path / "lib"
+        errors = []
+        worker.error.connect(errors.append)
+        worker.run()
+        assert not errors
+        return worker
+    return run
+
+
+class TestPerfilEnLaCancion:
+    def test_worker_usa_el_perfil_y_lo_anota(self, run_worker):
+        worker = run_worker("rapido")
+        assert (worker.base_path / "separated" / "vocals.mp3").exists()
+        assert not (worker.base_path / "separated" / "htdemucs").exists()
+        info = read_separation_info(worker.base_path)
+        assert info["profile"] == "rapido" and info["model"] == "htdemucs"
+        assert info["stems"] == list(DEFAULT_STEMS)
+        assert worker.separation_s > 0
+
+    def test_dialogo_emite_el_perfil_y_guarda_predeterminado(self, app, tmp_path):
+        from dialogs import SplitDialog
+        store = ProfileStore(tmp_path / "p.json")
+        dialog = SplitDialog(profiles=store)
+        got = []
+        dialog.process_started.connect(lambda *args: got.append(args))
+        dialog.profile_combo.setCurrentIndex(dialog.profile_combo.findData("equilibrado"))
+        dialog.default_chk.setChecked(True)
+        dialog.artist.setText("A")
+        dialog.song.setText("B")
+        dialog.file_path.setText(str(tmp_path / "x.mp3"))
+        dialog._start_process()
+        assert got[0][3:] == (False, "equilibrado", False)
+        assert json.loads((tmp_path / "p.json").read_text())["default"] == "equilibrado"
+        assert SplitDialog(profiles=store).profile_combo.currentData() == "equilibrado"
+
+
+class TestJuegoDeStems:
+    def test_stems_por_perfil(self):
+        assert PROFILES["karaoke"].stems == ("vocals", "no_vocals")
+        assert PROFILES["karaoke"].cli_args()[-2:] == ["--two-stems", "vocals"]
+        assert PROFILES["seis"].stems == DEFAULT_STEMS + ("guitar", "piano")
+        # "auto" nunca cambia el juego de stems
+        assert ProfileStore().fastest("CPU", min_quality=1) == "rapido"
+
+    def test_cancion_vieja_tiene_cuatro(self, tmp_path):
+        assert song_stems(tmp_path) == DEFAULT_STEMS
+
+    def test_repetir_con_karaoke_reemplaza_los_stems(self, run_worker):
+        worker = run_worker("mejor")
+        worker = run_worker("karaoke")
+        separated = worker.base_path / "separated"
+        assert sorted(p.stem for p in separated.glob("*.mp3")) == ["no_vocals", "vocals"]
+        assert song_stems(worker.base_path) == ("vocals", "no_vocals")
+        worker = run_worker("seis")
+        assert len(list(separated.glob("*.mp3"))) == 6
+
+    def test_repetir_conserva_el_estado_de_letras(self, run_worker):
+        from lyrics_fetcher import lyrics_status, read_lyrics_status, write_lyrics_status
+        worker = run_worker("mejor")
+        status = lyrics_status(True, "lrclib", 12)
+        write_lyrics_status(worker.base_path, "A", "B", status)
+        worker = run_worker("karaoke")
+        assert read_lyrics_status(worker.base_path) == status
+        assert read_separation_info(worker.base_path)["profile"] == "karaoke"
+
+    def test_reproduccion_y_controles_de_dos_stems(self, player, tmp_path):
+        song = tmp_path / "A" / "B"
+        (song / "separated").mkdir(parents=True)
+        (song / "data.json").write_text(json.dumps({"A": {"B": {
+            "path": str(song), "separation": {"stems": ["vocals", "no_vocals"]}}}}))
+        t = np.arange(44100, dtype=np.float32) / 44100
+        for name, freq in (("vocals", 440), ("no_vocals", 220)):
+            wave = 0.3 * np.sin(2 * np.pi * freq * t)
+            sf.write(str(song / "separated" / f"{name}.mp3"), wave, 44100)
+        player.playlist.append({"artist": "A", "song": "B", "path": str(song)})
+        player.current_index = 0
+        saved = player.auto_unmute_enabled, dict(player.mute_states)
+        try:
+            assert player._setup_audio()
+            assert player._track_names == ["vocals", "no_vocals"]
+            assert player._track_columns["drums"].isHidden()
+            assert not player._track_columns["no_vocals"].isHidden()
+
+            # Mezcla: el instrumental muteado no entra, la voz sí
+            player.mute_states.update(vocals=False, no_vocals=True)
+            player.auto_unmute_enabled = False
+            player._auto_unmute_gain = 0.0
+            written = []
+            cancel = threading.Event()
+
+            class Stream:
+                def write(self, chunk):
+                    written.append(chunk.copy())
+                    cancel.set()
+
+            player._stream_writer(Stream(), 0, cancel)
+            vocals = player._track_data[0][0][:len(written[0])]
+            gain = player.individual_volumes["vocals"] * player.volume / 100.0
+            assert np.allclose(written[0], vocals * gain, atol=1e-6)
+        finally:
+            # El player es de sesión: dejarlo como estaba
+            player.auto_unmute_enabled, player.mute_states = saved
+            player._track_data, player._track_names = [], []
+            player._apply_stem_controls(DEFAULT_STEMS)
+
+
+def _write_song(folder, stems, fmt, seconds=1.0, sr=44100):
+    """Canción con stems de audio real en `fmt` y su data.json."""
+    (folder / "separated").mkdir(parents=True)
+    t = np.arange(int(seconds * sr)) / sr
+    rng = np.random.default_rng(0)
+    for n, stem in enumerate(stems):
+        tone = 0.3 * np.sin(2 * np.pi * 110 * (n + 1) * t)
+        data = np.stack([tone, tone], axis=1) + 0.05 * rng.standard_normal((len(t), 2))
+        sf.write(str(folder / "separated" / f"{stem}.{fmt}"), data.astype(np.float32), sr)
+    (folder / "data.json").write_text(json.dumps({"A": {"B": {"separation": {
+        "stems": list(stems), "format": fmt}}}}))
+
+
+class TestFormatoDeStems:
+    def test_formato_anotado_y_rutas(self, tmp_path):
+        (tmp_path / "data.json").write_text(json.dumps({"A": {"B": {"separation": {
+            "stems": ["vocals", "no_vocals"], "format": "flac"}}}}))
+        assert song_stem_format(tmp_path) == "flac"
+        assert stem_paths(tmp_path) == [tmp_path / "separated" / "vocals.flac",
+                                        tmp_path / "separated" / "no_vocals.flac"]
+        # Separadas antes de la opción: mp3
+        assert song_stem_format(tmp_path / "vieja") == "mp3"
+
+    def test_formato_predeterminado_persiste(self, tmp_path):
+        store = ProfileStore(tmp_path / "perfiles.json")
+        assert store.stem_format == "mp3"
+        store.set_stem_format("wav")
+        assert ProfileStore(tmp_path / "perfiles.json").stem_format == "wav"
+        with pytest.raises(ValueError):
+            store.set_stem_format("ogg")
+
+    def test_worker_pide_el_formato_a_demucs(self, run_worker):
+        worker = run_worker("rapido", stem_format="flac")
+        assert sorted(p.name for p in (worker.base_path / "separated").iterdir()) == [
+            "bass.flac", "drums.flac", "other.flac", "vocals.flac"]
+        assert read_separation_info(worker.base_path)["format"] == "flac"
+        # Repetir en otro formato no deja los stems viejos
+        worker = run_worker("rapido", stem_format="wav")
+        assert all(p.suffix == ".wav" for p in (worker.base_path / "separated").iterdir())
+
+    @pytest.mark.parametrize("fmt", sorted(STEM_FORMATS))
+    def test_carga_y_duracion_en_cada_formato(self, tmp_path, fmt):
+        from lazy_resources import LazyAudioManager, get_song_duration
+        folder = tmp_path / fmt
+        _write_song(folder, DEFAULT_STEMS, fmt, seconds=61.0, sr=8000)
+        paths = LazyAudioManager().load_audio_lazy(folder)
+        assert paths == stem_paths(folder) and paths[0].suffix == f".{fmt}"
+        assert get_song_duration(folder) == "1:01"
+
+    def test_espacio_en_disco_por_formato(self, tmp_path):
+        sizes = {}
+        for fmt in STEM_FORMATS:
+            _write_song(tmp_path / fmt, DEFAULT_STEMS, fmt, seconds=5.0)
+            sizes[fmt] = sum(p.stat().st_size for p in stem_paths(tmp_path / fmt))
+        assert sizes["mp3"] < sizes["flac"] < sizes["wav"]
+
+
+@pytest.mark.benchmark
+class TestBenchmarkFormatos:
+    def test_tiempo_de_carga(self, tmp_path):
+        import time
+        results = {}
+        for fmt in STEM_FORMATS:
+            folder = tmp_path / fmt
+            _write_song(folder, DEFAULT_STEMS, fmt, seconds=20.0)
+            paths = stem_paths(folder)
+            best = float("inf")
+            for _ in range(3):
+                t0 = time.perf_counter()
+                for p in paths:
+                    sf.read(str(p), dtype="float32", always_2d=True)
+                best = min(best, time.perf_counter() - t0)
+            results[fmt] = best
+        assert results["wav"] < results["mp3"]
@@ -0,0 +1,101 @@
+"""Tests del análisis offline por canción (song_analysis) y su uso en el
+AudioAnalyzer."""
+import os
+
+import numpy as np
+
+from song_analysis import (compute_song_analysis, load_song_analysis,
+                           save_song_analysis)
+
+SR = 22050
+
+
+def _cancion(seconds=2.0):
+    """Cuatro stems estéreo: grave, medio, agudo y uno mudo."""
+    t = np.arange(int(seconds * SR)) / SR
+    tracks = []
+    for freq in (80.0, 440.0, 2500.0, None):
+        mono = np.zeros_like(t) if freq is None else 0.3 * np.sin(2 * np.pi * freq * t)
+        tracks.append((np.repeat(mono[:, None], 2, axis=1).astype(np.float32), SR))
+    return tracks
+
+
+class TestComputeSongAnalysis:
+    def test_formas_y_bandas(self):
+        a = compute_song_analysis(_cancion(), num_bars=32, fft_size=1024, fps=30)
+        assert a.bands.shape == (4, 60, 32)
+        assert a.bands.dtype == a.loudness.dtype == a.peaks.dtype == np.uint8
+        mags = a.band_magnitudes(a.frame_at(1.0))
+        assert mags.shape == (4, 32)
+        assert mags[0].argmax() < mags[1].argmax() < mags[2].argmax()
+        assert mags[3].max() == 0.0
+
+    def test_picos_y_loudness(self):
+        a = compute_song_analysis(_cancion(), num_bars=32, fft_size=1024)
+        idx = a.frame_at(1.0)
+        assert np.isclose(a.peak_envelope(0)[idx], 0.3, atol=0.01)
+        assert a.peaks[3].max() == 0
+        # Tres senos de 0.3 sin correlación: RMS ≈ 0.3·sqrt(3/2) ≈ -8.7 dBFS
+        assert -10.0 < a.loudness_db(idx) < -7.0
+        # El primer frame no ha visto audio todavía
+        assert a.loudness_db(0) == -80.0
+
+    def test_frame_at_se_acota(self):
+        a = compute_song_analysis(_cancion(0.5), num_bars=8, fft_size=512)
+        assert a.frame_at(-1.0) == 0
+        assert a.frame_at(99.0) == a.num_frames - 1
+
+
+class TestPersistencia:
+    def test_ida_y_vuelta(self, tmp_path):
+        a = compute_song_analysis(_cancion(), num_bars=16, fft_size=512,
+                                  source_mtime=123.0)
+        path = tmp_path / "analysis.npz"
+        save_song_analysis(path, a)
+        assert not os.path.exists(str(path) + ".tmp")
+        b = load_song_analysis(path, source_mtime=123.0, num_bars=16, fft_size=512)
+        assert b is not None
+        assert np.array_equal(a.bands, b.bands)
+        assert np.array_equal(a.loudness, b.loudness)
+        assert np.array_equal(a.peaks, b.peaks)
+        assert b.band_scale == a.band_scale
+
+    def test_viejo_o_incompatible_se_descarta(self, tmp_path):
+        a = compute_song_analysis(_cancion(0.5), num_bars=16, fft_size=512,
+                                  source_mtime=123.0)
+        path = tmp_path / "analysis.npz"
+        save_song_analysis(path, a)
+        assert load_song_analysis(path, source_mtime=456.0) is None
+        assert load_song_analysis(path, num_bars=48) is None
+        assert load_song_analysis(tmp_path / "no_existe.npz") is None
+
+    def test_archivo_corrupto_devuelve_none(self, tmp_path):
+        path = tmp_path / "analysis.npz"
+        path.write_bytes(b"no es un npz")
+        assert load_song_analysis(path) is None
+
+
+class TestAnalizadorOffline:
+    def test_emite_barras_sin_buffer_en_vivo(self, app):
+        from audio_visualizer import AudioAnalyzer
+        an = AudioAnalyzer(num_bars=32, fft_size=1024)
+        an.set_framerate(1e9)
+        an.configure(SR)
+        an.set_offline(compute_song_analysis(_cancion(), num_bars=32,
+                                             fft_size=1024))
+        got = []
+        an.bars_ready.connect(got.append)
+        an.process_offline(1.0, np.array([1, 0, 0, 0], dtype=np.float32),
+                           peak=0.3)
+        assert len(got) == 1
+        # Solo el grave suena: la barra más alta queda abajo
+        assert got[-1].argmax() < 8
+        # El buffer del análisis en vivo no se tocó
+        assert not an._buf.any()
+
+    def test_analisis_con_otras_bandas_no_se_usa(self, app):
+        from audio_visualizer import AudioAnalyzer
+        an = AudioAnalyzer(num_bars=48)
+        an.set_offline(compute_song_analysis(_cancion(0.5), num_bars=16,
+                                             fft_size=512))
+        assert an.offline is None